@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Time benchmark of sending the same CFP to many agents, through the :class:`~oef.framing.FrameWriter`
+of a network proxy.
+
+It compares one :func:`~oef.core.OEFCoreInterface.send_cfp` per destination, that builds and serializes
+a full envelope every time, with :func:`~oef.core.OEFCoreInterface.broadcast_cfp`, that serializes the query once.
+
+Usage:
+
+    python benchmarks/bench_broadcast.py [--destinations N] [--constraints N] [--repeat N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from oef.framing import FrameWriter
+from oef.messages import CFP, Multicast
+from oef.query import Query, Constraint, Eq, Gt, In, Or, Distance
+from oef.schema import Location
+
+
+class _NullTransport:
+    """A transport that discards the data."""
+
+    def write(self, data):
+        pass
+
+
+def _make_query(nb_constraints: int) -> Query:
+    constraints = []
+    for i in range(nb_constraints):
+        constraints.append(Or([Constraint("author_{}".format(i), Eq("Stephen King")),
+                               Constraint("genre_{}".format(i), In(["horror", "thriller", "fantasy"])),
+                               Constraint("position_{}".format(i), Distance(Location(48.85, 2.29), 10.0))]))
+        constraints.append(Constraint("year_{}".format(i), Gt(1990)))
+    return Query(constraints)
+
+
+def send_one_by_one(writer: FrameWriter, destinations, query: Query) -> None:
+    for dialogue_id, destination in destinations:
+        writer.write(CFP(0, dialogue_id, destination, 0, query).to_envelope().SerializeToString())
+    writer.flush()
+
+
+def broadcast(writer: FrameWriter, destinations, query: Query) -> None:
+    writer.writelines(Multicast(CFP(0, 0, "", 0, query), destinations).serialize())
+    writer.flush()
+
+
+def measure(name: str, function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = (time.perf_counter() - start) / repeat
+    print("{:<14} {:>10.2f} ms/broadcast".format(name, elapsed * 1e3))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the broadcast of a CFP.")
+    parser.add_argument("--destinations", type=int, default=1000, help="number of destinations.")
+    parser.add_argument("--constraints", type=int, default=20, help="number of constraints of the query.")
+    parser.add_argument("--repeat", type=int, default=10, help="number of repetitions.")
+    args = parser.parse_args()
+
+    writer = FrameWriter(_NullTransport(), asyncio.get_event_loop())
+    query = _make_query(args.constraints)
+    destinations = [(i, "agent-{}".format(i)) for i in range(args.destinations)]
+
+    print("{} destinations, query of {} bytes".format(args.destinations, query.to_pb().ByteSize()))
+    before = measure("send_cfp", lambda: send_one_by_one(writer, destinations, query), args.repeat)
+    after = measure("broadcast_cfp", lambda: broadcast(writer, destinations, query), args.repeat)
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
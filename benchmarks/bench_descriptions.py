@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Allocation and time benchmark of the decoding of the proposals of a Propose, and of the construction
+of descriptions without a data model.
+
+It compares the previous implementation (every description deep-copies its values, and every data model
+deep-copies its attributes) with the current one, that shares the data models and takes the ownership
+of the decoded values. The allocations are counted with ``tracemalloc``.
+
+Usage:
+
+    python benchmarks/bench_descriptions.py [--proposals N] [--repeat N]
+"""
+
+import argparse
+import copy
+import time
+import tracemalloc
+from typing import Callable
+
+from oef import fipa_pb2
+from oef.schema import Description, DataModel, AttributeSchema, Location
+
+
+class _DeepCopyDataModel(DataModel):
+    """The data model before the removal of the deep copies."""
+
+    def __init__(self, name, attribute_schemas, description=None):
+        super().__init__(name, copy.deepcopy(attribute_schemas), description)
+
+
+class _DeepCopyDescription(Description):
+    """The description before the removal of the deep copies."""
+
+    def __init__(self, attribute_values, data_model=None, data_model_name=""):
+        if data_model is None:
+            data_model = _DeepCopyDataModel(data_model_name, [AttributeSchema(k, type(v), True)
+                                                              for k, v in attribute_values.items()])
+        super().__init__(copy.deepcopy(attribute_values), data_model)
+
+    @classmethod
+    def from_pb(cls, query_instance, data_model=None):
+        model = _DeepCopyDataModel.from_pb(query_instance.model)
+        values = dict([(attr.key, cls._extract_value(attr.value)) for attr in query_instance.values])
+        return cls(values, model)
+
+
+def _make_proposals(nb_proposals: int) -> bytes:
+    proposals_pb = fipa_pb2.Fipa.Propose.Proposals()
+    proposals_pb.objects.extend([Description({"price": i, "author": "Stephen King", "year": 2000 + i,
+                                              "position": Location(48.85, 2.29)}, data_model_name="book").to_pb()
+                                 for i in range(nb_proposals)])
+    return proposals_pb.SerializeToString()
+
+
+def measure(name: str, function: Callable[[], object], repeat: int) -> int:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    result = function()
+    snapshot_after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    nb_blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, "filename")
+                    if stat.count_diff > 0)
+
+    print("{:<24} {:>8.1f} us/call {:>8d} memory blocks {:>8d} bytes peak".format(
+        name, elapsed / repeat * 1e6, nb_blocks, peak))
+    return nb_blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the construction and the decoding of descriptions.")
+    parser.add_argument("--proposals", type=int, default=100, help="number of proposals in the Propose.")
+    parser.add_argument("--repeat", type=int, default=200, help="number of repetitions.")
+    args = parser.parse_args()
+
+    proposals_pb = fipa_pb2.Fipa.Propose.Proposals()
+    proposals_pb.ParseFromString(_make_proposals(args.proposals))
+    values = [{"price": i, "author": "Stephen King", "year": 2000 + i} for i in range(args.proposals)]
+
+    print("{} proposals".format(args.proposals))
+    before = measure("decode (deepcopy)",
+                     lambda: [_DeepCopyDescription.from_pb(p) for p in proposals_pb.objects], args.repeat)
+    after = measure("decode", lambda: Description.list_from_pb(proposals_pb.objects), args.repeat)
+    print("memory blocks: {:.2f}x fewer".format(before / after))
+
+    before = measure("construct (deepcopy)", lambda: [_DeepCopyDescription(v) for v in values], args.repeat)
+    after = measure("construct", lambda: [Description(v) for v in values], args.repeat)
+    print("memory blocks: {:.2f}x fewer".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Throughput benchmark of the dispatch of the messages in :func:`~oef.core.OEFProxy.loop`,
+measured in messages per second through :class:`~oef.proxy.OEFLocalProxy`.
+
+It compares the previous implementation (a chain of ``if``/``elif`` on the ``oneof`` cases, that decodes
+every query and proposal) with the dispatch table, with and without lazy payloads.
+
+Usage:
+
+    python benchmarks/bench_dispatch.py [--messages N] [--proposals N] [--touch]
+"""
+
+import argparse
+import asyncio
+import time
+
+from oef import agent_pb2
+from oef.agents import Agent
+from oef.messages import CFP, Propose, Accept, Message, OEFErrorOperation
+from oef.proxy import OEFLocalProxy
+from oef.query import Query, Constraint, Gt, Eq, And
+from oef.schema import Description
+
+
+class _IfElifLocalProxy(OEFLocalProxy):
+    """The local proxy, with the dispatch before the introduction of the dispatch table."""
+
+    def _dispatch(self, agent, msg):  # noqa: C901
+        case = msg.WhichOneof("payload")
+        if case == "agents":
+            agent.on_search_result(msg.answer_id, msg.agents.agents)
+        elif case == "oef_error":
+            agent.on_oef_error(msg.answer_id, OEFErrorOperation(msg.oef_error.operation))
+        elif case == "dialogue_error":
+            agent.on_dialogue_error(msg.answer_id, msg.dialogue_error.dialogue_id, msg.dialogue_error.origin)
+        elif case == "content":
+            content_case = msg.content.WhichOneof("payload")
+            if content_case == "content":
+                agent.on_message(msg.answer_id, msg.content.dialogue_id, msg.content.origin, msg.content.content)
+            elif content_case == "fipa":
+                fipa = msg.content.fipa
+                fipa_case = fipa.WhichOneof("msg")
+                if fipa_case == "cfp":
+                    cfp_case = fipa.cfp.WhichOneof("payload")
+                    if cfp_case == "nothing":
+                        query = None
+                    elif cfp_case == "content":
+                        query = fipa.cfp.content
+                    else:
+                        query = Query.from_pb(fipa.cfp.query)
+                    agent.on_cfp(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target, query)
+                elif fipa_case == "propose":
+                    if fipa.propose.WhichOneof("payload") == "content":
+                        proposals = fipa.propose.content
+                    else:
+                        proposals = [Description.from_pb(propose) for propose in fipa.propose.proposals.objects]
+                    agent.on_propose(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target,
+                                     proposals)
+                elif fipa_case == "accept":
+                    agent.on_accept(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target)
+                elif fipa_case == "decline":
+                    agent.on_decline(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target)
+
+
+class _CountingAgent(Agent):
+    """An agent that counts the messages, and stops after a given number of them."""
+
+    def __init__(self, proxy, nb_messages: int, touch: bool, lazy: bool):
+        super().__init__(proxy)
+        self.nb_messages = nb_messages
+        self.touch = touch
+        self.lazy_payloads = lazy
+        self.count = 0
+
+    def _count(self, payload=None):
+        if self.touch and payload is not None:
+            for _ in payload.constraints if isinstance(payload, Query) else payload:
+                pass
+        self.count += 1
+        if self.count == self.nb_messages:
+            self.stop()
+
+    def on_message(self, msg_id, dialogue_id, origin, content):
+        self._count()
+
+    def on_cfp(self, msg_id, dialogue_id, origin, target, query):
+        self._count(query)
+
+    def on_propose(self, msg_id, dialogue_id, origin, target, proposals):
+        self._count(proposals)
+
+    def on_accept(self, msg_id, dialogue_id, origin, target):
+        self._count()
+
+    def on_decline(self, msg_id, dialogue_id, origin, target):
+        self._count()
+
+
+def _make_messages(nb_messages: int, nb_proposals: int):
+    query = Query([And([Constraint("price", Gt(10)), Constraint("author", Eq("Stephen King"))]),
+                   Constraint("year", Gt(1990))])
+    proposals = [Description({"price": i, "author": "Stephen King", "year": 2000 + i}) for i in range(nb_proposals)]
+    templates = [
+        Message(0, 0, "receiver", b"hello"),
+        CFP(1, 0, "receiver", 0, query),
+        Propose(2, 0, "receiver", 1, proposals),
+        Accept(3, 0, "receiver", 2),
+    ]
+    messages = []
+    for template in templates:
+        msg = agent_pb2.Server.AgentMessage()
+        msg.answer_id = template.msg_id
+        msg.content.CopyFrom(_to_content(template))
+        messages.append(msg.SerializeToString())
+    return [messages[i % len(messages)] for i in range(nb_messages)]
+
+
+def _to_content(msg) -> agent_pb2.Server.AgentMessage.Content:
+    envelope = msg.to_envelope()
+    content = agent_pb2.Server.AgentMessage.Content()
+    content.dialogue_id = envelope.send_message.dialogue_id
+    content.origin = "sender"
+    if envelope.send_message.HasField("content"):
+        content.content = envelope.send_message.content
+    else:
+        content.fipa.CopyFrom(envelope.send_message.fipa)
+    return content
+
+
+def run(name: str, proxy_class, messages, touch: bool, lazy: bool) -> float:
+    loop = asyncio.get_event_loop()
+    node = OEFLocalProxy.LocalNode()
+    proxy = proxy_class("receiver", node)
+    agent = _CountingAgent(proxy, len(messages), touch, lazy)
+    agent.connect()
+    for data in messages:
+        proxy._read_queue.put_nowait(data)
+
+    start = time.perf_counter()
+    try:
+        loop.run_until_complete(agent.async_run())
+    except asyncio.CancelledError:
+        pass
+    elapsed = time.perf_counter() - start
+    print("{:<14} {:>10.0f} msg/s".format(name, len(messages) / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dispatch of the messages in the agent loop.")
+    parser.add_argument("--messages", type=int, default=100000, help="number of messages.")
+    parser.add_argument("--proposals", type=int, default=10, help="number of proposals in every Propose.")
+    parser.add_argument("--touch", action="store_true", help="access the payload in the handlers.")
+    args = parser.parse_args()
+
+    messages = _make_messages(args.messages, args.proposals)
+    print("{} messages (Message, CFP, Propose, Accept), {} proposals per Propose, payload {}".format(
+        args.messages, args.proposals, "accessed" if args.touch else "not accessed"))
+    before = run("if/elif", _IfElifLocalProxy, messages, args.touch, False)
+    eager = run("table", OEFLocalProxy, messages, args.touch, False)
+    lazy = run("table (lazy)", OEFLocalProxy, messages, args.touch, True)
+    print("speedup: {:.2f}x (table), {:.2f}x (table, lazy)".format(before / eager, before / lazy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Throughput benchmark of the receive path of :class:`~oef.proxy.OEFNetworkProxy`.
+
+It compares the previous implementation of ``_receive`` (read the header, then append the chunks of the payload)
+with the :class:`~oef.framing.FrameReader` buffer. The bytes are fed to an ``asyncio.StreamReader`` in chunks,
+as it happens with a real socket.
+
+Usage:
+
+    python benchmarks/bench_framing.py [--frames N] [--size BYTES] [--chunk BYTES]
+"""
+
+import argparse
+import asyncio
+import struct
+import time
+from collections import deque
+
+from oef import agent_pb2
+from oef.framing import FrameReader, HEADER, DEFAULT_BUFFER_SIZE
+
+
+async def _stream_reader_receive(reader: asyncio.StreamReader) -> bytes:
+    """
+    The receive path before the introduction of the frame reader.
+    The header is read with ``readexactly``, otherwise it fails whenever the header is split between two chunks.
+    """
+    nbytes_packed = await reader.readexactly(len(struct.pack("I", 0)))
+    nbytes = struct.unpack("I", nbytes_packed)[0]
+    data = b""
+    while len(data) < nbytes:
+        data += await reader.read(nbytes - len(data))
+    return data
+
+
+class _FrameReaderReceive:
+    """The receive path based on :class:`~oef.framing.FrameReader`."""
+
+    def __init__(self, reader: asyncio.StreamReader):
+        self.reader = reader
+        self.frame_reader = FrameReader()
+        self.frames = deque()
+
+    async def __call__(self) -> memoryview:
+        while not self.frames:
+            self.frame_reader.feed(await self.reader.read(DEFAULT_BUFFER_SIZE))
+            self.frames.extend(self.frame_reader.frames())
+        return self.frames.popleft()
+
+
+def _make_stream(nb_frames: int, size: int) -> bytes:
+    msg = agent_pb2.Server.AgentMessage()
+    msg.answer_id = 0
+    msg.content.dialogue_id = 0
+    msg.content.origin = "benchmark"
+    msg.content.content = b"a" * size
+    serialized = msg.SerializeToString()
+    return (HEADER.pack(len(serialized)) + serialized) * nb_frames
+
+
+async def _feed(reader: asyncio.StreamReader, stream: bytes, chunk_size: int) -> None:
+    for i in range(0, len(stream), chunk_size):
+        reader.feed_data(stream[i:i + chunk_size])
+        await asyncio.sleep(0)
+    reader.feed_eof()
+
+
+async def _consume(receive, nb_frames: int) -> None:
+    msg = agent_pb2.Server.AgentMessage()
+    for _ in range(nb_frames):
+        msg.ParseFromString(await receive())
+
+
+def run(name: str, receive_factory, stream: bytes, nb_frames: int, chunk_size: int) -> float:
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader(limit=2 ** 32)
+    start = time.perf_counter()
+    loop.run_until_complete(asyncio.gather(_feed(reader, stream, chunk_size),
+                                           _consume(receive_factory(reader), nb_frames)))
+    elapsed = time.perf_counter() - start
+    print("{:<14} {:>10.0f} frames/s {:>10.1f} MB/s".format(name, nb_frames / elapsed, len(stream) / elapsed / 2**20))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the receive path of the network proxy.")
+    parser.add_argument("--frames", type=int, default=200, help="number of frames.")
+    parser.add_argument("--size", type=int, default=2 ** 20, help="size of the payload of every frame, in bytes.")
+    parser.add_argument("--chunk", type=int, default=2 ** 16, help="size of the chunks fed to the reader, in bytes.")
+    args = parser.parse_args()
+
+    stream = _make_stream(args.frames, args.size)
+    print("{} frames of {} bytes, received in chunks of {} bytes".format(args.frames, args.size, args.chunk))
+    before = run("StreamReader", lambda reader: (lambda: _stream_reader_receive(reader)),
+                 stream, args.frames, args.chunk)
+    after = run("FrameReader", _FrameReaderReceive, stream, args.frames, args.chunk)
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Micro-benchmarks of the hot paths of the SDK:
+
+* the serialization of :class:`~oef.schema.Description` and :class:`~oef.query.Query` (``to_pb``/``from_pb``);
+* the ``check`` of every :class:`~oef.query.ConstraintType`;
+* :func:`~oef.helpers.haversine`;
+* the ``to_envelope`` of every :class:`~oef.messages.BaseMessage`;
+* the decoding of the messages in :func:`~oef.core.OEFProxy.loop`.
+
+The inputs are drawn from the Hypothesis strategies in ``test/strategies.py``, with fixed seeds,
+so every run measures the same inputs. The descriptions, the queries and the sets have 1, 10 and 1000
+attributes, constraints or elements.
+
+Every benchmark is calibrated, as in ``pyperf``: the number of loops is increased until a run lasts
+at least ``--min-time``, then the runs are repeated, and the median and the minimum time per call are reported.
+
+Usage (from the root of the repository):
+
+    python benchmarks/bench_hot_paths.py [--filter SUBSTRING] [--sizes 1 10 1000] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List, Tuple, Dict
+
+from hypothesis import given, settings, seed, Phase, HealthCheck
+from hypothesis.strategies import SearchStrategy, integers
+
+# the strategies are in the tests, that are not installed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from oef import agent_pb2  # noqa: E402
+from oef.core import decode_agent_message  # noqa: E402
+from oef.helpers import haversine  # noqa: E402
+from oef.messages import BaseMessage, RegisterDescription, RegisterService, UnregisterDescription, \
+    UnregisterService, SearchAgents, SearchServices, Message, CFP, Propose, Accept, Decline  # noqa: E402
+from oef.query import Query, Eq, NotEq, Lt, LtEq, Gt, GtEq, Range, In, NotIn, Distance, ConstraintType  # noqa: E402
+from oef.schema import AttributeSchema, DataModel, Description  # noqa: E402
+from test.strategies import attributes_schema, constraints, integers_32, locations, strategies_by_type  # noqa: E402
+
+SEED = 42
+SIZES = [1, 10, 1000]
+
+"""The number of proposals in the Propose messages, whose descriptions have 1, 10 or 1000 attributes."""
+NB_PROPOSALS = 10
+
+"""A benchmark: its name and the function to time."""
+BENCHMARK = Tuple[str, Callable[[], object]]
+"""A benchmark whose function makes many calls: its name, the function to time, and the number of calls."""
+BATCH_BENCHMARK = Tuple[str, Callable[[], object], int]
+
+
+def draw(strategy: SearchStrategy, n: int, seed_: int = SEED) -> list:
+    """
+    Draw ``n`` examples from a strategy, deterministically for a given seed.
+    If the strategy has fewer distinct examples, they are repeated.
+
+    :param strategy: the Hypothesis strategy.
+    :param n: the number of examples.
+    :param seed_: the seed.
+    :return: the list of the examples.
+    """
+    examples = []
+
+    @seed(seed_)
+    @settings(max_examples=n, database=None, deadline=None, phases=[Phase.generate],
+              suppress_health_check=list(HealthCheck))
+    @given(strategy)
+    def collect(example):
+        examples.append(example)
+
+    collect()
+    return [examples[i % len(examples)] for i in range(n)]
+
+
+def make_data_model(size: int) -> DataModel:
+    """Draw a data model with ``size`` attributes, with unique names."""
+    attributes = [AttributeSchema("{}_{}".format(a.name, i), a.type, a.required, a.description)
+                  for i, a in enumerate(draw(attributes_schema(), size))]
+    return DataModel("data_model_{}".format(size), attributes)
+
+
+def make_description(data_model: DataModel) -> Description:
+    """Draw a description with a value for every attribute of a data model."""
+    values = {}
+    for type_, strategy in strategies_by_type.items():
+        names = [a.name for a in data_model.attribute_schemas if a.type == type_]
+        values.update(zip(names, draw(strategy, len(names)) if names else []))
+    return Description(values, data_model)
+
+
+def make_query(data_model: DataModel, size: int) -> Query:
+    """Draw a query with ``size`` constraints over the attributes of a data model."""
+    return Query(draw(constraints(data_model.attribute_schemas), size), data_model)
+
+
+def _server_message(msg: BaseMessage) -> bytes:
+    """Serialize an agent message as delivered by the OEF Node to its destination."""
+    agent_msg = msg.to_envelope().send_message
+    server_msg = agent_pb2.Server.AgentMessage()
+    server_msg.answer_id = msg.msg_id
+    server_msg.content.dialogue_id = agent_msg.dialogue_id
+    server_msg.content.origin = "origin"
+    if agent_msg.WhichOneof("payload") == "content":
+        server_msg.content.content = agent_msg.content
+    else:
+        server_msg.content.fipa.CopyFrom(agent_msg.fipa)
+    return server_msg.SerializeToString()
+
+
+def _decode(data: bytes, lazy: bool):
+    msg = agent_pb2.Server.AgentMessage()
+    msg.ParseFromString(data)
+    return decode_agent_message(msg, lazy)
+
+
+def serialization_benchmarks(sizes: List[int]) -> List[BENCHMARK]:
+    benchmarks = []
+    for size in sizes:
+        data_model = make_data_model(size)
+        description, query = make_description(data_model), make_query(data_model, size)
+        description_pb, query_pb = description.to_pb(), query.to_pb()
+        benchmarks += [
+            ("Description.to_pb[{}]".format(size), description.to_pb),
+            ("Description.from_pb[{}]".format(size), lambda pb=description_pb: Description.from_pb(pb)),
+            ("Query.to_pb[{}]".format(size), query.to_pb),
+            ("Query.from_pb[{}]".format(size), lambda pb=query_pb: Query.from_pb(pb)),
+        ]
+    return benchmarks
+
+
+def _check_all(constraint_type: ConstraintType, values: list) -> Callable[[], None]:
+    check = constraint_type.check
+
+    def run():
+        for value in values:
+            check(value)
+    return run
+
+
+def check_benchmarks(sizes: List[int], nb_values: int = 100) -> List[BATCH_BENCHMARK]:
+    """The checks of every constraint type, over ``nb_values`` values (the time is per check)."""
+    ints = draw(integers_32, nb_values)
+    locs = draw(locations(), nb_values)
+    a, b = sorted(draw(integers_32, 2, SEED + 1))
+    benchmarks = [("{}.check".format(cls.__name__), _check_all(cls(a), ints))
+                  for cls in [Eq, NotEq, Lt, LtEq, Gt, GtEq]]
+    benchmarks.append(("Range.check", _check_all(Range((a, b)), ints)))
+    benchmarks.append(("Distance.check", _check_all(Distance(locs[0], 1000.0), locs)))
+    for size in sizes:
+        elements = draw(integers_32, size, SEED + 2)
+        benchmarks += [("{}.check[{}]".format(cls.__name__, size), _check_all(cls(elements), ints))
+                       for cls in [In, NotIn]]
+    return [(name, fn, nb_values) for name, fn in benchmarks]
+
+
+def haversine_benchmarks(nb_values: int = 100) -> List[BATCH_BENCHMARK]:
+    pairs = list(zip(draw(locations(), nb_values), draw(locations(), nb_values, SEED + 1)))
+
+    def run():
+        for l1, l2 in pairs:
+            haversine(l1.latitude, l1.longitude, l2.latitude, l2.longitude)
+    return [("haversine", run, nb_values)]
+
+
+def message_benchmarks(sizes: List[int]) -> List[BENCHMARK]:
+    msg_id, dialogue_id, destination, target = draw(integers(min_value=0, max_value=2 ** 31 - 1), 4)
+    benchmarks = [
+        ("UnregisterDescription.to_envelope", UnregisterDescription(msg_id).to_envelope),
+        ("Accept.to_envelope", Accept(msg_id, dialogue_id, "destination", target).to_envelope),
+        ("Decline.to_envelope", Decline(msg_id, dialogue_id, "destination", target).to_envelope),
+    ]
+    decode = [("Accept", Accept(msg_id, dialogue_id, "destination", target)),
+              ("Decline", Decline(msg_id, dialogue_id, "destination", target))]
+    for size in sizes:
+        data_model = make_data_model(size)
+        description, query = make_description(data_model), make_query(data_model, size)
+        proposals = [description] * NB_PROPOSALS
+        messages = [RegisterDescription(msg_id, description), RegisterService(msg_id, description),
+                    UnregisterService(msg_id, description), SearchAgents(msg_id, query), SearchServices(msg_id, query),
+                    Message(msg_id, dialogue_id, "destination", b"x" * size),
+                    CFP(msg_id, dialogue_id, "destination", target, query),
+                    Propose(msg_id, dialogue_id, "destination", target, proposals)]
+        benchmarks += [("{}.to_envelope[{}]".format(type(m).__name__, size), m.to_envelope) for m in messages]
+        decode += [("{}[{}]".format(type(m).__name__, size), m) for m in messages[-3:]]
+
+        search_result = agent_pb2.Server.AgentMessage()
+        search_result.answer_id = msg_id
+        search_result.agents.agents.extend("agent_{}".format(i) for i in range(size))
+        decode.append(("SearchResult[{}]".format(size), search_result.SerializeToString()))
+
+    for name, msg in decode:
+        data = msg if isinstance(msg, bytes) else _server_message(msg)
+        benchmarks.append(("loop.decode {}".format(name), lambda data=data: _decode(data, False)))
+        benchmarks.append(("loop.decode lazy {}".format(name), lambda data=data: _decode(data, True)))
+    return benchmarks
+
+
+def _run(fn: Callable[[], object], loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - start
+
+
+def measure(fn: Callable[[], object], min_time: float, repeat: int) -> List[float]:
+    """
+    Calibrate the number of loops so that a run lasts at least ``min_time``, then time ``repeat`` runs.
+
+    :return: the time of every run, per loop, in seconds.
+    """
+    loops = 1
+    while _run(fn, loops) < min_time:
+        loops *= 2
+    return [_run(fn, loops) / loops for _ in range(repeat)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the hot paths of the SDK.")
+    parser.add_argument("--filter", default="", help="run only the benchmarks whose name contains this string.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="the numbers of attributes/constraints.")
+    parser.add_argument("--min-time", type=float, default=0.02, help="minimum duration of a run, in seconds.")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs of every benchmark.")
+    parser.add_argument("--output", default=None, help="file where the results are saved as JSON.")
+    args = parser.parse_args()
+
+    benchmarks = [(name, fn, 1) for name, fn in serialization_benchmarks(args.sizes)]
+    benchmarks += check_benchmarks(args.sizes)
+    benchmarks += haversine_benchmarks()
+    benchmarks += [(name, fn, 1) for name, fn in message_benchmarks(args.sizes)]
+
+    results = {}  # type: Dict[str, Dict[str, float]]
+    print("{:<42} {:>14} {:>14}".format("benchmark", "median (us)", "min (us)"))
+    for name, fn, nb_calls in benchmarks:
+        if args.filter not in name:
+            continue
+        times = [t / nb_calls for t in measure(fn, args.min_time, args.repeat)]
+        results[name] = {"median_us": statistics.median(times) * 1e6, "min_us": min(times) * 1e6}
+        print("{:<42} {:>14.3f} {:>14.3f}".format(name, results[name]["median_us"], results[name]["min_us"]))
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"seed": SEED, "sizes": args.sizes, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
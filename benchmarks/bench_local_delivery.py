@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Throughput benchmark of the delivery of the messages through :class:`~oef.proxy.OEFLocalProxy.LocalNode`,
+from the send of an agent to the handler of the recipient, measured in messages per second.
+
+It compares the wire-faithful node (every message is serialized by the node and parsed by the recipient)
+with the default one, that delivers the Python objects that were sent.
+
+Usage:
+
+    python benchmarks/bench_local_delivery.py [--messages N] [--proposals N]
+"""
+
+import argparse
+import asyncio
+import time
+
+from oef.agents import Agent
+from oef.proxy import OEFLocalProxy
+from oef.query import Query, Constraint, Gt, Eq, And
+from oef.schema import Description
+
+
+class _CountingAgent(Agent):
+    """An agent that counts the messages, and stops after a given number of them."""
+
+    def __init__(self, proxy, nb_messages: int):
+        super().__init__(proxy)
+        self.nb_messages = nb_messages
+        self.count = 0
+
+    def _count(self):
+        self.count += 1
+        if self.count == self.nb_messages:
+            self.stop()
+
+    def on_message(self, msg_id, dialogue_id, origin, content):
+        self._count()
+
+    def on_cfp(self, msg_id, dialogue_id, origin, target, query):
+        self._count()
+
+    def on_propose(self, msg_id, dialogue_id, origin, target, proposals):
+        self._count()
+
+    def on_accept(self, msg_id, dialogue_id, origin, target):
+        self._count()
+
+
+def run(name: str, wire_faithful: bool, nb_messages: int, nb_proposals: int) -> float:
+    loop = asyncio.get_event_loop()
+    node = OEFLocalProxy.LocalNode(wire_faithful=wire_faithful)
+    sender = OEFLocalProxy("sender", node)
+    receiver = _CountingAgent(OEFLocalProxy("receiver", node), nb_messages)
+    loop.run_until_complete(sender.connect())
+    receiver.connect()
+
+    query = Query([And([Constraint("price", Gt(10)), Constraint("author", Eq("Stephen King"))]),
+                   Constraint("year", Gt(1990))])
+    proposals = [Description({"price": i, "author": "Stephen King", "year": 2000 + i}) for i in range(nb_proposals)]
+    sends = [lambda i: sender.send_message(i, 0, "receiver", b"hello"),
+             lambda i: sender.send_cfp(i, 0, "receiver", 0, query),
+             lambda i: sender.send_propose(i, 0, "receiver", 0, proposals),
+             lambda i: sender.send_accept(i, 0, "receiver", 0)]
+
+    node_task = asyncio.ensure_future(node.run())
+    start = time.perf_counter()
+    for i in range(nb_messages):
+        sends[i % len(sends)](i)
+    try:
+        loop.run_until_complete(receiver.async_run())
+    except asyncio.CancelledError:
+        pass
+    elapsed = time.perf_counter() - start
+    node.stop()
+    node_task.cancel()
+    print("{:<16} {:>10.0f} msg/s".format(name, nb_messages / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the delivery of the messages through the local node.")
+    parser.add_argument("--messages", type=int, default=100000, help="number of messages.")
+    parser.add_argument("--proposals", type=int, default=10, help="number of proposals in every Propose.")
+    args = parser.parse_args()
+
+    print("{} messages (Message, CFP, Propose, Accept), {} proposals per Propose".format(
+        args.messages, args.proposals))
+    before = run("wire-faithful", True, args.messages, args.proposals)
+    after = run("handler calls", False, args.messages, args.proposals)
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Memory benchmark of the nodes of a query.
+
+It compares the previous implementation (every node stores its attributes in a ``__dict__``,
+and the sets and the conjunctions keep the lists they are built with) with the current one,
+that stores the attributes in ``__slots__`` and the sequences in tuples. The memory is measured with ``tracemalloc``.
+
+Usage:
+
+    python benchmarks/bench_query_memory.py [--objects N]
+"""
+
+import argparse
+import tracemalloc
+from typing import Callable
+
+from oef.query import Constraint, Gt, In, Distance, And
+from oef.schema import Location
+
+
+class _DictLocation:
+    """A location before the introduction of ``__slots__``: the attributes are stored in a ``__dict__``."""
+
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class _DictRelation:
+    def __init__(self, value):
+        self.value = value
+
+
+class _DictSet:
+    def __init__(self, values):
+        self.values = values
+
+
+class _DictDistance:
+    def __init__(self, center, distance):
+        self.center = center
+        self.distance = distance
+
+
+class _DictConstraint:
+    def __init__(self, attribute_name, constraint):
+        self.attribute_name = attribute_name
+        self.constraint = constraint
+
+
+class _DictAnd:
+    def __init__(self, constraints):
+        self.constraints = constraints
+
+
+"""The factories of the nodes to measure: for every kind of node, the previous and the current implementation."""
+_FACTORIES = [
+    ("Location",
+     lambda i: _DictLocation(float(i), 2.0),
+     lambda i: Location(float(i), 2.0)),
+    ("Gt",
+     lambda i: _DictRelation(i),
+     lambda i: Gt(i)),
+    ("In",
+     lambda i: _DictSet(["horror", "thriller", "fantasy"]),
+     lambda i: In(["horror", "thriller", "fantasy"])),
+    ("Constraint(Gt)",
+     lambda i: _DictConstraint("year", _DictRelation(i)),
+     lambda i: Constraint("year", Gt(i))),
+    ("Constraint(Distance)",
+     lambda i: _DictConstraint("position", _DictDistance(_DictLocation(float(i), 2.0), 10.0)),
+     lambda i: Constraint("position", Distance(Location(float(i), 2.0), 10.0))),
+    ("And",
+     lambda i: _DictAnd([_DictConstraint("year", _DictRelation(i)), _DictConstraint("genre", _DictRelation(i))]),
+     lambda i: And([Constraint("year", Gt(i)), Constraint("genre", Gt(i))])),
+]
+
+
+def measure(factory: Callable[[int], object], nb_objects: int) -> float:
+    """
+    Measure the memory allocated by the nodes.
+
+    :param factory: the function that builds a node.
+    :param nb_objects: the number of nodes to build.
+    :return: the bytes per node.
+    """
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [factory(i) for i in range(nb_objects)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the list that holds the objects is not part of their footprint.
+    size = after - before - objects.__sizeof__()
+    del objects
+    return size / nb_objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory footprint of the nodes of a query.")
+    parser.add_argument("--objects", type=int, default=100000, help="number of objects of every kind.")
+    args = parser.parse_args()
+
+    print("{:<22} {:>10} {:>10}".format("bytes per node", "__dict__", "__slots__"))
+    for name, before_factory, after_factory in _FACTORIES:
+        before = measure(before_factory, args.objects)
+        after = measure(after_factory, args.objects)
+        print("{:<22} {:>10.1f} {:>10.1f}   {:.2f}x smaller".format(name, before, after, before / after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Time benchmark of the optimization of the queries (see :func:`~oef.query.Query.optimize`).
+
+It compares the previous implementation (the constraints are compiled and planned as they are written)
+with the current one, that merges the bounds on the same attribute, folds the equalities into sets
+and evaluates the cheapest constraints first. The query is checked against a list of descriptions,
+and searched in a :class:`~oef.directory.Directory`.
+
+Usage:
+
+    python benchmarks/bench_query_optimize.py [--descriptions N] [--repeat N]
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from oef.directory import Directory
+from oef.query import Query, Constraint, Or, Eq, Gt, GtEq, LtEq, Distance
+from oef.schema import Description, Location
+
+
+class _UnoptimizedQuery(Query):
+    """The query before the introduction of the optimization."""
+
+    def optimize(self) -> Query:
+        return self
+
+
+_GENRES = ["horror", "fantasy", "science-fiction", "thriller", "novel", "poetry", "biography", "history"]
+
+
+def _make_constraints():
+    return [Constraint("position", Distance(Location(48.85, 2.29), 1000.0)),
+            Or([Constraint("genre", Eq(genre)) for genre in _GENRES[:4]]),
+            Constraint("year", Gt(1980)),
+            Constraint("year", GtEq(1990)),
+            Constraint("year", LtEq(2000))]
+
+
+def measure(name: str, function: Callable[[], object], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    elapsed = (time.perf_counter() - start) / repeat
+
+    print("{:<28} {:>10.1f} us/call".format(name, elapsed * 1e6))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the optimization of the queries.")
+    parser.add_argument("--descriptions", type=int, default=10000, help="number of descriptions.")
+    parser.add_argument("--repeat", type=int, default=20, help="number of repetitions.")
+    args = parser.parse_args()
+
+    descriptions = [Description({"year": 1950 + i % 70, "genre": _GENRES[i % len(_GENRES)],
+                                 "position": Location(48.0 + (i % 100) / 50, 2.0 + (i % 70) / 50)})
+                    for i in range(args.descriptions)]
+    directory = Directory()
+    for i, description in enumerate(descriptions):
+        directory.add("agent_{}".format(i), description)
+
+    query = Query(_make_constraints())
+    unoptimized_query = _UnoptimizedQuery(_make_constraints())
+    assert [query.check(d) for d in descriptions] == [unoptimized_query.check(d) for d in descriptions]
+
+    print("{} descriptions".format(args.descriptions))
+    before = measure("check (unoptimized)", lambda: [unoptimized_query.check(d) for d in descriptions], args.repeat)
+    after = measure("check", lambda: [query.check(d) for d in descriptions], args.repeat)
+    print("speedup: {:.2f}x".format(before / after))
+
+    before = measure("search (unoptimized)", lambda: directory.search(unoptimized_query), args.repeat)
+    after = measure("search", lambda: directory.search(query), args.repeat)
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
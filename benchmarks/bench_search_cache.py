@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Time benchmark of the cache of the search results of a :class:`~oef.directory.Directory`.
+
+Many agents search the same services, while other services are registered from time to time.
+It compares the directory without cache (every search is computed) with the one with a
+:class:`~oef.directory.SearchCache`, whose results are invalidated only by the registrations that match them.
+
+Usage:
+
+    python benchmarks/bench_search_cache.py [--services N] [--searches N] [--register-every N]
+"""
+
+import argparse
+import time
+
+from oef.directory import Directory, SearchCache
+from oef.query import Query, Constraint, Eq, Range, Distance
+from oef.schema import Description, Location
+
+_GENRES = ["horror", "fantasy", "science-fiction", "thriller", "novel"]
+
+
+def _make_description(i: int) -> Description:
+    return Description({"year": 1950 + i % 70, "genre": _GENRES[i % len(_GENRES)],
+                        "position": Location(48.0 + (i % 100) / 50, 2.0 + (i % 70) / 50)}, data_model_name="book")
+
+
+def _make_queries():
+    return [Query([Constraint("genre", Eq("horror")), Constraint("year", Range((1990, 2000)))]),
+            Query([Constraint("position", Distance(Location(48.85, 2.29), 50.0))]),
+            Query([Constraint("year", Range((1960, 2010)))])]
+
+
+def measure(name: str, directory: Directory, nb_services: int, nb_searches: int, register_every: int) -> float:
+    queries = _make_queries()
+    start = time.perf_counter()
+    for i in range(nb_searches):
+        if i % register_every == 0:
+            directory.add("agent_{}".format(nb_services + i), _make_description(nb_services + i))
+        directory.search(queries[i % len(queries)])
+    elapsed = (time.perf_counter() - start) / nb_searches
+
+    print("{:<16} {:>10.1f} us/search".format(name, elapsed * 1e6))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cache of the search results.")
+    parser.add_argument("--services", type=int, default=10000, help="number of registered services.")
+    parser.add_argument("--searches", type=int, default=2000, help="number of searches.")
+    parser.add_argument("--register-every", type=int, default=50, help="number of searches between registrations.")
+    args = parser.parse_args()
+
+    directories = [Directory(), Directory(cache=SearchCache())]
+    for directory in directories:
+        for i in range(args.services):
+            directory.add("agent_{}".format(i), _make_description(i))
+
+    print("{} services, {} searches, a registration every {} searches".format(
+        args.services, args.searches, args.register_every))
+    before = measure("no cache", directories[0], args.services, args.searches, args.register_every)
+    after = measure("cache", directories[1], args.services, args.searches, args.register_every)
+    cache = directories[1].cache
+    print("speedup: {:.2f}x, hits: {}, misses: {}".format(before / after, cache.hits, cache.misses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Throughput benchmark of :class:`~oef.sharding.ShardedNode`, measured in messages per second.
+
+Pairs of agents play ping-pong for a fixed time: every received message is sent back to its origin.
+It compares one shard (i.e. a single :class:`~oef.proxy.OEFLocalProxy.LocalNode`, in a worker process)
+with many shards, where the agents of a pair can be in different shards.
+
+Usage:
+
+    python benchmarks/bench_sharding.py [--pairs N] [--shards N] [--window N] [--duration SECONDS]
+"""
+
+import argparse
+import time
+
+from oef.agents import Agent
+from oef.sharding import ShardedNode
+
+
+class _PingPongAgent(Agent):
+    """An agent that sends back every message it receives, and counts them."""
+
+    def __init__(self, public_key, proxy):
+        super().__init__(proxy)
+        self.count = 0
+
+    def on_message(self, msg_id, dialogue_id, origin, content):
+        self.count += 1
+        self.send_message(msg_id + 1, dialogue_id, origin, content)
+
+
+class _Setup:
+    """Start the ping-pong: the first agent of every pair sends a window of messages to the second one."""
+
+    def __init__(self, window: int):
+        self.window = window
+
+    def __call__(self, agent: _PingPongAgent):
+        index = int(agent.public_key.split("_")[1])
+        if index % 2 == 0:
+            for dialogue_id in range(self.window):
+                agent.send_message(0, dialogue_id, "agent_{}".format(index + 1), b"ping")
+
+
+def _teardown(agent: _PingPongAgent) -> int:
+    return agent.count
+
+
+def run(nb_shards: int, nb_pairs: int, window: int, duration: float) -> float:
+    public_keys = ["agent_{}".format(i) for i in range(2 * nb_pairs)]
+    with ShardedNode(nb_shards, public_keys, _PingPongAgent, setup=_Setup(window), teardown=_teardown) as node:
+        time.sleep(duration)
+        counts = node.stop()
+    throughput = sum(counts.values()) / duration
+    print("{:<3} shard(s) {:>10.0f} msg/s".format(nb_shards, throughput))
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sharded local node.")
+    parser.add_argument("--pairs", type=int, default=64, help="number of pairs of agents.")
+    parser.add_argument("--shards", type=int, default=4, help="number of shards.")
+    parser.add_argument("--window", type=int, default=8, help="number of messages in flight for every pair.")
+    parser.add_argument("--duration", type=float, default=5.0, help="duration of every run, in seconds.")
+    args = parser.parse_args()
+
+    print("{} pairs of agents, {} messages in flight per pair, {} s per run".format(
+        args.pairs, args.window, args.duration))
+    before = run(1, args.pairs, args.window, args.duration)
+    after = run(args.shards, args.pairs, args.window, args.duration)
+    print("speedup: {:.2f}x".format(after / before))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+Time benchmark of the discovery of the new services.
+
+Many buyers want to know the sellers of a genre of books, while new services are registered.
+It compares polling (every buyer repeats its search after each registration, on a directory with a
+:class:`~oef.directory.SearchCache`, and computes the difference with the previous result) with the
+:class:`~oef.directory.Subscriptions`, that match every registered description only with the indexed subscriptions.
+
+Usage:
+
+    python benchmarks/bench_subscriptions.py [--services N] [--subscribers N] [--registrations N]
+"""
+
+import argparse
+import time
+
+from oef.directory import Directory, SearchCache, Subscriptions
+from oef.query import Query, Constraint, Eq, Range
+from oef.schema import Description
+
+_GENRES = ["horror", "fantasy", "science-fiction", "thriller", "novel"]
+
+
+def _make_description(i: int) -> Description:
+    return Description({"year": 1950 + i % 70, "genre": _GENRES[i % len(_GENRES)]}, data_model_name="book")
+
+
+def _make_query(i: int) -> Query:
+    return Query([Constraint("genre", Eq(_GENRES[i % len(_GENRES)])), Constraint("year", Range((1960, 2010)))])
+
+
+def _make_directory(nb_services: int) -> Directory:
+    directory = Directory(cache=SearchCache())
+    for i in range(nb_services):
+        directory.add("agent_{}".format(i), _make_description(i))
+    return directory
+
+
+def measure_polling(nb_services: int, nb_subscribers: int, nb_registrations: int) -> float:
+    directory = _make_directory(nb_services)
+    queries = [_make_query(i) for i in range(nb_subscribers)]
+    results = [set(directory.search(query)) for query in queries]
+    start = time.perf_counter()
+    for i in range(nb_services, nb_services + nb_registrations):
+        directory.add("agent_{}".format(i), _make_description(i))
+        for j, query in enumerate(queries):
+            result = set(directory.search(query))
+            _ = result - results[j], results[j] - result
+            results[j] = result
+    elapsed = (time.perf_counter() - start) / nb_registrations
+
+    print("{:<16} {:>10.1f} us/registration".format("polling", elapsed * 1e6))
+    return elapsed
+
+
+def measure_subscriptions(nb_services: int, nb_subscribers: int, nb_registrations: int) -> float:
+    directory = _make_directory(nb_services)
+    subscriptions = Subscriptions()
+    for i in range(nb_subscribers):
+        subscriptions.subscribe(("buyer_{}".format(i), 0), _make_query(i), directory)
+    start = time.perf_counter()
+    for i in range(nb_services, nb_services + nb_registrations):
+        description = _make_description(i)
+        directory.add("agent_{}".format(i), description)
+        subscriptions.add("agent_{}".format(i), description)
+    elapsed = (time.perf_counter() - start) / nb_registrations
+
+    print("{:<16} {:>10.1f} us/registration".format("subscriptions", elapsed * 1e6))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the discovery of the new services.")
+    parser.add_argument("--services", type=int, default=10000, help="number of registered services.")
+    parser.add_argument("--subscribers", type=int, default=100, help="number of buyers.")
+    parser.add_argument("--registrations", type=int, default=200, help="number of new services.")
+    args = parser.parse_args()
+
+    print("{} services, {} buyers, {} registrations".format(args.services, args.subscribers, args.registrations))
+    before = measure_polling(args.services, args.subscribers, args.registrations)
+    after = measure_subscriptions(args.services, args.subscribers, args.registrations)
+    print("speedup: {:.2f}x".format(before / after))
+
+
+if __name__ == '__main__':
+    main()
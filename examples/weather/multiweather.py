@@ -67,7 +67,6 @@ class WeatherClientDialogue(SingleDialogue):
         super().__init__(agent, destination, id_)
         self.notify = notify  # type: Callable
         self.data_received = 0
-        self.agent.send_cfp(1, self.id, destination, 0, None)
 
     def on_propose(self, msg_id: int, target: int, proposals: PROPOSE_TYPES):
         print("Received propose from agent {0}".format(self.destination))
@@ -116,6 +115,7 @@ class WeatherGroupDialogues(GroupDialogues):
                                            lambda from_, price: self.update(from_, price))
                      for a in agents]
         self.add_agents(dialogues)
+        agent.broadcast_cfp(1, [(d.id, d.destination) for d in dialogues], 0, None)
     
     def better(self, price1: int, price2: int) -> bool:
         return price1 < price2
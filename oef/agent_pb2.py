@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: agent.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import query_pb2 as query__pb2
+from . import fipa_pb2 as fipa__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0b\x61gent.proto\x12\x0c\x66\x65tch.oef.pb\x1a\x0bquery.proto\x1a\nfipa.proto\"\xc4\x01\n\x05\x41gent\x1a<\n\x06Server\x1a\x18\n\x02ID\x12\x12\n\npublic_key\x18\x01 \x02(\t\x1a\x18\n\x06\x41nswer\x12\x0e\n\x06\x61nswer\x18\x01 \x02(\t\x1a}\n\x07Message\x12\x13\n\x0b\x64ialogue_id\x18\x01 \x02(\x05\x12\x13\n\x0b\x64\x65stination\x18\x02 \x02(\t\x12\x11\n\x07\x63ontent\x18\x03 \x01(\x0cH\x00\x12*\n\x04\x66ipa\x18\x04 \x01(\x0b\x32\x1a.fetch.oef.pb.Fipa.MessageH\x00\x42\t\n\x07payload\"\xd4\x06\n\x06Server\x1ah\n\x06Phrase\x12\x10\n\x06phrase\x18\x01 \x01(\tH\x00\x12\x36\n\x07\x66\x61ilure\x18\x02 \x01(\x0b\x32#.fetch.oef.pb.Server.Phrase.FailureH\x00\x1a\t\n\x07\x46\x61ilureB\t\n\x07payload\x1a\x1b\n\tConnected\x12\x0e\n\x06status\x18\x01 \x02(\x08\x1a\x1e\n\x0cSearchResult\x12\x0e\n\x06\x61gents\x18\x01 \x03(\t\x1a\xa2\x05\n\x0c\x41gentMessage\x12\x11\n\tanswer_id\x18\x01 \x02(\x05\x12<\n\x07\x63ontent\x18\x02 \x01(\x0b\x32).fetch.oef.pb.Server.AgentMessage.ContentH\x00\x12?\n\toef_error\x18\x03 \x01(\x0b\x32*.fetch.oef.pb.Server.AgentMessage.OEFErrorH\x00\x12\x33\n\x06\x61gents\x18\x04 \x01(\x0b\x32!.fetch.oef.pb.Server.SearchResultH\x00\x12I\n\x0e\x64ialogue_error\x18\x05 \x01(\x0b\x32/.fetch.oef.pb.Server.AgentMessage.DialogueErrorH\x00\x1ax\n\x07\x43ontent\x12\x13\n\x0b\x64ialogue_id\x18\x01 \x02(\x05\x12\x0e\n\x06origin\x18\x02 \x02(\t\x12\x11\n\x07\x63ontent\x18\x03 \x01(\x0cH\x00\x12*\n\x04\x66ipa\x18\x04 \x01(\x0b\x32\x1a.fetch.oef.pb.Fipa.MessageH\x00\x42\t\n\x07payload\x1a\xc4\x01\n\x08OEFError\x12G\n\toperation\x18\x01 \x02(\x0e\x32\x34.fetch.oef.pb.Server.AgentMessage.OEFError.Operation\"o\n\tOperation\x12\x14\n\x10REGISTER_SERVICE\x10\x00\x12\x16\n\x12UNREGISTER_SERVICE\x10\x01\x12\x18\n\x14REGISTER_DESCRIPTION\x10\x02\x12\x1a\n\x16UNREGISTER_DESCRIPTION\x10\x03\x1a\x34\n\rDialogueError\x12\x13\n\x0b\x64ialogue_id\x18\x01 \x02(\x05\x12\x0e\n\x06origin\x18\x02 \x02(\tB\t\n\x07payload\"E\n\x10\x41gentDescription\x12\x31\n\x0b\x64\x65scription\x18\x01 \x02(\x0b\x32\x1c.fetch.oef.pb.Query.Instance\"7\n\x0b\x41gentSearch\x12(\n\x05query\x18\x01 \x02(\x0b\x32\x19.fetch.oef.pb.Query.Model\"\xcb\x03\n\x08\x45nvelope\x12\x0e\n\x06msg_id\x18\x01 \x02(\x05\x12\x33\n\x0csend_message\x18\x02 \x01(\x0b\x32\x1b.fetch.oef.pb.Agent.MessageH\x00\x12:\n\x10register_service\x18\x03 \x01(\x0b\x32\x1e.fetch.oef.pb.AgentDescriptionH\x00\x12<\n\x12unregister_service\x18\x04 \x01(\x0b\x32\x1e.fetch.oef.pb.AgentDescriptionH\x00\x12>\n\x14register_description\x18\x05 \x01(\x0b\x32\x1e.fetch.oef.pb.AgentDescriptionH\x00\x12@\n\x16unregister_description\x18\x06 \x01(\x0b\x32\x1e.fetch.oef.pb.Envelope.NothingH\x00\x12\x34\n\x0fsearch_services\x18\x07 \x01(\x0b\x32\x19.fetch.oef.pb.AgentSearchH\x00\x12\x32\n\rsearch_agents\x18\x08 \x01(\x0b\x32\x19.fetch.oef.pb.AgentSearchH\x00\x1a\t\n\x07NothingB\t\n\x07payload\"2\n\x04\x44\x61ta\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x0c\n\x04type\x18\x02 \x02(\t\x12\x0e\n\x06values\x18\x03 \x03(\t\"\x19\n\x07\x42oolean\x12\x0e\n\x06status\x18\x01 \x02(\x08\"\x1d\n\x0bTransaction\x12\x0e\n\x06\x61mount\x18\x01 \x02(\x04\x42\x02H\x01')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'agent_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  DESCRIPTOR._serialized_options = b'H\001'
+  _AGENT._serialized_start=55
+  _AGENT._serialized_end=251
+  _AGENT_SERVER._serialized_start=64
+  _AGENT_SERVER._serialized_end=124
+  _AGENT_SERVER_ID._serialized_start=74
+  _AGENT_SERVER_ID._serialized_end=98
+  _AGENT_SERVER_ANSWER._serialized_start=100
+  _AGENT_SERVER_ANSWER._serialized_end=124
+  _AGENT_MESSAGE._serialized_start=126
+  _AGENT_MESSAGE._serialized_end=251
+  _SERVER._serialized_start=254
+  _SERVER._serialized_end=1106
+  _SERVER_PHRASE._serialized_start=264
+  _SERVER_PHRASE._serialized_end=368
+  _SERVER_PHRASE_FAILURE._serialized_start=348
+  _SERVER_PHRASE_FAILURE._serialized_end=357
+  _SERVER_CONNECTED._serialized_start=370
+  _SERVER_CONNECTED._serialized_end=397
+  _SERVER_SEARCHRESULT._serialized_start=399
+  _SERVER_SEARCHRESULT._serialized_end=429
+  _SERVER_AGENTMESSAGE._serialized_start=432
+  _SERVER_AGENTMESSAGE._serialized_end=1106
+  _SERVER_AGENTMESSAGE_CONTENT._serialized_start=722
+  _SERVER_AGENTMESSAGE_CONTENT._serialized_end=842
+  _SERVER_AGENTMESSAGE_OEFERROR._serialized_start=845
+  _SERVER_AGENTMESSAGE_OEFERROR._serialized_end=1041
+  _SERVER_AGENTMESSAGE_OEFERROR_OPERATION._serialized_start=930
+  _SERVER_AGENTMESSAGE_OEFERROR_OPERATION._serialized_end=1041
+  _SERVER_AGENTMESSAGE_DIALOGUEERROR._serialized_start=1043
+  _SERVER_AGENTMESSAGE_DIALOGUEERROR._serialized_end=1095
+  _AGENTDESCRIPTION._serialized_start=1108
+  _AGENTDESCRIPTION._serialized_end=1177
+  _AGENTSEARCH._serialized_start=1179
+  _AGENTSEARCH._serialized_end=1234
+  _ENVELOPE._serialized_start=1237
+  _ENVELOPE._serialized_end=1696
+  _ENVELOPE_NOTHING._serialized_start=1676
+  _ENVELOPE_NOTHING._serialized_end=1685
+  _DATA._serialized_start=1698
+  _DATA._serialized_end=1748
+  _BOOLEAN._serialized_start=1750
+  _BOOLEAN._serialized_end=1775
+  _TRANSACTION._serialized_start=1777
+  _TRANSACTION._serialized_end=1806
+# @@protoc_insertion_point(module_scope)
@@ -30,16 +30,24 @@ This module contains the base class for implementing agents.
 import asyncio
 import logging
 from abc import ABC
-from typing import List
+from concurrent.futures import Executor
+from typing import List, Optional, Callable, Dict
 
 from oef.core import OEFProxy, AgentInterface
-from oef.messages import OEFErrorOperation
-from oef.proxy import OEFNetworkProxy, PROPOSE_TYPES, CFP_TYPES, OEFLocalProxy, OEFConnectionError
+from oef.messages import OEFErrorOperation, DESTINATIONS
+from oef.offload import OffloadedHandler, HandlerStats, in_offloaded_handler
+from oef.proxy import OEFNetworkProxy, OEFNetworkProtocolProxy, PROPOSE_TYPES, CFP_TYPES, OEFLocalProxy, OEFConnectionError, \
+    OEFNotSupportedError
 from oef.query import Query
+from oef.scheduler import DEFAULT_MAX_CONCURRENT_HANDLERS
 from oef.schema import Description
 
 logger = logging.getLogger(__name__)
 
+"""The names of the handlers of an agent."""
+_HANDLER_NAMES = ("on_message", "on_cfp", "on_propose", "on_accept", "on_decline",
+                  "on_oef_error", "on_dialogue_error", "on_search_result", "on_search_update")
+
 
 def _warning_not_implemented_method(method_name: str) -> None:
     """
@@ -59,8 +67,22 @@ class Agent(AgentInterface, ABC):
     :class:`~oef.core.DialogueInterface` and :class:`~oef.core.ConnectionInterface`.
 
     In this way you can program the behaviour of the agent when it's running.
+
+    Set ``lazy_payloads = True`` in a subclass to receive the queries of the CFPs as :class:`~oef.query.LazyQuery`
+    and the proposals as :class:`~oef.messages.LazyProposals`, that are decoded only when they are accessed.
+    The :class:`~oef.proxy.OEFLocalProxy.LocalNode` delivers the objects that were sent, unless it is wire-faithful.
+
+    The handlers can also be coroutines (i.e. defined with ``async def``): they are run concurrently, but the messages
+    of the same dialogue (i.e. with the same origin and dialogue id) are handled one at a time, in order.
+    Likewise, the results of the same search and the updates of the same subscription are handled in order,
+    while the other calls (e.g. of :func:`~oef.core.ConnectionInterface.on_oef_error`) are never serialized.
+    At most ``max_concurrent_handlers`` coroutines are pending at the same time: when the limit is reached,
+    the agent stops receiving messages until one of them is complete. See :class:`~oef.scheduler.HandlerScheduler`.
     """
 
+    lazy_payloads = False
+    max_concurrent_handlers = DEFAULT_MAX_CONCURRENT_HANDLERS
+
     @property
     def public_key(self) -> str:
         """
@@ -80,6 +102,12 @@ class Agent(AgentInterface, ABC):
         self._oef_proxy = oef_proxy
         self._task = None
         self._loop = asyncio.get_event_loop()
+        self.handler_stats = {}  # type: Dict[str, HandlerStats]
+
+        for name in _HANDLER_NAMES:
+            offload_args = getattr(getattr(type(self), name, None), "offload", None)
+            if offload_args is not None:
+                self.offload_handler(name, *offload_args)
 
     def run(self) -> None:
         """
@@ -152,60 +180,155 @@ class Agent(AgentInterface, ABC):
         if self._oef_proxy.is_connected():
             await self._oef_proxy.stop()
 
+    def flush(self) -> None:
+        """
+        Write the messages sent so far to the OEF Node, waiting if the write buffer is full.
+
+        :return: ``None``
+        """
+        return self._loop.run_until_complete(self.async_flush())
+
+    async def async_flush(self) -> None:
+        """
+        The asynchronous counterpart of :func:`~oef.agents.Agent.flush`.
+
+        :return: ``None``
+        """
+        await self._oef_proxy.flush()
+
+    def offload_handler(self, name: str, executor: Optional[Executor] = None, fn: Optional[Callable] = None) -> None:
+        """
+        Run a handler in an executor, e.g. a ``ThreadPoolExecutor`` or a ``ProcessPoolExecutor``,
+        instead of the event loop. The messages sent by the handler from a worker thread
+        are passed to the event loop. The statistics of the calls are stored in ``handler_stats[name]``.
+
+        :param name: the name of the handler, e.g. ``"on_cfp"``.
+        :param executor: the executor. If ``None``, the default executor of the event loop is used.
+        :param fn: if not ``None``, only ``fn`` runs in the executor, with the arguments of the handler,
+                 | and the handler is then called in the event loop with the result as an additional last argument.
+                 | Use it with a ``ProcessPoolExecutor``, since the agent cannot be sent to another process.
+        :return: ``None``
+        :raises ValueError: if the name is not the name of a handler.
+        """
+        if name not in _HANDLER_NAMES:
+            raise ValueError("Invalid input value for type '{}': {} is not a handler.".format(type(self).__name__, name))
+        handler = OffloadedHandler(getattr(self, name), executor, fn, self._loop)
+        setattr(self, name, handler)
+        self.handler_stats[name] = handler.stats
+
+    def _call_in_loop(self, method: Callable, *args) -> None:
+        """
+        Call a method of the proxy. If the caller is an offloaded handler, the call is passed to the event loop.
+
+        :param method: the method of the proxy.
+        :param args: the positional arguments of the method.
+        :return: ``None``
+        """
+        if in_offloaded_handler():
+            self._loop.call_soon_threadsafe(method, *args)
+        else:
+            method(*args)
+
     def register_agent(self, msg_id: int, agent_description: Description) -> None:
         """Register an agent. See :func:`~oef.core.OEFCoreInterface.register_agent`."""
-        self._oef_proxy.register_agent(msg_id, agent_description)
+        self._call_in_loop(self._oef_proxy.register_agent, msg_id, agent_description)
 
     def unregister_agent(self, msg_id: int) -> None:
         """Unregister an agent. See :func:`~oef.core.OEFCoreInterface.unregister_agent`."""
-        self._oef_proxy.unregister_agent(msg_id)
+        self._call_in_loop(self._oef_proxy.unregister_agent, msg_id)
 
     def register_service(self, msg_id: int, service_description: Description) -> None:
         """Unregister a service. See :func:`~oef.core.OEFCoreInterface.register_service`."""
-        self._oef_proxy.register_service(msg_id, service_description)
+        self._call_in_loop(self._oef_proxy.register_service, msg_id, service_description)
+
+    def register_services(self, msg_id: int, service_descriptions: List[Description]) -> None:
+        """Register many services. See :func:`~oef.core.OEFCoreInterface.register_services`."""
+        self._call_in_loop(self._oef_proxy.register_services, msg_id, service_descriptions)
 
     def unregister_service(self, msg_id: int, service_description: Description) -> None:
         """Unregister a service. See :func:`~oef.core.OEFCoreInterface.unregister_service`."""
-        self._oef_proxy.unregister_service(msg_id, service_description)
+        self._call_in_loop(self._oef_proxy.unregister_service, msg_id, service_description)
 
     def search_agents(self, search_id: int, query: Query) -> None:
         """Search agents. See :func:`~oef.core.OEFCoreInterface.search_agents`."""
-        self._oef_proxy.search_agents(search_id, query)
+        self._call_in_loop(self._oef_proxy.search_agents, search_id, query)
 
     def search_services(self, search_id: int, query: Query) -> None:
         """Search services. See :func:`~oef.core.OEFCoreInterface.search_services`."""
-        self._oef_proxy.search_services(search_id, query)
+        self._call_in_loop(self._oef_proxy.search_services, search_id, query)
+
+    def subscribe_services(self, subscription_id: int, query: Query) -> None:
+        """
+        Subscribe to the services that satisfy a query. See :func:`~oef.proxy.OEFLocalProxy.subscribe_services`.
+
+        :raises OEFNotSupportedError: if the proxy does not support the subscriptions (e.g. a network proxy).
+        """
+        self._call_in_loop(self._subscription_method("subscribe_services"), subscription_id, query)
+
+    def unsubscribe(self, subscription_id: int) -> None:
+        """
+        Cancel a subscription. See :func:`~oef.proxy.OEFLocalProxy.unsubscribe`.
+
+        :raises OEFNotSupportedError: if the proxy does not support the subscriptions (e.g. a network proxy).
+        """
+        self._call_in_loop(self._subscription_method("unsubscribe"), subscription_id)
+
+    def _subscription_method(self, name: str) -> Callable:
+        """
+        Get a method of the proxy for the subscriptions. The support is checked in the caller's thread,
+        so that an offloaded handler gets the error too, instead of the event loop.
+
+        :param name: the name of the method.
+        :return: the method of the proxy.
+        :raises OEFNotSupportedError: if the proxy does not support the subscriptions.
+        """
+        method = getattr(self._oef_proxy, name, None)
+        if method is None:
+            raise OEFNotSupportedError("{} does not support the subscriptions.".format(type(self._oef_proxy).__name__))
+        return method
 
     def send_message(self, msg_id: int, dialogue_id: int, destination: str, msg: bytes) -> None:
         """Send a simple message. See :func:`~oef.core.OEFCoreInterface.send_message`."""
         logger.debug("Agent {}: msg_id={}, dialogue_id={}, destination={}, msg={}"
                      .format(self.public_key, msg_id, dialogue_id, destination, msg))
-        self._oef_proxy.send_message(msg_id, dialogue_id, destination, msg)
+        self._call_in_loop(self._oef_proxy.send_message, msg_id, dialogue_id, destination, msg)
 
     def send_cfp(self, msg_id: int, dialogue_id: int, destination: str, target: int, query: CFP_TYPES) -> None:
         """Send a CFP. See :func:`~oef.core.OEFCoreInterface.send_cfp`."""
         logger.debug("Agent {}: msg_id={}, dialogue_id={}, destination={}, target={}, query={}"
                      .format(self.public_key, dialogue_id, destination, query, msg_id, target))
-        self._oef_proxy.send_cfp(msg_id, dialogue_id, destination, target, query)
+        self._call_in_loop(self._oef_proxy.send_cfp, msg_id, dialogue_id, destination, target, query)
+
+    def broadcast_message(self, msg_id: int, destinations: DESTINATIONS, msg: bytes) -> None:
+        """Send a simple message to many agents. See :func:`~oef.core.OEFCoreInterface.broadcast_message`."""
+        logger.debug("Agent {}: msg_id={}, destinations={}, msg={}"
+                     .format(self.public_key, msg_id, destinations, msg))
+        self._call_in_loop(self._oef_proxy.broadcast_message, msg_id, destinations, msg)
+
+    def broadcast_cfp(self, msg_id: int, destinations: DESTINATIONS, target: int, query: CFP_TYPES) -> None:
+        """Send a CFP to many agents. See :func:`~oef.core.OEFCoreInterface.broadcast_cfp`."""
+        logger.debug("Agent {}: msg_id={}, destinations={}, target={}, query={}"
+                     .format(self.public_key, msg_id, destinations, target, query))
+        self._call_in_loop(self._oef_proxy.broadcast_cfp, msg_id, destinations, target, query)
 
     def send_propose(self, msg_id: int, dialogue_id: int, destination: str, target: int,
                      proposals: PROPOSE_TYPES) -> None:
         """Send a Propose. See :func:`~oef.core.OEFCoreInterface.send_propose`."""
         logger.debug("Agent {}: msg_id={}, dialogue_id={}, destination={}, target={}, proposals={}"
                      .format(self.public_key, msg_id, dialogue_id, destination, target, proposals))
-        self._oef_proxy.send_propose(msg_id, dialogue_id, destination, target, proposals)
+        self._call_in_loop(self._oef_proxy.send_propose, msg_id, dialogue_id, destination, target, proposals)
 
     def send_accept(self, msg_id: int, dialogue_id: int, destination: str, target: int) -> None:
         """Send an Accept. See :func:`~oef.core.OEFCoreInterface.send_accept`."""
         logger.debug("Agent {}: dialogue_id={}, destination={}, msg_id={}, target={}"
                      .format(self.public_key, msg_id, dialogue_id, destination, target))
-        self._oef_proxy.send_accept(msg_id, dialogue_id, destination, target)
+        self._call_in_loop(self._oef_proxy.send_accept, msg_id, dialogue_id, destination, target)
 
     def send_decline(self, msg_id: int, dialogue_id: int, destination: str, target: int) -> None:
         """Send a Decline. See :func:`~oef.core.OEFCoreInterface.send_decline`."""
         logger.debug("Agent {}: dialogue_id={}, destination={}, msg_id={}, target={}"
                      .format(self.public_key, msg_id, dialogue_id, destination, target))
-        self._oef_proxy.send_decline(msg_id, dialogue_id, destination, target)
+        self._call_in_loop(self._oef_proxy.send_decline, msg_id, dialogue_id, destination, target)
 
     def on_message(self, msg_id: int, dialogue_id: int, origin: str, content: bytes):
         logger.debug("on_message: msg_id={}, dialogue_id={}, origin={}, content={}"
@@ -245,6 +368,11 @@ class Agent(AgentInterface, ABC):
         logger.debug("on_search_result: search_id={}, agents={}".format(search_id, agents))
         _warning_not_implemented_method(self.on_search_result.__name__)
 
+    def on_search_update(self, subscription_id: int, added: List[str], removed: List[str]):
+        logger.debug("on_search_update: subscription_id={}, added={}, removed={}"
+                     .format(subscription_id, added, removed))
+        _warning_not_implemented_method(self.on_search_update.__name__)
+
 
 class OEFAgent(Agent):
     """
@@ -253,17 +381,20 @@ class OEFAgent(Agent):
     It provides a nicer constructor that does not require to instantiate :class:`~oef.proxy.OEFLocalProxy` explicitly.
     """
 
-    def __init__(self, public_key: str, oef_addr: str, oef_port: int = 3333) -> None:
+    def __init__(self, public_key: str, oef_addr: str, oef_port: int = 3333, use_protocol: bool = False) -> None:
         """
         Initialize an OEF network agent.
 
         :param public_key: the public key (identifier) of the agent
         :param oef_addr: the IP address of the OEF Node.
         :param oef_port: the port for the connection.
+        :param use_protocol: if ``True``, use :class:`~oef.proxy.OEFNetworkProtocolProxy` instead of
+                           | :class:`~oef.proxy.OEFNetworkProxy`.
         """
         self._oef_addr = oef_addr
         self._oef_port = oef_port
-        super().__init__(OEFNetworkProxy(public_key, str(self._oef_addr), self._oef_port))
+        proxy_class = OEFNetworkProtocolProxy if use_protocol else OEFNetworkProxy
+        super().__init__(proxy_class(public_key, str(self._oef_addr), self._oef_port))
 
 
 class LocalAgent(Agent):
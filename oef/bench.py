@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.bench
+~~~~~~~~~
+
+This module contains a load generator, that measures the end-to-end throughput and latency of the SDK.
+
+N seller agents and M buyer agents connect to a node, either a :class:`~oef.proxy.OEFLocalProxy.LocalNode`
+or an OEF Node over TCP (by default, an :class:`~oef.node.OEFNode` in the same process). Every buyer keeps
+a number of requests in flight, and sends a new one whenever it receives the response of the previous one.
+The workloads are:
+
+* ``fipa``: the buyer sends a CFP, the seller answers with a Propose, the buyer sends an Accept or a Decline;
+* ``message``: the buyer sends a message, the seller sends it back;
+* ``search``: the buyer searches the services registered by the sellers.
+
+The report contains the messages handled per second, the percentiles of the latency from a request
+to the handler of its response, the CPU usage and the peak RSS, and can be saved as JSON.
+
+Usage:
+
+    python -m oef.bench [--workload {fipa,message,search}] [--sellers N] [--buyers N]
+                        [--proxy {local,network,protocol}] [--duration SECONDS] [--output FILE]
+
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from oef.__version__ import __version__
+from oef.agents import Agent
+from oef.core import OEFProxy
+from oef.messages import CFP_TYPES, PROPOSE_TYPES
+from oef.proxy import OEFLocalProxy, OEFNetworkProxy, OEFNetworkProtocolProxy
+from oef.query import Query, Constraint, Eq, Range
+from oef.schema import Description, DataModel, AttributeSchema
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+WORKLOADS = ["fipa", "message", "search"]
+PROXIES = ["local", "network", "protocol"]
+
+_BOOK = DataModel("book", [AttributeSchema("title", str, True), AttributeSchema("price", int, True)])
+_QUERY = Query([Constraint("price", Range((10, 50)))], _BOOK)
+_CONTENT = b"x" * 64
+
+
+def _seller_description(i: int) -> Description:
+    return Description({"title": "book_{}".format(i), "price": 10 + i % 60}, _BOOK)
+
+
+class Seller(Agent):
+    """A seller: it answers the CFPs with its proposals, and sends back the messages."""
+
+    def __init__(self, proxy: OEFProxy, nb_proposals: int = 1):
+        super().__init__(proxy)
+        self.received = 0
+        self.proposals = [_seller_description(i) for i in range(nb_proposals)]
+
+    def on_cfp(self, msg_id: int, dialogue_id: int, origin: str, target: int, query: CFP_TYPES):
+        self.received += 1
+        self.send_propose(msg_id + 1, dialogue_id, origin, msg_id, self.proposals)
+
+    def on_accept(self, msg_id: int, dialogue_id: int, origin: str, target: int):
+        self.received += 1
+
+    def on_decline(self, msg_id: int, dialogue_id: int, origin: str, target: int):
+        self.received += 1
+
+    def on_message(self, msg_id: int, dialogue_id: int, origin: str, content: bytes):
+        self.received += 1
+        self.send_message(msg_id + 1, dialogue_id, origin, content)
+
+
+class Buyer(Agent):
+    """
+    A buyer: it keeps ``window`` requests in flight, sent to the sellers in turn,
+    and records the latency from every request to the handler of its response.
+    """
+
+    def __init__(self, proxy: OEFProxy, workload: str, sellers: List[str], window: int = 1):
+        super().__init__(proxy)
+        self.received = 0
+        self.latencies = []  # type: List[float]
+        self.workload = workload
+        self.sellers = sellers
+        self.window = window
+        self.running = False
+        self._next_request = 0
+        self._sent = {}  # type: Dict[int, float]
+
+    def start_requests(self) -> None:
+        """Send the first ``window`` requests."""
+        self.running = True
+        for _ in range(self.window):
+            self._request()
+
+    def _request(self) -> None:
+        request_id = self._next_request
+        self._next_request += 1
+        seller = self.sellers[request_id % len(self.sellers)]
+        self._sent[request_id] = time.perf_counter()
+        if self.workload == "fipa":
+            self.send_cfp(0, request_id, seller, 0, _QUERY)
+        elif self.workload == "message":
+            self.send_message(0, request_id, seller, _CONTENT)
+        else:
+            self.search_services(request_id, _QUERY)
+
+    def _response(self, request_id: int) -> None:
+        self.received += 1
+        self.latencies.append(time.perf_counter() - self._sent.pop(request_id))
+        if self.running:
+            self._request()
+
+    def on_propose(self, msg_id: int, dialogue_id: int, origin: str, target: int, proposals: PROPOSE_TYPES):
+        if dialogue_id % 2 == 0:
+            self.send_accept(msg_id + 1, dialogue_id, origin, msg_id)
+        else:
+            self.send_decline(msg_id + 1, dialogue_id, origin, msg_id)
+        self._response(dialogue_id)
+
+    def on_message(self, msg_id: int, dialogue_id: int, origin: str, content: bytes):
+        self._response(dialogue_id)
+
+    def on_search_result(self, search_id: int, agents: List[str]):
+        self._response(search_id)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Get a percentile of some values, with the nearest-rank method.
+
+    :param values: the values.
+    :param q: the percentile, between 0 and 100.
+    :return: the percentile, or ``0.0`` if there are no values.
+
+    Examples:
+        >>> percentile([3.0, 1.0, 2.0, 4.0], 50)
+        2.0
+        >>> percentile([3.0, 1.0, 2.0, 4.0], 99)
+        4.0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(-(-q * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+def _max_rss_mb() -> Optional[float]:
+    """Get the peak resident set size of the process, in MB, if available on the platform."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS.
+    return max_rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def run_benchmark(workload: str = "fipa", nb_sellers: int = 10, nb_buyers: int = 10, proxy: str = "local",
+                  duration: float = 5.0, warmup: float = 1.0, window: int = 1, nb_proposals: int = 1,
+                  host: str = "127.0.0.1", port: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Run a benchmark in the current event loop.
+
+    :param workload: the workload, one of ``"fipa"``, ``"message"`` and ``"search"``.
+    :param nb_sellers: the number of sellers.
+    :param nb_buyers: the number of buyers.
+    :param proxy: the proxy: ``"local"`` (:class:`~oef.proxy.OEFLocalProxy`), ``"network"``
+                | (:class:`~oef.proxy.OEFNetworkProxy`) or ``"protocol"`` (:class:`~oef.proxy.OEFNetworkProtocolProxy`).
+    :param duration: the duration of the measure, in seconds.
+    :param warmup: the time before the measure starts, in seconds.
+    :param window: the number of requests in flight for every buyer.
+    :param nb_proposals: the number of proposals in every Propose.
+    :param host: the address of the OEF Node, for the network proxies.
+    :param port: the port of the OEF Node, for the network proxies. If ``None``, an :class:`~oef.node.OEFNode`
+               | is started in the current event loop.
+    :return: the configuration, the results and the environment of the benchmark.
+    :raises ValueError: if the workload or the proxy are not valid.
+    """
+    if workload not in WORKLOADS:
+        raise ValueError("Workload not valid: {}. Expected one of {}.".format(workload, WORKLOADS))
+    if proxy not in PROXIES:
+        raise ValueError("Proxy not valid: {}. Expected one of {}.".format(proxy, PROXIES))
+    config = dict(workload=workload, sellers=nb_sellers, buyers=nb_buyers, proxy=proxy, duration=duration,
+                  warmup=warmup, window=window, proposals=nb_proposals)
+
+    loop = asyncio.get_event_loop()
+    make_proxy, stop_node = _start_node(proxy, host, port)
+    sellers, buyers = _start_agents(make_proxy, workload, nb_sellers, nb_buyers, window, nb_proposals)
+    agents = sellers + buyers  # type: List[Agent]
+
+    tasks = [asyncio.ensure_future(agent.async_run()) for agent in agents]
+    for buyer in buyers:
+        buyer.start_requests()
+    loop.run_until_complete(asyncio.sleep(warmup))
+    nb_messages, latencies, elapsed, cpu = _measure(sellers, buyers, duration)
+    _shutdown(sellers, buyers, tasks, proxy != "local", stop_node)
+
+    results = {
+        "messages": nb_messages,
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "messages_per_second": nb_messages / elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_p50_ms": percentile(latencies, 50) * 1e3,
+        "latency_p99_ms": percentile(latencies, 99) * 1e3,
+        "cpu_percent": 100 * cpu / elapsed,
+        "max_rss_mb": _max_rss_mb(),
+    }
+    environment = {"oef": __version__, "python": platform.python_version(), "platform": platform.platform()}
+    return {"config": config, "results": results, "environment": environment}
+
+
+def _start_node(proxy: str, host: str, port: Optional[int]) -> Tuple[Callable[[str], OEFProxy],
+                                                                     Callable[[], Awaitable[None]]]:
+    """
+    Start the node of a benchmark in the current event loop: a :class:`~oef.proxy.OEFLocalProxy.LocalNode`
+    for the local proxy, or an :class:`~oef.node.OEFNode` for the network proxies if no port is given.
+
+    :param proxy: the proxy, one of ``PROXIES``.
+    :param host: the address of the OEF Node, for the network proxies.
+    :param port: the port of the OEF Node, for the network proxies, or ``None`` to start a node.
+    :return: the function that creates the proxy of an agent, given its public key,
+           | and the coroutine function that stops the node.
+    """
+    if proxy == "local":
+        local_node = OEFLocalProxy.LocalNode()
+        node_task = asyncio.ensure_future(local_node.run())
+
+        def make_local_proxy(public_key: str) -> OEFProxy:
+            return OEFLocalProxy(public_key, local_node)
+
+        async def stop_local_node() -> None:
+            node_task.cancel()
+            await asyncio.gather(node_task, return_exceptions=True)
+        return make_local_proxy, stop_local_node
+
+    node = None
+    if port is None:
+        from oef.node import OEFNode
+        node = OEFNode(host, 0)
+        asyncio.get_event_loop().run_until_complete(node.start())
+        port = node.port
+    proxy_class = OEFNetworkProxy if proxy == "network" else OEFNetworkProtocolProxy
+
+    def make_proxy(public_key: str) -> OEFProxy:
+        return proxy_class(public_key, host, port)
+
+    async def stop_node() -> None:
+        if node is not None:
+            await node.stop()
+    return make_proxy, stop_node
+
+
+def _start_agents(make_proxy: Callable[[str], OEFProxy], workload: str, nb_sellers: int, nb_buyers: int,
+                  window: int, nb_proposals: int) -> Tuple[List[Seller], List[Buyer]]:
+    """
+    Create and connect the agents of a benchmark. For the search workload, the sellers register their services.
+
+    :return: the sellers and the buyers.
+    :raises ConnectionError: if some agents could not connect to the node.
+    """
+    loop = asyncio.get_event_loop()
+    seller_keys = ["seller_{}".format(i) for i in range(nb_sellers)]
+    sellers = [Seller(make_proxy(public_key), nb_proposals) for public_key in seller_keys]
+    buyers = [Buyer(make_proxy("buyer_{}".format(i)), workload, seller_keys, window) for i in range(nb_buyers)]
+    connected = loop.run_until_complete(asyncio.gather(*[agent.async_connect() for agent in sellers + buyers]))
+    if not all(connected):
+        raise ConnectionError("Some agents could not connect to the node.")
+    if workload == "search":
+        for i, seller in enumerate(sellers):
+            seller.register_service(0, _seller_description(i))
+        loop.run_until_complete(asyncio.sleep(0.1))
+    return sellers, buyers
+
+
+def _measure(sellers: List[Seller], buyers: List[Buyer], duration: float) -> Tuple[int, List[float], float, float]:
+    """
+    Measure the messages received by the agents, and the latencies of the requests of the buyers, for some time.
+
+    :param sellers: the sellers.
+    :param buyers: the buyers.
+    :param duration: the duration of the measure, in seconds.
+    :return: the number of messages, the latencies, the elapsed time and the CPU time, in seconds.
+    """
+    agents = sellers + buyers
+    for agent in agents:
+        agent.received = 0
+    for buyer in buyers:
+        buyer.latencies = []
+    start, start_cpu = time.perf_counter(), time.process_time()
+    asyncio.get_event_loop().run_until_complete(asyncio.sleep(duration))
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    nb_messages = sum(agent.received for agent in agents)
+    latencies = [latency for buyer in buyers for latency in buyer.latencies]
+    return nb_messages, latencies, elapsed, cpu
+
+
+def _shutdown(sellers: List[Seller], buyers: List[Buyer], tasks: List[asyncio.Future], disconnect: bool,
+              stop_node: Callable[[], Awaitable[None]]) -> None:
+    """
+    Stop the agents of a benchmark, and the node.
+
+    :param sellers: the sellers.
+    :param buyers: the buyers.
+    :param tasks: the tasks that run the agents.
+    :param disconnect: whether the agents are disconnected from the node (i.e. for the network proxies).
+    :param stop_node: the coroutine function that stops the node.
+    :return: ``None``
+    """
+    loop = asyncio.get_event_loop()
+    agents = sellers + buyers
+    for buyer in buyers:
+        buyer.running = False
+    for agent in agents:
+        agent.stop()
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    if disconnect:
+        loop.run_until_complete(asyncio.gather(*[agent.async_disconnect() for agent in agents]))
+    loop.run_until_complete(stop_node())
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the end-to-end throughput and latency of the agents.")
+    parser.add_argument("--workload", choices=WORKLOADS, default="fipa", help="the workload.")
+    parser.add_argument("--sellers", type=int, default=10, help="number of seller agents.")
+    parser.add_argument("--buyers", type=int, default=10, help="number of buyer agents.")
+    parser.add_argument("--proxy", choices=PROXIES, default="local", help="the proxy used by the agents.")
+    parser.add_argument("--duration", type=float, default=5.0, help="duration of the measure, in seconds.")
+    parser.add_argument("--warmup", type=float, default=1.0, help="time before the measure starts, in seconds.")
+    parser.add_argument("--window", type=int, default=1, help="number of requests in flight for every buyer.")
+    parser.add_argument("--proposals", type=int, default=1, help="number of proposals in every Propose.")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the OEF Node, for the network proxies.")
+    parser.add_argument("--port", type=int, default=None,
+                        help="port of the OEF Node, for the network proxies. "
+                             "If not given, an OEF Node is started in this process.")
+    parser.add_argument("--output", default=None, help="file where the report is saved as JSON ('-' for stdout).")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.workload, args.sellers, args.buyers, args.proxy, args.duration, args.warmup,
+                           args.window, args.proposals, args.host, args.port)
+    results = report["results"]
+    print("{workload} workload, {sellers} sellers, {buyers} buyers, {proxy} proxy".format(**report["config"]),
+          file=sys.stderr)
+    print("{:>12.0f} msg/s, {:.0f} req/s, latency p50 {:.3f} ms, p99 {:.3f} ms, CPU {:.0f}%, max RSS {} MB".format(
+        results["messages_per_second"], results["requests_per_second"], results["latency_p50_ms"],
+        results["latency_p99_ms"], results["cpu_percent"],
+        "{:.1f}".format(results["max_rss_mb"]) if results["max_rss_mb"] is not None else "n/a"), file=sys.stderr)
+
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
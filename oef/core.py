@@ -29,11 +29,14 @@ The core module that contains the main abstraction of the SDK.
 import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import List
-
-from oef import agent_pb2 as agent_pb2
-from oef.messages import CFP_TYPES, PROPOSE_TYPES, OEFErrorOperation
-from oef.query import Query
+from typing import Hashable, List, Optional, Union
+
+from oef import agent_pb2 as agent_pb2, fipa_pb2 as fipa_pb2
+from oef.messages import CFP_TYPES, PROPOSE_TYPES, OEFErrorOperation, LazyProposals, DESTINATIONS, HANDLER_CALL
+from oef.metrics import AgentMetrics
+from oef.offload import OffloadedHandler
+from oef.query import Query, LazyQuery
+from oef.scheduler import HandlerScheduler, DEFAULT_MAX_CONCURRENT_HANDLERS
 from oef.schema import Description
 
 logger = logging.getLogger(__name__)
@@ -72,6 +75,19 @@ class OEFCoreInterface(ABC):
         :return: ``None``
         """
 
+    def register_services(self, msg_id: int, service_descriptions: List[Description]) -> None:
+        """
+        Add the descriptions of many services at once.
+        The default implementation registers one service at a time:
+        the local proxy overrides it to index them in bulk.
+
+        :param msg_id: the identifier of the message.
+        :param service_descriptions: the descriptions of the services to add.
+        :return: ``None``
+        """
+        for service_description in service_descriptions:
+            self.register_service(msg_id, service_description)
+
     @abstractmethod
     def search_agents(self, msg_id: int, query: Query) -> None:
         """
@@ -145,6 +161,35 @@ class OEFCoreInterface(ABC):
         :return: ``None``
         """
 
+    def broadcast_message(self, msg_id: int, destinations: DESTINATIONS, msg: bytes) -> None:
+        """
+        Send the same simple message to many agents, each one in its own dialogue.
+        The default implementation sends one message per destination:
+        the proxies override it to serialize the message only once.
+
+        :param msg_id: the identifier of the message.
+        :param destinations: the pairs of dialogue identifier and agent identifier of the recipients.
+        :param msg: the message (in bytes).
+        :return: ``None``
+        """
+        for dialogue_id, destination in destinations:
+            self.send_message(msg_id, dialogue_id, destination, msg)
+
+    def broadcast_cfp(self, msg_id: int, destinations: DESTINATIONS, target: int, query: CFP_TYPES) -> None:
+        """
+        Send the same Call-For-Proposals to many agents, each one in its own dialogue.
+        The default implementation sends one message per destination:
+        the proxies override it to serialize the query only once.
+
+        :param msg_id: the message identifier for the dialogues.
+        :param destinations: the pairs of dialogue identifier and agent identifier of the recipients.
+        :param target: the identifier of the message to whom this message is answering.
+        :param query: the query associated with the Call For Proposals.
+        :return: ``None``
+        """
+        for dialogue_id, destination in destinations:
+            self.send_cfp(msg_id, dialogue_id, destination, target, query)
+
     @abstractmethod
     def send_propose(self, msg_id: int, dialogue_id: int, destination: str, target: int,
                      proposals: PROPOSE_TYPES) -> None:
@@ -313,6 +358,19 @@ class ConnectionInterface(ABC):
         :return: ``None``
         """
 
+    def on_search_update(self, subscription_id: int, added: List[str], removed: List[str]) -> None:
+        """
+        Handler for the changes of the result of a subscription
+        (see :func:`~oef.agents.Agent.subscribe_services`).
+        The first update of a subscription contains all the agents that satisfy its query.
+        By default, the updates are ignored.
+
+        :param subscription_id: the identifier of the subscription.
+        :param added: the identifiers of the agents that now satisfy the query.
+        :param removed: the identifiers of the agents that no longer satisfy the query.
+        :return: ``None``
+        """
+
 
 class AgentInterface(DialogueInterface, ConnectionInterface, ABC):
     """
@@ -330,6 +388,9 @@ class OEFProxy(OEFCoreInterface, ABC):
 
     def __init__(self, public_key):
         self._public_key = public_key
+        self._scheduler = None  # type: Optional[HandlerScheduler]
+        # the metrics of the agent, enabled by oef.metrics.instrument().
+        self.metrics = None  # type: Optional[AgentMetrics]
 
     @property
     def public_key(self) -> str:
@@ -337,11 +398,12 @@ class OEFProxy(OEFCoreInterface, ABC):
         return self._public_key
 
     @abstractmethod
-    async def _receive(self) -> bytes:
+    async def _receive(self) -> Union[bytes, HANDLER_CALL]:
         """
         Receive a message from the OEF Node
 
-        :return: the bytes received from the communication channel.
+        :return: the bytes received from the communication channel,
+               | or the call of a handler if the message is delivered already decoded.
         """
 
     @abstractmethod
@@ -352,59 +414,201 @@ class OEFProxy(OEFCoreInterface, ABC):
         :return: ``True`` if the proxy is connected, ``False`` otherwise.
         """
 
-    async def loop(self, agent: AgentInterface) -> None:  # noqa: C901
+    async def flush(self) -> None:
+        """
+        Wait until the messages sent so far have been handed to the communication channel.
+        By default, the messages are delivered as soon as they are sent, so there is nothing to wait for.
+
+        :return: ``None``
+        """
+
+    async def loop(self, agent: AgentInterface) -> None:
         """
         Event loop to wait for messages and to dispatch the arrived messages to the proper handler.
 
         :param agent: the implementation of the message handlers specified in AgentInterface.
         :return: ``None``
         """
-        while True:
-            try:
-                data = await self._receive()
-            except asyncio.CancelledError:
-                logger.debug("Proxy {}: loop cancelled".format(self.public_key))
-                break
-            msg = agent_pb2.Server.AgentMessage()
-            msg.ParseFromString(data)
-            case = msg.WhichOneof("payload")
-            logger.debug("loop {0}".format(case))
-            if case == "agents":
-                agent.on_search_result(msg.answer_id, msg.agents.agents)
-            elif case == "oef_error":
-                agent.on_oef_error(msg.answer_id, OEFErrorOperation(msg.oef_error.operation))
-            elif case == "dialogue_error":
-                agent.on_dialogue_error(msg.answer_id, msg.dialogue_error.dialogue_id, msg.dialogue_error.origin)
-            elif case == "content":
-                content_case = msg.content.WhichOneof("payload")
-                logger.debug("msg content {0}".format(content_case))
-                if content_case == "content":
-                    agent.on_message(msg.answer_id, msg.content.dialogue_id, msg.content.origin, msg.content.content)
-                elif content_case == "fipa":
-                    fipa = msg.content.fipa
-                    fipa_case = fipa.WhichOneof("msg")
-                    if fipa_case == "cfp":
-                        cfp_case = fipa.cfp.WhichOneof("payload")
-                        if cfp_case == "nothing":
-                            query = None
-                        elif cfp_case == "content":
-                            query = fipa.cfp.content
-                        elif cfp_case == "query":
-                            query = Query.from_pb(fipa.cfp.query)
-                        else:
-                            raise Exception("Query type not valid.")
-                        agent.on_cfp(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target, query)
-                    elif fipa_case == "propose":
-                        propose_case = fipa.propose.WhichOneof("payload")
-                        if propose_case == "content":
-                            proposals = fipa.propose.content
-                        else:
-                            proposals = [Description.from_pb(propose) for propose in fipa.propose.proposals.objects]
-                        agent.on_propose(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target,
-                                         proposals)
-                    elif fipa_case == "accept":
-                        agent.on_accept(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target)
-                    elif fipa_case == "decline":
-                        agent.on_decline(msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target)
-                    else:
-                        logger.warning("Not implemented yet: fipa {0}".format(fipa_case))
+        self._scheduler = self._new_scheduler(agent)
+        try:
+            while True:
+                try:
+                    if self._scheduler.full():
+                        await self._scheduler.wait_available()
+                    data = await self._receive()
+                except asyncio.CancelledError:
+                    logger.debug("Proxy {}: loop cancelled".format(self.public_key))
+                    break
+                if type(data) == tuple:
+                    # the call of a handler, already decoded (e.g. by the local node).
+                    self._call(agent, data)
+                    continue
+                msg = agent_pb2.Server.AgentMessage()
+                msg.ParseFromString(data)
+                self._dispatch(agent, msg)
+        finally:
+            self._scheduler.cancel()
+
+    def _new_scheduler(self, agent: AgentInterface) -> HandlerScheduler:
+        """
+        Create the scheduler of the handlers of an agent, with the concurrency limit set by the agent
+        in the attribute ``max_concurrent_handlers``.
+
+        :param agent: the implementation of the message handlers specified in AgentInterface.
+        :return: the scheduler.
+        """
+        max_concurrency = getattr(agent, "max_concurrent_handlers", DEFAULT_MAX_CONCURRENT_HANDLERS)
+        return HandlerScheduler(max_concurrency)
+
+    def _dispatch(self, agent: AgentInterface, msg: agent_pb2.Server.AgentMessage) -> None:
+        """
+        Dispatch a message received from the OEF Node to the proper handler.
+
+        :param agent: the implementation of the message handlers specified in AgentInterface.
+        :param msg: the message received.
+        :return: ``None``
+        """
+        decoded = decode_agent_message(msg, getattr(agent, "lazy_payloads", False))
+        if decoded is not None:
+            self._call(agent, decoded, msg.ByteSize() if self.metrics is not None else 0)
+
+    def _call(self, agent: AgentInterface, handler_call: HANDLER_CALL, nbytes: int = 0) -> None:
+        """
+        Schedule the call of a handler.
+
+        :param agent: the implementation of the message handlers specified in AgentInterface.
+        :param handler_call: the name of the handler and its arguments.
+        :param nbytes: the size of the message received, or ``0`` if it was delivered already decoded.
+        :return: ``None``
+        """
+        handler_name, args = handler_call
+        key = _scheduler_key(handler_name, args)
+        handler = getattr(agent, handler_name)
+        if isinstance(handler, OffloadedHandler):
+            # the statistics of the offloaded handlers also count the calls waiting in the scheduler.
+            handler = handler.submit()
+        if self.metrics is not None:
+            self.metrics.message_received(handler_name, nbytes)
+            handler = self.metrics.timed(handler_name, handler, args)
+        self._scheduler.call(key, handler, args)
+
+
+def _decode_cfp_query(cfp: fipa_pb2.Fipa.Cfp, lazy: bool) -> CFP_TYPES:
+    """Decode the query of a CFP."""
+    return LazyQuery(cfp.query) if lazy else Query.from_pb(cfp.query)
+
+
+def _decode_cfp(msg: agent_pb2.Server.AgentMessage, fipa: fipa_pb2.Fipa.Message, lazy: bool) -> HANDLER_CALL:
+    """Decode a CFP."""
+    decoder = _CFP_DECODERS.get(fipa.cfp.WhichOneof("payload"))
+    if decoder is None:
+        raise Exception("Query type not valid.")
+    query = decoder(fipa.cfp, lazy)
+    return "on_cfp", (msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target, query)
+
+
+def _decode_propose(msg: agent_pb2.Server.AgentMessage, fipa: fipa_pb2.Fipa.Message, lazy: bool) -> HANDLER_CALL:
+    """Decode a Propose."""
+    if fipa.propose.WhichOneof("payload") == "content":
+        proposals = fipa.propose.content
+    elif lazy:
+        proposals = LazyProposals(fipa.propose.proposals.objects)
+    else:
+        proposals = Description.list_from_pb(fipa.propose.proposals.objects)
+    return "on_propose", (msg.answer_id, msg.content.dialogue_id, msg.content.origin, fipa.target, proposals)
+
+
+def _decode_fipa(msg: agent_pb2.Server.AgentMessage, lazy: bool) -> Optional[HANDLER_CALL]:
+    """Decode a FIPA message."""
+    fipa = msg.content.fipa
+    fipa_case = fipa.WhichOneof("msg")
+    decoder = _FIPA_DECODERS.get(fipa_case)
+    if decoder is None:
+        logger.warning("Not implemented yet: fipa {0}".format(fipa_case))
+        return None
+    return decoder(msg, fipa, lazy)
+
+
+def _decode_content(msg: agent_pb2.Server.AgentMessage, lazy: bool) -> Optional[HANDLER_CALL]:
+    """Decode a message from another agent."""
+    content_case = msg.content.WhichOneof("payload")
+    logger.debug("msg content {0}".format(content_case))
+    decoder = _CONTENT_DECODERS.get(content_case)
+    return decoder(msg, lazy) if decoder is not None else None
+
+
+"""The handlers of the messages exchanged in a dialogue, whose calls are serialized by dialogue."""
+_DIALOGUE_HANDLERS = frozenset(["on_message", "on_cfp", "on_propose", "on_accept", "on_decline", "on_dialogue_error"])
+
+"""
+The handlers whose calls are serialized by their first argument, i.e. the search or the subscription identifier,
+so that e.g. the updates of a subscription are handled in order. The values tag the keys, so that they are
+distinct from the keys of the dialogues.
+"""
+_SEARCH_HANDLERS = {"on_search_result": object(), "on_search_update": object()}
+
+
+def _scheduler_key(handler_name: str, args: tuple) -> Hashable:
+    """
+    Get the key of the call of a handler in the :class:`~oef.scheduler.HandlerScheduler`:
+    the calls with the same key are serialized, the other ones run concurrently.
+
+    :param handler_name: the name of the handler.
+    :param args: the arguments of the call.
+    :return: the pair (origin, dialogue id) for the messages of a dialogue, the search or subscription identifier
+           | for the results of the searches, and a new key for any other call (e.g. ``on_oef_error``).
+    """
+    if handler_name in _DIALOGUE_HANDLERS:
+        return args[2], args[1]
+    tag = _SEARCH_HANDLERS.get(handler_name)
+    return (tag, args[0]) if tag is not None else object()
+
+
+"""The decoders of the payload of a CFP, keyed on the case of its ``oneof``."""
+_CFP_DECODERS = {
+    "nothing": lambda cfp, lazy: None,
+    "content": lambda cfp, lazy: cfp.content,
+    "query": _decode_cfp_query,
+}
+
+"""The decoders of the FIPA messages, keyed on the case of their ``oneof``."""
+_FIPA_DECODERS = {
+    "cfp": _decode_cfp,
+    "propose": _decode_propose,
+    "accept": lambda msg, fipa, lazy: ("on_accept", (msg.answer_id, msg.content.dialogue_id,
+                                                     msg.content.origin, fipa.target)),
+    "decline": lambda msg, fipa, lazy: ("on_decline", (msg.answer_id, msg.content.dialogue_id,
+                                                       msg.content.origin, fipa.target)),
+}
+
+"""The decoders of the messages from other agents, keyed on the case of their ``oneof``."""
+_CONTENT_DECODERS = {
+    "content": lambda msg, lazy: ("on_message", (msg.answer_id, msg.content.dialogue_id,
+                                                 msg.content.origin, msg.content.content)),
+    "fipa": _decode_fipa,
+}
+
+"""The decoders of the messages from the OEF Node, keyed on the case of their ``oneof``."""
+_DECODERS = {
+    "agents": lambda msg, lazy: ("on_search_result", (msg.answer_id, msg.agents.agents)),
+    "oef_error": lambda msg, lazy: ("on_oef_error", (msg.answer_id, OEFErrorOperation(msg.oef_error.operation))),
+    "dialogue_error": lambda msg, lazy: ("on_dialogue_error", (msg.answer_id, msg.dialogue_error.dialogue_id,
+                                                               msg.dialogue_error.origin)),
+    "content": _decode_content,
+}
+
+
+def decode_agent_message(msg: agent_pb2.Server.AgentMessage, lazy: bool = False) -> Optional[HANDLER_CALL]:
+    """
+    Decode a message received from the OEF Node into the call of the handler of :class:`~oef.core.AgentInterface`
+    that has to process it.
+
+    :param msg: the message received.
+    :param lazy: if ``True``, the queries of CFPs and the proposals are wrapped in
+               | :class:`~oef.query.LazyQuery` and :class:`~oef.messages.LazyProposals`, and decoded only when accessed.
+    :return: the name of the handler and its arguments, or ``None`` if the message is not supported.
+    """
+    case = msg.WhichOneof("payload")
+    logger.debug("loop {0}".format(case))
+    decoder = _DECODERS.get(case)
+    return decoder(msg, lazy) if decoder is not None else None
@@ -266,34 +266,47 @@ class DialogueAgent(Agent, ABC):
     def on_message(self, msg_id: int, dialogue_id: int, origin: str, content: bytes):
         try:
             dialogue = self._get_dialogue((origin, dialogue_id))
-            dialogue.on_message(msg_id, content)
         except KeyError:
-            self.on_new_message(msg_id, dialogue_id, origin, content)
+            self._count_routed("new")
+            return self.on_new_message(msg_id, dialogue_id, origin, content)
+        self._count_routed("open")
+        return dialogue.on_message(msg_id, content)
 
     def on_cfp(self, msg_id: int, dialogue_id: int, origin: str, target: int, query: CFP_TYPES):
         try:
             dialogue = self._get_dialogue((origin, dialogue_id))
-            dialogue.on_cfp(msg_id, target, query)
         except KeyError:
-            self.on_new_cfp(msg_id, dialogue_id, origin, target, query)
+            self._count_routed("new")
+            return self.on_new_cfp(msg_id, dialogue_id, origin, target, query)
+        self._count_routed("open")
+        return dialogue.on_cfp(msg_id, target, query)
 
     def on_propose(self, msg_id: int, dialogue_id: int, origin: str, target: int, proposals: PROPOSE_TYPES):
         dialogue = self._get_dialogue((origin, dialogue_id))
-        dialogue.on_propose(msg_id, target, proposals)
+        self._count_routed("open")
+        return dialogue.on_propose(msg_id, target, proposals)
 
     def on_accept(self, msg_id: int, dialogue_id: int, origin: str, target: int):
         dialogue = self._get_dialogue((origin, dialogue_id))
-        dialogue.on_accept(msg_id, target)
+        self._count_routed("open")
+        return dialogue.on_accept(msg_id, target)
 
     def on_decline(self, msg_id: int, dialogue_id: int, origin: str, target: int):
         dialogue = self._get_dialogue((origin, dialogue_id))
-        dialogue.on_decline(msg_id, target)
+        self._count_routed("open")
+        return dialogue.on_decline(msg_id, target)
 
     def _get_dialogue(self, key: DialogueKey) -> SingleDialogue:
         if key not in self.dialogues:
             raise KeyError("Dialogue key {} not found.".format(key))
         return self.dialogues[key]
 
+    def _count_routed(self, dialogue: str) -> None:
+        """Count a message routed to an open dialogue or to a new one, if the metrics are enabled."""
+        metrics = self._oef_proxy.metrics
+        if metrics is not None:
+            metrics.dialogue_routed(dialogue)
+
 
 class GroupDialogues:
     """
@@ -0,0 +1,962 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.directory
+~~~~~~~~~~~~~
+
+This module contains an indexed directory of descriptions, used by :class:`~oef.proxy.OEFLocalProxy.LocalNode`
+to answer the searches without checking the query against every registered description.
+
+"""
+
+import bisect
+import math
+from abc import ABC, abstractmethod
+from collections import defaultdict, OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from oef.helpers import EARTH_RADIUS
+from oef.query import Query, ConstraintExpr, Constraint, And, Or, Not, Eq, In, Lt, LtEq, Gt, GtEq, Range, Distance, \
+    Relation, Set as SetConstraint, PREDICATE
+from oef.schema import Description, Location
+
+"""A plan to compute a set of candidates: the estimated number of candidates, and the function that computes them."""
+PLAN = Tuple[int, Callable[[], Set[int]]]
+
+"""The types of the values that are indexed by :class:`~oef.directory.HashIndex`."""
+_HASHABLE_TYPES = (int, float, str, bool)
+
+"""The types of the values that are indexed by :class:`~oef.directory.SortedIndex`."""
+_ORDERED_TYPES = (int, float, str)
+
+
+class Index(ABC):
+    """
+    An index over the descriptions of a :class:`~oef.directory.Directory`.
+
+    Given a constraint, an index returns a superset of the entries that satisfy it. The directory then verifies
+    every candidate with :func:`~oef.query.Query.check`, so the indexes can be approximate.
+    """
+
+    @abstractmethod
+    def add(self, entry_id: int, description: Description) -> None:
+        """
+        Index a description.
+
+        :param entry_id: the identifier of the entry in the directory.
+        :param description: the description.
+        :return: ``None``
+        """
+
+    def add_all(self, entries: List[Tuple[int, Description]]) -> None:
+        """
+        Index many descriptions. The default implementation indexes them one at a time.
+
+        :param entries: the pairs of identifier of the entry and description.
+        :return: ``None``
+        """
+        for entry_id, description in entries:
+            self.add(entry_id, description)
+
+    @abstractmethod
+    def remove(self, entry_id: int, description: Description) -> None:
+        """
+        Remove a description from the index.
+
+        :param entry_id: the identifier of the entry in the directory.
+        :param description: the description, as it was added.
+        :return: ``None``
+        """
+
+    @abstractmethod
+    def plan(self, constraint: Constraint) -> Optional[PLAN]:
+        """
+        Plan the computation of the candidates that may satisfy a constraint.
+
+        :param constraint: the constraint.
+        :return: the plan, or ``None`` if the index cannot be used for the constraint.
+        """
+
+
+class HashIndex(Index):
+    """
+    An index for :class:`~oef.query.Eq` and :class:`~oef.query.In` constraints.
+    For every attribute name and type, it maps every value to the entries that have it.
+    """
+
+    def __init__(self) -> None:
+        self._buckets = defaultdict(lambda: defaultdict(set))  # type: Dict[Tuple[str, type], Dict[object, Set[int]]]
+
+    def add(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if type(value) in _HASHABLE_TYPES:
+                self._buckets[(name, type(value))][value].add(entry_id)
+
+    def remove(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if type(value) in _HASHABLE_TYPES:
+                buckets = self._buckets[(name, type(value))]
+                buckets[value].discard(entry_id)
+                if not buckets[value]:
+                    del buckets[value]
+
+    def plan(self, constraint: Constraint) -> Optional[PLAN]:
+        constraint_type = constraint.constraint
+        if isinstance(constraint_type, Eq):
+            values = [constraint_type.value]
+        elif isinstance(constraint_type, In):
+            values = list(constraint_type.values)
+        else:
+            return None
+        if len(values) == 0:
+            # an empty set is not satisfied by any value (e.g. an unsatisfiable query, once optimized).
+            return 0, set
+        value_type = constraint_type._get_type()
+        if value_type not in _HASHABLE_TYPES or not all(type(v) in _HASHABLE_TYPES for v in values):
+            return None
+
+        buckets = self._buckets.get((constraint.attribute_name, value_type), {})
+        matches = [buckets[v] for v in values if v in buckets]
+        return sum(len(m) for m in matches), lambda: set().union(*matches)
+
+
+class SortedIndex(Index):
+    """
+    An index for :class:`~oef.query.Lt`, :class:`~oef.query.LtEq`, :class:`~oef.query.Gt`, :class:`~oef.query.GtEq`
+    and :class:`~oef.query.Range` constraints over ``int``, ``float`` and ``str`` attributes.
+    For every attribute name and type, it keeps the values sorted, together with their entries.
+
+    NaN values are not indexed, since they do not satisfy any ordering constraint.
+    """
+
+    def __init__(self) -> None:
+        self._values = defaultdict(list)  # type: Dict[Tuple[str, type], List[Tuple[object, int]]]
+
+    def add(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if self._is_indexed(value):
+                bisect.insort(self._values[(name, type(value))], (value, entry_id))
+
+    def add_all(self, entries: List[Tuple[int, Description]]) -> None:
+        # the values are appended, and every list is sorted once, instead of inserting them one at a time.
+        changed = set()
+        for entry_id, description in entries:
+            for name, value in description.values.items():
+                if self._is_indexed(value):
+                    self._values[(name, type(value))].append((value, entry_id))
+                    changed.add((name, type(value)))
+        for key in changed:
+            self._values[key].sort()
+
+    def remove(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if self._is_indexed(value):
+                values = self._values[(name, type(value))]
+                del values[bisect.bisect_left(values, (value, entry_id))]
+
+    def plan(self, constraint: Constraint) -> Optional[PLAN]:
+        constraint_type = constraint.constraint
+        value_type = constraint_type._get_type()
+        if value_type not in _ORDERED_TYPES:
+            return None
+        values = self._values.get((constraint.attribute_name, value_type), [])
+
+        # the entry ids are within [-inf, +inf], so they do not affect the position of the bounds.
+        if isinstance(constraint_type, Lt):
+            start, end = 0, bisect.bisect_left(values, (constraint_type.value, -math.inf))
+        elif isinstance(constraint_type, LtEq):
+            start, end = 0, bisect.bisect_right(values, (constraint_type.value, math.inf))
+        elif isinstance(constraint_type, Gt):
+            start, end = bisect.bisect_right(values, (constraint_type.value, math.inf)), len(values)
+        elif isinstance(constraint_type, GtEq):
+            start, end = bisect.bisect_left(values, (constraint_type.value, -math.inf)), len(values)
+        elif isinstance(constraint_type, Range):
+            left, right = constraint_type.values
+            start = bisect.bisect_left(values, (left, -math.inf))
+            end = bisect.bisect_right(values, (right, math.inf))
+        else:
+            return None
+        end = max(start, end)
+        return end - start, lambda: set(entry_id for _, entry_id in values[start:end])
+
+    @staticmethod
+    def _is_indexed(value) -> bool:
+        return type(value) in _ORDERED_TYPES and not (type(value) == float and math.isnan(value))
+
+
+class LocationIndex(Index):
+    """
+    A spatial index for :class:`~oef.query.Distance` constraints.
+    For every attribute name, it partitions the :class:`~oef.schema.Location` values in a grid of cells
+    of ``cell_size`` degrees of latitude and longitude.
+
+    The candidates of a constraint are the entries in the cells that overlap the bounding box of the circle
+    of the constraint, so only them are checked with the haversine distance.
+    The locations that are not on the globe (e.g. with NaN coordinates or a latitude greater than 90)
+    are always candidates.
+    """
+
+    def __init__(self, cell_size: float = 1.0) -> None:
+        """
+        Initialize the index.
+
+        :param cell_size: the size of the cells of the grid, in degrees. It must divide 180.
+        """
+        self.cell_size = cell_size
+        self._nb_lat_cells = int(round(180.0 / cell_size))
+        self._nb_lon_cells = int(round(360.0 / cell_size))
+        self._cells = defaultdict(lambda: defaultdict(set))  # type: Dict[str, Dict[Tuple[int, int], Set[int]]]
+        self._not_indexed = defaultdict(set)  # type: Dict[str, Set[int]]
+
+    def add(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if type(value) == Location:
+                cell = self._get_cell(value)
+                if cell is None:
+                    self._not_indexed[name].add(entry_id)
+                else:
+                    self._cells[name][cell].add(entry_id)
+
+    def remove(self, entry_id: int, description: Description) -> None:
+        for name, value in description.values.items():
+            if type(value) == Location:
+                cell = self._get_cell(value)
+                entries = self._not_indexed[name] if cell is None else self._cells[name][cell]
+                entries.discard(entry_id)
+                if not entries and cell is not None:
+                    del self._cells[name][cell]
+
+    def plan(self, constraint: Constraint) -> Optional[PLAN]:
+        constraint_type = constraint.constraint
+        if not isinstance(constraint_type, Distance) or type(constraint_type.center) != Location:
+            return None
+        center, distance = constraint_type.center, constraint_type.distance
+        if self._get_cell(center) is None or not 0.0 <= distance < math.inf:
+            return None
+
+        lat_range, lon_range = self._bounding_box(center, distance)
+        cells = self._cells.get(constraint.attribute_name, {})
+        lon_cells = range(self._nb_lon_cells) if lon_range is None \
+            else [(lon_range[0] + i) % self._nb_lon_cells
+                  for i in range((lon_range[1] - lon_range[0]) % self._nb_lon_cells + 1)]
+        if (lat_range[1] - lat_range[0] + 1) * len(lon_cells) <= len(cells):
+            # the box has fewer cells than the occupied ones: look them up.
+            matches = [cells[(lat_cell, lon_cell)] for lat_cell in range(lat_range[0], lat_range[1] + 1)
+                       for lon_cell in lon_cells if (lat_cell, lon_cell) in cells]
+        else:
+            matches = [entries for (lat_cell, lon_cell), entries in cells.items()
+                       if lat_range[0] <= lat_cell <= lat_range[1] and self._in_lon_range(lon_cell, lon_range)]
+        not_indexed = self._not_indexed.get(constraint.attribute_name)
+        if not_indexed:
+            matches.append(not_indexed)
+        return sum(len(m) for m in matches), lambda: set().union(*matches)
+
+    def _get_cell(self, location: Location) -> Optional[Tuple[int, int]]:
+        """
+        Get the cell of a location.
+
+        :param location: the location.
+        :return: the pair of indexes of the cell, or ``None`` if the location is not on the globe.
+        """
+        latitude, longitude = location.latitude, location.longitude
+        if not (-90.0 <= latitude <= 90.0 and math.isfinite(longitude)):
+            return None
+        lat_cell = min(int((latitude + 90.0) // self.cell_size), self._nb_lat_cells - 1)
+        lon_cell = int(((longitude + 180.0) % 360.0) // self.cell_size) % self._nb_lon_cells
+        return lat_cell, lon_cell
+
+    def _bounding_box(self, center: Location, distance: float) -> Tuple[Tuple[int, int], Optional[Tuple[int, int]]]:
+        """
+        Compute the cells that overlap the bounding box of a circle on the globe.
+
+        :param center: the center of the circle.
+        :param distance: the radius of the circle, in km.
+        :return: the (inclusive) range of the latitude cells, and the range of the longitude cells,
+               | that may wrap around the antimeridian. The latter is ``None`` if the box spans all the longitudes.
+        """
+        # the angular radius, slightly enlarged to account for the rounding errors of the haversine formula.
+        radius = math.degrees(distance / EARTH_RADIUS) * (1 + 1e-9) + 1e-9
+        min_lat, max_lat = center.latitude - radius, center.latitude + radius
+        lat_range = (self._get_cell(Location(max(min_lat, -90.0), 0.0))[0],
+                     self._get_cell(Location(min(max_lat, 90.0), 0.0))[0])
+        if min_lat <= -90.0 or max_lat >= 90.0:
+            # the circle contains a pole.
+            return lat_range, None
+
+        sin_delta_lon = math.sin(math.radians(radius)) / math.cos(math.radians(center.latitude))
+        delta_lon = math.degrees(math.asin(min(1.0, sin_delta_lon)))
+        if delta_lon * 2 >= 360.0 - self.cell_size:
+            return lat_range, None
+        lon_range = (self._get_cell(Location(0.0, center.longitude - delta_lon))[1],
+                     self._get_cell(Location(0.0, center.longitude + delta_lon))[1])
+        return lat_range, lon_range
+
+    @staticmethod
+    def _in_lon_range(lon_cell: int, lon_range: Optional[Tuple[int, int]]) -> bool:
+        if lon_range is None:
+            return True
+        start, end = lon_range
+        if start <= end:
+            return start <= lon_cell <= end
+        # the range wraps around the antimeridian.
+        return lon_cell >= start or lon_cell <= end
+
+
+"""
+The fingerprint of a query, built from its optimized constraints: for every constraint expression, its class
+and its content, where every value is represented by its type and its ``repr``.
+"""
+QUERY_FINGERPRINT = Tuple[tuple, ...]
+
+"""The key of a cached result: the fingerprint of the query, and the name of the data model of the search."""
+CACHE_KEY = Tuple[QUERY_FINGERPRINT, Optional[str]]
+
+"""A value a query is indexed by: the name of the attribute, the type of the value, and the value."""
+INDEX_VALUE = Tuple[str, type, object]
+
+
+def _value_key(value) -> tuple:
+    """
+    Get the key of a value of a constraint, so that the equal values of different types (e.g. ``1``, ``1.0`` and
+    ``True``) have different keys, and a NaN has the same key as itself.
+    """
+    if type(value) == Location:
+        return Location, repr(value.latitude), repr(value.longitude)
+    return type(value), repr(value)
+
+
+def _expression_key(expression: ConstraintExpr) -> tuple:
+    """
+    Get the key of a constraint expression, used in the fingerprints of the queries.
+
+    :param expression: the constraint expression.
+    :return: the key.
+    :raises TypeError: if the constraint expression, or its constraint type, is not one of the SDK.
+    """
+    if isinstance(expression, Constraint):
+        constraint_type = expression.constraint
+        if isinstance(constraint_type, Relation):
+            values = (constraint_type.value, )
+        elif isinstance(constraint_type, (Range, SetConstraint)):
+            values = constraint_type.values
+        elif isinstance(constraint_type, Distance):
+            values = (constraint_type.center, constraint_type.distance)
+        else:
+            raise TypeError("Constraint type not supported: {}".format(type(constraint_type).__name__))
+        return Constraint, expression.attribute_name, type(constraint_type), tuple(_value_key(v) for v in values)
+    elif isinstance(expression, (And, Or)):
+        return type(expression), tuple(_expression_key(c) for c in expression.constraints)
+    elif isinstance(expression, Not):
+        return Not, _expression_key(expression.constraint)
+    raise TypeError("Constraint expression not supported: {}".format(type(expression).__name__))
+
+
+def _index_values(query: Query) -> Optional[List[INDEX_VALUE]]:
+    """
+    Choose the values a query is indexed by: the ones of the :class:`~oef.query.Eq` or :class:`~oef.query.In`
+    constraint with the fewest values among the optimized constraints of the query, that are in conjunction.
+    A description satisfies the query only if it has one of these values.
+
+    :param query: the query.
+    :return: the triples of attribute name, type and value, or ``None`` if the query cannot be indexed.
+    """
+    best = None
+    for expression in query.optimize().constraints:
+        if not isinstance(expression, Constraint):
+            continue
+        constraint_type = expression.constraint
+        if isinstance(constraint_type, Eq):
+            values = [constraint_type.value]
+        elif isinstance(constraint_type, In):
+            values = list(constraint_type.values)
+        else:
+            continue
+        if not all(type(v) in _HASHABLE_TYPES for v in values):
+            continue
+        if best is None or len(values) < len(best):
+            # an empty set is satisfied by no description, so the query is never a candidate.
+            best = [(expression.attribute_name, type(v), v) for v in values]
+    return best
+
+
+class _ValueIndex:
+    """
+    An index of queries (the subscriptions, or the cached searches) by the values returned by ``_index_values``,
+    used to find the queries that a description may satisfy without matching all of them.
+    The queries that cannot be indexed are always candidates.
+    """
+
+    def __init__(self) -> None:
+        self._by_value = defaultdict(set)  # type: Dict[INDEX_VALUE, Set[object]]
+        self._not_indexed = set()  # type: Set[object]
+
+    def add(self, key, index_values: Optional[List[INDEX_VALUE]]) -> None:
+        """
+        Index a query.
+
+        :param key: the key of the query.
+        :param index_values: the values the query is indexed by, or ``None`` if it cannot be indexed.
+        :return: ``None``
+        """
+        if index_values is None:
+            self._not_indexed.add(key)
+        else:
+            for value in index_values:
+                self._by_value[value].add(key)
+
+    def remove(self, key, index_values: Optional[List[INDEX_VALUE]]) -> None:
+        """
+        Remove a query from the index.
+
+        :param key: the key of the query.
+        :param index_values: the values the query was indexed by.
+        :return: ``None``
+        """
+        if index_values is None:
+            self._not_indexed.discard(key)
+            return
+        for value in index_values:
+            keys = self._by_value[value]
+            keys.discard(key)
+            if not keys:
+                del self._by_value[value]
+
+    def candidates(self, description: Description) -> Set[object]:
+        """
+        Get the queries that a description may satisfy.
+
+        :param description: the description.
+        :return: the keys of the queries.
+        """
+        candidates = set(self._not_indexed)
+        for name, value in description.values.items():
+            if type(value) in _HASHABLE_TYPES:
+                candidates |= self._by_value.get((name, type(value), value), set())
+        return candidates
+
+    def clear(self) -> None:
+        self._by_value.clear()
+        self._not_indexed.clear()
+
+
+class SearchCache:
+    """
+    A cache of the results of the searches in a :class:`~oef.directory.Directory`, with LRU eviction.
+
+    The results are keyed by a fingerprint of the query (see :func:`~oef.directory.SearchCache.fingerprint`)
+    and by the name of the data model the search is restricted to. When a description is added to the directory
+    or removed from it, only the results of the queries that the description satisfies are invalidated.
+    The results are indexed by the values the descriptions must have to satisfy their query
+    (e.g. the value of an :class:`~oef.query.Eq` constraint), so only the queries that may be satisfied
+    by the description are checked.
+
+    Examples:
+        >>> directory = Directory(cache=SearchCache(max_size=2))
+        >>> directory.add("agent_1", Description({"year": 1990}))
+        >>> query = Query([Constraint("year", Gt(1980))])
+        >>> directory.search(query), directory.search(query)
+        (['agent_1'], ['agent_1'])
+        >>> directory.cache.hits, directory.cache.misses
+        (1, 1)
+        >>> directory.add("agent_2", Description({"year": 1970}))
+        >>> len(directory.cache)
+        1
+        >>> directory.add("agent_3", Description({"year": 2000}))
+        >>> len(directory.cache)
+        0
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        """
+        Initialize the cache.
+
+        :param max_size: the maximum number of results in the cache.
+        """
+        if max_size < 1:
+            raise ValueError("Invalid input value for type '{}': the maximum size must be at least 1."
+                             .format(type(self).__name__))
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # for every result: the compiled query, the sorted keys, and the values the result is indexed by.
+        self._results = OrderedDict()  # type: Dict[CACHE_KEY, Tuple[PREDICATE, List[str], Optional[list]]]
+        self._index = _ValueIndex()
+
+    def __len__(self) -> int:
+        """Get the number of results in the cache."""
+        return len(self._results)
+
+    @staticmethod
+    def fingerprint(query: Query) -> QUERY_FINGERPRINT:
+        """
+        Compute a fingerprint of a query, that is the same for the queries with the same optimized constraints
+        (see :func:`~oef.query.Query.optimize`). The data model of the query is ignored, as in the searches.
+
+        :param query: the query.
+        :return: the fingerprint.
+        :raises TypeError: if a constraint expression of the query is not one of the SDK.
+        """
+        constraints = query.optimize().constraints
+        keys = [_expression_key(c) for c in constraints]
+        if all(c._cost() is not None for c in constraints):
+            # no constraint raises, so their order does not change the result.
+            keys.sort(key=repr)
+        return tuple(keys)
+
+    def get(self, cache_key: CACHE_KEY) -> Optional[List[str]]:
+        """
+        Get the result of a search, and mark it as the most recently used.
+
+        :param cache_key: the fingerprint of the query, and the name of the data model of the search.
+        :return: the sorted list of the keys, or ``None`` if the result is not in the cache.
+        """
+        entry = self._results.get(cache_key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results.move_to_end(cache_key)
+        return list(entry[1])
+
+    def put(self, cache_key: CACHE_KEY, query: Query, result: List[str]) -> None:
+        """
+        Add the result of a search, and evict the least recently used ones beyond the maximum size.
+
+        :param cache_key: the fingerprint of the query, and the name of the data model of the search.
+        :param query: the query, used to decide whether a changed description invalidates the result.
+        :param result: the sorted list of the keys.
+        :return: ``None``
+        """
+        if cache_key in self._results:
+            self._remove(cache_key)
+        constraints = query.optimize().constraints
+        # if a constraint may raise, a description without the indexed values may still change the result.
+        index_values = _index_values(query) if all(c._cost() is not None for c in constraints) else None
+        self._results[cache_key] = (query.compile(), list(result), index_values)
+        self._index.add(cache_key, index_values)
+        while len(self._results) > self.max_size:
+            self._remove(next(iter(self._results)))
+
+    def invalidate(self, description: Description) -> None:
+        """
+        Invalidate the results that may change because a description has been added or removed,
+        that is the ones whose query is satisfied by the description.
+
+        :param description: the description added or removed.
+        :return: ``None``
+        """
+        self.invalidate_all([description])
+
+    def invalidate_all(self, descriptions: List[Description]) -> None:
+        """
+        Invalidate the results that may change because many descriptions have been added or removed,
+        in one pass over the cache.
+
+        :param descriptions: the descriptions added or removed.
+        :return: ``None``
+        """
+        invalid = set()
+        for description in descriptions:
+            for cache_key in self._index.candidates(description):
+                if cache_key in invalid or cache_key[1] is not None and cache_key[1] != description.data_model.name:
+                    continue
+                try:
+                    if self._results[cache_key][0](description):
+                        invalid.add(cache_key)
+                except TypeError:
+                    # the query cannot be checked against the description, so the search now raises.
+                    invalid.add(cache_key)
+        for cache_key in invalid:
+            self._remove(cache_key)
+
+    def clear(self) -> None:
+        """
+        Remove all the results from the cache. The counters are not reset.
+
+        :return: ``None``
+        """
+        self._results.clear()
+        self._index.clear()
+
+    def _remove(self, cache_key: CACHE_KEY) -> None:
+        _, _, index_values = self._results.pop(cache_key)
+        self._index.remove(cache_key, index_values)
+
+
+class Directory:
+    """
+    A directory of descriptions, each one associated with a key (e.g. the public key of an agent).
+    A key can have more than one description.
+
+    The searches are planned over the indexes: among the constraints of the query (that are in conjunction),
+    the one with the smallest estimated number of candidates is chosen, and only its candidates are checked
+    against the query. If no constraint can be answered by an index, all the descriptions are checked.
+    The result is always the same as checking every description.
+
+    The descriptions are also partitioned by the name of their data model, so that a search can be restricted
+    to the descriptions of one data model (see :func:`~oef.directory.Directory.search`).
+
+    Optionally, the results of the searches are kept in a :class:`~oef.directory.SearchCache`,
+    that is invalidated when the descriptions change.
+
+    Examples:
+        >>> directory = Directory()
+        >>> directory.add("agent_1", Description({"year": 1990, "author": "Stephen King"}))
+        >>> directory.add("agent_2", Description({"year": 2000, "author": "George Orwell"}))
+        >>> directory.search(Query([Constraint("year", Gt(1980)), Constraint("author", Eq("Stephen King"))]))
+        ['agent_1']
+    """
+
+    def __init__(self, indexes: Optional[List[Index]] = None, cache: Optional[SearchCache] = None) -> None:
+        """
+        Initialize the directory.
+
+        :param indexes: the indexes to maintain. By default, a :class:`~oef.directory.HashIndex`,
+                      | a :class:`~oef.directory.SortedIndex` and a :class:`~oef.directory.LocationIndex`.
+        :param cache: the cache of the results of the searches. By default, the results are not cached.
+        """
+        self.indexes = indexes if indexes is not None else [HashIndex(), SortedIndex(), LocationIndex()]
+        self.cache = cache
+        self._entries = {}  # type: Dict[int, Tuple[str, Description]]
+        self._entries_by_key = defaultdict(list)  # type: Dict[str, List[int]]
+        self._entries_by_data_model = defaultdict(set)  # type: Dict[str, Set[int]]
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        """Get the number of descriptions in the directory."""
+        return len(self._entries)
+
+    def add(self, key: str, description: Description) -> None:
+        """
+        Add a description.
+
+        :param key: the key associated with the description.
+        :param description: the description.
+        :return: ``None``
+        """
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (key, description)
+        self._entries_by_key[key].append(entry_id)
+        self._entries_by_data_model[description.data_model.name].add(entry_id)
+        for index in self.indexes:
+            index.add(entry_id, description)
+        if self.cache is not None:
+            self.cache.invalidate(description)
+
+    def add_all(self, entries: List[Tuple[str, Description]]) -> None:
+        """
+        Add many descriptions at once. The indexes are updated in bulk
+        (e.g. the :class:`~oef.directory.SortedIndex` sorts its values once), and the cache is invalidated in one pass.
+
+        :param entries: the pairs of key and description.
+        :return: ``None``
+        """
+        indexed_entries = []
+        for key, description in entries:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, description)
+            self._entries_by_key[key].append(entry_id)
+            self._entries_by_data_model[description.data_model.name].add(entry_id)
+            indexed_entries.append((entry_id, description))
+        for index in self.indexes:
+            index.add_all(indexed_entries)
+        if self.cache is not None:
+            self.cache.invalidate_all([description for _, description in indexed_entries])
+
+    def remove(self, key: str, description: Description) -> None:
+        """
+        Remove the first description associated with a key that is equal to the one provided.
+
+        :param key: the key.
+        :param description: the description.
+        :return: ``None``
+        :raises ValueError: if there is no such description.
+        """
+        for entry_id in self._entries_by_key.get(key, []):
+            if self._entries[entry_id][1] == description:
+                self._remove_entry(entry_id)
+                return
+        raise ValueError("Description not found for key {}.".format(key))
+
+    def remove_key(self, key: str) -> None:
+        """
+        Remove all the descriptions associated with a key.
+
+        :param key: the key.
+        :return: ``None``
+        """
+        for entry_id in list(self._entries_by_key.get(key, [])):
+            self._remove_entry(entry_id)
+
+    def keys(self) -> List[str]:
+        """
+        Get the keys that have at least one description.
+
+        :return: the sorted list of the keys.
+        """
+        return sorted(self._entries_by_key)
+
+    def descriptions(self, key: str) -> List[Description]:
+        """
+        Get the descriptions associated with a key.
+
+        :param key: the key.
+        :return: the descriptions, in the order they were added.
+        """
+        return [self._entries[entry_id][1] for entry_id in self._entries_by_key.get(key, [])]
+
+    def search(self, query: Query, data_model_name: Optional[str] = None) -> List[str]:
+        """
+        Search the keys that have at least one description that satisfies the query.
+
+        :param query: the query.
+        :param data_model_name: if provided, only the descriptions whose data model has this name are searched.
+        :return: the sorted list of the keys.
+        """
+        if self.cache is None:
+            return self._search(query, data_model_name)
+        try:
+            cache_key = (SearchCache.fingerprint(query), data_model_name)
+        except TypeError:
+            # e.g. a constraint expression defined outside the SDK: the result is not cached.
+            return self._search(query, data_model_name)
+        result = self.cache.get(cache_key)
+        if result is None:
+            result = self._search(query, data_model_name)
+            self.cache.put(cache_key, query, result)
+        return result
+
+    def _search(self, query: Query, data_model_name: Optional[str]) -> List[str]:
+        """Search the keys that satisfy the query, planning over the indexes."""
+        partition = self._entries_by_data_model.get(data_model_name, set()) if data_model_name is not None \
+            else self._entries.keys()
+        # e.g. the bounds on the same attribute are merged into a range, that is planned with one bisection.
+        plan = self._plan_conjunction(query.optimize().constraints)
+        if plan is not None and plan[0] < len(partition):
+            entry_ids = plan[1]()
+            if data_model_name is not None:
+                entry_ids &= partition
+        else:
+            entry_ids = partition
+        result = set()
+        check = query.check
+        for entry_id in entry_ids:
+            key, description = self._entries[entry_id]
+            if key not in result and check(description):
+                result.add(key)
+        return sorted(result)
+
+    def _remove_entry(self, entry_id: int) -> None:
+        key, description = self._entries.pop(entry_id)
+        self._entries_by_key[key].remove(entry_id)
+        if not self._entries_by_key[key]:
+            del self._entries_by_key[key]
+        data_model_entries = self._entries_by_data_model[description.data_model.name]
+        data_model_entries.discard(entry_id)
+        if not data_model_entries:
+            del self._entries_by_data_model[description.data_model.name]
+        for index in self.indexes:
+            index.remove(entry_id, description)
+        if self.cache is not None:
+            self.cache.invalidate(description)
+
+    def _plan(self, expression: ConstraintExpr) -> Optional[PLAN]:
+        """
+        Plan the computation of the candidates that may satisfy a constraint expression.
+
+        :param expression: the constraint expression.
+        :return: the plan, or ``None`` if the expression cannot be answered by the indexes.
+        """
+        if isinstance(expression, Constraint):
+            plans = [index.plan(expression) for index in self.indexes]
+            return min((p for p in plans if p is not None), key=lambda p: p[0], default=None)
+        elif isinstance(expression, And):
+            return self._plan_conjunction(expression.constraints)
+        elif isinstance(expression, Or):
+            plans = [self._plan(c) for c in expression.constraints]
+            if any(p is None for p in plans):
+                return None
+            return sum(p[0] for p in plans), lambda: set().union(*(p[1]() for p in plans))
+        else:
+            # Not and unknown expressions cannot be answered by the indexes.
+            return None
+
+    def _plan_conjunction(self, expressions: List[ConstraintExpr]) -> Optional[PLAN]:
+        """Plan a conjunction of constraint expressions: choose the most selective one."""
+        plans = [self._plan(c) for c in expressions]
+        return min((p for p in plans if p is not None), key=lambda p: p[0], default=None)
+
+
+"""The key of a subscription: the public key of the subscriber, and the identifier of the subscription."""
+SUBSCRIPTION_KEY = Tuple[str, int]
+
+
+class Subscriptions:
+    """
+    The standing queries over a :class:`~oef.directory.Directory`: every subscription keeps the set of the keys
+    that have at least one description that satisfies its query, and the changes of this set are returned
+    when a description is added to the directory or removed from it.
+
+    The description is matched with the compiled query (see :func:`~oef.query.Query.compile`) of the subscriptions
+    indexed by its values, instead of all of them: a subscription whose optimized query requires an attribute
+    to be equal to (or in) some values is indexed by them, the other ones are always matched.
+    A description that cannot be checked against a query (i.e. the check raises a ``TypeError``) does not satisfy it.
+
+    Examples:
+        >>> directory, subscriptions = Directory(), Subscriptions()
+        >>> directory.add("agent_1", Description({"year": 1990}))
+        >>> subscriptions.subscribe(("agent_0", 1), Query([Constraint("year", Gt(1980))]), directory)
+        ['agent_1']
+        >>> directory.add("agent_2", Description({"year": 2000}))
+        >>> subscriptions.add("agent_2", Description({"year": 2000}))
+        [('agent_0', 1)]
+        >>> subscriptions.add("agent_3", Description({"year": 1970}))
+        []
+        >>> subscriptions.remove("agent_1", Description({"year": 1990}))
+        [('agent_0', 1)]
+    """
+
+    def __init__(self) -> None:
+        """Initialize the subscriptions."""
+        # for every subscription: the compiled query, the values it is indexed by,
+        # and the number of matching descriptions of every matching key.
+        self._subscriptions = OrderedDict()  # type: Dict[SUBSCRIPTION_KEY, Tuple[PREDICATE, Optional[list], dict]]
+        self._index = _ValueIndex()
+        # the sequence number of every subscription, to sort the candidates in the order of subscription.
+        self._sequence_numbers = {}  # type: Dict[SUBSCRIPTION_KEY, int]
+        self._next_sequence_number = 0
+
+    def __len__(self) -> int:
+        """Get the number of subscriptions."""
+        return len(self._subscriptions)
+
+    def __contains__(self, subscription_key: SUBSCRIPTION_KEY) -> bool:
+        """Check if a subscription is active."""
+        return subscription_key in self._subscriptions
+
+    def subscribe(self, subscription_key: SUBSCRIPTION_KEY, query: Query, directory: Directory) -> List[str]:
+        """
+        Add a subscription, or replace the one with the same key.
+
+        :param subscription_key: the public key of the subscriber and the identifier of the subscription.
+        :param query: the query.
+        :param directory: the directory whose descriptions are matched by the subscription.
+        :return: the sorted list of the keys that currently satisfy the query.
+        """
+        if subscription_key in self._subscriptions:
+            self.unsubscribe(subscription_key)
+        predicate = query.compile()
+        try:
+            keys = directory.search(query)
+        except TypeError:
+            # some descriptions cannot be checked against the query: they are skipped below.
+            keys = directory.keys()
+        counts = {}  # type: Dict[str, int]
+        for key in keys:
+            count = sum(1 for description in directory.descriptions(key) if self._matches(predicate, description))
+            if count > 0:
+                counts[key] = count
+
+        index_values = _index_values(query)
+        self._subscriptions[subscription_key] = (predicate, index_values, counts)
+        self._sequence_numbers[subscription_key] = self._next_sequence_number
+        self._next_sequence_number += 1
+        self._index.add(subscription_key, index_values)
+        return sorted(counts)
+
+    def unsubscribe(self, subscription_key: SUBSCRIPTION_KEY) -> None:
+        """
+        Remove a subscription.
+
+        :param subscription_key: the public key of the subscriber and the identifier of the subscription.
+        :return: ``None``
+        :raises ValueError: if there is no such subscription.
+        """
+        if subscription_key not in self._subscriptions:
+            raise ValueError("Subscription {} not found.".format(subscription_key))
+        _, index_values, _ = self._subscriptions.pop(subscription_key)
+        del self._sequence_numbers[subscription_key]
+        self._index.remove(subscription_key, index_values)
+
+    def add(self, key: str, description: Description) -> List[SUBSCRIPTION_KEY]:
+        """
+        Match a description added to the directory.
+
+        :param key: the key associated with the description.
+        :param description: the description.
+        :return: the subscriptions whose query is now satisfied by the key, and was not before.
+        """
+        added = []
+        for subscription_key in self._candidates(description):
+            predicate, _, counts = self._subscriptions[subscription_key]
+            if self._matches(predicate, description):
+                counts[key] = counts.get(key, 0) + 1
+                if counts[key] == 1:
+                    added.append(subscription_key)
+        return added
+
+    def add_all(self, entries: List[Tuple[str, Description]]) -> Dict[SUBSCRIPTION_KEY, List[str]]:
+        """
+        Match many descriptions added to the directory.
+
+        :param entries: the pairs of key and description.
+        :return: for every subscription whose result changed, the keys that now satisfy its query,
+               | and did not before, in the order of the entries.
+        """
+        added = OrderedDict()  # type: Dict[SUBSCRIPTION_KEY, List[str]]
+        for key, description in entries:
+            for subscription_key in self.add(key, description):
+                added.setdefault(subscription_key, []).append(key)
+        return added
+
+    def remove(self, key: str, description: Description) -> List[SUBSCRIPTION_KEY]:
+        """
+        Match a description removed from the directory.
+
+        :param key: the key associated with the description.
+        :param description: the description.
+        :return: the subscriptions whose query is no longer satisfied by the key.
+        """
+        removed = []
+        for subscription_key in self._candidates(description):
+            predicate, _, counts = self._subscriptions[subscription_key]
+            if key in counts and self._matches(predicate, description):
+                counts[key] -= 1
+                if counts[key] == 0:
+                    del counts[key]
+                    removed.append(subscription_key)
+        return removed
+
+    def _candidates(self, description: Description) -> List[SUBSCRIPTION_KEY]:
+        """Get the subscriptions that may be satisfied by a description, in the order of subscription."""
+        candidates = self._index.candidates(description)
+        return sorted(candidates, key=self._sequence_numbers.__getitem__)
+
+    @staticmethod
+    def _matches(predicate: PREDICATE, description: Description) -> bool:
+        try:
+            return predicate(description)
+        except TypeError:
+            return False
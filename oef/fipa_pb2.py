@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: fipa.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+from . import query_pb2 as query__pb2
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nfipa.proto\x12\x0c\x66\x65tch.oef.pb\x1a\x0bquery.proto\"\xa1\x04\n\x04\x46ipa\x1a\x8d\x01\n\x03\x43\x66p\x12*\n\x05query\x18\x01 \x01(\x0b\x32\x19.fetch.oef.pb.Query.ModelH\x00\x12\x11\n\x07\x63ontent\x18\x02 \x01(\x0cH\x00\x12\x31\n\x07nothing\x18\x03 \x01(\x0b\x32\x1e.fetch.oef.pb.Fipa.Cfp.NothingH\x00\x1a\t\n\x07NothingB\t\n\x07payload\x1a\x9e\x01\n\x07Propose\x12\x39\n\tproposals\x18\x01 \x01(\x0b\x32$.fetch.oef.pb.Fipa.Propose.ProposalsH\x00\x12\x11\n\x07\x63ontent\x18\x02 \x01(\x0cH\x00\x1a:\n\tProposals\x12-\n\x07objects\x18\x01 \x03(\x0b\x32\x1c.fetch.oef.pb.Query.InstanceB\t\n\x07payload\x1a\x08\n\x06\x41\x63\x63\x65pt\x1a\t\n\x07\x44\x65\x63line\x1a\xd2\x01\n\x07Message\x12\x0e\n\x06target\x18\x01 \x02(\x05\x12%\n\x03\x63\x66p\x18\x02 \x01(\x0b\x32\x16.fetch.oef.pb.Fipa.CfpH\x00\x12-\n\x07propose\x18\x03 \x01(\x0b\x32\x1a.fetch.oef.pb.Fipa.ProposeH\x00\x12+\n\x06\x61\x63\x63\x65pt\x18\x04 \x01(\x0b\x32\x19.fetch.oef.pb.Fipa.AcceptH\x00\x12-\n\x07\x64\x65\x63line\x18\x05 \x01(\x0b\x32\x1a.fetch.oef.pb.Fipa.DeclineH\x00\x42\x05\n\x03msg')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'fipa_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  _FIPA._serialized_start=42
+  _FIPA._serialized_end=587
+  _FIPA_CFP._serialized_start=51
+  _FIPA_CFP._serialized_end=192
+  _FIPA_CFP_NOTHING._serialized_start=172
+  _FIPA_CFP_NOTHING._serialized_end=181
+  _FIPA_PROPOSE._serialized_start=195
+  _FIPA_PROPOSE._serialized_end=353
+  _FIPA_PROPOSE_PROPOSALS._serialized_start=284
+  _FIPA_PROPOSE_PROPOSALS._serialized_end=342
+  _FIPA_ACCEPT._serialized_start=355
+  _FIPA_ACCEPT._serialized_end=363
+  _FIPA_DECLINE._serialized_start=365
+  _FIPA_DECLINE._serialized_end=374
+  _FIPA_MESSAGE._serialized_start=377
+  _FIPA_MESSAGE._serialized_end=587
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.framing
+~~~~~~~~~~~
+
+This module implements the framing layer of the OEF protocol, that is, how Protobuf messages are
+delimited on the wire. Every frame is made of a 4-byte length header, followed by the serialized message.
+
+"""
+
+import asyncio
+import struct
+from typing import List, Optional
+
+"""The header of a frame: the length of the serialized message, packed as an unsigned int."""
+HEADER = struct.Struct("I")
+
+"""The initial capacity of the receive buffer, in bytes."""
+DEFAULT_BUFFER_SIZE = 2 ** 16
+
+
+class FrameReader:
+    """
+    A reusable receive buffer that splits the incoming stream of bytes into frames.
+
+    The buffer is a single pre-allocated ``bytearray``. The bytes received are written at its tail
+    (either with :func:`~oef.framing.FrameReader.feed` or, without any intermediate copy,
+    through :func:`~oef.framing.FrameReader.get_buffer` and :func:`~oef.framing.FrameReader.buffer_updated`),
+    and the complete frames are returned as ``memoryview`` slices of the buffer,
+    that can be passed directly to ``ParseFromString``.
+
+    Notice: a frame returned by :func:`~oef.framing.FrameReader.frames` is valid only until
+    the next write to the buffer, since the buffer is compacted in place.
+
+    Examples:
+        >>> reader = FrameReader()
+        >>> reader.feed(HEADER.pack(5) + b"hello" + HEADER.pack(5) + b"wor")
+        >>> [bytes(frame) for frame in reader.frames()]
+        [b'hello']
+        >>> reader.feed(b"ld")
+        >>> [bytes(frame) for frame in reader.frames()]
+        [b'world']
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        """
+        Initialize the frame reader.
+
+        :param buffer_size: the initial capacity of the buffer. The buffer grows if a frame does not fit in it.
+        """
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # index of the first byte not consumed yet
+        self._end = 0    # index of the first free byte
+
+    def __len__(self) -> int:
+        """Get the number of bytes received but not consumed yet."""
+        return self._end - self._start
+
+    def get_buffer(self, size_hint: int = -1) -> memoryview:
+        """
+        Get a writable view of the free space at the tail of the buffer.
+        After having written into it, call :func:`~oef.framing.FrameReader.buffer_updated`.
+
+        :param size_hint: the minimum size of the view. If not positive, any non-empty view is returned.
+        :return: the writable view.
+        """
+        size_hint = max(size_hint, 1)
+        if self._start == self._end:
+            # nothing pending: rewind, without copying anything.
+            self._start = self._end = 0
+        if len(self._buffer) - self._end < size_hint:
+            self._compact(size_hint)
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        """
+        Notify the reader that ``nbytes`` have been written in the view returned by
+        :func:`~oef.framing.FrameReader.get_buffer`.
+
+        :param nbytes: the number of bytes written.
+        :return: ``None``
+        """
+        self._end += nbytes
+
+    def feed(self, data: bytes) -> None:
+        """
+        Copy some received bytes at the tail of the buffer.
+
+        :param data: the bytes received.
+        :return: ``None``
+        """
+        nbytes = len(data)
+        self.get_buffer(nbytes)[:nbytes] = data
+        self.buffer_updated(nbytes)
+
+    def frames(self) -> List[memoryview]:
+        """
+        Parse all the complete frames in the buffer, in one pass.
+
+        :return: the list of the payloads of the complete frames, as views over the buffer.
+        """
+        result = []
+        start, end = self._start, self._end
+        while end - start >= HEADER.size:
+            nbytes = HEADER.unpack_from(self._buffer, start)[0]
+            if end - start - HEADER.size < nbytes:
+                break
+            start += HEADER.size
+            result.append(self._view[start:start + nbytes])
+            start += nbytes
+        self._start = start
+        return result
+
+    def _compact(self, size_hint: int) -> None:
+        """
+        Make room for at least ``size_hint`` bytes at the tail of the buffer.
+        The pending bytes are moved at the head of the buffer; if that is not enough, a larger buffer is allocated.
+
+        :param size_hint: the number of free bytes needed.
+        :return: ``None``
+        """
+        pending = self._end - self._start
+        if pending < HEADER.size:
+            needed = pending + size_hint
+        else:
+            # reserve enough space for the whole frame being received.
+            frame_size = HEADER.size + HEADER.unpack_from(self._buffer, self._start)[0]
+            needed = max(pending + size_hint, frame_size)
+
+        if needed <= len(self._buffer):
+            self._view[:pending] = self._view[self._start:self._end]
+        else:
+            # allocate a new buffer instead of resizing, since the old one may still be referenced by some frame.
+            new_buffer = bytearray(max(needed, 2 * len(self._buffer)))
+            new_buffer[:pending] = self._view[self._start:self._end]
+            self._buffer = new_buffer
+            self._view = memoryview(new_buffer)
+        self._start, self._end = 0, pending
+
+
+class FrameWriter:
+    """
+    Coalesce the frames written in the same iteration of the event loop into a single write on the transport.
+
+    Every frame is packed, header and payload, into one buffer allocated with the exact size of the batch,
+    and the buffer is handed to the transport with one ``write``, that is, one system call in the common case.
+
+    Examples:
+        >>> class Transport:
+        ...     def __init__(self): self.writes = []
+        ...     def write(self, data): self.writes.append(bytes(data))
+        >>> transport = Transport()
+        >>> writer = FrameWriter(transport)
+        >>> writer.write(b"hello")
+        >>> writer.write(b"world")
+        >>> writer.flush()
+        >>> transport.writes == [HEADER.pack(5) + b"hello" + HEADER.pack(5) + b"world"]
+        True
+    """
+
+    def __init__(self, transport: asyncio.WriteTransport, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Initialize the frame writer.
+
+        :param transport: the transport where the frames are written.
+        :param loop: the event loop where the writes are scheduled. If ``None``, the current event loop is used.
+        """
+        self._transport = transport
+        self._loop = loop if loop is not None else asyncio.get_event_loop()
+        self._pending = []  # type: List[bytes]
+        self._pending_size = 0
+        self._scheduled = False
+
+    def __len__(self) -> int:
+        """Get the number of bytes queued but not written to the transport yet."""
+        return self._pending_size
+
+    def write(self, data: bytes) -> None:
+        """
+        Queue a frame. The frame is written to the transport at the end of the current iteration of the event loop,
+        together with all the other frames queued in the meantime.
+
+        :param data: the payload of the frame, i.e. the serialized message.
+        :return: ``None``
+        """
+        self._pending.append(data)
+        self._pending_size += HEADER.size + len(data)
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon(self._write_pending)
+
+    def writelines(self, frames: List[bytes]) -> None:
+        """
+        Queue many frames at once. See :func:`~oef.framing.FrameWriter.write`.
+
+        :param frames: the payloads of the frames.
+        :return: ``None``
+        """
+        if not frames:
+            return
+        self._pending.extend(frames)
+        self._pending_size += HEADER.size * len(frames) + sum(map(len, frames))
+        if not self._scheduled:
+            self._scheduled = True
+            self._loop.call_soon(self._write_pending)
+
+    def flush(self) -> None:
+        """
+        Write all the queued frames to the transport immediately.
+
+        :return: ``None``
+        """
+        if not self._pending:
+            return
+
+        buffer = bytearray(self._pending_size)
+        offset = 0
+        for data in self._pending:
+            HEADER.pack_into(buffer, offset, len(data))
+            offset += HEADER.size
+            buffer[offset:offset + len(data)] = data
+            offset += len(data)
+        self._pending = []
+        self._pending_size = 0
+
+        # the buffer is never reused, so the transport can hold a reference to it.
+        self._transport.write(buffer)
+
+    def _write_pending(self) -> None:
+        """Callback scheduled on the event loop by :func:`~oef.framing.FrameWriter.write`."""
+        self._scheduled = False
+        self.flush()
@@ -29,6 +29,9 @@ This module contains helper functions.
 
 from math import sin, cos, sqrt, asin, radians
 
+"""The average radius of the Earth, in km."""
+EARTH_RADIUS = 6372.8
+
 
 def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -43,8 +46,7 @@ def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
 
     lat1, lon1, lat2, lon2, = map(radians, [lat1, lon1, lat2, lon2])
 
-    # average earth radius
-    R = 6372.8
+    R = EARTH_RADIUS
 
     dlat = lat2 - lat1
     dlon = lon2 - lon1
@@ -27,12 +27,14 @@ This module contains classes to manage serialization of data in Protobuf message
 
 """
 
+import copy
 from abc import ABC, abstractmethod
-from typing import Optional, Union, List
+from collections.abc import Sequence
+from typing import Optional, Union, List, Tuple, Iterator
 
 from enum import Enum
 
-from oef.schema import Description
+from oef.schema import CachedSerialization, Description
 
 from oef import agent_pb2, fipa_pb2
 from oef.query import Query
@@ -40,6 +42,66 @@ from oef.query import Query
 NoneType = type(None)
 CFP_TYPES = Union[Query, bytes, NoneType]
 PROPOSE_TYPES = Union[bytes, List[Description]]
+"""The recipients of a multicast: pairs of dialogue identifier and public key of the recipient agent."""
+DESTINATIONS = List[Tuple[int, str]]
+
+"""The call of a handler of an agent: the name of the handler and its positional arguments."""
+HANDLER_CALL = Tuple[str, tuple]
+
+
+class LazyProposals(Sequence):
+    """
+    A read-only list of proposals that wraps the Protobuf objects received,
+    and decodes every :class:`~oef.schema.Description` only when it is accessed for the first time.
+
+    Examples:
+        >>> proposals_pb = fipa_pb2.Fipa.Propose.Proposals()
+        >>> proposals_pb.objects.extend([Description({"price": 10}).to_pb(), Description({"price": 20}).to_pb()])
+        >>> proposals = LazyProposals(proposals_pb.objects)
+        >>> len(proposals)
+        2
+        >>> proposals[1].values["price"]
+        20
+        >>> proposals == [Description({"price": 10}), Description({"price": 20})]
+        True
+    """
+
+    def __init__(self, descriptions_pb) -> None:
+        """
+        Initialize the list of proposals.
+
+        :param descriptions_pb: the repeated field of ``Query.Instance`` Protobuf objects.
+        """
+        self._descriptions_pb = descriptions_pb
+        self._descriptions = [None] * len(descriptions_pb)  # type: List[Optional[Description]]
+
+    def __len__(self) -> int:
+        return len(self._descriptions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        description = self._descriptions[index]
+        if description is None:
+            description = Description.from_pb(self._descriptions_pb[index])
+            self._descriptions[index] = description
+        return description
+
+    def __iter__(self):
+        for index in range(len(self._descriptions)):
+            yield self[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, LazyProposals)):
+            return False
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return "LazyProposals({})".format(len(self))
+
+    def __reduce__(self):
+        # the Protobuf repeated field cannot be pickled: unpickle as a list (e.g. in a ProcessPoolExecutor).
+        return list, (list(self),)
 
 
 class OEFErrorOperation(Enum):
@@ -95,7 +157,7 @@ class RegisterDescription(BaseMessage):
     def to_envelope(self) -> agent_pb2.Envelope:
         envelope = agent_pb2.Envelope()
         envelope.msg_id = self.msg_id
-        envelope.register_description.CopyFrom(self.agent_description.to_agent_description_pb())
+        self.agent_description._write_pb(envelope.register_description.description)
         return envelope
 
 
@@ -120,7 +182,7 @@ class RegisterService(BaseMessage):
     def to_envelope(self) -> agent_pb2.Envelope:
         envelope = agent_pb2.Envelope()
         envelope.msg_id = self.msg_id
-        envelope.register_service.CopyFrom(self.service_description.to_agent_description_pb())
+        self.service_description._write_pb(envelope.register_service.description)
         return envelope
 
 
@@ -166,7 +228,7 @@ class UnregisterService(BaseMessage):
     def to_envelope(self) -> agent_pb2.Envelope:
         envelope = agent_pb2.Envelope()
         envelope.msg_id = self.msg_id
-        envelope.unregister_service.CopyFrom(self.service_description.to_agent_description_pb())
+        self.service_description._write_pb(envelope.unregister_service.description)
         return envelope
 
 
@@ -198,7 +260,7 @@ class SearchAgents(BaseMessage):
     def to_envelope(self):
         envelope = agent_pb2.Envelope()
         envelope.msg_id = self.msg_id
-        envelope.search_agents.query.CopyFrom(self.query.to_pb())
+        self.query._write_pb(envelope.search_agents.query)
         return envelope
 
 
@@ -230,10 +292,23 @@ class SearchServices(BaseMessage):
     def to_envelope(self) -> agent_pb2.Envelope:
         envelope = agent_pb2.Envelope()
         envelope.msg_id = self.msg_id
-        envelope.search_services.query.CopyFrom(self.query.to_pb())
+        self.query._write_pb(envelope.search_services.query)
         return envelope
 
 
+def _copy_mutable(obj):
+    """
+    Copy an object delivered to an agent, unless it is immutable.
+
+    :param obj: the query, the proposal or the bytes of a message.
+    :return: the object itself, if it is immutable, otherwise a copy of it (see ``Query.__copy__`` and
+           | ``Description.__copy__``).
+    """
+    if obj is None or isinstance(obj, (bytes, CachedSerialization)):
+        return obj
+    return copy.copy(obj)
+
+
 class AgentMessage(BaseMessage, ABC):
     """
     This type of message is used for interacting with other agents, via an OEF Node.
@@ -252,6 +327,21 @@ class AgentMessage(BaseMessage, ABC):
     The protocol is compliant with FIPA specifications.
     """
 
+    @abstractmethod
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        """
+        Get the call of the handler of the recipient, as if the message was delivered by an OEF Node
+        (see :func:`~oef.core.decode_agent_message`), without serializing it.
+        Every recipient gets its own copy of the query and of the proposals, with their own list of constraints and
+        dictionary of values, so that neither the sender nor the other recipients see its changes. The constraint
+        expressions and the attribute values are shared, as in :class:`~oef.schema.Description`. The immutable
+        queries and proposals (e.g. :class:`~oef.query.FrozenQuery`, :class:`~oef.schema.FrozenDescription`)
+        are not copied.
+
+        :param origin: the public key of the sender.
+        :return: the name of the handler and its arguments.
+        """
+
 
 class Message(AgentMessage):
     """
@@ -285,6 +375,9 @@ class Message(AgentMessage):
         self.destination = destination
         self.msg = msg
 
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        return "on_message", (self.msg_id, self.dialogue_id, origin, self.msg)
+
     def to_envelope(self) -> agent_pb2.Envelope:
         agent_msg = agent_pb2.Agent.Message()
         agent_msg.dialogue_id = self.dialogue_id
@@ -334,26 +427,28 @@ class CFP(AgentMessage):
         self.query = query
         self.target = target
 
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        return "on_cfp", (self.msg_id, self.dialogue_id, origin, self.target, _copy_mutable(self.query))
+
     def to_envelope(self) -> agent_pb2.Agent.Message:
-        fipa_msg = fipa_pb2.Fipa.Message()
+        # the envelope is filled in place, so that the query is written only once.
+        envelope = agent_pb2.Envelope()
+        envelope.msg_id = self.msg_id
+        agent_msg = envelope.send_message
+        agent_msg.dialogue_id = self.dialogue_id
+        agent_msg.destination = self.destination
+        fipa_msg = agent_msg.fipa
         fipa_msg.target = self.target
-        cfp = fipa_pb2.Fipa.Cfp()
+        cfp = fipa_msg.cfp
 
         if self.query is None:
-            cfp.nothing.CopyFrom(fipa_pb2.Fipa.Cfp.Nothing())
+            cfp.nothing.SetInParent()
         elif isinstance(self.query, Query):
-            cfp.query.CopyFrom(self.query.to_pb())
+            self.query._write_pb(cfp.query)
         elif isinstance(self.query, bytes):
             cfp.content = self.query
-        fipa_msg.cfp.CopyFrom(cfp)
-        agent_msg = agent_pb2.Agent.Message()
-        agent_msg.dialogue_id = self.dialogue_id
-        agent_msg.destination = self.destination
-        agent_msg.fipa.CopyFrom(fipa_msg)
-
-        envelope = agent_pb2.Envelope()
-        envelope.msg_id = self.msg_id
-        envelope.send_message.CopyFrom(agent_msg)
+        else:
+            cfp.SetInParent()
         return envelope
 
 
@@ -395,25 +490,27 @@ class Propose(AgentMessage):
         self.target = target
         self.proposals = proposals
 
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        proposals = self.proposals if isinstance(self.proposals, bytes) else [_copy_mutable(p) for p in self.proposals]
+        return "on_propose", (self.msg_id, self.dialogue_id, origin, self.target, proposals)
+
     def to_envelope(self) -> agent_pb2.Agent.Message:
-        fipa_msg = fipa_pb2.Fipa.Message()
+        # the envelope is filled in place, so that every proposal is written only once.
+        envelope = agent_pb2.Envelope()
+        envelope.msg_id = self.msg_id
+        agent_msg = envelope.send_message
+        agent_msg.dialogue_id = self.dialogue_id
+        agent_msg.destination = self.destination
+        fipa_msg = agent_msg.fipa
         fipa_msg.target = self.target
-        propose = fipa_pb2.Fipa.Propose()
+        propose = fipa_msg.propose
         if isinstance(self.proposals, bytes):
             propose.content = self.proposals
         else:
-            proposals_pb = fipa_pb2.Fipa.Propose.Proposals()
-            proposals_pb.objects.extend([propose.to_pb() for propose in self.proposals])
-            propose.proposals.CopyFrom(proposals_pb)
-        fipa_msg.propose.CopyFrom(propose)
-        agent_msg = agent_pb2.Agent.Message()
-        agent_msg.dialogue_id = self.dialogue_id
-        agent_msg.destination = self.destination
-        agent_msg.fipa.CopyFrom(fipa_msg)
-
-        envelope = agent_pb2.Envelope()
-        envelope.msg_id = self.msg_id
-        envelope.send_message.CopyFrom(agent_msg)
+            objects = propose.proposals.objects
+            propose.proposals.SetInParent()
+            for proposal in self.proposals:
+                proposal._write_pb(objects.add())
         return envelope
 
 
@@ -450,6 +547,9 @@ class Accept(AgentMessage):
         self.destination = destination
         self.target = target
 
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        return "on_accept", (self.msg_id, self.dialogue_id, origin, self.target)
+
     def to_envelope(self) -> agent_pb2.Agent.Message:
         fipa_msg = fipa_pb2.Fipa.Message()
         fipa_msg.target = self.target
@@ -500,6 +600,9 @@ class Decline(AgentMessage):
         self.destination = destination
         self.target = target
 
+    def to_handler_call(self, origin: str) -> HANDLER_CALL:
+        return "on_decline", (self.msg_id, self.dialogue_id, origin, self.target)
+
     def to_envelope(self):
         fipa_msg = fipa_pb2.Fipa.Message()
         fipa_msg.target = self.target
@@ -514,3 +617,80 @@ class Decline(AgentMessage):
         envelope.msg_id = self.msg_id
         envelope.send_message.CopyFrom(agent_msg)
         return envelope
+
+
+class Multicast:
+    """
+    This class is used to send the same agent message to many agents, each one in its own dialogue.
+    It contains:
+
+    * the agent message, whose dialogue id and destination are ignored.
+    * the destinations, that is, the pairs of dialogue id and public key of the recipients.
+
+    The payload of the message (the content or the FIPA message) is serialized only once. The envelope for every
+    destination is the concatenation of its own fields with the shared payload: a Protobuf parser merges
+    the occurrences of the same embedded message, so the recipient reads the envelope of the single message.
+
+    It is used in the methods :func:`~oef.core.OEFCoreInterface.broadcast_message`
+    and :func:`~oef.core.OEFCoreInterface.broadcast_cfp`.
+
+    Examples:
+        >>> multicast = Multicast(Message(0, 0, "", b"hello"), [(1, "alice"), (2, "bob")])
+        >>> envelope = agent_pb2.Envelope()
+        >>> _ = envelope.ParseFromString(multicast.serialize()[1])
+        >>> envelope == Message(0, 2, "bob", b"hello").to_envelope()
+        True
+    """
+
+    def __init__(self, msg: AgentMessage, destinations: DESTINATIONS):
+        """
+        Initialize a multicast.
+
+        :param msg: the agent message to send.
+        :param destinations: the pairs of dialogue id and public key of the recipients.
+        """
+        self.msg = msg
+        self.destinations = list(destinations)
+
+    def messages(self) -> Iterator[AgentMessage]:
+        """
+        Get the single messages of the multicast, one for every destination.
+
+        :return: an iterator over the messages.
+        """
+        for dialogue_id, destination in self.destinations:
+            msg = copy.copy(self.msg)
+            msg.dialogue_id = dialogue_id
+            msg.destination = destination
+            yield msg
+
+    def payload(self) -> agent_pb2.Agent.Message:
+        """
+        Get the payload shared by all the destinations.
+
+        :return: the ``Agent.Message`` Protobuf object, without dialogue id and destination.
+        """
+        agent_msg = self.msg.to_envelope().send_message
+        agent_msg.ClearField("dialogue_id")
+        agent_msg.ClearField("destination")
+        return agent_msg
+
+    def serialize(self) -> List[bytes]:
+        """
+        Serialize the envelopes of the multicast.
+
+        :return: the serialized envelope for every destination, in the same order of the destinations.
+        """
+        payload = agent_pb2.Envelope()
+        payload.send_message.CopyFrom(self.payload())
+        payload_data = payload.SerializePartialToString()
+
+        header = agent_pb2.Envelope()
+        header.msg_id = self.msg.msg_id
+        agent_msg = header.send_message
+        envelopes = []
+        for dialogue_id, destination in self.destinations:
+            agent_msg.dialogue_id = dialogue_id
+            agent_msg.destination = destination
+            envelopes.append(header.SerializePartialToString() + payload_data)
+        return envelopes
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.metrics
+~~~~~~~~~~~
+
+This module contains the metrics of the agents, and their export in the Prometheus text format.
+
+The metrics are disabled by default: the instrumented code paths only check that the ``metrics`` attribute of the
+proxy is ``None``. To enable them for an agent, call :func:`~oef.metrics.instrument`:
+
+.. code-block:: python
+
+    registry = MetricsRegistry()
+    for agent in agents:
+        instrument(agent, registry)
+
+    registry.write_text_file("/var/lib/node_exporter/oef.prom")
+    # or, from a coroutine:
+    server = await registry.start_http_server(port=9100)
+
+"""
+
+import asyncio
+import bisect
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Callable, Tuple, Optional
+
+"""The default upper bounds of the buckets of the histograms, in seconds."""
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+"""The content type of the Prometheus text format."""
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+"""The maximum number of searches whose round trip is being measured: the oldest one is dropped beyond it."""
+MAX_PENDING_SEARCHES = 1024
+
+"""The type of the message delivered to every handler, i.e. the label of the messages received."""
+_RECEIVED_MESSAGE_TYPES = {
+    "on_message": "Message",
+    "on_cfp": "CFP",
+    "on_propose": "Propose",
+    "on_accept": "Accept",
+    "on_decline": "Decline",
+    "on_search_result": "SearchResult",
+    "on_search_update": "SearchUpdate",
+    "on_oef_error": "OEFError",
+    "on_dialogue_error": "DialogueError",
+}
+
+
+class Histogram:
+    """
+    A histogram of observed values, with cumulative buckets as in Prometheus.
+
+    Examples:
+        >>> h = Histogram(buckets=(0.1, 1.0))
+        >>> for value in [0.05, 0.5, 2.0]:
+        ...     h.observe(value)
+        >>> h.cumulative_counts()
+        [1, 2, 3]
+        >>> h.count, h.sum
+        (3, 2.55)
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize a histogram.
+
+        :param buckets: the sorted upper bounds of the buckets. The bucket ``+Inf`` is added.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add an observed value.
+
+        :param value: the value.
+        :return: ``None``
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> List[int]:
+        """
+        Get the number of values in every bucket, including the values of the previous buckets.
+
+        :return: the cumulative counts, the last one being for ``+Inf``.
+        """
+        result, total = [], 0
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class AgentMetrics:
+    """
+    The metrics of an agent, updated by its proxy, its handler loop and its dialogues:
+
+    * the messages and the bytes sent and received, by type. The type of a message sent is the name of its class in
+      :mod:`oef.messages` (e.g. ``"CFP"`` or ``"SearchServices"``), or of the Protobuf message of the handshake
+      with the OEF Node (``"ID"`` and ``"Answer"``). The type of a message received is the type of the message
+      delivered to its handler, e.g. ``"CFP"`` for ``on_cfp`` or ``"SearchResult"`` for ``on_search_result``.
+      The local proxy does not serialize the messages, so it counts no bytes;
+    * the latency of the handlers, by handler;
+    * the round-trip time of the searches, from the request to the call of ``on_search_result``;
+    * the messages routed by a :class:`~oef.dialogue.DialogueAgent`, to an open dialogue or to a new one;
+    * some gauges computed when the metrics are exported, e.g. the depth of the queue of the handlers.
+    """
+
+    def __init__(self, public_key: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the metrics of an agent.
+
+        :param public_key: the public key of the agent.
+        :param buckets: the buckets of the histograms.
+        """
+        self.public_key = public_key
+        self.buckets = buckets
+        self.messages_sent = defaultdict(int)      # type: Dict[str, int]
+        self.bytes_sent = defaultdict(int)         # type: Dict[str, int]
+        self.messages_received = defaultdict(int)  # type: Dict[str, int]
+        self.bytes_received = defaultdict(int)     # type: Dict[str, int]
+        self.dialogue_messages = defaultdict(int)  # type: Dict[str, int]
+        self.handler_latency = {}  # type: Dict[str, Histogram]
+        self.search_round_trip = Histogram(buckets)
+        self.gauges = {}  # type: Dict[str, Callable[[], float]]
+        self._pending_searches = OrderedDict()  # type: Dict[int, float]
+
+    def message_sent(self, message_type: str, nbytes: int, count: int = 1) -> None:
+        """
+        Count some messages sent.
+
+        :param message_type: the type of the messages, e.g. ``"Message"`` or ``"SearchServices"``.
+        :param nbytes: the total size of the messages, in bytes.
+        :param count: the number of messages.
+        :return: ``None``
+        """
+        self.messages_sent[message_type] += count
+        self.bytes_sent[message_type] += nbytes
+
+    def message_received(self, handler_name: str, nbytes: int) -> None:
+        """
+        Count a message received, by the type of the message delivered to its handler.
+
+        :param handler_name: the name of the handler, e.g. ``"on_message"`` or ``"on_search_result"``.
+        :param nbytes: the size of the message, in bytes.
+        :return: ``None``
+        """
+        message_type = _RECEIVED_MESSAGE_TYPES.get(handler_name, handler_name)
+        self.messages_received[message_type] += 1
+        self.bytes_received[message_type] += nbytes
+
+    def search_sent(self, search_id: int) -> None:
+        """
+        Start measuring the round-trip time of a search. At most ``MAX_PENDING_SEARCHES`` searches are measured
+        at once, so that the searches that never get a result (e.g. because of an error) are eventually dropped.
+
+        :param search_id: the identifier of the search.
+        :return: ``None``
+        """
+        self._pending_searches.pop(search_id, None)
+        self._pending_searches[search_id] = time.perf_counter()
+        if len(self._pending_searches) > MAX_PENDING_SEARCHES:
+            self._pending_searches.popitem(last=False)
+
+    def dialogue_routed(self, dialogue: str) -> None:
+        """
+        Count a message routed by a :class:`~oef.dialogue.DialogueAgent`.
+
+        :param dialogue: ``"open"`` if the message belongs to an open dialogue, ``"new"`` otherwise.
+        :return: ``None``
+        """
+        self.dialogue_messages[dialogue] += 1
+
+    def timed(self, handler_name: str, handler: Callable, args: tuple) -> Callable:
+        """
+        Wrap a handler, so that the latency of its call is measured. The latency of a coroutine handler
+        is measured until the coroutine completes. A search result also completes the round trip of its search.
+
+        :param handler_name: the name of the handler.
+        :param handler: the handler.
+        :param args: the arguments of the call.
+        :return: the wrapped handler.
+        """
+        if handler_name == "on_search_result":
+            start = self._pending_searches.pop(args[0], None)
+            if start is not None:
+                self.search_round_trip.observe(time.perf_counter() - start)
+        histogram = self.handler_latency.get(handler_name)
+        if histogram is None:
+            histogram = self.handler_latency[handler_name] = Histogram(self.buckets)
+
+        def timed_handler(*handler_args):
+            start = time.perf_counter()
+            result = handler(*handler_args)
+            if asyncio.iscoroutine(result):
+                return _timed_coroutine(result, histogram, start)
+            histogram.observe(time.perf_counter() - start)
+            return result
+        # the scheduler unwraps the handler, e.g. to discard a cancelled call of an OffloadedHandler.
+        timed_handler.__wrapped__ = handler
+        return timed_handler
+
+
+async def _timed_coroutine(coroutine, histogram: Histogram, start: float):
+    """Run the coroutine of a handler, and observe its latency."""
+    try:
+        return await coroutine
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def _escape(value: str) -> str:
+    """Escape the value of a label."""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: List[Tuple[str, str]]) -> str:
+    return "{" + ",".join("{}=\"{}\"".format(name, _escape(str(value))) for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    The registry of the metrics of many agents, that exports them in the Prometheus text format.
+    Every sample is labelled with the public key of its agent.
+    """
+
+    _COUNTERS = [
+        ("oef_messages_sent_total", "messages_sent", "type", "The messages sent to the OEF Node."),
+        ("oef_sent_bytes_total", "bytes_sent", "type", "The bytes sent to the OEF Node."),
+        ("oef_messages_received_total", "messages_received", "type", "The messages received from the OEF Node."),
+        ("oef_received_bytes_total", "bytes_received", "type", "The bytes received from the OEF Node."),
+        ("oef_dialogue_messages_total", "dialogue_messages", "dialogue",
+         "The messages routed by a DialogueAgent, to an open dialogue or to a new one."),
+    ]
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize the registry.
+
+        :param buckets: the buckets of the histograms.
+        """
+        self.buckets = buckets
+        self.agents = {}  # type: Dict[str, AgentMetrics]
+
+    def agent_metrics(self, public_key: str) -> AgentMetrics:
+        """
+        Get the metrics of an agent, creating them if needed.
+
+        :param public_key: the public key of the agent.
+        :return: the metrics of the agent.
+        """
+        metrics = self.agents.get(public_key)
+        if metrics is None:
+            metrics = self.agents[public_key] = AgentMetrics(public_key, self.buckets)
+        return metrics
+
+    def render(self) -> str:
+        """
+        Export the metrics of all the agents.
+
+        :return: the metrics, in the Prometheus text format.
+        """
+        lines = []
+        agents = [self.agents[public_key] for public_key in sorted(self.agents)]
+        for name, attribute, label, help_text in self._COUNTERS:
+            lines += ["# HELP {} {}".format(name, help_text), "# TYPE {} counter".format(name)]
+            for metrics in agents:
+                for key, value in sorted(getattr(metrics, attribute).items()):
+                    lines.append("{}{} {}".format(name, _labels([("agent", metrics.public_key), (label, key)]), value))
+
+        self._render_histograms(lines, "oef_handler_latency_seconds", "The latency of the handlers.",
+                                [([("agent", m.public_key), ("handler", handler)], histogram)
+                                 for m in agents for handler, histogram in sorted(m.handler_latency.items())])
+        self._render_histograms(lines, "oef_search_round_trip_seconds",
+                                "The time from a search request to the call of on_search_result.",
+                                [([("agent", m.public_key)], m.search_round_trip) for m in agents])
+
+        gauge_names = sorted({name for metrics in agents for name in metrics.gauges})
+        for name in gauge_names:
+            lines += ["# TYPE {} gauge".format(name)]
+            for metrics in agents:
+                gauge = metrics.gauges.get(name)
+                if gauge is not None:
+                    lines.append("{}{} {}".format(name, _labels([("agent", metrics.public_key)]),
+                                                  _format_value(gauge())))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histograms(lines: List[str], name: str, help_text: str,
+                           histograms: List[Tuple[List[Tuple[str, str]], Histogram]]) -> None:
+        lines += ["# HELP {} {}".format(name, help_text), "# TYPE {} histogram".format(name)]
+        for labels, histogram in histograms:
+            bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.cumulative_counts()):
+                lines.append("{}_bucket{} {}".format(name, _labels(labels + [("le", bound)]), count))
+            lines.append("{}_sum{} {}".format(name, _labels(labels), repr(histogram.sum)))
+            lines.append("{}_count{} {}".format(name, _labels(labels), histogram.count))
+
+    def write_text_file(self, path: str) -> None:
+        """
+        Write the metrics in a file, e.g. for the textfile collector of the Prometheus node exporter.
+        The file is replaced atomically, so it is never read half-written.
+
+        :param path: the path of the file.
+        :return: ``None``
+        """
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    async def start_http_server(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """
+        Serve the metrics over HTTP, in the current event loop: every request gets the current metrics.
+
+        :param host: the address where the server listens. By default, only the loopback interface.
+        :param port: the port where the server listens. If ``0``, a free port is chosen.
+        :return: the server. The port is in ``server.sockets[0].getsockname()[1]``.
+        """
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                # the request is not parsed: every path returns the metrics.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                body = self.render().encode("utf-8")
+                writer.write("HTTP/1.1 200 OK\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+                             .format(CONTENT_TYPE, len(body)).encode("ascii") + body)
+                await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(handle, host, port)
+
+
+def instrument(agent, registry: MetricsRegistry) -> AgentMetrics:
+    """
+    Enable the metrics of an agent (e.g. an :class:`~oef.agents.Agent` or a :class:`~oef.dialogue.DialogueAgent`).
+
+    :param agent: the agent.
+    :param registry: the registry where the metrics are exported.
+    :return: the metrics of the agent.
+    """
+    proxy = agent._oef_proxy
+    metrics = registry.agent_metrics(agent.public_key)
+    metrics.gauges["oef_handler_queue_depth"] = lambda: len(proxy._scheduler) if proxy._scheduler is not None else 0
+    if hasattr(agent, "dialogues"):
+        metrics.gauges["oef_open_dialogues"] = lambda: len(agent.dialogues)
+    proxy.metrics = metrics
+    return metrics
+
+
+def uninstrument(agent) -> None:
+    """
+    Disable the metrics of an agent. The metrics collected so far are still exported by the registry.
+
+    :param agent: the agent.
+    :return: ``None``
+    """
+    agent._oef_proxy.metrics = None
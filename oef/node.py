@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.node
+~~~~~~~~
+
+This module contains a pure-Python implementation of an OEF Node, that speaks the same protocol
+of the OEF Node over TCP, so it can be used by :class:`~oef.proxy.OEFNetworkProxy`
+(e.g. for tests or load tests on a single machine, without building the OEF Node).
+
+Usage:
+
+    python -m oef.node [--host HOST] [--port PORT]
+
+"""
+
+import argparse
+import asyncio
+import binascii
+import logging
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+import oef.agent_pb2 as agent_pb2
+from oef.directory import Directory, SearchCache
+from oef.framing import FrameReader, FrameWriter
+from oef.messages import OEFErrorOperation
+from oef.proxy import DEFAULT_OEF_NODE_PORT, _BaseProtocol, _MIN_READ_SIZE
+from oef.query import Query
+from oef.schema import Description
+
+logger = logging.getLogger(__name__)
+
+
+class _AgentConnection(_BaseProtocol):
+    """
+    The asyncio protocol of the connection of an agent to a :class:`~oef.node.OEFNode`.
+
+    The first frames are the handshake (ID, then Answer); after that, every frame is an ``Envelope``,
+    handled by the node in the callback that received it.
+    """
+
+    def __init__(self, node: "OEFNode") -> None:
+        """
+        Initialize the protocol.
+
+        :param node: the node that accepted the connection.
+        """
+        self.node = node
+        self.public_key = None  # type: Optional[str]
+        self.transport = None  # type: Optional[asyncio.Transport]
+        self.connected = False
+
+        self._frame_reader = FrameReader()
+        self._frame_writer = None  # type: Optional[FrameWriter]
+        self._phrase = None  # type: Optional[str]
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self._frame_writer = FrameWriter(transport, self.node.loop)
+        self.node._open_connections.add(self)
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.node._open_connections.discard(self)
+        if self.connected:
+            self.connected = False
+            self.node._disconnect(self.public_key)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._frame_reader.get_buffer(max(sizehint, _MIN_READ_SIZE))
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._frame_reader.buffer_updated(nbytes)
+        self._process_frames()
+
+    def data_received(self, data: bytes) -> None:
+        self._frame_reader.feed(data)
+        self._process_frames()
+
+    def send(self, data: bytes) -> None:
+        """
+        Send a serialized message to the agent.
+
+        :param data: the serialized message.
+        :return: ``None``
+        """
+        self._frame_writer.write(data)
+
+    def _process_frames(self) -> None:
+        """Handle all the complete frames in the receive buffer."""
+        for frame in self._frame_reader.frames():
+            if self.transport.is_closing():
+                return
+            try:
+                if self.connected:
+                    envelope = agent_pb2.Envelope()
+                    envelope.ParseFromString(frame)
+                    self.node._handle_envelope(self, envelope)
+                elif self._phrase is None:
+                    self._on_id(frame)
+                else:
+                    self._on_answer(frame)
+            except Exception:
+                logger.exception("OEF Node: error while handling a message from {}.".format(self.public_key))
+                self.transport.close()
+
+    def _on_id(self, frame: memoryview) -> None:
+        """Step 1 of the handshake: the agent sends its public key, the node answers with a phrase."""
+        pb_public_key = agent_pb2.Agent.Server.ID()
+        pb_public_key.ParseFromString(frame)
+        self.public_key = pb_public_key.public_key
+
+        pb_phrase = agent_pb2.Server.Phrase()
+        if self.public_key in self.node._connections:
+            logger.warning("OEF Node: public key {} already connected.".format(self.public_key))
+            pb_phrase.failure.SetInParent()
+            self.send(pb_phrase.SerializeToString())
+            self._frame_writer.flush()
+            self.transport.close()
+            return
+        self._phrase = binascii.hexlify(os.urandom(16)).decode()
+        pb_phrase.phrase = self._phrase
+        self.send(pb_phrase.SerializeToString())
+
+    def _on_answer(self, frame: memoryview) -> None:
+        """Step 3 of the handshake: the agent sends the reversed phrase, the node answers whether it is connected."""
+        pb_answer = agent_pb2.Agent.Server.Answer()
+        pb_answer.ParseFromString(frame)
+        status = pb_answer.answer == self._phrase[::-1] and self.public_key not in self.node._connections
+
+        pb_status = agent_pb2.Server.Connected()
+        pb_status.status = status
+        self.send(pb_status.SerializeToString())
+        if status:
+            self.connected = True
+            self.node._connections[self.public_key] = self
+        else:
+            self._frame_writer.flush()
+            self.transport.close()
+
+
+class OEFNode:
+    """
+    An OEF Node, that accepts the connections of the agents over TCP, and serves the same protocol
+    of the OEF Node: the handshake (ID, Phrase, Answer, Connected), then the ``Envelope`` messages from
+    the agents and the ``Server.AgentMessage`` messages to them.
+
+    The descriptions are kept in indexed :class:`~oef.directory.Directory` objects, as in
+    :class:`~oef.proxy.OEFLocalProxy.LocalNode`. The registrations of an agent are removed when it disconnects.
+
+    The node runs in an event loop, e.g.:
+
+    .. code-block:: python
+
+        node = OEFNode(port=3333)
+        await node.start()
+        ...
+        await node.stop()
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_OEF_NODE_PORT,
+                 search_cache_size: int = 1024, backlog: int = 1024,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Initialize an OEF Node.
+
+        :param host: the address where the node listens.
+        :param port: the port where the node listens. If ``0``, a free port is chosen when the node starts.
+        :param search_cache_size: the maximum number of search results cached for each directory
+                                | (see :class:`~oef.directory.SearchCache`). ``0`` disables the caches.
+        :param backlog: the maximum number of pending connections, e.g. when thousands of agents connect at once.
+        :param loop: the event loop where the node runs. If ``None``, the current event loop is used.
+        """
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.agents = dict()                     # type: Dict[str, Description]
+        self.services = defaultdict(lambda: [])  # type: Dict[str, List[Description]]
+        self._agent_directory = Directory(cache=SearchCache(search_cache_size) if search_cache_size > 0 else None)
+        self._service_directory = Directory(cache=SearchCache(search_cache_size) if search_cache_size > 0 else None)
+
+        self._server = None  # type: Optional[asyncio.AbstractServer]
+        self._connections = {}  # type: Dict[str, _AgentConnection]
+        self._open_connections = set()  # type: Set[_AgentConnection]
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def connected_agents(self) -> List[str]:
+        """
+        Get the public keys of the agents connected to the node.
+
+        :return: the sorted list of the public keys.
+        """
+        return sorted(self._connections)
+
+    async def start(self) -> None:
+        """
+        Start listening for the connections of the agents.
+
+        :return: ``None``
+        """
+        self._server = await self.loop.create_server(lambda: _AgentConnection(self), self.host, self.port,
+                                                     backlog=self.backlog)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.debug("OEF Node: listening on {}:{}".format(self.host, self.port))
+
+    async def stop(self) -> None:
+        """
+        Stop listening, and close the connections of the agents.
+
+        :return: ``None``
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for connection in list(self._open_connections):
+            connection.transport.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    def _disconnect(self, public_key: str) -> None:
+        """
+        Remove a disconnected agent, and all its registrations.
+
+        :param public_key: the public key of the agent.
+        :return: ``None``
+        """
+        self._connections.pop(public_key, None)
+        if self.agents.pop(public_key, None) is not None:
+            self._agent_directory.remove_key(public_key)
+        for description in self.services.pop(public_key, []):
+            self._service_directory.remove(public_key, description)
+
+    def _handle_envelope(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """
+        Handle a message sent by an agent, with the handler of its case in ``_ENVELOPE_HANDLERS``.
+
+        :param connection: the connection of the agent.
+        :param envelope: the message.
+        :return: ``None``
+        """
+        case = envelope.WhichOneof("payload")
+        handler = self._ENVELOPE_HANDLERS.get(case)
+        if handler is None:
+            logger.warning("OEF Node: envelope not recognized from {}: {}".format(connection.public_key, case))
+            return
+        handler(self, connection, envelope)
+
+    def _forward_message(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle a ``send_message`` envelope."""
+        self._send_agent_message(connection, envelope.msg_id, envelope.send_message)
+
+    def _register_description(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle a ``register_description`` envelope."""
+        public_key = connection.public_key
+        description = Description.from_pb(envelope.register_description.description)
+        self.agents[public_key] = description
+        self._agent_directory.remove_key(public_key)
+        self._agent_directory.add(public_key, description)
+
+    def _unregister_description(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle an ``unregister_description`` envelope."""
+        if self.agents.pop(connection.public_key, None) is None:
+            self._send_oef_error(connection, envelope.msg_id, OEFErrorOperation.UNREGISTER_DESCRIPTION)
+        else:
+            self._agent_directory.remove_key(connection.public_key)
+
+    def _register_service(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle a ``register_service`` envelope."""
+        description = Description.from_pb(envelope.register_service.description)
+        self.services[connection.public_key].append(description)
+        self._service_directory.add(connection.public_key, description)
+
+    def _unregister_service(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle an ``unregister_service`` envelope."""
+        public_key = connection.public_key
+        description = Description.from_pb(envelope.unregister_service.description)
+        if description not in self.services.get(public_key, []):
+            self._send_oef_error(connection, envelope.msg_id, OEFErrorOperation.UNREGISTER_SERVICE)
+            return
+        self.services[public_key].remove(description)
+        self._service_directory.remove(public_key, description)
+        if len(self.services[public_key]) == 0:
+            self.services.pop(public_key)
+
+    def _search_agents(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle a ``search_agents`` envelope."""
+        query = Query.from_pb(envelope.search_agents.query)
+        self._send_search_result(connection, envelope.msg_id, self._agent_directory.search(query))
+
+    def _search_services(self, connection: _AgentConnection, envelope: agent_pb2.Envelope) -> None:
+        """Handle a ``search_services`` envelope."""
+        query = Query.from_pb(envelope.search_services.query)
+        self._send_search_result(connection, envelope.msg_id, self._service_directory.search(query))
+
+    def _send_agent_message(self, connection: _AgentConnection, msg_id: int, agent_msg: agent_pb2.Agent.Message):
+        """
+        Deliver a message to its destination, or send back a ``DialogueError`` if the destination is not connected.
+
+        :param connection: the connection of the sender.
+        :param msg_id: the identifier of the message.
+        :param agent_msg: the message.
+        :return: ``None``
+        """
+        msg = agent_pb2.Server.AgentMessage()
+        msg.answer_id = msg_id
+        destination = self._connections.get(agent_msg.destination)
+        if destination is None:
+            msg.dialogue_error.dialogue_id = agent_msg.dialogue_id
+            msg.dialogue_error.origin = agent_msg.destination
+            connection.send(msg.SerializeToString())
+            return
+
+        msg.content.dialogue_id = agent_msg.dialogue_id
+        msg.content.origin = connection.public_key
+        payload = agent_msg.WhichOneof("payload")
+        if payload == "content":
+            msg.content.content = agent_msg.content
+        elif payload == "fipa":
+            msg.content.fipa.CopyFrom(agent_msg.fipa)
+        destination.send(msg.SerializeToString())
+
+    @staticmethod
+    def _send_oef_error(connection: _AgentConnection, msg_id: int, operation: OEFErrorOperation) -> None:
+        """Send an ``OEFError`` to an agent."""
+        msg = agent_pb2.Server.AgentMessage()
+        msg.answer_id = msg_id
+        msg.oef_error.operation = operation.value
+        connection.send(msg.SerializeToString())
+
+    @staticmethod
+    def _send_search_result(connection: _AgentConnection, search_id: int, agents: List[str]) -> None:
+        """Send a search result to an agent."""
+        msg = agent_pb2.Server.AgentMessage()
+        msg.answer_id = search_id
+        msg.agents.agents.extend(agents)
+        connection.send(msg.SerializeToString())
+
+    """The handlers of the envelopes sent by the agents, keyed on the case of their ``oneof``."""
+    _ENVELOPE_HANDLERS = {
+        "send_message": _forward_message,
+        "register_description": _register_description,
+        "unregister_description": _unregister_description,
+        "register_service": _register_service,
+        "unregister_service": _unregister_service,
+        "search_agents": _search_agents,
+        "search_services": _search_services,
+    }  # type: Dict[str, Callable[[OEFNode, _AgentConnection, agent_pb2.Envelope], None]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a pure-Python OEF Node.")
+    parser.add_argument("--host", default="127.0.0.1", help="the address where the node listens.")
+    parser.add_argument("--port", type=int, default=DEFAULT_OEF_NODE_PORT, help="the port where the node listens.")
+    parser.add_argument("--search-cache-size", type=int, default=1024, help="the size of the search caches.")
+    parser.add_argument("--log-level", default="INFO", help="the logging level.")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    node = OEFNode(args.host, args.port, args.search_cache_size, loop=loop)
+    loop.run_until_complete(node.start())
+    logger.info("OEF Node listening on {}:{}".format(args.host, args.port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(node.stop())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.offload
+~~~~~~~~~~~
+
+This module contains the tools to run the handlers of an agent in an executor (i.e. a pool of threads or processes),
+so that CPU-heavy handlers do not block the event loop.
+
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from typing import Callable, Optional
+
+"""The state of the worker threads that are running an offloaded handler."""
+_worker_state = threading.local()
+
+
+def in_offloaded_handler() -> bool:
+    """
+    Check if the current thread is running an offloaded handler.
+
+    :return: ``True`` if the caller is an offloaded handler, ``False`` otherwise.
+    """
+    return getattr(_worker_state, "active", False)
+
+
+def offload(executor: Optional[Executor] = None, fn: Optional[Callable] = None) -> Callable:
+    """
+    Decorator to run a handler of an :class:`~oef.agents.Agent` in an executor.
+    It is equivalent to call :func:`~oef.agents.Agent.offload_handler` in the constructor of the agent.
+
+    Examples:
+        >>> from oef.agents import Agent
+        >>> class PricingAgent(Agent):
+        ...     @offload()
+        ...     def on_cfp(self, msg_id, dialogue_id, origin, target, query):
+        ...         pass
+        >>> PricingAgent.on_cfp.offload
+        (None, None)
+
+    :param executor: the executor. If ``None``, the default executor of the event loop is used.
+    :param fn: if not ``None``, only ``fn`` runs in the executor, with the arguments of the handler,
+             | and the handler is then called in the event loop with the result as an additional last argument.
+             | Use it with a ``ProcessPoolExecutor``, since the agent cannot be sent to another process.
+    :return: the decorator.
+    """
+    def decorator(handler: Callable) -> Callable:
+        handler.offload = (executor, fn)
+        return handler
+    return decorator
+
+
+class HandlerStats:
+    """The statistics of the calls of an offloaded handler."""
+
+    def __init__(self) -> None:
+        self.pending = 0            # the calls submitted and not completed yet, also the ones waiting to start.
+        self.completed = 0          # the calls completed, successfully or not. The cancelled calls are not counted.
+        self.failed = 0             # the calls that raised an exception.
+        self.total_latency = 0.0    # the sum of the latencies of the completed calls, in seconds.
+        self.max_latency = 0.0      # the maximum latency of the completed calls, in seconds.
+
+    @property
+    def mean_latency(self) -> float:
+        """
+        The mean latency of the completed calls, from the submission to the completion, in seconds.
+        It includes the time the calls waited for the previous messages of their dialogue.
+        """
+        return self.total_latency / self.completed if self.completed else 0.0
+
+    def __repr__(self):
+        return "HandlerStats(pending={}, completed={}, failed={}, mean_latency={:.6f}, max_latency={:.6f})"\
+            .format(self.pending, self.completed, self.failed, self.mean_latency, self.max_latency)
+
+
+class OffloadedHandler:
+    """
+    A handler that runs in an executor. Every call returns a coroutine, that completes when the handler has been run,
+    so the calls are scheduled by :class:`~oef.scheduler.HandlerScheduler` like any other coroutine handler.
+
+    The proxy submits the calls with :func:`~oef.offload.OffloadedHandler.submit` when they are scheduled,
+    so the statistics also count the calls that wait in the scheduler behind the other calls of their dialogue.
+    """
+
+    def __init__(self, handler: Callable, executor: Optional[Executor] = None, fn: Optional[Callable] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Initialize the offloaded handler.
+
+        :param handler: the handler.
+        :param executor: the executor. If ``None``, the default executor of the event loop is used.
+        :param fn: if not ``None``, the function to run in the executor instead of the handler. See :func:`offload`.
+        :param loop: the event loop. If ``None``, the current event loop is used.
+        """
+        self.handler = handler
+        self.executor = executor
+        self.fn = fn
+        self.stats = HandlerStats()
+        self._loop = loop if loop is not None else asyncio.get_event_loop()
+
+    def __call__(self, *args):
+        return self.submit()(*args)
+
+    def submit(self) -> "_OffloadedCall":
+        """
+        Submit a call: it is pending from now, until it is complete or discarded.
+
+        :return: the call, to be called with the arguments of the handler when it starts.
+        """
+        return _OffloadedCall(self)
+
+    async def _run(self, args: tuple, call: "_OffloadedCall"):
+        """Run the handler in the executor, and update the statistics."""
+        cancelled = False
+        try:
+            if self.fn is None:
+                return await self._loop.run_in_executor(self.executor, _run_in_worker, self.handler, args)
+            result = await self._loop.run_in_executor(self.executor, self.fn, *args)
+            handler_result = self.handler(*args, result)
+            if asyncio.iscoroutine(handler_result):
+                handler_result = await handler_result
+            return handler_result
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception:
+            self.stats.failed += 1
+            raise
+        finally:
+            if cancelled:
+                call.discard()
+            else:
+                call.complete()
+
+
+class _OffloadedCall:
+    """A call of an :class:`~oef.offload.OffloadedHandler`, from its submission to its completion."""
+
+    __slots__ = ("handler", "start", "done")
+
+    def __init__(self, handler: OffloadedHandler) -> None:
+        self.handler = handler
+        self.start = time.perf_counter()
+        self.done = False
+        handler.stats.pending += 1
+
+    def __call__(self, *args):
+        return self.handler._run(args, self)
+
+    def complete(self) -> None:
+        """Count the call as completed, with its latency."""
+        if self._finish():
+            stats, latency = self.handler.stats, time.perf_counter() - self.start
+            stats.completed += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+
+    def discard(self) -> None:
+        """Forget the call, that has been cancelled before it completed (e.g. when the agent is stopped)."""
+        self._finish()
+
+    def _finish(self) -> bool:
+        if self.done:
+            return False
+        self.done = True
+        self.handler.stats.pending -= 1
+        return True
+
+
+def _run_in_worker(handler: Callable, args: tuple):
+    """Run a handler in a worker thread, marking the thread so that the messages sent are passed to the event loop."""
+    _worker_state.active = True
+    try:
+        return handler(*args)
+    finally:
+        _worker_state.active = False
@@ -30,16 +30,18 @@ This module defines the proxies classes used by agents to interact with an OEF N
 
 import asyncio
 import logging
-import struct
-from collections import defaultdict
-from typing import Optional, Awaitable, Tuple, List, Dict
+from collections import defaultdict, deque
+from typing import Optional, Awaitable, Tuple, List, Dict, Callable, Union
 
 import oef.agent_pb2 as agent_pb2
-from oef.core import OEFProxy
+from oef.core import OEFProxy, AgentInterface, HANDLER_CALL
+from oef.directory import Directory, SearchCache, Subscriptions, SUBSCRIPTION_KEY
+from oef.framing import FrameReader, FrameWriter, DEFAULT_BUFFER_SIZE
 from oef.messages import Message, CFP_TYPES, PROPOSE_TYPES, CFP, Propose, Accept, Decline, BaseMessage, \
     AgentMessage, RegisterDescription, RegisterService, UnregisterDescription, \
-    UnregisterService, SearchAgents, SearchServices
+    UnregisterService, SearchAgents, SearchServices, Multicast, DESTINATIONS
 from oef.query import Query
+from oef.scheduler import HandlerScheduler
 from oef.schema import Description
 
 logger = logging.getLogger(__name__)
@@ -54,6 +56,13 @@ class OEFConnectionError(ConnectionError):
     """
 
 
+class OEFNotSupportedError(Exception):
+    """
+    This exception is used whenever an agent requests an operation that its proxy does not support,
+    e.g. the subscriptions, that only :class:`~oef.proxy.OEFLocalProxy` supports.
+    """
+
+
 class OEFNetworkProxy(OEFProxy):
     """
     Proxy to the functionality of the OEF. Provides functionality for an agent to:
@@ -65,23 +74,35 @@ class OEFNetworkProxy(OEFProxy):
      * Establish a connection with another agent
     """
 
-    def __init__(self, public_key: str, oef_addr: str, port: int = DEFAULT_OEF_NODE_PORT) -> None:
+    def __init__(self, public_key: str, oef_addr: str, port: int = DEFAULT_OEF_NODE_PORT,
+                 write_buffer_high: Optional[int] = None, write_buffer_low: Optional[int] = None) -> None:
         """
         Initialize the proxy to the OEF Node.
 
         :param public_key: the public key used in the protocols.
         :param oef_addr: the IP address of the OEF node.
         :param port: port number for the connection.
+        :param write_buffer_high: the high watermark of the write buffer, in bytes. Above it,
+               | :func:`~oef.proxy.OEFNetworkProxy.flush` waits for the buffer to drain.
+               | If ``None``, the default of the transport is used.
+        :param write_buffer_low: the low watermark of the write buffer, in bytes. Below it,
+               | :func:`~oef.proxy.OEFNetworkProxy.flush` stops waiting. If ``None``, the default of the transport is used.
         """
         super().__init__(public_key)
 
         self.oef_addr = oef_addr
         self.port = port
+        self.write_buffer_high = write_buffer_high
+        self.write_buffer_low = write_buffer_low
 
         # these are setup in _connect_to_server
         self._connection = None
         self._server_reader = None
         self._server_writer = None
+        self._frame_writer = None  # type: Optional[FrameWriter]
+
+        self._frame_reader = FrameReader()
+        self._frames = deque()  # type: deque
 
     def is_connected(self) -> bool:
         """
@@ -98,42 +119,82 @@ class OEFNetworkProxy(OEFProxy):
         :param event_loop: the event loop to use for the connection.
         :return: A stream reader and a stream writer for the connection.
         """
-        return await asyncio.open_connection(self.oef_addr, self.port, loop=event_loop)
+        return await asyncio.open_connection(self.oef_addr, self.port)
 
-    def _send(self, protobuf_msg) -> None:
+    def _send(self, protobuf_msg, message_type: Optional[str] = None) -> None:
         """
         Send a Protobuf message to a previously established connection.
 
         :param protobuf_msg: the message to be sent
+        :param message_type: the type of the message in the metrics, by default the name of its Protobuf class.
         :return: ``None``
         :raises OEFConnectionError: if the connection has not been established yet.
         """
-        if self._server_writer is None:
+        if self._frame_writer is None:
             raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
-        serialized_msg = protobuf_msg.SerializeToString()
-        nbytes = struct.pack("I", len(serialized_msg))
-        self._server_writer.write(nbytes)
-        self._server_writer.write(serialized_msg)
+        data = protobuf_msg.SerializeToString()
+        if self.metrics is not None:
+            self.metrics.message_sent(message_type or type(protobuf_msg).__name__, len(data))
+        self._frame_writer.write(data)
 
-    async def _receive(self):
+    def _send_message(self, msg: BaseMessage) -> None:
         """
-        Receive a Protobuf message.
+        Send a message to the OEF Node, in its envelope.
 
+        :param msg: the message to be sent.
         :return: ``None``
         :raises OEFConnectionError: if the connection has not been established yet.
         """
+        self._send(msg.to_envelope(), type(msg).__name__)
+
+    def _send_multicast(self, multicast: Multicast) -> None:
+        """
+        Send a message to many agents. The envelopes are queued at once, and written together.
+
+        :param multicast: the multicast message.
+        :return: ``None``
+        :raises OEFConnectionError: if the connection has not been established yet.
+        """
+        if self._frame_writer is None:
+            raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
+        envelopes = multicast.serialize()
+        if self.metrics is not None:
+            self.metrics.message_sent(type(multicast.msg).__name__, sum(map(len, envelopes)), len(envelopes))
+        self._frame_writer.writelines(envelopes)
+
+    async def flush(self) -> None:
+        """
+        Write all the messages sent so far, and wait until the write buffer of the connection
+        is below the low watermark.
+
+        :return: ``None``
+        :raises OEFConnectionError: if the connection has not been established yet.
+        """
+        if self._server_writer is None:
+            raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
+        self._frame_writer.flush()
+        await self._server_writer.drain()
+
+    async def _receive(self) -> memoryview:
+        """
+        Receive a Protobuf message.
+
+        All the complete frames already received are parsed in one pass, and returned by the following calls
+        without reading from the connection again.
+
+        :return: the serialized message, as a view over the receive buffer. It is valid until the next call.
+        :raises OEFConnectionError: if the connection has not been established yet, or it has been closed.
+        """
         if self._server_reader is None:
             raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
-        nbytes_packed = await self._server_reader.read(len(struct.pack("I", 0)))
-        logger.debug("received ${0}".format(nbytes_packed))
-        nbytes = struct.unpack("I", nbytes_packed)[0]
-        logger.debug("received unpacked ${0}".format(nbytes))
-        logger.debug("Preparing to receive ${0} bytes ...".format(nbytes))
-        data = b""
-        while len(data) < nbytes:
-            data += await self._server_reader.read(nbytes - len(data))
+        while not self._frames:
+            data = await self._server_reader.read(DEFAULT_BUFFER_SIZE)
+            if not data:
+                raise OEFConnectionError("Connection closed by the OEF Node.")
             logger.debug("Read bytes: {}".format(len(data)))
-        return data
+            self._frame_reader.feed(data)
+            self._frames.extend(self._frame_reader.frames())
+        return self._frames.popleft()
 
     async def connect(self) -> bool:
         if self.is_connected() and not self._server_writer.transport.is_closing():
@@ -142,6 +203,18 @@ class OEFNetworkProxy(OEFProxy):
         event_loop = asyncio.get_event_loop()
         self._connection = await self._connect_to_server(event_loop)
         self._server_reader, self._server_writer = self._connection
+        self._server_writer.transport.set_write_buffer_limits(self.write_buffer_high, self.write_buffer_low)
+        self._frame_writer = FrameWriter(self._server_writer.transport, event_loop)
+        self._frame_reader = FrameReader()
+        self._frames.clear()
+        return await self._handshake()
+
+    async def _handshake(self) -> bool:
+        """
+        Perform the handshake with the OEF Node, over the connection just established.
+
+        :return: True if the OEF Node accepted the connection, False otherwise.
+        """
         # Step 1: Agent --(ID)--> OEFCore
         pb_public_key = agent_pb2.Agent.Server.ID()
         pb_public_key.public_key = self.public_key
@@ -165,56 +238,353 @@ class OEFNetworkProxy(OEFProxy):
 
     def register_agent(self, msg_id: int, agent_description: Description):
         msg = RegisterDescription(msg_id, agent_description)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def register_service(self, msg_id: int, service_description: Description):
         msg = RegisterService(msg_id, service_description)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def unregister_agent(self, msg_id: int):
         msg = UnregisterDescription(msg_id)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def unregister_service(self, msg_id: int, service_description: Description):
         msg = UnregisterService(msg_id, service_description)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def search_agents(self, search_id: int, query: Query) -> None:
         msg = SearchAgents(search_id, query)
-        self._send(msg.to_envelope())
+        if self.metrics is not None:
+            self.metrics.search_sent(search_id)
+        self._send_message(msg)
 
     def search_services(self, search_id: int, query: Query) -> None:
         msg = SearchServices(search_id, query)
-        self._send(msg.to_envelope())
+        if self.metrics is not None:
+            self.metrics.search_sent(search_id)
+        self._send_message(msg)
 
     def send_message(self, msg_id: int, dialogue_id: int, destination: str, msg: bytes) -> None:
         msg = Message(msg_id, dialogue_id, destination, msg)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def send_cfp(self, msg_id: int, dialogue_id: int, destination: str, target: int, query: CFP_TYPES):
         msg = CFP(msg_id, dialogue_id, destination, target, query)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
+
+    def broadcast_message(self, msg_id: int, destinations: DESTINATIONS, msg: bytes) -> None:
+        self._send_multicast(Multicast(Message(msg_id, 0, "", msg), destinations))
+
+    def broadcast_cfp(self, msg_id: int, destinations: DESTINATIONS, target: int, query: CFP_TYPES) -> None:
+        self._send_multicast(Multicast(CFP(msg_id, 0, "", target, query), destinations))
 
     def send_propose(self, msg_id: int, dialogue_id: int, destination: str, target: int, proposals: PROPOSE_TYPES):
         msg = Propose(msg_id, dialogue_id, destination, target, proposals)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def send_accept(self, msg_id: int, dialogue_id: int, destination: str, target: int):
         msg = Accept(msg_id, dialogue_id, destination, target)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     def send_decline(self, msg_id: int, dialogue_id: int, destination: str, target: int):
         msg = Decline(msg_id, dialogue_id, destination, target)
-        self._send(msg.to_envelope())
+        self._send_message(msg)
 
     async def stop(self) -> None:
         """
         Tear down resources associated with this Proxy, i.e. the writing connection with the server.
         """
-        await self._server_writer.drain()
+        await self.flush()
         self._server_writer.close()
         self._server_writer = None
         self._server_reader = None
+        self._frame_writer = None
+        self._connection = None
+
+
+"""The base class of the protocol used by OEFNetworkProtocolProxy. BufferedProtocol is available from Python 3.7."""
+_BaseProtocol = getattr(asyncio, "BufferedProtocol", asyncio.Protocol)
+
+"""The minimum size of the free space offered to the transport at every read, in bytes."""
+_MIN_READ_SIZE = 2 ** 12
+
+
+class _OEFClientProtocol(_BaseProtocol):
+    """
+    The asyncio protocol used by :class:`~oef.proxy.OEFNetworkProtocolProxy`.
+
+    The transport reads straight into a :class:`~oef.framing.FrameReader`, and the frames are handled in the callback
+    that received them: before a dispatcher is set (i.e. during the handshake), they are queued and returned by
+    :func:`~oef.proxy._OEFClientProtocol.receive`; after that, they are parsed and passed to the dispatcher.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Initialize the protocol.
+
+        :param loop: the event loop that runs the protocol.
+        """
+        self._loop = loop
+        self.transport = None  # type: Optional[asyncio.Transport]
+        self.exception = None  # type: Optional[Exception]
+        self.closed = loop.create_future()
+
+        self._frame_reader = FrameReader()
+        self._received = deque()  # type: deque
+        self._receive_waiter = None  # type: Optional[asyncio.Future]
+        self._dispatcher = None  # type: Optional[Callable[[agent_pb2.Server.AgentMessage], None]]
+        self._dispatch_paused = False
+        self._paused = False
+        self._drain_waiter = None  # type: Optional[asyncio.Future]
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if exc is not None and self.exception is None:
+            self.exception = OEFConnectionError("Connection lost: {}".format(exc))
+        if not self.closed.done():
+            self.closed.set_result(None)
+        self._wake_up(self._receive_waiter)
+        self._wake_up(self._drain_waiter)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._frame_reader.get_buffer(max(sizehint, _MIN_READ_SIZE))
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._frame_reader.buffer_updated(nbytes)
+        self._process_frames()
+
+    def data_received(self, data: bytes) -> None:
+        self._frame_reader.feed(data)
+        self._process_frames()
+
+    def pause_writing(self) -> None:
+        self._paused = True
+
+    def resume_writing(self) -> None:
+        self._paused = False
+        self._wake_up(self._drain_waiter)
+
+    def set_dispatcher(self, dispatcher: Optional[Callable[[agent_pb2.Server.AgentMessage], None]]) -> None:
+        """
+        Set the function that handles the messages received from now on.
+        The frames received before, and not consumed by :func:`~oef.proxy._OEFClientProtocol.receive`,
+        are dispatched immediately.
+
+        :param dispatcher: the function that handles a message. If ``None``, the received frames are queued again.
+        :return: ``None``
+        """
+        self._dispatcher = dispatcher
+        self._dispatch_received()
+
+    def pause_dispatch(self) -> None:
+        """
+        Stop dispatching the messages, and stop reading from the transport.
+        The frames already received are queued until :func:`~oef.proxy._OEFClientProtocol.resume_dispatch` is called.
+
+        :return: ``None``
+        """
+        self._dispatch_paused = True
+        self.transport.pause_reading()
+
+    def resume_dispatch(self) -> None:
+        """
+        Dispatch the queued frames, and resume reading from the transport.
+
+        :return: ``None``
+        """
+        self._dispatch_paused = False
+        self._dispatch_received()
+        if not self._dispatch_paused:
+            self.transport.resume_reading()
+
+    async def receive(self) -> bytes:
+        """
+        Wait for the next frame queued by the protocol.
+
+        :return: the payload of the frame.
+        :raises OEFConnectionError: if the connection has been closed.
+        """
+        while not self._received:
+            if self.closed.done():
+                raise self.exception or OEFConnectionError("Connection closed by the OEF Node.")
+            self._receive_waiter = self._loop.create_future()
+            try:
+                await self._receive_waiter
+            finally:
+                self._receive_waiter = None
+        return self._received.popleft()
+
+    async def drain(self) -> None:
+        """
+        Wait until the write buffer of the transport is below the low watermark.
+
+        :return: ``None``
+        """
+        while self._paused and not self.closed.done():
+            self._drain_waiter = self._loop.create_future()
+            try:
+                await self._drain_waiter
+            finally:
+                self._drain_waiter = None
+
+    def _process_frames(self) -> None:
+        """Handle all the complete frames in the receive buffer."""
+        for frame in self._frame_reader.frames():
+            if self.exception is not None:
+                return
+            if self._dispatcher is None or self._dispatch_paused:
+                # the frames are copied, since they are consumed only after the receive buffer has been overwritten.
+                self._received.append(bytes(frame))
+                self._wake_up(self._receive_waiter)
+            else:
+                self._dispatch(frame)
+
+    def _dispatch_received(self) -> None:
+        """Dispatch the queued frames, until the dispatch is paused."""
+        while self._dispatcher is not None and not self._dispatch_paused and self._received \
+                and self.exception is None:
+            self._dispatch(self._received.popleft())
+
+    def _dispatch(self, frame: Union[bytes, memoryview]) -> None:
+        """
+        Parse a frame and pass the message to the dispatcher.
+        If the dispatcher raises an exception, the connection is closed and the exception is stored.
+
+        :param frame: the payload of the frame.
+        :return: ``None``
+        """
+        msg = agent_pb2.Server.AgentMessage()
+        try:
+            msg.ParseFromString(frame)
+            self._dispatcher(msg)
+        except Exception as e:
+            logger.exception("Error while handling a message from the OEF Node.")
+            self.exception = e
+            self.transport.close()
+
+    @staticmethod
+    def _wake_up(waiter: Optional[asyncio.Future]) -> None:
+        """Resolve a waiter, if there is one pending."""
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+class OEFNetworkProtocolProxy(OEFNetworkProxy):
+    """
+    Variant of :class:`~oef.proxy.OEFNetworkProxy` implemented directly on top of an asyncio protocol,
+    without streams.
+
+    The bytes are read by the transport straight into the receive buffer, and the messages are parsed and
+    dispatched to the agent in the same callback, so :func:`~oef.proxy.OEFNetworkProtocolProxy.loop`
+    does not wait on a coroutine for every message.
+    """
+
+    def __init__(self, public_key: str, oef_addr: str, port: int = DEFAULT_OEF_NODE_PORT,
+                 write_buffer_high: Optional[int] = None, write_buffer_low: Optional[int] = None) -> None:
+        """
+        Initialize the proxy to the OEF Node.
+
+        :param public_key: the public key used in the protocols.
+        :param oef_addr: the IP address of the OEF node.
+        :param port: port number for the connection.
+        :param write_buffer_high: the high watermark of the write buffer, in bytes.
+        :param write_buffer_low: the low watermark of the write buffer, in bytes.
+        """
+        super().__init__(public_key, oef_addr, port, write_buffer_high, write_buffer_low)
+        self._transport = None  # type: Optional[asyncio.Transport]
+        self._protocol = None  # type: Optional[_OEFClientProtocol]
+
+    async def _connect_to_server(self, event_loop) -> Awaitable[Tuple[asyncio.Transport, _OEFClientProtocol]]:
+        """
+        Connect to the OEF Node.
+
+        :param event_loop: the event loop to use for the connection.
+        :return: the transport and the protocol of the connection.
+        """
+        return await event_loop.create_connection(lambda: _OEFClientProtocol(event_loop), self.oef_addr, self.port)
+
+    async def flush(self) -> None:
+        if self._protocol is None:
+            raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
+        self._frame_writer.flush()
+        await self._protocol.drain()
+
+    async def _receive(self) -> bytes:
+        """
+        Receive a Protobuf message, before the messages are dispatched by
+        :func:`~oef.proxy.OEFNetworkProtocolProxy.loop`.
+
+        :return: the serialized message.
+        :raises OEFConnectionError: if the connection has not been established yet, or it has been closed.
+        """
+        if self._protocol is None:
+            raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
+        return await self._protocol.receive()
+
+    async def connect(self) -> bool:
+        if self.is_connected() and not self._transport.is_closing():
+            return True
+
+        event_loop = asyncio.get_event_loop()
+        self._connection = await self._connect_to_server(event_loop)
+        self._transport, self._protocol = self._connection
+        self._transport.set_write_buffer_limits(self.write_buffer_high, self.write_buffer_low)
+        self._frame_writer = FrameWriter(self._transport, event_loop)
+        return await self._handshake()
+
+    async def loop(self, agent: AgentInterface) -> None:
+        """
+        Dispatch the messages received from the OEF Node to the proper handler, until the connection is closed.
+
+        :param agent: the implementation of the message handlers specified in AgentInterface.
+        :return: ``None``
+        :raises OEFConnectionError: if the connection has not been established yet, or it has been closed.
+        """
+        if self._protocol is None:
+            raise OEFConnectionError("Connection not established yet. Please use 'connect()'.")
+        protocol = self._protocol
+        self._scheduler = self._new_scheduler(agent)
+
+        def dispatch(msg: agent_pb2.Server.AgentMessage) -> None:
+            self._dispatch(agent, msg)
+            if self._scheduler.full():
+                protocol.pause_dispatch()
+                asyncio.ensure_future(self._resume_dispatch_when_available(protocol, self._scheduler))
+
+        protocol.set_dispatcher(dispatch)
+        try:
+            await asyncio.shield(protocol.closed)
+        except asyncio.CancelledError:
+            logger.debug("Proxy {}: loop cancelled".format(self.public_key))
+            return
+        finally:
+            protocol.set_dispatcher(None)
+            self._scheduler.cancel()
+        raise protocol.exception or OEFConnectionError("Connection closed by the OEF Node.")
+
+    @staticmethod
+    async def _resume_dispatch_when_available(protocol: _OEFClientProtocol, scheduler: HandlerScheduler) -> None:
+        """
+        Wait until the scheduler of the handlers is not full, then resume the dispatch of the messages.
+
+        :param protocol: the protocol whose dispatch has been paused.
+        :param scheduler: the scheduler of the handlers.
+        :return: ``None``
+        """
+        await scheduler.wait_available()
+        protocol.resume_dispatch()
+
+    async def stop(self) -> None:
+        """
+        Tear down resources associated with this Proxy, i.e. the connection with the server.
+        """
+        await self.flush()
+        self._transport.close()
+        self._transport = None
+        self._protocol = None
+        self._frame_writer = None
         self._connection = None
 
 
@@ -226,15 +596,38 @@ class OEFLocalProxy(OEFProxy):
     """
 
     class LocalNode:
-        """A light-weight local implementation of a OEF Node."""
+        """
+        A light-weight local implementation of a OEF Node.
+
+        The node is owned by the thread of its event loop: its methods must be called from that thread
+        (the agents pass the calls of their offloaded handlers to the event loop, see :class:`~oef.agents.Agent`).
+        They never wait, so they need no lock, and they can be called from the coroutines running in the loop.
+
+        By default, the messages are delivered to the agents as the calls of their handlers, instead of
+        serializing and parsing them (see :func:`~oef.messages.AgentMessage.to_handler_call`). The queries and the
+        proposals are copied for every recipient when the message is delivered, except the immutable ones
+        (e.g. :class:`~oef.query.FrozenQuery`, :class:`~oef.schema.FrozenDescription`), that are shared by the sender
+        and all the recipients: use them for the messages sent to many agents. In the wire-faithful mode, the messages
+        are serialized as by an OEF Node.
+        """
 
-        def __init__(self):
+        def __init__(self, search_cache_size: int = 1024, wire_faithful: bool = False):
             """
             Initialize a local (i.e. non-networked) implementation of an OEF Node
+
+            :param search_cache_size: the maximum number of search results cached for each directory
+                                    | (see :class:`~oef.directory.SearchCache`). ``0`` disables the caches.
+            :param wire_faithful: if ``True``, the messages are delivered serialized, as by an OEF Node
+                                | (e.g. to test the decoding of the messages).
             """
+            self.wire_faithful = wire_faithful
             self.agents = dict()                     # type: Dict[str, Description]
             self.services = defaultdict(lambda: [])  # type: Dict[str, List[Description]]
-            self._lock = asyncio.Lock()
+            self.agent_search_cache = SearchCache(search_cache_size) if search_cache_size > 0 else None
+            self.service_search_cache = SearchCache(search_cache_size) if search_cache_size > 0 else None
+            self._agent_directory = Directory(cache=self.agent_search_cache)
+            self._service_directory = Directory(cache=self.service_search_cache)
+            self._service_subscriptions = Subscriptions()
             self._task = None
 
             self._read_queue = asyncio.Queue()  # type: asyncio.Queue
@@ -276,8 +669,11 @@ class OEFLocalProxy(OEFProxy):
                     break
 
                 public_key, msg = data
-                assert isinstance(msg, AgentMessage)
-                self._send_agent_message(public_key, msg)
+                if isinstance(msg, Multicast):
+                    self._send_multicast(public_key, msg)
+                else:
+                    assert isinstance(msg, AgentMessage)
+                    self._send_agent_message(public_key, msg)
 
         async def run(self) -> None:
             """
@@ -306,9 +702,9 @@ class OEFLocalProxy(OEFProxy):
             :param agent_description: the description of the agent to be registered.
             :return: ``None``
             """
-            self.loop.run_until_complete(self._lock.acquire())
             self.agents[public_key] = agent_description
-            self._lock.release()
+            self._agent_directory.remove_key(public_key)
+            self._agent_directory.add(public_key, agent_description)
 
         def register_service(self, public_key: str, service_description: Description):
             """
@@ -318,9 +714,27 @@ class OEFLocalProxy(OEFProxy):
             :param service_description: the description of the service agent to be registered.
             :return: ``None``
             """
-            self.loop.run_until_complete(self._lock.acquire())
             self.services[public_key].append(service_description)
-            self._lock.release()
+            self._service_directory.add(public_key, service_description)
+            for subscription_key in self._service_subscriptions.add(public_key, service_description):
+                self._send_search_update(subscription_key, [public_key], [])
+
+        def register_services(self, public_key: str, service_descriptions: List[Description]) -> None:
+            """
+            Register many services of an agent at once. The Service Directory indexes them in bulk,
+            and every subscription receives at most one update.
+
+            :param public_key: the public key of the service agent to be registered.
+            :param service_descriptions: the descriptions of the services to be registered.
+            :return: ``None``
+            """
+            if len(service_descriptions) == 0:
+                return
+            entries = [(public_key, description) for description in service_descriptions]
+            self.services[public_key].extend(service_descriptions)
+            self._service_directory.add_all(entries)
+            for subscription_key, added in self._service_subscriptions.add_all(entries).items():
+                self._send_search_update(subscription_key, added, [])
 
         def unregister_agent(self, public_key: str) -> None:
             """
@@ -329,9 +743,8 @@ class OEFLocalProxy(OEFProxy):
             :param public_key: the public key of the agent to be unregistered.
             :return: ``None``
             """
-            self.loop.run_until_complete(self._lock.acquire())
             self.agents.pop(public_key)
-            self._lock.release()
+            self._agent_directory.remove_key(public_key)
 
         def unregister_service(self, public_key: str, service_description: Description) -> None:
             """
@@ -341,48 +754,75 @@ class OEFLocalProxy(OEFProxy):
             :param service_description: the description of the service agent to be unregistered.
             :return: ``None``
             """
-            self.loop.run_until_complete(self._lock.acquire())
             self.services[public_key].remove(service_description)
+            self._service_directory.remove(public_key, service_description)
             if len(self.services[public_key]) == 0:
                 self.services.pop(public_key)
-            self._lock.release()
+            for subscription_key in self._service_subscriptions.remove(public_key, service_description):
+                self._send_search_update(subscription_key, [], [public_key])
 
         def search_agents(self, public_key: str, search_id: int, query: Query) -> None:
             """
             Search the agents in the local Agent Directory, and send back the result.
-            The provided query will be checked with every instance of the Agent Directory.
+            The provided query is checked only with the candidates selected by the indexes of the Agent Directory,
+            and the result is cached until a matching agent is registered or unregistered.
 
             :param public_key: the source of the search request.
             :param search_id: the search identifier associated with the search request.
             :param query: the query that constitutes the search.
             :return: ``None``
             """
-
-            result = []
-            for agent_public_key, description in self.agents.items():
-                if query.check(description):
-                    result.append(agent_public_key)
-
-            self._send_search_result(public_key, search_id, sorted(set(result)))
+            self._send_search_result(public_key, search_id, self._search("agents", query))
 
         def search_services(self, public_key: str, search_id: int, query: Query) -> None:
             """
             Search the agents in the local Service Directory, and send back the result.
-            The provided query will be checked with every instance of the Agent Directory.
+            The provided query is checked only with the candidates selected by the indexes of the Service Directory,
+            and the result is cached until a matching service is registered or unregistered.
 
             :param public_key: the source of the search request.
             :param search_id: the search identifier associated with the search request.
             :param query: the query that constitutes the search.
             :return: ``None``
             """
+            self._send_search_result(public_key, search_id, self._search("services", query))
 
-            result = []
-            for agent_public_key, descriptions in self.services.items():
-                for description in descriptions:
-                    if query.check(description):
-                        result.append(agent_public_key)
+        def _search(self, directory: str, query: Query) -> List[str]:
+            """
+            Search a local directory, through its :class:`~oef.directory.SearchCache`.
 
-            self._send_search_result(public_key, search_id, sorted(set(result)))
+            :param directory: the directory to search, ``"agents"`` or ``"services"``.
+            :param query: the query that constitutes the search.
+            :return: the sorted public keys of the agents that satisfy the query.
+            """
+            return (self._agent_directory if directory == "agents" else self._service_directory).search(query)
+
+        def subscribe_services(self, public_key: str, subscription_id: int, query: Query) -> None:
+            """
+            Subscribe to the services in the local Service Directory that satisfy a query,
+            and send back the current result. Then, every registered or unregistered service is matched
+            against the subscriptions (see :class:`~oef.directory.Subscriptions`), and only the changes
+            of their results are sent.
+
+            :param public_key: the public key of the subscriber.
+            :param subscription_id: the identifier of the subscription.
+            :param query: the query.
+            :return: ``None``
+            """
+            subscription_key = (public_key, subscription_id)
+            agents = self._service_subscriptions.subscribe(subscription_key, query, self._service_directory)
+            self._send_search_update(subscription_key, agents, [])
+
+        def unsubscribe(self, public_key: str, subscription_id: int) -> None:
+            """
+            Cancel a subscription.
+
+            :param public_key: the public key of the subscriber.
+            :param subscription_id: the identifier of the subscription.
+            :return: ``None``
+            :raises ValueError: if there is no such subscription.
+            """
+            self._service_subscriptions.unsubscribe((public_key, subscription_id))
 
         def _send_agent_message(self, origin: str, msg: AgentMessage) -> None:
             """
@@ -392,6 +832,10 @@ class OEFLocalProxy(OEFProxy):
             :param msg: the message.
             :return: ``None``
             """
+            if not self.wire_faithful:
+                self._queues[msg.destination].put_nowait(msg.to_handler_call(origin))
+                return
+
             e = msg.to_envelope()
             destination = e.send_message.destination
 
@@ -399,28 +843,84 @@ class OEFLocalProxy(OEFProxy):
             new_msg.answer_id = msg.msg_id
             new_msg.content.origin = origin
             new_msg.content.dialogue_id = e.send_message.dialogue_id
+            self._copy_payload(e.send_message, new_msg.content)
+
+            self._queues[destination].put_nowait(new_msg.SerializeToString())
+
+        def _send_multicast(self, origin: str, multicast: Multicast) -> None:
+            """
+            Send an agent message to many agents. In the wire-faithful mode, the payload is serialized only once,
+            and only the dialogue id is serialized for every destination.
 
-            payload = e.send_message.WhichOneof("payload")
+            :param origin: the public key of the sender agent.
+            :param multicast: the multicast message.
+            :return: ``None``
+            """
+            if not self.wire_faithful:
+                for msg in multicast.messages():
+                    self._queues[msg.destination].put_nowait(msg.to_handler_call(origin))
+                return
+
+            shared_msg = agent_pb2.Server.AgentMessage()
+            shared_msg.answer_id = multicast.msg.msg_id
+            shared_msg.content.origin = origin
+            self._copy_payload(multicast.payload(), shared_msg.content)
+            shared_data = shared_msg.SerializePartialToString()
+
+            header = agent_pb2.Server.AgentMessage()
+            content = header.content
+            for dialogue_id, destination in multicast.destinations:
+                content.dialogue_id = dialogue_id
+                self._queues[destination].put_nowait(header.SerializePartialToString() + shared_data)
+
+        @staticmethod
+        def _copy_payload(agent_msg: agent_pb2.Agent.Message, content: agent_pb2.Server.AgentMessage.Content) -> None:
+            """
+            Copy the payload of a message sent by an agent into the message delivered to the recipient.
+
+            :param agent_msg: the message sent.
+            :param content: the content of the message to deliver.
+            :return: ``None``
+            """
+            payload = agent_msg.WhichOneof("payload")
             if payload == "content":
-                new_msg.content.content = e.send_message.content
+                content.content = agent_msg.content
             elif payload == "fipa":
-                new_msg.content.fipa.CopyFrom(e.send_message.fipa)
-
-            self._queues[destination].put_nowait(new_msg.SerializeToString())
+                content.fipa.CopyFrom(agent_msg.fipa)
 
         def _send_search_result(self, public_key: str, search_id: int, agents: List[str]) -> None:
             """
-            Send a search result.
+            Send a search result. The result is delivered at the next iteration of the event loop, as by an OEF Node:
+            otherwise, an agent that searches again in :func:`~oef.core.AgentInterface.on_search_result`
+            would always find its queue non-empty, and never yield to the event loop.
 
             :param public_key: the public key of the agent to whom to send the search result.
             :param search_id: the id of the search request.
             :param agents: the list of public key of the agents/services to be returned.
             :return: ``None``
             """
+            queue = self._queues[public_key]
+            if not self.wire_faithful:
+                self.loop.call_soon(queue.put_nowait, ("on_search_result", (search_id, agents)))
+                return
+
             msg = agent_pb2.Server.AgentMessage()
             msg.answer_id = search_id
             msg.agents.agents.extend(agents)
-            self._queues[public_key].put_nowait(msg.SerializeToString())
+            self.loop.call_soon(queue.put_nowait, msg.SerializeToString())
+
+        def _send_search_update(self, subscription_key: SUBSCRIPTION_KEY, added: List[str], removed: List[str]) -> None:
+            """
+            Send a change of the result of a subscription. There is no message for it in the OEF protocol,
+            so the call of the handler is sent already decoded.
+
+            :param subscription_key: the public key of the subscriber and the identifier of the subscription.
+            :param added: the public keys of the agents that now satisfy the query.
+            :param removed: the public keys of the agents that no longer satisfy the query.
+            :return: ``None``
+            """
+            public_key, subscription_id = subscription_key
+            self._queues[public_key].put_nowait(("on_search_update", (subscription_id, added, removed)))
 
     def __init__(self, public_key: str, local_node: LocalNode):
         """
@@ -437,21 +937,62 @@ class OEFLocalProxy(OEFProxy):
         self._write_queue = None
 
     def register_agent(self, msg_id: int, agent_description: Description) -> None:
+        self._count("RegisterDescription")
         self.local_node.register_agent(self.public_key, agent_description)
 
     def register_service(self, msg_id: int, service_description: Description) -> None:
+        self._count("RegisterService")
         self.local_node.register_service(self.public_key, service_description)
 
+    def register_services(self, msg_id: int, service_descriptions: List[Description]) -> None:
+        self._count("RegisterService", len(service_descriptions))
+        self.local_node.register_services(self.public_key, service_descriptions)
+
     def search_agents(self, search_id: int, query: Query) -> None:
+        if self.metrics is not None:
+            self.metrics.message_sent("SearchAgents", 0)
+            self.metrics.search_sent(search_id)
         self.local_node.search_agents(self.public_key, search_id, query)
 
     def search_services(self, search_id: int, query: Query) -> None:
+        if self.metrics is not None:
+            self.metrics.message_sent("SearchServices", 0)
+            self.metrics.search_sent(search_id)
         self.local_node.search_services(self.public_key, search_id, query)
 
+    def subscribe_services(self, subscription_id: int, query: Query) -> None:
+        """
+        Subscribe to the services that satisfy a query. The agent receives the services that currently satisfy it,
+        then every change of the result (i.e. the agents whose services start or stop satisfying it), with
+        :func:`~oef.core.ConnectionInterface.on_search_update`, until :func:`~oef.proxy.OEFLocalProxy.unsubscribe`
+        is called. Subscribing again with the same identifier replaces the query.
+
+        Only the local proxy supports the subscriptions: the OEF Node protocol does not.
+
+        :param subscription_id: the identifier of the subscription.
+        :param query: the constraint on the matching services.
+        :return: ``None``.
+        """
+        self._count("SubscribeServices")
+        self.local_node.subscribe_services(self.public_key, subscription_id, query)
+
+    def unsubscribe(self, subscription_id: int) -> None:
+        """
+        Cancel a subscription made with :func:`~oef.proxy.OEFLocalProxy.subscribe_services`.
+
+        :param subscription_id: the identifier of the subscription.
+        :return: ``None``.
+        :raises ValueError: if there is no such subscription.
+        """
+        self._count("Unsubscribe")
+        self.local_node.unsubscribe(self.public_key, subscription_id)
+
     def unregister_agent(self, msg_id: int) -> None:
+        self._count("UnregisterDescription")
         self.local_node.unregister_agent(self.public_key)
 
     def unregister_service(self, msg_id: int, service_description: Description) -> None:
+        self._count("UnregisterService")
         self.local_node.unregister_service(self.public_key, service_description)
 
     def send_message(self, msg_id: int, dialogue_id: int, destination: str, msg: bytes):
@@ -462,6 +1003,12 @@ class OEFLocalProxy(OEFProxy):
         msg = CFP(msg_id, dialogue_id, destination, target, query)
         self._send(msg)
 
+    def broadcast_message(self, msg_id: int, destinations: DESTINATIONS, msg: bytes) -> None:
+        self._send(Multicast(Message(msg_id, 0, "", msg), destinations))
+
+    def broadcast_cfp(self, msg_id: int, destinations: DESTINATIONS, target: int, query: CFP_TYPES) -> None:
+        self._send(Multicast(CFP(msg_id, 0, "", target, query), destinations))
+
     def send_propose(self, msg_id: int, dialogue_id: int, destination: str, target: int,
                      proposals: PROPOSE_TYPES) -> None:
         msg = Propose(msg_id, dialogue_id, destination, target, proposals)
@@ -485,13 +1032,30 @@ class OEFLocalProxy(OEFProxy):
         self._write_queue, self._read_queue = self._connection
         return True
 
-    async def _receive(self) -> bytes:
+    async def _receive(self) -> Union[bytes, HANDLER_CALL]:
         data = await self._read_queue.get()
         return data
 
-    def _send(self, msg: BaseMessage) -> None:
+    def _send(self, msg: Union[BaseMessage, Multicast]) -> None:
+        if self.metrics is not None:
+            if isinstance(msg, Multicast):
+                self._count(type(msg.msg).__name__, len(msg.destinations))
+            else:
+                self._count(type(msg).__name__)
         self._write_queue.put_nowait((self.public_key, msg))
 
+    def _count(self, message_type: str, count: int = 1) -> None:
+        """
+        Count some messages sent, if the metrics are enabled. The messages are not serialized,
+        so only their number is counted.
+
+        :param message_type: the type of the messages (see :class:`~oef.metrics.AgentMetrics`).
+        :param count: the number of messages.
+        :return: ``None``
+        """
+        if self.metrics is not None:
+            self.metrics.message_sent(message_type, 0, count)
+
     async def stop(self):
         self._connection = None
         self._read_queue = None
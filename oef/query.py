@@ -18,23 +18,429 @@
 #
 # ------------------------------------------------------------------------------
 
+import copy
+import operator
 from abc import ABC, abstractmethod
-from typing import Union, Tuple, List, Optional, Type
+from collections import OrderedDict
+from typing import Any, Union, Tuple, List, Optional, Type, Callable, Dict
 
 import oef.query_pb2 as query_pb2
-from oef.schema import ATTRIBUTE_TYPES, AttributeSchema, DataModel, ProtobufSerializable, Description, Location
+from oef.schema import ATTRIBUTE_TYPES, AttributeSchema, DataModel, ProtobufSerializable, Description, Location, \
+    CachedSerialization
 
 RANGE_TYPES = Union[Tuple[str, str], Tuple[int, int], Tuple[float, float], Tuple[Location, Location]]
 ORDERED_TYPES = Union[int, str, float]
 SET_TYPES = Union[List[float], List[str], List[bool], List[int], List[Location]]
 Query = None
 
+"""A compiled constraint expression: a function that checks whether a description satisfies it."""
+PREDICATE = Callable[[Description], bool]
 
-class ConstraintExpr(ProtobufSerializable, ABC):
+"""The types whose values can be compared with the ordering operators without raising ``TypeError``."""
+_NUMERIC_TYPES = (int, float, bool)
+
+
+def _always_true(description: Description) -> bool:
+    return True
+
+
+def _always_false(description: Description) -> bool:
+    return False
+
+
+def _is_orderable(*values) -> bool:
+    """Check whether a group of values can be compared with each other without raising ``TypeError``."""
+    return all(type(v) in _NUMERIC_TYPES for v in values) or all(type(v) == str for v in values)
+
+
+def _compile_all(expressions: List["ConstraintExpr"], short_circuit: PREDICATE) -> Tuple[List[PREDICATE], bool]:
+    """
+    Compile a list of constraint expressions that are combined with a short-circuit operator.
+
+    If the cost of every expression is known, the predicates are sorted from the cheapest to the most expensive,
+    and the ones that are constant are folded. Otherwise, some expression may raise an exception,
+    so the order and the number of the evaluations are preserved.
+
+    :param expressions: the constraint expressions.
+    :param short_circuit: the constant predicate that determines the result of the operator
+                        | (e.g. :func:`~oef.query._always_false` for a conjunction).
+    :return: the predicates, and whether the result is ``short_circuit`` regardless of the description.
+    """
+    costs = [e._cost() for e in expressions]
+    predicates = [e._compile() for e in expressions]
+    if any(c is None for c in costs):
+        return predicates, False
+
+    predicates = [p for _, p in sorted(zip(costs, predicates), key=lambda x: x[0])]
+    if short_circuit in predicates:
+        return [], True
+    return [p for p in predicates if p is not _always_true and p is not _always_false], False
+
+
+def _compile_conjunction(expressions: List["ConstraintExpr"]) -> PREDICATE:
+    """Compile a list of constraint expressions interpreted in conjunction."""
+    predicates, is_false = _compile_all(expressions, _always_false)
+    if is_false:
+        return _always_false
+    if len(predicates) == 0:
+        return _always_true
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda description: first(description) and second(description)
+
+    def conjunction(description: Description) -> bool:
+        for predicate in predicates:
+            if not predicate(description):
+                return False
+        return True
+    return conjunction
+
+
+def _compile_disjunction(expressions: List["ConstraintExpr"]) -> PREDICATE:
+    """Compile a list of constraint expressions interpreted in disjunction."""
+    predicates, is_true = _compile_all(expressions, _always_true)
+    if is_true:
+        return _always_true
+    if len(predicates) == 0:
+        return _always_false
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda description: first(description) or second(description)
+
+    def disjunction(description: Description) -> bool:
+        for predicate in predicates:
+            if predicate(description):
+                return True
+        return False
+    return disjunction
+
+
+def _unsatisfiable(attribute_name: str) -> "Constraint":
+    """
+    Get a constraint that no description satisfies, and that is valid for any data model:
+    the values of an empty set have no type, so no attribute value is compared with them.
+    """
+    return Constraint(attribute_name, In([]))
+
+
+def _is_unsatisfiable(expression: "ConstraintExpr") -> bool:
+    """Check whether a constraint expression is a constraint whose type is unknown (e.g. an empty set)."""
+    return type(expression) is Constraint and expression.constraint._get_type() is None
+
+
+def _flatten(expressions: List["ConstraintExpr"], operator: Type["ConstraintExpr"]) -> List["ConstraintExpr"]:
+    """
+    Optimize a list of constraint expressions, and inline the ones that use the same operator (i.e. ``And`` or ``Or``).
+
+    :param expressions: the constraint expressions.
+    :param operator: the type of the expression that combines them.
+    :return: the optimized constraint expressions, in the same order.
+    """
+    result = []
+    for expression in expressions:
+        expression = expression._optimize()
+        if type(expression) is operator:
+            result.extend(expression.constraints)
+        else:
+            result.append(expression)
+    return result
+
+
+def _bound_type(constraint_type: "ConstraintType") -> Optional[Type[ORDERED_TYPES]]:
+    """
+    Get the type of the values of an equality, an ordering relation or a range, if they can be merged into an interval.
+
+    :param constraint_type: the constraint type.
+    :return: the type of the values, or ``None`` if the constraint type is not a bound of an interval.
+    """
+    if isinstance(constraint_type, Eq):
+        values = (constraint_type.value, )
+    elif type(constraint_type) in _BOUNDS:
+        values = _values_of_bound(constraint_type)
+    else:
+        return None
+    value_type = type(values[0])
+    if not _is_orderable(*values) or any(type(v) is not value_type for v in values):
+        return None
+    return value_type
+
+
+def _values_of_bound(constraint_type: "ConstraintType") -> tuple:
+    """Get the values of an equality, an ordering relation or a range."""
+    return constraint_type.values if isinstance(constraint_type, Range) else (constraint_type.value, )
+
+
+def _tighter_bound(bound: Optional[Tuple[ORDERED_TYPES, bool]], new_bound: Optional[Tuple[ORDERED_TYPES, bool]],
+                   tighter: Callable[[ORDERED_TYPES, ORDERED_TYPES], bool]) -> Optional[Tuple[ORDERED_TYPES, bool]]:
+    """
+    Get the tighter of two lower bounds, or of two upper bounds.
+
+    :param bound: the current bound, a pair (value, inclusive), or ``None`` if there is none.
+    :param new_bound: the other bound, or ``None``.
+    :param tighter: the comparison of the values, e.g. ``operator.gt`` for the lower bounds.
+    :return: the tighter bound, exclusive if the values are equal and either bound is.
+    """
+    if new_bound is None:
+        return bound
+    if bound is None or tighter(new_bound[0], bound[0]):
+        return new_bound
+    if new_bound[0] == bound[0]:
+        return bound[0], bound[1] and new_bound[1]
+    return bound
+
+
+def _merge_equality(equal: ORDERED_TYPES, lower: Optional[Tuple[ORDERED_TYPES, bool]],
+                    upper: Optional[Tuple[ORDERED_TYPES, bool]]) -> Optional[List["ConstraintType"]]:
+    """Merge an equality with the bounds of an interval: the equality, if its value is in the interval."""
+    if lower is not None and not (equal > lower[0] or lower[1] and equal == lower[0]):
+        return None
+    if upper is not None and not (equal < upper[0] or upper[1] and equal == upper[0]):
+        return None
+    return [Eq(equal)]
+
+
+def _interval(lower: Optional[Tuple[ORDERED_TYPES, bool]],
+              upper: Optional[Tuple[ORDERED_TYPES, bool]]) -> Optional[List["ConstraintType"]]:
+    """Get the constraint types of an interval, or ``None`` if it is empty."""
+    if lower is not None and upper is not None:
+        if lower[0] > upper[0] or lower[0] == upper[0] and not (lower[1] and upper[1]):
+            return None
+        if lower[0] == upper[0]:
+            return [Eq(lower[0])]
+        if lower[1] and upper[1]:
+            return [Range((lower[0], upper[0]))]
+
+    result = []
+    if lower is not None:
+        result.append(GtEq(lower[0]) if lower[1] else Gt(lower[0]))
+    if upper is not None:
+        result.append(LtEq(upper[0]) if upper[1] else Lt(upper[0]))
+    return result
+
+
+def _merge_bounds(constraint_types: List["ConstraintType"]) -> Optional[List["ConstraintType"]]:
+    """
+    Merge the bounds on the same attribute, interpreted in conjunction, into the tightest interval.
+    The values of the bounds must have the same type (see :func:`~oef.query._bound_type`).
+
+    :param constraint_types: the equalities, the ordering relations and the ranges.
+    :return: the equivalent constraint types, or ``None`` if no value satisfies all of them.
+    """
+    lower, upper, equal = None, None, None  # the bounds are pairs (value, inclusive)
+    for constraint_type in constraint_types:
+        if any(v != v for v in _values_of_bound(constraint_type)):
+            # NaN is not comparable with any value.
+            return None
+
+        if isinstance(constraint_type, Eq):
+            if equal is not None and equal != constraint_type.value:
+                return None
+            equal = constraint_type.value
+            continue
+
+        new_lower, new_upper = _BOUNDS[type(constraint_type)](constraint_type)
+        lower = _tighter_bound(lower, new_lower, operator.gt)
+        upper = _tighter_bound(upper, new_upper, operator.lt)
+
+    if equal is not None:
+        return _merge_equality(equal, lower, upper)
+    return _interval(lower, upper)
+
+
+def _conflicting_attribute(expressions: List["ConstraintExpr"]) -> Optional[str]:
+    """
+    Find an attribute whose constraints, interpreted in conjunction, disagree on the type of its value.
+    A value has only one type, so no description satisfies them.
+
+    :param expressions: the constraint expressions.
+    :return: the name of the first such attribute, or ``None`` if there is none.
+    """
+    types = {}  # type: Dict[str, Optional[Type[ATTRIBUTE_TYPES]]]
+    for expression in expressions:
+        if type(expression) is Constraint:
+            value_type = expression.constraint._get_type()
+            if types.setdefault(expression.attribute_name, value_type) != value_type:
+                return expression.attribute_name
+    return None
+
+
+def _bounds_by_attribute(expressions: List["ConstraintExpr"]) -> Dict[str, List["ConstraintType"]]:
+    """Group the bounds of the constraints that can be merged into an interval by attribute, in order."""
+    bounds = OrderedDict()  # type: Dict[str, List[ConstraintType]]
+    for expression in expressions:
+        if type(expression) is Constraint and _bound_type(expression.constraint) is not None:
+            bounds.setdefault(expression.attribute_name, []).append(expression.constraint)
+    return bounds
+
+
+def _replace_bounds(expressions: List["ConstraintExpr"]) -> List["ConstraintExpr"]:
+    """
+    Merge the bounds on the same attribute, interpreted in conjunction.
+    The merged bounds take the place of the first bound on the same attribute.
+
+    :param expressions: the constraint expressions, whose constraints agree on the types of the attributes.
+    :return: the equivalent constraint expressions, or an unsatisfiable constraint if the bounds are incompatible.
+    """
+    bounds = _bounds_by_attribute(expressions)
+    result = []
+    for expression in expressions:
+        if type(expression) is not Constraint or _bound_type(expression.constraint) is None:
+            result.append(expression)
+            continue
+        name = expression.attribute_name
+        constraint_types = bounds.pop(name, None)
+        if constraint_types is None:
+            continue
+        merged = _merge_bounds(constraint_types)
+        if merged is None:
+            return [_unsatisfiable(name)]
+        result.extend(Constraint(name, constraint_type) for constraint_type in merged)
+    return result
+
+
+def _optimize_conjunction(expressions: List["ConstraintExpr"]) -> List["ConstraintExpr"]:
+    """
+    Optimize a list of constraint expressions interpreted in conjunction.
+
+    The nested conjunctions are flattened. If the cost of every expression is known, the conjunction is replaced
+    by an unsatisfiable constraint when it is detected that no description satisfies it, the bounds on the same
+    attribute are merged and the expressions are sorted from the cheapest to the most expensive.
+    Otherwise, some expression may raise an exception, so the order and the number of the evaluations are preserved.
+
+    :param expressions: the constraint expressions.
+    :return: the equivalent constraint expressions, at least one.
+    """
+    expressions = _flatten(expressions, And)
+    if any(e._cost() is None for e in expressions):
+        return expressions
+
+    for expression in expressions:
+        if _is_unsatisfiable(expression):
+            return [expression]
+
+    name = _conflicting_attribute(expressions)
+    if name is not None:
+        return [_unsatisfiable(name)]
+    return sorted(_replace_bounds(expressions), key=lambda e: e._cost())
+
+
+def _equal_values(expression: "ConstraintExpr") -> Optional[tuple]:
+    """
+    Get the values an attribute is equal to, in an equality or an ``In`` constraint, if they can be folded into a set.
+
+    :param expression: the constraint expression.
+    :return: the values, or ``None`` if the expression is not such a constraint.
+    """
+    if type(expression) is not Constraint:
+        return None
+    if type(expression.constraint) is Eq:
+        values = (expression.constraint.value, )
+    elif type(expression.constraint) is In:
+        values = expression.constraint.values
+    else:
+        return None
+    # NaN is not equal to itself, but it is found in a set if it is the same object.
+    return values if all(v == v for v in values) else None
+
+
+def _fold_sets(expressions: List["ConstraintExpr"]) -> List["ConstraintExpr"]:
+    """
+    Fold the equalities and the sets on the same attribute, interpreted in disjunction, into one set.
+    The folded set takes the place of the first expression of the group.
+
+    :param expressions: the constraint expressions.
+    :return: the equivalent constraint expressions.
+    """
+    groups = OrderedDict()  # type: Dict[Tuple[str, Type[ATTRIBUTE_TYPES]], List[ConstraintExpr]]
+    for expression in expressions:
+        if _equal_values(expression) is not None:
+            key = (expression.attribute_name, expression.constraint._get_type())
+            groups.setdefault(key, []).append(expression)
+
+    result = []
+    for expression in expressions:
+        if _equal_values(expression) is None:
+            result.append(expression)
+            continue
+        group = groups.pop((expression.attribute_name, expression.constraint._get_type()), None)
+        if group is None:
+            continue
+        if len(group) == 1:
+            result.append(expression)
+            continue
+        values = [v for e in group for v in _equal_values(e)]
+        result.append(Constraint(expression.attribute_name, In(list(OrderedDict.fromkeys(values)))))
+    return result
+
+
+def _optimize_disjunction(expressions: List["ConstraintExpr"]) -> List["ConstraintExpr"]:
+    """
+    Optimize a list of constraint expressions interpreted in disjunction.
+
+    The nested disjunctions are flattened. If the cost of every expression is known, the unsatisfiable
+    expressions are removed, the equalities and the sets on the same attribute are folded into one set
+    and the expressions are sorted from the cheapest to the most expensive.
+    Otherwise, some expression may raise an exception, so the order and the number of the evaluations are preserved.
+
+    :param expressions: the constraint expressions.
+    :return: the equivalent constraint expressions, at least one.
+    """
+    expressions = _flatten(expressions, Or)
+    if any(e._cost() is None for e in expressions):
+        return expressions
+
+    satisfiable = [e for e in expressions if not _is_unsatisfiable(e)]
+    if len(satisfiable) == 0:
+        return expressions[:1]
+    return sorted(_fold_sets(satisfiable), key=lambda e: e._cost())
+
+
+class _ImmutableNode:
+    """
+    The base of the nodes of the constraint expressions, that are hashable and then immutable:
+    their attributes are set once in ``__init__``, and assigning or deleting them afterwards raises ``AttributeError``.
+    """
+
+    __slots__ = ()
+
+    def _set_attributes(self, **attributes) -> None:
+        """Set the attributes of the node, only in ``__init__``."""
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("'{}' object is immutable.".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("'{}' object is immutable.".format(type(self).__name__))
+
+    def __reduce__(self):
+        # the default reduction restores the slots with setattr, used by pickle and copy.
+        names = [name for cls in type(self).__mro__ for name in cls.__dict__.get("__slots__", ())]
+        return _restore_node, (type(self), {name: getattr(self, name) for name in names})
+
+
+def _restore_node(cls: type, attributes: Dict[str, Any]) -> _ImmutableNode:
+    """Restore a node of a constraint expression reduced by :func:`~oef.query._ImmutableNode.__reduce__`."""
+    node = object.__new__(cls)
+    node._set_attributes(**attributes)
+    return node
+
+
+class ConstraintExpr(_ImmutableNode, ProtobufSerializable, ABC):
     """
     This class is used to represent a constraint expression.
+
+    The constraint expressions are hashable, so they cannot be modified after their creation:
+    they store their attributes in ``__slots__``, and their sequences in tuples.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def check(self, description: Description) -> bool:
         """
@@ -55,6 +461,32 @@ class ConstraintExpr(ProtobufSerializable, ABC):
         :return: ``True`` if the constraint expression is valid wrt the data model, ``False`` otherwise.
         """
 
+    def _compile(self) -> PREDICATE:
+        """
+        Compile the constraint expression into a predicate over descriptions.
+        The default implementation just returns :func:`~oef.query.ConstraintExpr.check`.
+
+        :return: the predicate.
+        """
+        return self.check
+
+    def _cost(self) -> Optional[int]:
+        """
+        Estimate the cost of checking the constraint expression, used to decide the order of evaluation.
+
+        :return: the cost, or ``None`` if unknown (e.g. the check may raise an exception).
+        """
+        return None
+
+    def _optimize(self) -> "ConstraintExpr":
+        """
+        Get an equivalent constraint expression that is cheaper to check (see :func:`~oef.query.Query.optimize`).
+        The default implementation just returns the constraint expression itself.
+
+        :return: the optimized constraint expression.
+        """
+        return self
+
     def _check_validity(self) -> None:
         """Check whether a Constraint Expression satisfies some basic requirements.
         E.g. an :class:`~oef.query.And` expression must have at least 2 subexpressions.
@@ -109,13 +541,16 @@ class And(ConstraintExpr):
         False
     """
 
+    __slots__ = ("constraints",)
+
     def __init__(self, constraints: List[ConstraintExpr]) -> None:
         """
         Initialize an :class:`~oef.query.And` constraint.
 
         :param constraints: the list of constraints to be interpreted in conjunction.
+                          | They are stored in the ``constraints`` tuple.
         """
-        self.constraints = constraints
+        self._set_attributes(constraints=tuple(constraints))
 
         self._check_validity()
 
@@ -151,6 +586,17 @@ class And(ConstraintExpr):
         """
         return all(expr.check(description) for expr in self.constraints)
 
+    def _compile(self) -> PREDICATE:
+        return _compile_conjunction(self.constraints)
+
+    def _optimize(self) -> ConstraintExpr:
+        expressions = _optimize_conjunction(self.constraints)
+        return expressions[0] if len(expressions) == 1 else And(expressions)
+
+    def _cost(self) -> Optional[int]:
+        costs = [c._cost() for c in self.constraints]
+        return None if None in costs else sum(costs)
+
     def is_valid(self, data_model: DataModel) -> bool:
         return all(c.is_valid(data_model) for c in self.constraints)
 
@@ -167,6 +613,9 @@ class And(ConstraintExpr):
         else:
             return self.constraints == other.constraints
 
+    def __hash__(self):
+        return hash((And, self.constraints))
+
 
 class Or(ConstraintExpr):
     """
@@ -188,13 +637,16 @@ class Or(ConstraintExpr):
         False
     """
 
+    __slots__ = ("constraints",)
+
     def __init__(self, constraints: List[ConstraintExpr]) -> None:
         """
         Initialize an :class:`~oef.query.Or` constraint.
 
         :param constraints: the list of constraints to be interpreted in disjunction.
+                          | They are stored in the ``constraints`` tuple.
         """
-        self.constraints = constraints
+        self._set_attributes(constraints=tuple(constraints))
 
         self._check_validity()
 
@@ -230,6 +682,17 @@ class Or(ConstraintExpr):
         """
         return any(expr.check(description) for expr in self.constraints)
 
+    def _compile(self) -> PREDICATE:
+        return _compile_disjunction(self.constraints)
+
+    def _optimize(self) -> ConstraintExpr:
+        expressions = _optimize_disjunction(self.constraints)
+        return expressions[0] if len(expressions) == 1 else Or(expressions)
+
+    def _cost(self) -> Optional[int]:
+        costs = [c._cost() for c in self.constraints]
+        return None if None in costs else sum(costs)
+
     def is_valid(self, data_model: DataModel) -> bool:
         return all(c.is_valid(data_model) for c in self.constraints)
 
@@ -246,6 +709,9 @@ class Or(ConstraintExpr):
         else:
             return self.constraints == other.constraints
 
+    def __hash__(self):
+        return hash((Or, self.constraints))
+
 
 class Not(ConstraintExpr):
     """
@@ -263,8 +729,10 @@ class Not(ConstraintExpr):
         True
     """
 
+    __slots__ = ("constraint",)
+
     def __init__(self, constraint: ConstraintExpr) -> None:
-        self.constraint = constraint
+        self._set_attributes(constraint=constraint)
 
     def check(self, description: Description) -> bool:
         """
@@ -275,6 +743,24 @@ class Not(ConstraintExpr):
         """
         return not self.constraint.check(description)
 
+    def _compile(self) -> PREDICATE:
+        predicate = self.constraint._compile()
+        if predicate is _always_true:
+            return _always_false
+        if predicate is _always_false:
+            return _always_true
+        return lambda description: not predicate(description)
+
+    def _cost(self) -> Optional[int]:
+        return self.constraint._cost()
+
+    def _optimize(self) -> ConstraintExpr:
+        expression = self.constraint._optimize()
+        if type(expression) is Not:
+            # a double negation is removed.
+            return expression.constraint
+        return Not(expression)
+
     def to_pb(self):
         """
         From an instance of :class:`~oef.query.Not` to its associated Protobuf object.
@@ -306,12 +792,19 @@ class Not(ConstraintExpr):
         else:
             return self.constraint == other.constraint
 
+    def __hash__(self):
+        return hash((Not, self.constraint))
+
 
-class ConstraintType(ProtobufSerializable, ABC):
+class ConstraintType(_ImmutableNode, ProtobufSerializable, ABC):
     """
     This class is used to represent a constraint type.
+
+    Like the constraint expressions, the constraint types are hashable and cannot be modified.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def check(self, value: ATTRIBUTE_TYPES) -> bool:
         """
@@ -331,6 +824,23 @@ class ConstraintType(ProtobufSerializable, ABC):
         """
         return self._get_type() is None or self._get_type() == attribute.type
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        """
+        Compile the constraint type into a predicate over attribute values, whose type is already checked.
+        The default implementation just returns :func:`~oef.query.ConstraintType.check`.
+
+        :return: the predicate.
+        """
+        return self.check
+
+    def _cost(self) -> Optional[int]:
+        """
+        Estimate the cost of checking the constraint type, used to decide the order of evaluation.
+
+        :return: the cost, or ``None`` if unknown (e.g. the check may raise an exception).
+        """
+        return None
+
     @abstractmethod
     def _get_type(self) -> Optional[Type[ATTRIBUTE_TYPES]]:
         """
@@ -348,13 +858,15 @@ class Relation(ConstraintType, ABC):
     subclasses that extend this class.
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, value: ATTRIBUTE_TYPES) -> None:
         """
         Initialize a Relation object.
 
         :param value: the right value of the relation.
         """
-        self.value = value
+        self._set_attributes(value=value)
 
     @property
     @abstractmethod
@@ -418,22 +930,33 @@ class Relation(ConstraintType, ABC):
     def _get_type(self) -> Type[ATTRIBUTE_TYPES]:
         return type(self.value)
 
+    def _cost(self) -> Optional[int]:
+        return 1
+
     def __eq__(self, other):
         if type(other) != type(self):
             return False
         else:
             return self.value == other.value
 
+    def __hash__(self):
+        return hash((type(self), self.value))
+
 
 class OrderingRelation(Relation, ABC):
     """A specialization of the :class:`~oef.query.Relation` class to represent ordering relation (e.g. greater-than)."""
 
+    __slots__ = ()
+
     def __init__(self, value: ORDERED_TYPES):
         super().__init__(value)
 
     def _get_type(self) -> Type[ORDERED_TYPES]:
         return type(self.value)
 
+    def _cost(self) -> Optional[int]:
+        return 1 if _is_orderable(self.value) else None
+
 
 class Eq(Relation):
     """
@@ -451,6 +974,8 @@ class Eq(Relation):
 
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.EQ
 
@@ -463,6 +988,10 @@ class Eq(Relation):
         """
         return value == self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value == constant
+
 
 class NotEq(Relation):
     """
@@ -480,6 +1009,8 @@ class NotEq(Relation):
 
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.NOTEQ
 
@@ -492,6 +1023,10 @@ class NotEq(Relation):
         """
         return value != self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value != constant
+
 
 class Lt(OrderingRelation):
     """
@@ -509,6 +1044,8 @@ class Lt(OrderingRelation):
 
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.LT
 
@@ -521,6 +1058,10 @@ class Lt(OrderingRelation):
         """
         return value < self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value < constant
+
 
 class LtEq(OrderingRelation):
     """
@@ -538,6 +1079,8 @@ class LtEq(OrderingRelation):
 
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.LTEQ
 
@@ -550,6 +1093,10 @@ class LtEq(OrderingRelation):
         """
         return value <= self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value <= constant
+
 
 class Gt(OrderingRelation):
     """
@@ -566,6 +1113,8 @@ class Gt(OrderingRelation):
         False
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.GT
 
@@ -578,6 +1127,10 @@ class Gt(OrderingRelation):
         """
         return value > self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value > constant
+
 
 class GtEq(OrderingRelation):
     """
@@ -594,6 +1147,8 @@ class GtEq(OrderingRelation):
         False
     """
 
+    __slots__ = ()
+
     def _operator(self):
         return query_pb2.Query.Relation.GTEQ
 
@@ -606,6 +1161,10 @@ class GtEq(OrderingRelation):
         """
         return value >= self.value
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        constant = self.value
+        return lambda value: value >= constant
+
 
 class Range(ConstraintType):
     """
@@ -625,14 +1184,16 @@ class Range(ConstraintType):
         False
     """
 
+    __slots__ = ("values",)
+
     def __init__(self, values: RANGE_TYPES) -> None:
         """
         Initialize a range constraint type.
 
         :param values: a pair of ``int``, a pair of ``str``, a pair of ``float` or
-                     | a pair of :class:`~oef.schema.Location`.
+                     | a pair of :class:`~oef.schema.Location`. It is stored in the ``values`` tuple.
         """
-        self.values = values
+        self._set_attributes(values=tuple(values))
 
     def to_pb(self) -> query_pb2.Query:
         """
@@ -692,6 +1253,13 @@ class Range(ConstraintType):
         left, right = self.values
         return left <= value <= right
 
+    def _compile(self) -> Callable[[RANGE_TYPES], bool]:
+        left, right = self.values
+        return lambda value: left <= value <= right
+
+    def _cost(self) -> Optional[int]:
+        return 2 if _is_orderable(*self.values) else None
+
     def _get_type(self) -> Type[Union[int, str, float, Location]]:
         return type(self.values[0])
 
@@ -701,6 +1269,22 @@ class Range(ConstraintType):
         else:
             return self.values == other.values
 
+    def __hash__(self):
+        return hash((Range, self.values))
+
+
+"""
+The lower and the upper bounds of the ordering relations and of the ranges, as pairs (value, inclusive),
+or ``None`` if there is no such bound, by type of constraint (see :func:`~oef.query._merge_bounds`).
+"""
+_BOUNDS = {
+    Gt: lambda c: ((c.value, False), None),
+    GtEq: lambda c: ((c.value, True), None),
+    Lt: lambda c: (None, (c.value, False)),
+    LtEq: lambda c: (None, (c.value, True)),
+    Range: lambda c: ((c.values[0], True), (c.values[1], True)),
+}  # type: Dict[Type[ConstraintType], Callable[[ConstraintType], Tuple[Optional[tuple], Optional[tuple]]]]
+
 
 class Set(ConstraintType, ABC):
     """
@@ -709,13 +1293,15 @@ class Set(ConstraintType, ABC):
     The specific operator of the relation is defined in the subclasses that extend this class.
     """
 
+    __slots__ = ("values",)
+
     def __init__(self, values: SET_TYPES) -> None:
         """
         Initialize a :class:`~oef.query.Set` constraint.
 
-        :param values: a list of values for the set relation.
+        :param values: a list of values for the set relation. They are stored in the ``values`` tuple.
         """
-        self.values = values
+        self._set_attributes(values=tuple(values))
 
     @property
     @abstractmethod
@@ -785,11 +1371,28 @@ class Set(ConstraintType, ABC):
     def _get_type(self) -> Optional[Type[ATTRIBUTE_TYPES]]:
         return type(next(iter(self.values))) if len(self.values) > 0 else None
 
+    def _frozen_values(self) -> Union[frozenset, tuple]:
+        """
+        Get the values of the set in a container that is fast to search.
+
+        :return: a ``frozenset`` with the values, or a ``tuple`` if they are not hashable (e.g. locations).
+        """
+        try:
+            return frozenset(self.values)
+        except TypeError:
+            return tuple(self.values)
+
+    def _cost(self) -> Optional[int]:
+        return 1
+
     def __eq__(self, other):
         if type(other) != type(self):
             return False
         return self.values == other.values
 
+    def __hash__(self):
+        return hash((type(self), self.values))
+
 
 class In(Set):
     """
@@ -808,6 +1411,8 @@ class In(Set):
 
     """
 
+    __slots__ = ()
+
     def __init__(self, values: SET_TYPES):
         super().__init__(values)
 
@@ -823,6 +1428,10 @@ class In(Set):
         """
         return value in self.values
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        values = self._frozen_values()
+        return lambda value: value in values
+
 
 class NotIn(Set):
     """
@@ -841,6 +1450,8 @@ class NotIn(Set):
 
     """
 
+    __slots__ = ()
+
     def __init__(self, values: SET_TYPES):
         super().__init__(values)
 
@@ -856,6 +1467,10 @@ class NotIn(Set):
         """
         return value not in self.values
 
+    def _compile(self) -> Callable[[ATTRIBUTE_TYPES], bool]:
+        values = self._frozen_values()
+        return lambda value: value not in values
+
 
 class Distance(ConstraintType):
     """
@@ -883,6 +1498,8 @@ class Distance(ConstraintType):
 
     """
 
+    __slots__ = ("center", "distance")
+
     def __init__(self, center: Location, distance: float) -> None:
         """
         Instantiate the ``Distance`` constraint.
@@ -890,8 +1507,7 @@ class Distance(ConstraintType):
         :param center: the center from where compute the distance.
         :param distance: the maximum distance from the center, in km.
         """
-        self.center = center
-        self.distance = distance
+        self._set_attributes(center=center, distance=distance)
 
     def check(self, value: Location) -> bool:
         return self.center.distance(value) <= self.distance
@@ -922,22 +1538,33 @@ class Distance(ConstraintType):
     def _get_type(self) -> Optional[Type[ATTRIBUTE_TYPES]]:
         return Location
 
+    def _compile(self) -> Callable[[Location], bool]:
+        distance_from_center, distance = self.center.distance, self.distance
+        return lambda value: distance_from_center(value) <= distance
+
+    def _cost(self) -> Optional[int]:
+        return 10
+
     def __eq__(self, other):
         if type(other) != Distance:
             return False
         return self.center == other.center and self.distance == other.distance
 
+    def __hash__(self):
+        return hash((Distance, self.center, self.distance))
+
 
 class Constraint(ConstraintExpr):
     """
     A class that represent a constraint over an attribute.
     """
 
+    __slots__ = ("attribute_name", "constraint")
+
     def __init__(self,
                  attribute_name: str,
                  constraint: ConstraintType) -> None:
-        self.attribute_name = attribute_name
-        self.constraint = constraint
+        self._set_attributes(attribute_name=attribute_name, constraint=constraint)
 
     def to_pb(self):
         """
@@ -1035,6 +1662,23 @@ class Constraint(ConstraintExpr):
         # dispatch the check to the right implementation for the concrete constraint type.
         return self.constraint.check(value)
 
+    def _compile(self) -> PREDICATE:
+        name = self.attribute_name
+        value_type = self.constraint._get_type()
+        if value_type is None:
+            # no value has the type of the constraint (e.g. an empty set).
+            return _always_false
+        check = self.constraint._compile()
+
+        def predicate(description: Description) -> bool:
+            # a missing attribute is ``None``, whose type is never the one of the constraint.
+            value = description.values.get(name)
+            return type(value) is value_type and check(value)
+        return predicate
+
+    def _cost(self) -> Optional[int]:
+        return self.constraint._cost()
+
     def is_valid(self, data_model: DataModel) -> bool:
         # if the attribute name of the constraint is not present in the data model, the constraint is not valid.
         if self.attribute_name not in data_model.attributes_by_name:
@@ -1049,6 +1693,9 @@ class Constraint(ConstraintExpr):
         else:
             return self.attribute_name == other.attribute_name and self.constraint == other.constraint
 
+    def __hash__(self):
+        return hash((self.attribute_name, self.constraint))
+
 
 class Query(ProtobufSerializable):
     """
@@ -1087,6 +1734,11 @@ class Query(ProtobufSerializable):
         """
         self.constraints = constraints
         self.model = model
+        self._predicate = None  # type: Optional[PREDICATE]
+        self._optimized = None  # type: Optional[Query]
+        # the constraints and the data model the cached predicate and optimized query were computed from.
+        self._cached_constraints = None  # type: Optional[Tuple[ConstraintExpr, ...]]
+        self._cached_model = None  # type: Optional[DataModel]
 
         self._check_validity()
 
@@ -1101,7 +1753,7 @@ class Query(ProtobufSerializable):
         query.constraints.extend(constraint_expr_pbs)
 
         if self.model is not None:
-            query.model.CopyFrom(self.model.to_pb())
+            self.model._write_pb(query.model)
         return query
 
     @classmethod
@@ -1123,7 +1775,92 @@ class Query(ProtobufSerializable):
         :param description: the description to check.
         :return: ``True`` if the description satisfies all the constraints, ``False`` otherwise.
         """
-        return all(c.check(description) for c in self.constraints)
+        return self.compile()(description)
+
+    def compile(self) -> PREDICATE:
+        """
+        Compile the query into a predicate over descriptions, equivalent to :func:`~oef.query.Query.check`.
+
+        The query is optimized (see :func:`~oef.query.Query.optimize`), the values of the constraints are bound
+        in closures, the types are resolved once, the sets are turned into ``frozenset``
+        and the constraints are evaluated from the cheapest one.
+        The predicate is cached until the constraints or the data model of the query change
+        (the constraint expressions themselves are hashable, so they must not be modified).
+
+        :return: the predicate.
+
+        Examples:
+            >>> is_recent_book = Query([Constraint("year", Gt(1990)), Constraint("genre", In(["horror"]))]).compile()
+            >>> is_recent_book(Description({"year": 1991, "genre": "horror"}))
+            True
+            >>> is_recent_book(Description({"year": 1991, "genre": "novel"}))
+            False
+        """
+        self._check_cache()
+        if self._predicate is None:
+            self._predicate = _compile_conjunction(self.optimize().constraints)
+        return self._predicate
+
+    def optimize(self) -> "Query":
+        """
+        Get an equivalent query that is cheaper to check.
+
+        The nested :class:`~oef.query.And` and :class:`~oef.query.Or` are flattened, the double
+        :class:`~oef.query.Not` are removed and, where no constraint may raise an exception:
+
+        * the ordering relations and the ranges on the same attribute are merged into one interval;
+        * the equalities on the same attribute, in disjunction, are folded into one :class:`~oef.query.In`;
+        * a conjunction that no description satisfies is replaced by an empty :class:`~oef.query.In`;
+        * the constraints are sorted by their estimated cost (e.g. an equality before a distance).
+
+        The optimized query is cached until the constraints or the data model of the query change.
+
+        :return: the optimized query.
+
+        Examples:
+            >>> q = Query([Constraint("year", Gt(1990)), Constraint("year", LtEq(2000)),
+            ...            Constraint("year", GtEq(1995))])
+            >>> q.optimize() == Query([Constraint("year", Range((1995, 2000)))])
+            True
+            >>> q = Query([Or([Constraint("genre", Eq("horror")), Constraint("genre", Eq("fantasy"))])])
+            >>> q.optimize() == Query([Constraint("genre", In(["horror", "fantasy"]))])
+            True
+            >>> q = Query([Constraint("year", Lt(1990)), Constraint("year", Gt(2000))])
+            >>> q.optimize() == Query([Constraint("year", In([]))])
+            True
+        """
+        self._check_cache()
+        if self._optimized is None:
+            self._optimized = Query(_optimize_conjunction(self.constraints), self.model)
+        return self._optimized
+
+    def _check_cache(self) -> None:
+        """
+        Drop the cached predicate and optimized query if the constraints (e.g. a constraint has been appended)
+        or the data model have changed since they were computed.
+
+        :return: ``None``
+        """
+        constraints, cached = self.constraints, self._cached_constraints
+        if cached is not None and self._cached_model is self.model and (cached is constraints or (
+                len(cached) == len(constraints) and all(map(operator.is_, cached, constraints)))):
+            return
+        self._predicate = None
+        self._optimized = None
+        # the constraints of a FrozenQuery are a tuple, so they are not copied.
+        self._cached_constraints = constraints if type(constraints) == tuple else tuple(constraints)
+        self._cached_model = self.model
+
+    def check_batch(self, table):
+        """
+        Check a query against all the descriptions of a :class:`~oef.table.DescriptionTable` at once,
+        with array operations. It requires NumPy.
+
+        :param table: the table of descriptions.
+        :return: a NumPy array of ``bool``, ``True`` for the descriptions that satisfy the query.
+        :raises TypeError: if the query orders values that cannot be compared (e.g. a Range over Location values).
+        """
+        return table.check(self)
 
     def is_valid(self, data_model: DataModel) -> bool:
         """
@@ -1150,6 +1887,146 @@ class Query(ProtobufSerializable):
                              "for the given data model.".format(type(self).__name__))
 
     def __eq__(self, other):
-        if type(other) != Query:
+        if not isinstance(other, Query):
             return False
-        return self.constraints == other.constraints and self.model == other.model
+        # the constraints of a FrozenQuery are a tuple.
+        return list(self.constraints) == list(other.constraints) and self.model == other.model
+
+    def __getstate__(self):
+        # the compiled predicate is made of closures, that cannot be pickled.
+        state = self.__dict__.copy()
+        state["_predicate"] = None
+        state["_optimized"] = None
+        state["_cached_constraints"] = None
+        state["_cached_model"] = None
+        return state
+
+    def __copy__(self):
+        # the constraint expressions are not modified, so they are shared, and so is the compiled predicate.
+        copied = object.__new__(type(self))
+        copied.__dict__.update(self.__dict__)
+        copied.constraints = list(self.constraints)
+        return copied
+
+
+class FrozenQuery(CachedSerialization, Query):
+    """
+    An immutable :class:`~oef.query.Query`, that caches its serialization.
+    Use it for the queries that are sent many times, e.g. the same CFP sent to many sellers.
+
+    The constraints are a tuple, and they must not be modified.
+
+    Examples:
+        >>> q = FrozenQuery([Constraint("year", Gt(1990))])
+        >>> q == Query([Constraint("year", Gt(1990))])
+        True
+        >>> q.to_pb() == Query([Constraint("year", Gt(1990))]).to_pb()
+        True
+    """
+
+    _pb_class = query_pb2.Query.Model
+
+    @property
+    def constraints(self) -> Tuple[ConstraintExpr, ...]:
+        """The constraints of the query."""
+        return self._constraints
+
+    @constraints.setter
+    def constraints(self, constraints: List[ConstraintExpr]) -> None:
+        self._constraints = tuple(constraints)
+        self._predicate = None
+        self._optimized = None
+
+    def __hash__(self):
+        # equal queries have equal constraints, so the data model is not needed.
+        return hash(self._constraints)
+
+
+class LazyQuery(Query):
+    """
+    A :class:`~oef.query.Query` that wraps its Protobuf object, and decodes it only when
+    the constraints or the data model are accessed for the first time.
+
+    Notice: since the decoding is deferred, an invalid query raises ``ValueError`` when it is accessed,
+    not when it is received.
+
+    Examples:
+        >>> q = LazyQuery(Query([Constraint("year", Gt(1990))]).to_pb())
+        >>> q.check(Description({"year": 1991}))
+        True
+        >>> q == Query([Constraint("year", Gt(1990))])
+        True
+    """
+
+    def __init__(self, query_pb: query_pb2.Query.Model) -> None:
+        """
+        Initialize a lazy query.
+
+        :param query_pb: the Protobuf object that represents the query.
+        """
+        self._query_pb = query_pb
+        self._query = None  # type: Optional[Query]
+
+    @property
+    def constraints(self) -> List[ConstraintExpr]:
+        """The constraints of the query. The query is decoded at the first access."""
+        return self._decode().constraints
+
+    @property
+    def model(self) -> Optional[DataModel]:
+        """The data model of the query. The query is decoded at the first access."""
+        return self._decode().model
+
+    def to_pb(self) -> query_pb2.Query.Model:
+        """
+        Return the associated Protobuf object. If the query has not been decoded yet,
+        a copy of the wrapped Protobuf object is returned, without decoding it.
+
+        :return: a Protobuf object equivalent to the caller object.
+        """
+        if self._query is not None:
+            return self._query.to_pb()
+        query = query_pb2.Query.Model()
+        query.CopyFrom(self._query_pb)
+        return query
+
+    def _write_pb(self, field) -> None:
+        if self._query is not None:
+            self._query._write_pb(field)
+        else:
+            field.CopyFrom(self._query_pb)
+
+    def compile(self) -> PREDICATE:
+        """Compile the query into a predicate over descriptions. The query is decoded at the first access."""
+        return self._decode().compile()
+
+    def optimize(self) -> Query:
+        """Get an equivalent query that is cheaper to check. The query is decoded at the first access."""
+        return self._decode().optimize()
+
+    @classmethod
+    def from_pb(cls, query: query_pb2.Query.Model):
+        """
+        Wrap the ``Query`` Protobuf object, without decoding it.
+
+        :param query: the Protobuf object that represents the :class:`~oef.query.Query` object.
+        :return: an instance of :class:`~oef.query.LazyQuery` that wraps the Protobuf object provided in input.
+        """
+        return cls(query)
+
+    def __copy__(self):
+        # the Protobuf object is not modified, so it is shared until the copy is decoded.
+        copied = LazyQuery(self._query_pb)
+        if self._query is not None:
+            copied._query = copy.copy(self._query)
+        return copied
+
+    def _decode(self) -> Query:
+        """
+        Decode the wrapped Protobuf object, if not done yet.
+
+        :return: the decoded query.
+        """
+        if self._query is None:
+            self._query = Query.from_pb(self._query_pb)
+        return self._query
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# source: query.proto
+"""Generated protocol buffer code."""
+from google.protobuf.internal import builder as _builder
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import symbol_database as _symbol_database
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0bquery.proto\x12\x0c\x66\x65tch.oef.pb\"\xd8\x14\n\x05Query\x1a\xb3\x01\n\tAttribute\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x30\n\x04type\x18\x02 \x02(\x0e\x32\".fetch.oef.pb.Query.Attribute.Type\x12\x10\n\x08required\x18\x03 \x02(\x08\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\"?\n\x04Type\x12\n\n\x06\x44OUBLE\x10\x00\x12\x07\n\x03INT\x10\x01\x12\x08\n\x04\x42OOL\x10\x02\x12\n\n\x06STRING\x10\x03\x12\x0c\n\x08LOCATION\x10\x04\x1a\x61\n\tDataModel\x12\x0c\n\x04name\x18\x01 \x02(\t\x12\x31\n\nattributes\x18\x02 \x03(\x0b\x32\x1d.fetch.oef.pb.Query.Attribute\x12\x13\n\x0b\x64\x65scription\x18\x03 \x01(\t\x1a$\n\x08Location\x12\x0b\n\x03lon\x18\x01 \x02(\x01\x12\x0b\n\x03lat\x18\x02 \x02(\x01\x1ao\n\x05Value\x12\x0b\n\x01s\x18\x01 \x01(\tH\x00\x12\x0b\n\x01\x64\x18\x02 \x01(\x01H\x00\x12\x0b\n\x01\x62\x18\x03 \x01(\x08H\x00\x12\x0b\n\x01i\x18\x04 \x01(\x03H\x00\x12)\n\x01l\x18\x05 \x01(\x0b\x32\x1c.fetch.oef.pb.Query.LocationH\x00\x42\x07\n\x05value\x1a\x41\n\x08KeyValue\x12\x0b\n\x03key\x18\x01 \x02(\t\x12(\n\x05value\x18\x02 \x02(\x0b\x32\x19.fetch.oef.pb.Query.Value\x1a\x66\n\x08Instance\x12,\n\x05model\x18\x01 \x02(\x0b\x32\x1d.fetch.oef.pb.Query.DataModel\x12,\n\x06values\x18\x02 \x03(\x0b\x32\x1c.fetch.oef.pb.Query.KeyValue\x1a+\n\nStringPair\x12\r\n\x05\x66irst\x18\x01 \x02(\t\x12\x0e\n\x06second\x18\x02 \x02(\t\x1a(\n\x07IntPair\x12\r\n\x05\x66irst\x18\x01 \x02(\x03\x12\x0e\n\x06second\x18\x02 \x02(\x03\x1a+\n\nDoublePair\x12\r\n\x05\x66irst\x18\x01 \x02(\x01\x12\x0e\n\x06second\x18\x02 \x02(\x01\x1ai\n\x0cLocationPair\x12+\n\x05\x66irst\x18\x01 \x02(\x0b\x32\x1c.fetch.oef.pb.Query.Location\x12,\n\x06second\x18\x02 \x02(\x0b\x32\x1c.fetch.oef.pb.Query.Location\x1a\xc2\x01\n\x05Range\x12+\n\x01s\x18\x01 \x01(\x0b\x32\x1e.fetch.oef.pb.Query.StringPairH\x00\x12(\n\x01i\x18\x02 \x01(\x0b\x32\x1b.fetch.oef.pb.Query.IntPairH\x00\x12+\n\x01\x64\x18\x03 \x01(\x0b\x32\x1e.fetch.oef.pb.Query.DoublePairH\x00\x12-\n\x01l\x18\x04 \x01(\x0b\x32 .fetch.oef.pb.Query.LocationPairH\x00\x42\x06\n\x04pair\x1aJ\n\x08\x44istance\x12,\n\x06\x63\x65nter\x18\x01 \x02(\x0b\x32\x1c.fetch.oef.pb.Query.Location\x12\x10\n\x08\x64istance\x18\x02 \x02(\x01\x1a\xa8\x01\n\x08Relation\x12\x31\n\x02op\x18\x01 \x02(\x0e\x32%.fetch.oef.pb.Query.Relation.Operator\x12&\n\x03val\x18\x02 \x02(\x0b\x32\x19.fetch.oef.pb.Query.Value\"A\n\x08Operator\x12\x06\n\x02\x45Q\x10\x00\x12\x06\n\x02LT\x10\x01\x12\x08\n\x04LTEQ\x10\x02\x12\x06\n\x02GT\x10\x03\x12\x08\n\x04GTEQ\x10\x04\x12\t\n\x05NOTEQ\x10\x05\x1a\xb3\x04\n\x03Set\x12,\n\x02op\x18\x01 \x02(\x0e\x32 .fetch.oef.pb.Query.Set.Operator\x12,\n\x04vals\x18\x02 \x02(\x0b\x32\x1e.fetch.oef.pb.Query.Set.Values\x1a\xb0\x03\n\x06Values\x12\x33\n\x01s\x18\x01 \x01(\x0b\x32&.fetch.oef.pb.Query.Set.Values.StringsH\x00\x12\x33\n\x01\x64\x18\x02 \x01(\x0b\x32&.fetch.oef.pb.Query.Set.Values.DoublesH\x00\x12\x31\n\x01\x62\x18\x03 \x01(\x0b\x32$.fetch.oef.pb.Query.Set.Values.BoolsH\x00\x12\x30\n\x01i\x18\x04 \x01(\x0b\x32#.fetch.oef.pb.Query.Set.Values.IntsH\x00\x12\x35\n\x01l\x18\x05 \x01(\x0b\x32(.fetch.oef.pb.Query.Set.Values.LocationsH\x00\x1a\x14\n\x04Ints\x12\x0c\n\x04vals\x18\x01 \x03(\x03\x1a\x17\n\x07\x44oubles\x12\x0c\n\x04vals\x18\x01 \x03(\x01\x1a\x17\n\x07Strings\x12\x0c\n\x04vals\x18\x01 \x03(\t\x1a\x15\n\x05\x42ools\x12\x0c\n\x04vals\x18\x01 \x03(\x08\x1a\x37\n\tLocations\x12*\n\x04vals\x18\x01 \x03(\x0b\x32\x1c.fetch.oef.pb.Query.LocationB\x08\n\x06values\"\x1d\n\x08Operator\x12\x06\n\x02IN\x10\x00\x12\t\n\x05NOTIN\x10\x01\x1a\xa2\x05\n\x0e\x43onstraintExpr\x12\x34\n\x03or_\x18\x01 \x01(\x0b\x32%.fetch.oef.pb.Query.ConstraintExpr.OrH\x00\x12\x36\n\x04\x61nd_\x18\x02 \x01(\x0b\x32&.fetch.oef.pb.Query.ConstraintExpr.AndH\x00\x12\x36\n\x04not_\x18\x03 \x01(\x0b\x32&.fetch.oef.pb.Query.ConstraintExpr.NotH\x00\x12\x43\n\nconstraint\x18\x04 \x01(\x0b\x32-.fetch.oef.pb.Query.ConstraintExpr.ConstraintH\x00\x1a\x36\n\x02Or\x12\x30\n\x04\x65xpr\x18\x01 \x03(\x0b\x32\".fetch.oef.pb.Query.ConstraintExpr\x1a\x37\n\x03\x41nd\x12\x30\n\x04\x65xpr\x18\x01 \x03(\x0b\x32\".fetch.oef.pb.Query.ConstraintExpr\x1a\x37\n\x03Not\x12\x30\n\x04\x65xpr\x18\x01 \x02(\x0b\x32\".fetch.oef.pb.Query.ConstraintExpr\x1a\xec\x01\n\nConstraint\x12\x16\n\x0e\x61ttribute_name\x18\x01 \x02(\t\x12\'\n\x04set_\x18\x02 \x01(\x0b\x32\x17.fetch.oef.pb.Query.SetH\x00\x12+\n\x06range_\x18\x03 \x01(\x0b\x32\x19.fetch.oef.pb.Query.RangeH\x00\x12\x30\n\x08relation\x18\x04 \x01(\x0b\x32\x1c.fetch.oef.pb.Query.RelationH\x00\x12\x30\n\x08\x64istance\x18\x05 \x01(\x0b\x32\x1c.fetch.oef.pb.Query.DistanceH\x00\x42\x0c\n\nconstraintB\x0c\n\nexpression\x1an\n\x05Model\x12\x37\n\x0b\x63onstraints\x18\x01 \x03(\x0b\x32\".fetch.oef.pb.Query.ConstraintExpr\x12,\n\x05model\x18\x02 \x01(\x0b\x32\x1d.fetch.oef.pb.Query.DataModelB\x02H\x01')
+
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'query_pb2', globals())
+if _descriptor._USE_C_DESCRIPTORS == False:
+
+  DESCRIPTOR._options = None
+  DESCRIPTOR._serialized_options = b'H\001'
+  _QUERY._serialized_start=30
+  _QUERY._serialized_end=2678
+  _QUERY_ATTRIBUTE._serialized_start=40
+  _QUERY_ATTRIBUTE._serialized_end=219
+  _QUERY_ATTRIBUTE_TYPE._serialized_start=156
+  _QUERY_ATTRIBUTE_TYPE._serialized_end=219
+  _QUERY_DATAMODEL._serialized_start=221
+  _QUERY_DATAMODEL._serialized_end=318
+  _QUERY_LOCATION._serialized_start=320
+  _QUERY_LOCATION._serialized_end=356
+  _QUERY_VALUE._serialized_start=358
+  _QUERY_VALUE._serialized_end=469
+  _QUERY_KEYVALUE._serialized_start=471
+  _QUERY_KEYVALUE._serialized_end=536
+  _QUERY_INSTANCE._serialized_start=538
+  _QUERY_INSTANCE._serialized_end=640
+  _QUERY_STRINGPAIR._serialized_start=642
+  _QUERY_STRINGPAIR._serialized_end=685
+  _QUERY_INTPAIR._serialized_start=687
+  _QUERY_INTPAIR._serialized_end=727
+  _QUERY_DOUBLEPAIR._serialized_start=729
+  _QUERY_DOUBLEPAIR._serialized_end=772
+  _QUERY_LOCATIONPAIR._serialized_start=774
+  _QUERY_LOCATIONPAIR._serialized_end=879
+  _QUERY_RANGE._serialized_start=882
+  _QUERY_RANGE._serialized_end=1076
+  _QUERY_DISTANCE._serialized_start=1078
+  _QUERY_DISTANCE._serialized_end=1152
+  _QUERY_RELATION._serialized_start=1155
+  _QUERY_RELATION._serialized_end=1323
+  _QUERY_RELATION_OPERATOR._serialized_start=1258
+  _QUERY_RELATION_OPERATOR._serialized_end=1323
+  _QUERY_SET._serialized_start=1326
+  _QUERY_SET._serialized_end=1889
+  _QUERY_SET_VALUES._serialized_start=1426
+  _QUERY_SET_VALUES._serialized_end=1858
+  _QUERY_SET_VALUES_INTS._serialized_start=1698
+  _QUERY_SET_VALUES_INTS._serialized_end=1718
+  _QUERY_SET_VALUES_DOUBLES._serialized_start=1720
+  _QUERY_SET_VALUES_DOUBLES._serialized_end=1743
+  _QUERY_SET_VALUES_STRINGS._serialized_start=1745
+  _QUERY_SET_VALUES_STRINGS._serialized_end=1768
+  _QUERY_SET_VALUES_BOOLS._serialized_start=1770
+  _QUERY_SET_VALUES_BOOLS._serialized_end=1791
+  _QUERY_SET_VALUES_LOCATIONS._serialized_start=1793
+  _QUERY_SET_VALUES_LOCATIONS._serialized_end=1848
+  _QUERY_SET_OPERATOR._serialized_start=1860
+  _QUERY_SET_OPERATOR._serialized_end=1889
+  _QUERY_CONSTRAINTEXPR._serialized_start=1892
+  _QUERY_CONSTRAINTEXPR._serialized_end=2566
+  _QUERY_CONSTRAINTEXPR_OR._serialized_start=2145
+  _QUERY_CONSTRAINTEXPR_OR._serialized_end=2199
+  _QUERY_CONSTRAINTEXPR_AND._serialized_start=2201
+  _QUERY_CONSTRAINTEXPR_AND._serialized_end=2256
+  _QUERY_CONSTRAINTEXPR_NOT._serialized_start=2258
+  _QUERY_CONSTRAINTEXPR_NOT._serialized_end=2313
+  _QUERY_CONSTRAINTEXPR_CONSTRAINT._serialized_start=2316
+  _QUERY_CONSTRAINTEXPR_CONSTRAINT._serialized_end=2552
+  _QUERY_MODEL._serialized_start=2568
+  _QUERY_MODEL._serialized_end=2678
+# @@protoc_insertion_point(module_scope)
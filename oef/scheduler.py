@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.scheduler
+~~~~~~~~~~~~~
+
+This module contains the scheduler of the handlers of an agent, that allows the handlers to be coroutines.
+
+"""
+
+import asyncio
+import inspect
+import logging
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional, Set
+
+from oef.offload import _OffloadedCall
+
+logger = logging.getLogger(__name__)
+
+
+"""The default maximum number of coroutine handlers that are pending at the same time."""
+DEFAULT_MAX_CONCURRENT_HANDLERS = 64
+
+
+class HandlerScheduler:
+    """
+    Call the handlers of an agent, and run the ones that return a coroutine as tasks of the event loop.
+
+    Every call is associated with a key (e.g. the pair ``(origin, dialogue_id)``):
+
+    * the calls with the same key are serialized: a call is not started until the coroutine of
+      the previous one is complete, so the order of the messages of a dialogue is preserved;
+    * the calls with different keys run concurrently.
+
+    The scheduler is full when the pending coroutines, plus the calls waiting for them,
+    reach ``max_concurrency``: the caller should wait with :func:`~oef.scheduler.HandlerScheduler.wait_available`
+    before scheduling other calls. Exceptions raised by the coroutines are logged.
+
+    If a handler is a call submitted to an :class:`~oef.offload.OffloadedHandler` (possibly wrapped, see
+    :func:`inspect.unwrap`), it is discarded when it is cancelled before it starts.
+
+    Examples:
+        >>> async def handler(name):
+        ...     await asyncio.sleep(0)
+        ...     print(name)
+        >>> scheduler = HandlerScheduler()
+        >>> scheduler.call("a", handler, ("a1",))
+        >>> scheduler.call("a", handler, ("a2",))
+        >>> scheduler.call("b", handler, ("b1",))
+        >>> len(scheduler)
+        3
+        >>> asyncio.get_event_loop().run_until_complete(scheduler.join())
+        a1
+        b1
+        a2
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENT_HANDLERS,
+                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        Initialize the scheduler.
+
+        :param max_concurrency: the maximum number of pending calls.
+        :param loop: the event loop where the coroutines are run. If ``None``, the current event loop is used.
+        """
+        if max_concurrency < 1:
+            raise ValueError("Invalid input value for type '{}': max_concurrency must be at least 1."
+                             .format(type(self).__name__))
+        self.max_concurrency = max_concurrency
+        self._loop = loop if loop is not None else asyncio.get_event_loop()
+        self._busy = {}  # type: Dict[Hashable, deque]
+        self._tasks = set()  # type: Set[asyncio.Task]
+        self._size = 0
+        self._available = asyncio.Event()
+        self._available.set()
+
+    def __len__(self) -> int:
+        """Get the number of pending calls, i.e. the running coroutines and the calls waiting for them."""
+        return self._size
+
+    def full(self) -> bool:
+        """
+        Check if the scheduler is full.
+
+        :return: ``True`` if the number of pending calls reached ``max_concurrency``, ``False`` otherwise.
+        """
+        return self._size >= self.max_concurrency
+
+    def call(self, key: Hashable, handler: Callable, args: tuple) -> None:
+        """
+        Call a handler, or enqueue the call if a coroutine with the same key is still pending.
+        If the handler returns a coroutine, it is scheduled as a task.
+
+        :param key: the key that identifies the calls to serialize.
+        :param handler: the handler to call.
+        :param args: the positional arguments of the handler.
+        :return: ``None``
+        """
+        queue = self._busy.get(key)
+        if queue is not None:
+            queue.append((handler, args))
+            self._update_size(1)
+            return
+
+        result = handler(*args)
+        if asyncio.iscoroutine(result):
+            self._busy[key] = deque()
+            self._update_size(1)
+            self._start(key, handler, result)
+
+    async def wait_available(self) -> None:
+        """
+        Wait until the scheduler is not full.
+
+        :return: ``None``
+        """
+        await self._available.wait()
+
+    async def join(self) -> None:
+        """
+        Wait until all the pending calls are complete.
+
+        :return: ``None``
+        """
+        while self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    def cancel(self) -> None:
+        """
+        Cancel all the pending calls.
+
+        :return: ``None``
+        """
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        for queue in self._busy.values():
+            for handler, _ in queue:
+                _discard(handler)
+        self._busy.clear()
+        self._update_size(-self._size)
+
+    def _start(self, key: Hashable, handler: Callable, coroutine) -> None:
+        """Schedule the coroutine returned by a handler."""
+        task = asyncio.ensure_future(self._run(key, coroutine), loop=self._loop)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda t: self._close_if_cancelled(t, handler, coroutine))
+
+    @staticmethod
+    def _close_if_cancelled(task: asyncio.Task, handler: Callable, coroutine) -> None:
+        """If the task is cancelled before it starts, the coroutine has to be closed explicitly."""
+        if task.cancelled():
+            coroutine.close()
+            _discard(handler)
+
+    async def _run(self, key: Hashable, coroutine) -> None:
+        """Run the coroutine of a handler, then the calls enqueued with the same key."""
+        while coroutine is not None:
+            try:
+                await coroutine
+            except asyncio.CancelledError:
+                # the pending calls are discarded by cancel().
+                raise
+            except Exception:
+                logger.exception("Error in the handler of the calls with key {}.".format(key))
+            self._update_size(-1)
+            coroutine = self._next(key)
+
+    def _next(self, key: Hashable):
+        """
+        Call the handlers enqueued with a key, until one of them returns a coroutine.
+
+        :param key: the key.
+        :return: the coroutine, or ``None`` if there are no more calls with that key.
+        """
+        queue = self._busy[key]
+        while queue:
+            handler, args = queue.popleft()
+            try:
+                result = handler(*args)
+            except Exception:
+                logger.exception("Error in the handler of the calls with key {}.".format(key))
+                result = None
+            if asyncio.iscoroutine(result):
+                return result
+            self._update_size(-1)
+        del self._busy[key]
+        return None
+
+    def _update_size(self, delta: int) -> None:
+        """Update the number of pending calls, and the event that signals that the scheduler is not full."""
+        self._size += delta
+        if self.full():
+            self._available.clear()
+        else:
+            self._available.set()
+
+
+def _discard(handler: Callable) -> None:
+    """Notify a call submitted to an :class:`~oef.offload.OffloadedHandler` that it has been cancelled."""
+    call = inspect.unwrap(handler)
+    if isinstance(call, _OffloadedCall):
+        call.discard()
@@ -29,9 +29,11 @@ This module defines classes to deal with data models and their instances.
 """
 
 
-import copy
+import weakref
 from abc import ABC, abstractmethod
-from typing import Union, Type, Optional, List, Dict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Union, Type, Optional, List, Dict, Tuple, Iterable
 
 import oef.agent_pb2 as agent_pb2
 import oef.query_pb2 as query_pb2
@@ -43,6 +45,8 @@ class ProtobufSerializable(ABC):
     Interface that includes method for packing/unpacking to/from Protobuf objects.
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def to_pb(self):
         """Convert the object into a Protobuf object"""
@@ -57,9 +61,64 @@ class ProtobufSerializable(ABC):
         :return: an instance of the class that implements the interface.
         """
 
+    def _write_pb(self, field) -> None:
+        """
+        Write the object into an empty Protobuf field of the same type (e.g. a field of an envelope).
+
+        :param field: the Protobuf field.
+        :return: ``None``
+        """
+        field.CopyFrom(self.to_pb())
+
+
+class CachedSerialization:
+    """
+    Mixin for the immutable variants of the :class:`~oef.schema.ProtobufSerializable` classes,
+    that serialize their content only once.
+
+    The serialized bytes are cached, and invalidated whenever a public attribute is reassigned.
+    The subclasses must define the Protobuf class of the serialized object in ``_pb_class``.
+    """
+
+    _pb_class = None
+    _serialized = None  # type: Optional[bytes]
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_"):
+            object.__setattr__(self, "_serialized", None)
+        object.__setattr__(self, name, value)
+
+    def serialize(self) -> bytes:
+        """
+        Serialize the object.
+
+        :return: the serialized Protobuf object, cached after the first call.
+        """
+        if self._serialized is None:
+            self._serialized = super().to_pb().SerializeToString()
+        return self._serialized
+
+    def to_pb(self):
+        """
+        Convert the object into a Protobuf object, parsed from the cached serialization.
+
+        :return: the Protobuf object.
+        """
+        pb = self._pb_class()
+        pb.ParseFromString(self.serialize())
+        return pb
+
+    def _write_pb(self, field) -> None:
+        field.ParseFromString(self.serialize())
+
 
 class Location(ProtobufSerializable):
-    """Data structure to represent locations (i.e. a pair of latitude and longitude)."""
+    """
+    Data structure to represent locations (i.e. a pair of latitude and longitude).
+    Locations are hashable, so they must not be modified.
+    """
+
+    __slots__ = ("latitude", "longitude")
 
     def __init__(self, latitude: float, longitude: float):
         """
@@ -104,12 +163,23 @@ class Location(ProtobufSerializable):
         else:
             return self.latitude == other.latitude and self.longitude == other.longitude
 
+    def __hash__(self):
+        return hash((self.latitude, self.longitude))
+
 
 """
 The allowable types that an Attribute can have
 """
 ATTRIBUTE_TYPES = Union[float, str, bool, int, Location]
 
+_ALLOWED_TYPES = ATTRIBUTE_TYPES.__args__
+
+"""
+The fingerprint of a data model: its name, its description, and the name, type, requirement and description
+of its attributes, sorted by name. An empty description is the same as no description.
+"""
+FINGERPRINT = Tuple[str, Optional[str], Tuple[Tuple[str, type, bool, Optional[str]], ...]]
+
 
 class AttributeSchema(ProtobufSerializable):
     """
@@ -137,6 +207,9 @@ class AttributeSchema(ProtobufSerializable):
         Location: query_pb2.Query.Attribute.LOCATION
     }
 
+    """mapping from the Protobuf attribute types to the associated attribute types"""
+    _attribute_type_from_pb = dict(map(reversed, _attribute_type_to_pb.items()))
+
     def __init__(self,
                  attribute_name: str,
                  attribute_type: Type[ATTRIBUTE_TYPES],
@@ -178,7 +251,7 @@ class AttributeSchema(ProtobufSerializable):
         :return: the attribute.
         """
         return cls(attribute.name,
-                   dict(map(reversed, cls._attribute_type_to_pb.items()))[attribute.type],
+                   cls._attribute_type_from_pb[attribute.type],
                    attribute.required,
                    attribute.description if attribute.description else None)
 
@@ -203,6 +276,9 @@ class DataModel(ProtobufSerializable):
     """
     This class represents a data model (a.k.a. schema) of the OEFCore.
 
+    The data models decoded from Protobuf objects are interned (see :func:`~oef.schema.intern_data_model`):
+    all the equal data models received share the same instance, so they must not be modified.
+
     Examples:
         >>> book_model = DataModel("book", [
         ...  AttributeSchema("title" ,          str,   True,  "The title of the book."),
@@ -224,27 +300,57 @@ class DataModel(ProtobufSerializable):
 
         :param name: the name of the data model.
         :param attribute_schemas: the list of attributes that constitutes the data model.
+               | The attributes are not copied, so they must not be modified afterwards.
         :param description: a short description for the data model.
         """
         self.name = name
-        self.attribute_schemas = sorted(copy.deepcopy(attribute_schemas), key=lambda x: x.name)
+        self.attribute_schemas = sorted(attribute_schemas, key=lambda x: x.name)
         self.description = description
         self.attributes_by_name = {a.name: a for a in self.attribute_schemas}
+        self._required_attribute_names = [a.name for a in self.attribute_schemas if a.required]
         self._check_validity()
 
+    @property
+    def fingerprint(self) -> FINGERPRINT:
+        """
+        The fingerprint of the data model, that identifies it in the table of the interned data models.
+        Unlike the equality, it also takes into account the descriptions.
+        """
+        return (self.name, self.description if self.description else None,
+                tuple((a.name, a.type, a.required, a.description if a.description else None)
+                      for a in self.attribute_schemas))
+
+    @staticmethod
+    def _fingerprint_pb(model: query_pb2.Query.DataModel) -> FINGERPRINT:
+        """
+        Compute the fingerprint of the data model decoded from a Protobuf object, without decoding it.
+
+        :param model: the Protobuf object associated with the data model.
+        :return: the fingerprint.
+        """
+        type_from_pb = AttributeSchema._attribute_type_from_pb
+        attributes = sorted(((a.name, type_from_pb[a.type], a.required, a.description if a.description else None)
+                             for a in model.attributes), key=lambda a: a[0])
+        return model.name, model.description if model.description else None, tuple(attributes)
+
     @classmethod
     def from_pb(cls, model: query_pb2.Query.DataModel):
         """
         Unpack the data model Protobuf object.
 
         :param model: the Protobuf object associated with the data model.
-        :return: the data model.
+        :return: the data model. If an equal data model is interned, the interned instance.
         """
+        fingerprint = cls._fingerprint_pb(model) if cls is DataModel else None
+        data_model = _data_models.get(fingerprint) if fingerprint is not None else None
+        if data_model is not None:
+            return data_model
 
         name = model.name
         attributes = [AttributeSchema.from_pb(attr_pb) for attr_pb in model.attributes]
         description = model.description
-        return cls(name, attributes, description)
+        data_model = cls(name, attributes, description)
+        return _data_models.setdefault(fingerprint, data_model) if fingerprint is not None else data_model
 
     def to_pb(self):
         """
@@ -267,10 +373,38 @@ class DataModel(ProtobufSerializable):
                              .format(type(self).__name__))
 
     def __eq__(self, other):
-        if type(other) != DataModel:
+        if self is other:
+            return True
+        if not isinstance(other, DataModel):
             return False
         else:
-            return self.name == other.name and self.attribute_schemas == other.attribute_schemas
+            # the attribute schemas of a FrozenDataModel are a tuple.
+            return self.name == other.name and list(self.attribute_schemas) == list(other.attribute_schemas)
+
+
+"""The interned data models, by fingerprint. A data model is removed when it is no longer referenced."""
+_data_models = weakref.WeakValueDictionary()  # type: weakref.WeakValueDictionary
+
+
+def intern_data_model(data_model: DataModel) -> DataModel:
+    """
+    Intern a data model: return the canonical instance of the data models with the same fingerprint,
+    i.e. the first one interned that is still referenced.
+    The table is process-wide, and holds only weak references to the data models.
+
+    :param data_model: the data model.
+    :return: the canonical instance, that may be ``data_model`` itself.
+
+    Examples:
+        >>> model = intern_data_model(DataModel("book", [AttributeSchema("title", str, True)]))
+        >>> intern_data_model(DataModel("book", [AttributeSchema("title", str, True)])) is model
+        True
+        >>> DataModel.from_pb(model.to_pb()) is model
+        True
+    """
+    if type(data_model) != DataModel:
+        return data_model
+    return _data_models.setdefault(data_model.fingerprint, data_model)
 
 
 def generate_schema(model_name: str, attribute_values: Dict[str, ATTRIBUTE_TYPES]) -> DataModel:
@@ -279,12 +413,27 @@ def generate_schema(model_name: str, attribute_values: Dict[str, ATTRIBUTE_TYPES
     That is, for each attribute (name, value), generate an AttributeSchema.
     It is assumed that each attribute is required.
 
+    The schemas are cached and shared between the calls with the same name and the same attribute types,
+    so they are immutable :class:`~oef.schema.FrozenDataModel` instances.
+
     :param model_name: the name of the model.
     :param attribute_values: the values of each attribute
     :return: the schema compliant with the values specified.
     """
 
-    return DataModel(model_name, [AttributeSchema(k, type(v), True) for k, v in attribute_values.items()])
+    return _generate_schema(model_name, tuple((k, type(v)) for k, v in attribute_values.items()))
+
+
+@lru_cache(maxsize=1024)
+def _generate_schema(model_name: str, attribute_types: Tuple[Tuple[str, type], ...]) -> DataModel:
+    """
+    Generate a schema from the names and the types of the attributes.
+
+    :param model_name: the name of the model.
+    :param attribute_types: the pairs of attribute name and type.
+    :return: the immutable schema.
+    """
+    return FrozenDataModel(model_name, [AttributeSchema(k, t, True) for k, t in attribute_types])
 
 
 class Description(ProtobufSerializable):
@@ -326,13 +475,14 @@ class Description(ProtobufSerializable):
 
         :param attribute_values: the values of each attribute in the description. This is a dictionary from
                | attribute name to attribute value, each attribute value must have a type in ATTRIBUTE_TYPES.
+               | The dictionary is copied, while the values are shared (e.g. the :class:`~oef.schema.Location`).
         :param data_model: optional schema of this description. If none is provided then the attribute values
                | will not be checked against a schema. Schemas are extremely useful for preventing
                | problems hard to debug, and are highly recommended.
         :param data_model_name: the name of the default data model. If a data model is provided,
                | this parameter is ignored.
         """
-        self.values = copy.deepcopy(attribute_values)
+        self.values = dict(attribute_values)
         if data_model is not None:
             self.data_model = data_model
         else:
@@ -340,6 +490,30 @@ class Description(ProtobufSerializable):
 
         self._check_consistency()
 
+    @classmethod
+    def from_trusted(cls, attribute_values: Dict[str, ATTRIBUTE_TYPES], data_model: DataModel) -> "Description":
+        """
+        Initialize a description that takes the ownership of the attribute values, without copying them.
+        Use it when the dictionary has just been built, and no one else refers to it (e.g. when decoding).
+        The values are still checked against the data model.
+
+        :param attribute_values: the values of each attribute in the description. It must not be modified afterwards.
+        :param data_model: the schema of this description. It may be shared with other descriptions.
+        :return: the description.
+        :raises AttributeInconsistencyException: if the values do not meet the schema.
+
+        Examples:
+            >>> values = {"title": "It", "year": 1986}
+            >>> description = Description.from_trusted(values, generate_schema("book", values))
+            >>> description.values is values
+            True
+        """
+        description = cls.__new__(cls)
+        description.values = attribute_values
+        description.data_model = data_model
+        description._check_consistency()
+        return description
+
     @staticmethod
     def _extract_value(value: query_pb2.Query.Value) -> ATTRIBUTE_TYPES:
         """
@@ -361,16 +535,35 @@ class Description(ProtobufSerializable):
             return Location.from_pb(value.l)
 
     @classmethod
-    def from_pb(cls, query_instance: query_pb2.Query.Instance):
+    def from_pb(cls, query_instance: query_pb2.Query.Instance, data_model: Optional[DataModel] = None):
         """
         Unpack the data model Protobuf object.
 
         :param query_instance: the Protobuf object associated with the data model.
+        :param data_model: the data model of the description, if it has already been decoded.
         :return: the data model.
         """
-        model = DataModel.from_pb(query_instance.model)
-        values = dict([(attr.key, cls._extract_value(attr.value)) for attr in query_instance.values])
-        return cls(values, model)
+        model = data_model if data_model is not None else DataModel.from_pb(query_instance.model)
+        values = {attr.key: cls._extract_value(attr.value) for attr in query_instance.values}
+        return cls.from_trusted(values, model)
+
+    @classmethod
+    def list_from_pb(cls, query_instances: Iterable[query_pb2.Query.Instance]) -> List["Description"]:
+        """
+        Unpack a list of description Protobuf objects (e.g. the proposals of a Propose).
+        Consecutive descriptions with the same data model share the same :class:`~oef.schema.DataModel` object,
+        that is decoded only once.
+
+        :param query_instances: the Protobuf objects associated with the descriptions.
+        :return: the descriptions.
+        """
+        descriptions = []
+        model_pb, model = None, None
+        for query_instance in query_instances:
+            if model_pb is None or query_instance.model != model_pb:
+                model_pb, model = query_instance.model, DataModel.from_pb(query_instance.model)
+            descriptions.append(cls.from_pb(query_instance, model))
+        return descriptions
 
     @staticmethod
     def _to_key_value_pb(key: str, value: ATTRIBUTE_TYPES) -> query_pb2.Query.KeyValue:
@@ -404,7 +597,7 @@ class Description(ProtobufSerializable):
         :return: the Protobuf query instance object associated to the description.
         """
         instance = query_pb2.Query.Instance()
-        instance.model.CopyFrom(self.data_model.to_pb())
+        self.data_model._write_pb(instance.model)
         instance.values.extend([self._to_key_value_pb(key, value) for key, value in self.values.items()])
         return instance
 
@@ -415,7 +608,7 @@ class Description(ProtobufSerializable):
         :return: the associated AgentDescription Protobuf object.
         """
         description = agent_pb2.AgentDescription()
-        description.description.CopyFrom(self.to_pb())
+        self._write_pb(description.description)
         return description
 
     def _check_consistency(self):
@@ -431,12 +624,11 @@ class Description(ProtobufSerializable):
         """
 
         # check that all required attributes in the schema are contained in the description
-        required_attributes = [s.name for s in self.data_model.attribute_schemas if s.required]
-        if not all(a in self.values for a in required_attributes):
+        if not all(a in self.values for a in self.data_model._required_attribute_names):
             raise AttributeInconsistencyException("Missing required attribute.")
 
         # check that all values are defined in the schema
-        all_schema_attributes = [s.name for s in self.data_model.attribute_schemas]
+        all_schema_attributes = self.data_model.attributes_by_name
         if not all(k in all_schema_attributes for k in self.values):
             raise AttributeInconsistencyException("Have extra attribute not in schema")
 
@@ -447,13 +639,78 @@ class Description(ProtobufSerializable):
                     # values does not match type in schema
                     raise AttributeInconsistencyException(
                         "Attribute {} has incorrect type: {}".format(schema.name, schema.type))
-                elif not isinstance(self.values[schema.name], ATTRIBUTE_TYPES.__args__):
+                elif not isinstance(self.values[schema.name], _ALLOWED_TYPES):
                     # value type matches schema, but it is not an allowed type
                     raise AttributeInconsistencyException(
                         "Attribute {} has unallowed type".format(schema.name))
 
     def __eq__(self, other):
-        if type(other) != Description:
+        if not isinstance(other, Description):
             return False
         else:
             return self.values == other.values and self.data_model == other.data_model
+
+    def __copy__(self):
+        # as in the constructor, the dictionary is copied, while the values are shared.
+        copied = object.__new__(type(self))
+        copied.__dict__.update(self.__dict__)
+        copied.values = dict(self.values)
+        return copied
+
+
+class FrozenDataModel(CachedSerialization, DataModel):
+    """
+    An immutable :class:`~oef.schema.DataModel`, that caches its serialization.
+    The attribute schemas are a tuple, and they must not be modified.
+
+    Examples:
+        >>> model = FrozenDataModel("book", [AttributeSchema("title", str, True)])
+        >>> model == DataModel("book", [AttributeSchema("title", str, True)])
+        True
+        >>> model.to_pb() == DataModel("book", [AttributeSchema("title", str, True)]).to_pb()
+        True
+    """
+
+    _pb_class = query_pb2.Query.DataModel
+
+    @property
+    def attribute_schemas(self) -> Tuple[AttributeSchema, ...]:
+        """The attribute schemas, sorted by name."""
+        return self._attribute_schemas
+
+    @attribute_schemas.setter
+    def attribute_schemas(self, attribute_schemas: List[AttributeSchema]) -> None:
+        self._attribute_schemas = tuple(attribute_schemas)
+
+
+class FrozenDescription(CachedSerialization, Description):
+    """
+    An immutable :class:`~oef.schema.Description`, that caches its serialization.
+    Use it for the descriptions that are sent many times, e.g. the same proposal sent to many buyers.
+
+    The values are a read-only mapping. The data model must not be modified.
+
+    Examples:
+        >>> description = FrozenDescription({"title": "It", "year": 1986})
+        >>> description == Description({"title": "It", "year": 1986})
+        True
+        >>> description.values["year"] = 1987
+        Traceback (most recent call last):
+        ...
+        TypeError: 'mappingproxy' object does not support item assignment
+    """
+
+    _pb_class = query_pb2.Query.Instance
+
+    @property
+    def values(self) -> MappingProxyType:
+        """The read-only values of each attribute in the description."""
+        return self._values
+
+    @values.setter
+    def values(self, values: Dict[str, ATTRIBUTE_TYPES]) -> None:
+        self._values = MappingProxyType(values)
+
+    def __reduce__(self):
+        # the mapping proxy cannot be pickled.
+        return type(self), (dict(self.values), self.data_model)
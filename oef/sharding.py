@@ -0,0 +1,526 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.sharding
+~~~~~~~~~~~~
+
+This module contains a sharded implementation of :class:`~oef.proxy.OEFLocalProxy.LocalNode`,
+that runs the agents of a local simulation in many worker processes, to use more than one core.
+
+"""
+
+import asyncio
+import heapq
+import logging
+import multiprocessing
+import queue
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from oef.agents import Agent
+from oef.directory import SUBSCRIPTION_KEY
+from oef.messages import AgentMessage, Multicast, HANDLER_CALL
+from oef.proxy import OEFLocalProxy
+from oef.query import Query
+
+logger = logging.getLogger(__name__)
+
+"""The function that creates an agent, given its public key and the proxy to its shard."""
+AGENT_FACTORY = Callable[[str, OEFLocalProxy], Agent]
+
+"""The interval, in seconds, at which ShardedNode.stop() checks that the worker processes are still alive."""
+_POLL_INTERVAL = 0.1
+
+
+def shard_of(public_key: str, nb_shards: int) -> int:
+    """
+    Get the shard of an agent. The hash is the same in every process (unlike the built-in ``hash`` of strings).
+
+    :param public_key: the public key of the agent.
+    :param nb_shards: the number of shards.
+    :return: the index of the shard.
+
+    Examples:
+        >>> shard_of("agent_1", 4)
+        1
+    """
+    return zlib.crc32(public_key.encode("utf-8")) % nb_shards
+
+
+class ShardNode(OEFLocalProxy.LocalNode):
+    """
+    A shard of a :class:`~oef.sharding.ShardedNode`: a local node for the agents whose public key belongs to
+    the shard (see :func:`~oef.sharding.shard_of`), that exchanges the requests with the other shards
+    through their inboxes, i.e. ``multiprocessing`` queues.
+
+    * the messages to the agents of other shards are sent to their shard, that delivers them;
+    * the descriptions are registered in the shard of their agent, so the searches are sent to every shard,
+      and the results, that are disjoint and sorted, are merged;
+    * the subscriptions are sent to every shard, that sends the changes of its own descriptions.
+    """
+
+    def __init__(self, shard_id: int, inboxes: List[multiprocessing.Queue], **kwargs):
+        """
+        Initialize a shard.
+
+        :param shard_id: the index of the shard.
+        :param inboxes: the inboxes of all the shards, in the order of their index.
+        :param kwargs: the arguments of :class:`~oef.proxy.OEFLocalProxy.LocalNode`.
+        """
+        super().__init__(**kwargs)
+        self.shard_id = shard_id
+        self._inboxes = inboxes
+        self._next_search = 0
+        # for every pending search: the searcher, the search id, the number of missing results, and the results.
+        self._searches = {}  # type: Dict[int, Tuple[str, int, int, List[List[str]]]]
+        self._reader = None  # type: Optional[threading.Thread]
+
+    def _shard_of(self, public_key: str) -> int:
+        """Get the shard of an agent."""
+        return shard_of(public_key, len(self._inboxes))
+
+    def _send_to_shard(self, shard_id: int, request: tuple) -> None:
+        """Send a request to another shard."""
+        self._inboxes[shard_id].put_nowait(request)
+
+    def _send_to_other_shards(self, request: tuple) -> None:
+        """Send a request to all the other shards."""
+        for shard_id in range(len(self._inboxes)):
+            if shard_id != self.shard_id:
+                self._send_to_shard(shard_id, request)
+
+    def start_reader(self) -> None:
+        """
+        Start the thread that reads the inbox of the shard, and passes the requests to the event loop of the node.
+
+        :return: ``None``
+        """
+        inbox = self._inboxes[self.shard_id]
+
+        def read() -> None:
+            while True:
+                request = inbox.get()
+                if request is None:
+                    break
+                self.loop.call_soon_threadsafe(self._process_request, request)
+
+        self._reader = threading.Thread(target=read, name="shard-{}-reader".format(self.shard_id), daemon=True)
+        self._reader.start()
+
+    def stop_reader(self) -> None:
+        """
+        Stop the thread that reads the inbox of the shard.
+
+        :return: ``None``
+        """
+        if self._reader is not None:
+            self._inboxes[self.shard_id].put(None)
+            self._reader.join()
+            self._reader = None
+
+    def _process_request(self, request: tuple) -> None:
+        """
+        Process a request from another shard, with the handler of its kind in ``_REQUEST_HANDLERS``.
+
+        :param request: the kind of the request, followed by its arguments.
+        :return: ``None``
+        """
+        kind, args = request[0], request[1:]
+        handler = self._REQUEST_HANDLERS.get(kind)
+        if handler is None:
+            logger.warning("Shard {}: unknown request {}.".format(self.shard_id, kind))
+            return
+        try:
+            handler(self, *args)
+        except KeyError as e:
+            # e.g. a message to an agent that is not connected.
+            logger.warning("Shard {}: cannot process the request {}: {}".format(self.shard_id, kind, e))
+
+    def _deliver_message(self, origin: str, msg: AgentMessage) -> None:
+        """Handle a ``message`` request: deliver a message to an agent of this shard."""
+        super()._send_agent_message(origin, msg)
+
+    def _deliver_call(self, public_key: str, handler_call: HANDLER_CALL) -> None:
+        """Handle a ``call`` request: pass a handler call to an agent of this shard."""
+        self._queues[public_key].put_nowait(handler_call)
+
+    def _answer_search(self, shard_id: int, token: int, directory: str, query: Query) -> None:
+        """Handle a ``search`` request: search the directory of this shard, and send the result back."""
+        self._send_to_shard(shard_id, ("search_result", token, self._search(directory, query)))
+
+    def _subscribe_other_shard(self, public_key: str, subscription_id: int, query: Query) -> None:
+        """Handle a ``subscribe`` request: subscribe to the services of this shard for an agent of another shard."""
+        subscription_key = (public_key, subscription_id)
+        agents = self._service_subscriptions.subscribe(subscription_key, query, self._service_directory)
+        if agents:
+            self._send_search_update(subscription_key, agents, [])
+
+    def _unsubscribe_other_shard(self, public_key: str, subscription_id: int) -> None:
+        """Handle an ``unsubscribe`` request: cancel the subscription of an agent of another shard, if any."""
+        if (public_key, subscription_id) in self._service_subscriptions:
+            self._service_subscriptions.unsubscribe((public_key, subscription_id))
+
+    def _send_agent_message(self, origin: str, msg: AgentMessage) -> None:
+        shard_id = self._shard_of(msg.destination)
+        if shard_id == self.shard_id:
+            super()._send_agent_message(origin, msg)
+        else:
+            self._send_to_shard(shard_id, ("message", origin, msg))
+
+    def _send_multicast(self, origin: str, multicast: Multicast) -> None:
+        local_destinations = []
+        for msg in multicast.messages():
+            shard_id = self._shard_of(msg.destination)
+            if shard_id == self.shard_id:
+                local_destinations.append((msg.dialogue_id, msg.destination))
+            else:
+                self._send_to_shard(shard_id, ("message", origin, msg))
+        if local_destinations:
+            super()._send_multicast(origin, Multicast(multicast.msg, local_destinations))
+
+    def search_agents(self, public_key: str, search_id: int, query: Query) -> None:
+        """
+        Search the agents in the Agent Directories of all the shards, and send back the merged result.
+
+        :param public_key: the source of the search request.
+        :param search_id: the search identifier associated with the search request.
+        :param query: the query that constitutes the search.
+        :return: ``None``
+        """
+        self._scatter_search(public_key, search_id, "agents", query)
+
+    def search_services(self, public_key: str, search_id: int, query: Query) -> None:
+        """
+        Search the services in the Service Directories of all the shards, and send back the merged result.
+
+        :param public_key: the source of the search request.
+        :param search_id: the search identifier associated with the search request.
+        :param query: the query that constitutes the search.
+        :return: ``None``
+        """
+        self._scatter_search(public_key, search_id, "services", query)
+
+    def _scatter_search(self, public_key: str, search_id: int, directory: str, query: Query) -> None:
+        """
+        Send a search to all the shards, and search the directory of this shard.
+
+        :param public_key: the source of the search request.
+        :param search_id: the search identifier associated with the search request.
+        :param directory: the directory to search, ``"agents"`` or ``"services"``.
+        :param query: the query that constitutes the search.
+        :return: ``None``
+        """
+        token = self._next_search
+        self._next_search += 1
+        self._searches[token] = (public_key, search_id, len(self._inboxes), [])
+        self._send_to_other_shards(("search", self.shard_id, token, directory, query))
+        self._add_search_result(token, self._search(directory, query))
+
+    def _add_search_result(self, token: int, result: List[str]) -> None:
+        """
+        Add the result of a shard to a pending search, and send back the merged result when all the shards answered.
+
+        :param token: the identifier of the pending search.
+        :param result: the sorted result of the shard.
+        :return: ``None``
+        """
+        public_key, search_id, missing, results = self._searches[token]
+        results.append(result)
+        if missing > 1:
+            self._searches[token] = (public_key, search_id, missing - 1, results)
+            return
+        del self._searches[token]
+        # the keys are partitioned among the shards, so the results are disjoint.
+        self._send_search_result(public_key, search_id, list(heapq.merge(*results)))
+
+    def subscribe_services(self, public_key: str, subscription_id: int, query: Query) -> None:
+        """
+        Subscribe to the services of all the shards that satisfy a query. The first update contains the services
+        of this shard; the other shards send an update only if some of their services satisfy the query.
+
+        :param public_key: the public key of the subscriber.
+        :param subscription_id: the identifier of the subscription.
+        :param query: the query.
+        :return: ``None``
+        """
+        super().subscribe_services(public_key, subscription_id, query)
+        self._send_to_other_shards(("subscribe", public_key, subscription_id, query))
+
+    def unsubscribe(self, public_key: str, subscription_id: int) -> None:
+        """
+        Cancel a subscription in all the shards.
+
+        :param public_key: the public key of the subscriber.
+        :param subscription_id: the identifier of the subscription.
+        :return: ``None``
+        :raises ValueError: if there is no such subscription.
+        """
+        super().unsubscribe(public_key, subscription_id)
+        self._send_to_other_shards(("unsubscribe", public_key, subscription_id))
+
+    def _send_search_update(self, subscription_key: SUBSCRIPTION_KEY, added: List[str], removed: List[str]) -> None:
+        public_key, subscription_id = subscription_key
+        shard_id = self._shard_of(public_key)
+        if shard_id == self.shard_id:
+            super()._send_search_update(subscription_key, added, removed)
+        else:
+            handler_call = ("on_search_update", (subscription_id, added, removed))  # type: HANDLER_CALL
+            self._send_to_shard(shard_id, ("call", public_key, handler_call))
+
+    """The handlers of the requests from the other shards, keyed on their kind."""
+    _REQUEST_HANDLERS = {
+        "message": _deliver_message,
+        "call": _deliver_call,
+        "search": _answer_search,
+        "search_result": _add_search_result,
+        "subscribe": _subscribe_other_shard,
+        "unsubscribe": _unsubscribe_other_shard,
+    }  # type: Dict[str, Callable[..., None]]
+
+
+def _run_shard(shard_id: int, inboxes: List[multiprocessing.Queue], public_keys: List[str],
+               agent_factory: AGENT_FACTORY, setup: Optional[Callable[[Agent], None]],
+               teardown: Optional[Callable[[Agent], object]], barrier: multiprocessing.Barrier,
+               stop_event: multiprocessing.Event, results: multiprocessing.Queue, node_kwargs: dict) -> None:
+    """
+    The main function of a worker process: run a shard and its agents, until the stop event is set,
+    then send ``(shard_id, teardown_results, error)`` to the results queue.
+
+    If the shard fails, the barrier is aborted (so that the other shards do not wait for it) and the error is sent
+    before the exception is raised again. A shard that finds the barrier broken sends neither results nor error.
+
+    :param results: the queue where the results of the shard are sent.
+    :return: ``None``
+
+    The other parameters are the ones of :func:`~oef.sharding._run_agents`.
+    """
+    try:
+        teardown_results = _run_agents(shard_id, inboxes, public_keys, agent_factory, setup, teardown,
+                                       barrier, stop_event, node_kwargs)
+        results.put((shard_id, teardown_results, None))
+    except threading.BrokenBarrierError:
+        results.put((shard_id, None, None))
+    except BaseException as e:
+        barrier.abort()
+        results.put((shard_id, None, "{}: {}".format(type(e).__name__, e)))
+        raise
+
+
+def _run_agents(shard_id: int, inboxes: List[multiprocessing.Queue], public_keys: List[str],
+                agent_factory: AGENT_FACTORY, setup: Optional[Callable[[Agent], None]],
+                teardown: Optional[Callable[[Agent], object]], barrier: multiprocessing.Barrier,
+                stop_event: multiprocessing.Event, node_kwargs: dict) -> Dict[str, object]:
+    """
+    Run a shard and its agents, until the stop event is set.
+
+    :param shard_id: the index of the shard.
+    :param inboxes: the inboxes of all the shards.
+    :param public_keys: the public keys of the agents of the shard.
+    :param agent_factory: the function that creates an agent.
+    :param setup: the function called with every agent, once the agents of all the shards are connected.
+    :param teardown: the function called with every agent when the shard stops, whose result is sent back.
+    :param barrier: the barrier that waits for the agents of all the shards to be connected.
+    :param stop_event: the event that stops the shard.
+    :param node_kwargs: the arguments of :class:`~oef.proxy.OEFLocalProxy.LocalNode`.
+    :return: the results of ``teardown``, keyed by public key.
+    :raises threading.BrokenBarrierError: if another shard failed, or the agents did not connect in time.
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    node = ShardNode(shard_id, inboxes, **node_kwargs)
+    agents = [agent_factory(public_key, OEFLocalProxy(public_key, node)) for public_key in public_keys]
+    for agent in agents:
+        agent.connect()
+    barrier.wait()
+
+    node_task = asyncio.ensure_future(node.run())
+    node.start_reader()
+    if setup is not None:
+        for agent in agents:
+            setup(agent)
+    agent_tasks = [asyncio.ensure_future(agent.async_run()) for agent in agents]
+
+    stopped = loop.create_future()
+    threading.Thread(target=lambda: (stop_event.wait(), loop.call_soon_threadsafe(stopped.set_result, None)),
+                     daemon=True).start()
+    loop.run_until_complete(stopped)
+
+    for agent in agents:
+        agent.stop()
+    loop.run_until_complete(asyncio.gather(*agent_tasks, return_exceptions=True))
+    node.stop_reader()
+    node_task.cancel()
+    loop.run_until_complete(asyncio.gather(node_task, return_exceptions=True))
+    teardown_results = {agent.public_key: teardown(agent) if teardown is not None else None for agent in agents}
+    loop.close()
+    return teardown_results
+
+
+class ShardedNode:
+    """
+    A local OEF Node whose agents are partitioned by public key among many worker processes,
+    each one running a :class:`~oef.sharding.ShardNode` and the agents of its shard.
+
+    The agents are created in the workers by ``agent_factory``, so it must be picklable (e.g. a module-level
+    function or class) if the start method of ``multiprocessing`` is not ``fork``. Once all the agents are
+    connected, ``setup`` is called with every agent (e.g. to register it, or to send the first messages), then the
+    agents run until :func:`~oef.sharding.ShardedNode.stop` is called, that returns the results of ``teardown``.
+
+    The messages and the searches across the shards are pickled, so they are slower than the ones within a shard.
+
+    If a worker process fails (e.g. ``agent_factory`` raises), the other ones stop waiting for it, and
+    :func:`~oef.sharding.ShardedNode.stop` raises a :class:`RuntimeError` that names the failed shards.
+    """
+
+    def __init__(self, nb_shards: int, public_keys: List[str], agent_factory: AGENT_FACTORY,
+                 setup: Optional[Callable[[Agent], None]] = None,
+                 teardown: Optional[Callable[[Agent], object]] = None, connect_timeout: Optional[float] = 60.0,
+                 **node_kwargs):
+        """
+        Initialize a sharded node.
+
+        :param nb_shards: the number of shards, i.e. of worker processes.
+        :param public_keys: the public keys of the agents.
+        :param agent_factory: the function that creates an agent, given its public key and the proxy to its shard.
+        :param setup: the function called with every agent, once the agents of all the shards are connected.
+        :param teardown: the function called with every agent when the node stops, e.g. to collect statistics.
+        :param connect_timeout: the time, in seconds, the shards wait for the agents of all the shards to connect,
+                                or ``None`` to wait forever.
+        :param node_kwargs: the arguments of :class:`~oef.proxy.OEFLocalProxy.LocalNode`, e.g. ``search_cache_size``.
+        :raises ValueError: if the number of shards is not positive.
+        """
+        if nb_shards < 1:
+            raise ValueError("Invalid input value for type '{}': the number of shards must be at least 1."
+                             .format(type(self).__name__))
+        self.nb_shards = nb_shards
+        self.public_keys = list(public_keys)
+        self.agent_factory = agent_factory
+        self.setup = setup
+        self.teardown = teardown
+        self.connect_timeout = connect_timeout
+        self.node_kwargs = node_kwargs
+        self._processes = []  # type: List[multiprocessing.Process]
+        self._stop_event = None
+        self._results = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._processes:
+            self.stop()
+
+    def start(self) -> None:
+        """
+        Start the worker processes.
+
+        :return: ``None``
+        """
+        inboxes = [multiprocessing.Queue() for _ in range(self.nb_shards)]
+        barrier = multiprocessing.Barrier(self.nb_shards, timeout=self.connect_timeout)
+        self._stop_event = multiprocessing.Event()
+        self._results = multiprocessing.Queue()
+        shards = [[] for _ in range(self.nb_shards)]  # type: List[List[str]]
+        for public_key in self.public_keys:
+            shards[shard_of(public_key, self.nb_shards)].append(public_key)
+
+        self._processes = [multiprocessing.Process(target=_run_shard, name="shard-{}".format(shard_id),
+                                                   args=(shard_id, inboxes, shards[shard_id], self.agent_factory,
+                                                         self.setup, self.teardown, barrier, self._stop_event,
+                                                         self._results, self.node_kwargs))
+                           for shard_id in range(self.nb_shards)]
+        for process in self._processes:
+            process.start()
+
+    def stop(self) -> Dict[str, object]:
+        """
+        Stop the agents and the worker processes.
+
+        :return: the result of ``teardown`` for every agent, keyed by public key.
+        :raises RuntimeError: if a worker process failed, or the agents of the shards did not connect in time.
+        """
+        self._stop_event.set()
+        results = {}  # type: Dict[str, object]
+        errors = {}  # type: Dict[int, Optional[str]]
+        pending = set(range(self.nb_shards))
+        try:
+            while pending:
+                try:
+                    self._collect(self._results.get(timeout=_POLL_INTERVAL), pending, results, errors)
+                except queue.Empty:
+                    self._collect_dead(pending, results, errors)
+        finally:
+            for process in self._processes:
+                process.join()
+            self._processes = []
+
+        failures = {shard_id: error for shard_id, error in errors.items() if error is not None}
+        if failures:
+            raise RuntimeError("; ".join("Shard {} failed: {}".format(shard_id, error)
+                                         for shard_id, error in sorted(failures.items())))
+        if errors:
+            raise RuntimeError("The agents of the shards did not connect within {} seconds."
+                               .format(self.connect_timeout))
+        return results
+
+    @staticmethod
+    def _collect(message: Tuple[int, Optional[Dict[str, object]], Optional[str]], pending: Set[int],
+                 results: Dict[str, object], errors: Dict[int, Optional[str]]) -> None:
+        """
+        Record the message of a worker process.
+
+        :param message: the index of the shard, the results of ``teardown`` and the error of the shard.
+        :param pending: the shards whose message is still expected.
+        :param results: the results of ``teardown`` of all the shards.
+        :param errors: the errors of the shards, ``None`` for the ones that found the barrier broken.
+        :return: ``None``
+        """
+        shard_id, shard_results, error = message
+        pending.discard(shard_id)
+        if shard_results is not None:
+            results.update(shard_results)
+        else:
+            errors[shard_id] = error
+
+    def _collect_dead(self, pending: Set[int], results: Dict[str, object], errors: Dict[int, Optional[str]]) -> None:
+        """
+        Record the worker processes that exited without sending their message, e.g. because they were killed.
+
+        :param pending: the shards whose message is still expected.
+        :param results: the results of ``teardown`` of all the shards.
+        :param errors: the errors of the shards.
+        :return: ``None``
+        """
+        dead = [shard_id for shard_id in pending if self._processes[shard_id].exitcode not in (None, 0)]
+        # a worker flushes its message before it exits, so the messages of the dead workers can be read now.
+        while True:
+            try:
+                self._collect(self._results.get_nowait(), pending, results, errors)
+            except queue.Empty:
+                break
+        for shard_id in dead:
+            if shard_id in pending:
+                pending.discard(shard_id)
+                errors[shard_id] = "exit code {}".format(self._processes[shard_id].exitcode)
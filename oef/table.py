@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+
+"""
+
+oef.table
+~~~~~~~~~
+
+This module contains a columnar store of descriptions, used to check a query against many descriptions at once
+(see :func:`~oef.query.Query.check_batch`).
+
+It requires NumPy, that can be installed with ``pip install oef[numpy]``.
+
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from oef.helpers import EARTH_RADIUS
+from oef.query import ConstraintExpr, Constraint, And, Or, Not, Relation, Eq, NotEq, Lt, LtEq, Gt, GtEq, Range, \
+    Set, In, NotIn, Distance, Query
+from oef.schema import Description, Location
+
+"""A column: the values of an attribute with a given type, and the mask of the descriptions that have them."""
+COLUMN = Tuple[np.ndarray, np.ndarray]
+
+"""The NumPy types of the columns. The other values (e.g. ``str``, or ``int`` out of 64 bits) are stored as objects."""
+_DTYPES = {bool: np.bool_, int: np.int64, float: np.float64}
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class DescriptionTable:
+    """
+    A columnar store of descriptions. For every attribute name and type of value, the table has an array
+    with the values of the descriptions, and a mask of the descriptions that have a value of that type.
+    The :class:`~oef.schema.Location` values are stored in two arrays, for the latitudes and the longitudes.
+
+    The table is immutable: to check a query against other descriptions, build another table.
+
+    Examples:
+        >>> table = DescriptionTable([Description({"year": 1990, "author": "Stephen King"}),
+        ...                           Description({"year": 2000, "author": "George Orwell"}),
+        ...                           Description({"author": "Stephen King"})])
+        >>> Query([Constraint("year", Gt(1980)), Constraint("author", Eq("Stephen King"))]).check_batch(table)
+        array([ True, False, False])
+    """
+
+    def __init__(self, descriptions: List[Description]) -> None:
+        """
+        Initialize the table.
+
+        :param descriptions: the descriptions, in the order of the rows of the table.
+        """
+        self.descriptions = list(descriptions)
+        self._columns = self._build_columns(self.descriptions)  # type: Dict[Tuple[str, type], COLUMN]
+
+    def __len__(self) -> int:
+        """Get the number of descriptions in the table."""
+        return len(self.descriptions)
+
+    def column(self, attribute_name: str, value_type: type) -> Optional[COLUMN]:
+        """
+        Get the column of an attribute.
+
+        :param attribute_name: the name of the attribute.
+        :param value_type: the type of the values.
+        :return: the values and the mask of the column, or ``None`` if no description has such values.
+               | The values of a :class:`~oef.schema.Location` column are the pair of latitudes and longitudes.
+        """
+        return self._columns.get((attribute_name, value_type))
+
+    def check(self, query: Query) -> np.ndarray:
+        """
+        Check which descriptions satisfy a query.
+
+        :param query: the query.
+        :return: an array of ``bool``, ``True`` for the descriptions that satisfy the query.
+        :raises TypeError: if the query orders values that cannot be compared (e.g. a Range over Location values).
+                         | Unlike :func:`~oef.query.Query.check`, every constraint is evaluated, so the error is
+                         | raised even if the descriptions do not satisfy the other constraints.
+        """
+        return self._check_all(query.constraints)
+
+    def _check_all(self, expressions: List[ConstraintExpr]) -> np.ndarray:
+        result = np.ones(len(self), dtype=bool)
+        for expression in expressions:
+            result &= self._check(expression)
+        return result
+
+    def _check(self, expression: ConstraintExpr) -> np.ndarray:
+        """
+        Check which descriptions satisfy a constraint expression.
+        Unknown constraint expressions are checked description by description.
+
+        :param expression: the constraint expression.
+        :return: an array of ``bool``.
+        """
+        if isinstance(expression, And):
+            return self._check_all(expression.constraints)
+        elif isinstance(expression, Or):
+            result = np.zeros(len(self), dtype=bool)
+            for c in expression.constraints:
+                result |= self._check(c)
+            return result
+        elif isinstance(expression, Not):
+            return ~self._check(expression.constraint)
+        elif isinstance(expression, Constraint):
+            result = self._check_constraint(expression)
+            if result is not None:
+                return result
+        return np.fromiter((expression.check(d) for d in self.descriptions), dtype=bool, count=len(self))
+
+    def _check_constraint(self, constraint: Constraint) -> Optional[np.ndarray]:
+        """
+        Check which descriptions satisfy a constraint.
+
+        :param constraint: the constraint.
+        :return: an array of ``bool``, or ``None`` if the constraint type is not supported.
+        """
+        constraint_type = constraint.constraint
+        if not isinstance(constraint_type, (Relation, Range, Set, Distance)):
+            return None
+
+        value_type = constraint_type._get_type()
+        column = self.column(constraint.attribute_name, value_type) if value_type is not None else None
+        if column is None:
+            return np.zeros(len(self), dtype=bool)
+        if isinstance(constraint_type, (Relation, Range)) and constraint_type._cost() is None:
+            raise TypeError("Cannot order the values of the constraint: {}".format(constraint_type))
+
+        values, mask = column
+        if value_type == Location:
+            result = self._check_locations(constraint_type, values[0], values[1])
+        elif isinstance(constraint_type, Relation):
+            result = self._compare(values, type(constraint_type), constraint_type.value)
+        elif isinstance(constraint_type, Range):
+            left, right = constraint_type.values
+            result = self._compare(values, GtEq, left) & self._compare(values, LtEq, right)
+        else:
+            result = self._check_set(constraint_type, values)
+        return result & mask
+
+    @staticmethod
+    def _compare(values: np.ndarray, relation_type: type, constant) -> np.ndarray:
+        """Compare an array with a constant, with the operator of a relation type."""
+        if values.dtype != object and not (_fits_dtype(constant) and _DTYPES[type(constant)] == values.dtype):
+            # compare in Python, e.g. to avoid the loss of precision of the integers converted to floats.
+            values = values.astype(object)
+        if relation_type == Eq:
+            result = values == constant
+        elif relation_type == NotEq:
+            result = values != constant
+        elif relation_type == Lt:
+            result = values < constant
+        elif relation_type == LtEq:
+            result = values <= constant
+        elif relation_type == Gt:
+            result = values > constant
+        else:
+            result = values >= constant
+        return np.asarray(result, dtype=bool)
+
+    @staticmethod
+    def _check_set(set_: Set, values: np.ndarray) -> np.ndarray:
+        if values.dtype != object and all(_fits_dtype(v) for v in set_.values):
+            result = np.isin(values, list(set_.values))
+        else:
+            set_values = set_._frozen_values()
+            result = np.fromiter((v in set_values for v in values), dtype=bool, count=len(values))
+        return ~result if isinstance(set_, NotIn) else result
+
+    def _check_locations(self, constraint_type, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        if isinstance(constraint_type, Distance):
+            center = constraint_type.center
+            distances = _haversine(center.latitude, center.longitude, latitudes, longitudes)
+            return distances <= constraint_type.distance
+        elif isinstance(constraint_type, (Eq, NotEq)):
+            result = self._is_location(constraint_type.value, latitudes, longitudes)
+            return result if isinstance(constraint_type, Eq) else ~result
+        elif isinstance(constraint_type, Set):
+            result = np.zeros(len(latitudes), dtype=bool)
+            for location in constraint_type.values:
+                result |= self._is_location(location, latitudes, longitudes)
+            return result if isinstance(constraint_type, In) else ~result
+        raise TypeError("Cannot order the values of the constraint: {}".format(constraint_type))
+
+    @staticmethod
+    def _is_location(location: Location, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        if type(location) != Location:
+            return np.zeros(len(latitudes), dtype=bool)
+        return (latitudes == location.latitude) & (longitudes == location.longitude)
+
+    @staticmethod
+    def _build_columns(descriptions: List[Description]) -> Dict[Tuple[str, type], COLUMN]:
+        """
+        Build the columns of the table.
+
+        :param descriptions: the descriptions.
+        :return: the columns, by attribute name and type of the values.
+        """
+        rows_by_column = defaultdict(list)  # type: Dict[Tuple[str, type], List[Tuple[int, object]]]
+        for row, description in enumerate(descriptions):
+            for name, value in description.values.items():
+                rows_by_column[(name, type(value))].append((row, value))
+
+        columns = {}
+        for (name, value_type), rows in rows_by_column.items():
+            indexes = np.fromiter((row for row, _ in rows), dtype=np.int64, count=len(rows))
+            mask = np.zeros(len(descriptions), dtype=bool)
+            mask[indexes] = True
+            if value_type == Location:
+                latitudes = np.zeros(len(descriptions), dtype=np.float64)
+                longitudes = np.zeros(len(descriptions), dtype=np.float64)
+                latitudes[indexes] = [value.latitude for _, value in rows]
+                longitudes[indexes] = [value.longitude for _, value in rows]
+                columns[(name, value_type)] = ((latitudes, longitudes), mask)
+                continue
+
+            dtype = _DTYPES[value_type] if all(_fits_dtype(value) for _, value in rows) else object
+            # the missing values are filled with a value of the same type, so that they can be compared.
+            values = np.full(len(descriptions), rows[0][1], dtype=dtype)
+            if dtype == object:
+                # assign one by one, so that NumPy does not try to interpret sequences (e.g. strings).
+                for row, value in rows:
+                    values[row] = value
+            else:
+                values[indexes] = [value for _, value in rows]
+            columns[(name, value_type)] = (values, mask)
+        return columns
+
+
+def _fits_dtype(value) -> bool:
+    """Check whether a value can be stored in a NumPy array of the type associated with its own type."""
+    return type(value) in _DTYPES and (type(value) != int or _INT64_MIN <= value <= _INT64_MAX)
+
+
+def _haversine(lat1: float, lon1: float, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """
+    Compute the Haversine distance between a location and an array of locations.
+    The same as :func:`~oef.helpers.haversine`, on arrays.
+    """
+    lat1, lon1, lat2, lon2 = np.radians(lat1), np.radians(lon1), np.radians(lat2), np.radians(lon2)
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    sin_lat_squared = np.sin(dlat * 0.5) * np.sin(dlat * 0.5)
+    sin_lon_squared = np.sin(dlon * 0.5) * np.sin(dlon * 0.5)
+    with np.errstate(invalid="ignore"):
+        computation = np.arcsin(np.sqrt(sin_lat_squared + sin_lon_squared * np.cos(lat1) * np.cos(lat2)))
+
+    return 2 * EARTH_RADIUS * computation
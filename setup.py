@@ -132,6 +132,7 @@ setup(
         'Programming Language :: Python :: 3.7',
     ],
     install_requires=["protobuf"],
+    extras_require={"numpy": ["numpy"]},
     tests_require=["tox"],
     python_requires='>=3.5',
     license=about['__license__'],
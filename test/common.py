@@ -53,6 +53,9 @@ class AgentTest(Agent):
     def on_search_result(self, search_id: int, agents: List[str]):
         self._process_message((search_id, sorted(agents)))
 
+    def on_search_update(self, subscription_id: int, added: List[str], removed: List[str]):
+        self._process_message((subscription_id, sorted(added), sorted(removed)))
+
     def on_cfp(self, msg_id: int, dialogue_id: int, origin: str, target: int, query: CFP_TYPES):
         self._process_message((msg_id, dialogue_id, origin, target, query))
 
@@ -73,15 +76,16 @@ class AgentTest(Agent):
 
 
 @contextlib.contextmanager
-def setup_local_proxies(n: int, prefix: str) -> List[OEFNetworkProxy]:
+def setup_local_proxies(n: int, prefix: str, wire_faithful: bool = False) -> List[OEFNetworkProxy]:
     """
     Set up a list of :class:`oef.proxy.OEFLocalProxy`.
 
     :param n: the number of proxies to set up.
     :param prefix: the prefix to add to the proxies' public keys.
+    :param wire_faithful: whether the local node delivers the messages serialized.
     """
     public_key_prefix = prefix + "-" if prefix else ""
-    local_node = OEFLocalProxy.LocalNode()
+    local_node = OEFLocalProxy.LocalNode(wire_faithful=wire_faithful)
     proxies = [OEFLocalProxy("{}agent-{}".format(public_key_prefix, i), local_node) for i in range(n)]
     try:
         asyncio.ensure_future(local_node.run())
@@ -17,9 +17,11 @@
 #   limitations under the License.
 #
 # ------------------------------------------------------------------------------
+import asyncio
 import inspect
 import os
 import subprocess
+import threading
 import time
 
 from hypothesis import settings
@@ -37,12 +39,42 @@ PATH_TO_NODE_EXEC = os.path.join(*FULL_PATH)
 
 
 class NetworkOEFNode:
+    """
+    Run an OEF Node for the tests: the OEF Node built by ``scripts/setup_test.py`` if it exists,
+    otherwise the pure-Python :class:`~oef.node.OEFNode`, in a thread with its own event loop.
+    """
 
     def __enter__(self):
-        FNULL = open(os.devnull, 'w')
-        self.p = subprocess.Popen(PATH_TO_NODE_EXEC, stdout=FNULL, stderr=subprocess.STDOUT)
-        time.sleep(0.01)
+        if os.path.exists(PATH_TO_NODE_EXEC):
+            FNULL = open(os.devnull, 'w')
+            self.p = subprocess.Popen(PATH_TO_NODE_EXEC, stdout=FNULL, stderr=subprocess.STDOUT)
+            time.sleep(0.01)
+        else:
+            self.p = None
+            self._start_python_node()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.p.terminate()
-        self.p.kill()
+        if self.p is not None:
+            self.p.terminate()
+            self.p.kill()
+        else:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    def _start_python_node(self):
+        from oef.node import OEFNode
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            node = OEFNode(loop=self.loop)
+            self.loop.run_until_complete(node.start())
+            started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(node.stop())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
@@ -27,7 +27,7 @@ from typing import List, Optional, Type
 
 import hypothesis
 from hypothesis.strategies import integers, sampled_from, composite, text, booleans, one_of, none, lists, tuples,\
-                                  floats, register_type_strategy
+                                  floats, register_type_strategy, recursive, dictionaries
 
 from oef.query import Eq, NotEq, Lt, LtEq, Gt, GtEq, Range, In, NotIn, And, Or, Constraint, Query, Not, Distance
 from oef.schema import AttributeSchema, DataModel, Description, Location, ATTRIBUTE_TYPES
@@ -238,6 +238,55 @@ def queries(draw):
     return Query(draw(lists(constraint_expressions(attributes), min_size=1, max_size=3)), data_model)
 
 
+@composite
+def queries_and_descriptions(draw):
+    """Draw a query and a list of descriptions over the same data model."""
+    data_model = draw(data_models(min_size=1))
+    attributes = data_model.attribute_schemas
+    query = Query(draw(lists(constraint_expressions(attributes), min_size=1, max_size=3)), data_model)
+    descriptions = [Description(values, data_model) for values in draw(lists(schema_instances(attributes)))]
+    return query, descriptions
+
+
+# few attribute names and values, so that the constraints of a query often overlap (e.g. two bounds on "a").
+overlapping_attribute_names = sampled_from(["a", "b"])
+overlapping_value_strategies = [integers(min_value=-3, max_value=3),
+                                sampled_from([-1.5, 0.0, 0.5, float("nan")]),
+                                sampled_from(["a", "b", "c"]),
+                                booleans(),
+                                sampled_from([Location(0.0, 0.0), Location(1.0, 1.0)])]
+
+
+@composite
+def overlapping_constraints(draw):
+    values = draw(sampled_from(overlapping_value_strategies))
+    constraint_type = draw(one_of(tuples(relation_types, values).map(lambda x: x[0](x[1])),
+                                  tuples(values, values).map(Range),
+                                  tuples(set_types, lists(values, max_size=3)).map(lambda x: x[0](x[1])),
+                                  distances()))
+    return Constraint(draw(overlapping_attribute_names), constraint_type)
+
+
+overlapping_constraint_expressions = recursive(
+    overlapping_constraints(),
+    lambda children: one_of(lists(children, min_size=2, max_size=3).map(And),
+                            lists(children, min_size=2, max_size=3).map(Or),
+                            children.map(Not)),
+    max_leaves=8)
+
+
+@composite
+def overlapping_queries_and_descriptions(draw):
+    """
+    Draw a query, without data model, whose constraints often overlap,
+    and a list of descriptions with the same attribute names and values.
+    """
+    query = Query(draw(lists(overlapping_constraint_expressions, min_size=1, max_size=4)))
+    descriptions = [Description(values) for values in draw(lists(dictionaries(
+        overlapping_attribute_names, one_of(*overlapping_value_strategies), max_size=2)))]
+    return query, descriptions
+
+
 hypothesis.strategies.register_type_strategy(AttributeSchema, attributes_schema)
 hypothesis.strategies.register_type_strategy(DataModel, data_models)
 hypothesis.strategies.register_type_strategy(Description, descriptions)
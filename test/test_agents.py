@@ -20,8 +20,10 @@ import asyncio
 from unittest.mock import patch
 
 from oef.agents import OEFAgent
-from oef.query import Query, Constraint, Eq
+from oef.messages import LazyProposals
+from oef.query import Query, Constraint, Eq, LazyQuery
 from oef.schema import Description, AttributeSchema
+from .common import AgentTest, setup_local_proxies
 from .conftest import _ASYNCIO_DELAY, NetworkOEFNode
 
 
@@ -163,3 +165,109 @@ def test_agent_on_dialogue_error_handler_warning():
 
             mock.assert_called_with("You should implement on_dialogue_error in your OEFAgent class.")
 
+
+
+def test_lazy_payloads():
+    """Test that an agent with lazy_payloads receives lazy queries and proposals, equal to the ones sent."""
+
+    class LazyAgentTest(AgentTest):
+        lazy_payloads = True
+
+    query = Query([Constraint("foo", Eq(True))])
+    proposals = [Description({"foo": True}), Description({"foo": False})]
+
+    # the payloads are decoded lazily only when they are delivered serialized.
+    with setup_local_proxies(1, "test_lazy_payloads", wire_faithful=True) as proxies:
+        agent = LazyAgentTest(proxies[0])
+        agent.connect()
+
+        agent.send_cfp(0, 0, agent.public_key, 0, query)
+        agent.send_propose(1, 0, agent.public_key, 0, proposals)
+
+        asyncio.ensure_future(agent.async_run())
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+        agent.stop()
+
+    (_, _, _, _, actual_query), (_, _, _, _, actual_proposals) = agent.received_msg
+    assert isinstance(actual_query, LazyQuery)
+    assert isinstance(actual_proposals, LazyProposals)
+    assert query == actual_query
+    assert proposals == list(actual_proposals)
+
+
+def test_coroutine_handlers():
+    """Test that coroutine handlers of different dialogues run concurrently,
+    while the messages of the same dialogue are handled in order."""
+
+    class AsyncAgentTest(AgentTest):
+
+        async def on_message(self, msg_id: int, dialogue_id: int, origin: str, content: bytes):
+            if dialogue_id == 0:
+                await asyncio.sleep(_ASYNCIO_DELAY / 2)
+            self.received_msg.append((msg_id, dialogue_id, origin, content))
+
+    with setup_local_proxies(1, "test_coroutine_handlers") as proxies:
+        agent = AsyncAgentTest(proxies[0])
+        agent.connect()
+
+        agent.send_message(0, 0, agent.public_key, b"a")
+        agent.send_message(1, 0, agent.public_key, b"b")
+        agent.send_message(2, 1, agent.public_key, b"c")
+
+        asyncio.ensure_future(agent.async_run())
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY * 2))
+        agent.stop()
+
+    assert [2, 0, 1] == [msg_id for msg_id, _, _, _ in agent.received_msg]
+
+
+def test_coroutine_search_results():
+    """Test that a slow coroutine handling the result of a search does not delay the results of the other searches,
+    while the results of the same search are handled in order."""
+
+    class AsyncAgentTest(AgentTest):
+
+        async def on_search_result(self, search_id: int, agents):
+            if search_id == 0:
+                await asyncio.sleep(_ASYNCIO_DELAY / 2)
+            self.received_msg.append(search_id)
+
+    with setup_local_proxies(1, "test_coroutine_search_results") as proxies:
+        agent = AsyncAgentTest(proxies[0])
+        agent.connect()
+
+        query = Query([Constraint("foo", Eq(True))])
+        for search_id in [0, 0, 1]:
+            agent.search_services(search_id, query)
+
+        asyncio.ensure_future(agent.async_run())
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY * 2))
+        agent.stop()
+
+    assert [1, 0, 0] == agent.received_msg
+
+
+def test_broadcast():
+    """Test that the messages broadcast through the local node are delivered to every destination,
+    each one in its own dialogue."""
+    query = Query([Constraint("foo", Eq(True))])
+
+    with setup_local_proxies(3, "test_broadcast") as proxies:
+        agents = [AgentTest(proxy) for proxy in proxies]
+        for agent in agents:
+            agent.connect()
+
+        destinations = [(i, agent.public_key) for i, agent in enumerate(agents[1:])]
+        agents[0].broadcast_cfp(0, destinations, 0, query)
+        agents[0].broadcast_message(1, destinations, b"hello")
+
+        for agent in agents:
+            asyncio.ensure_future(agent.async_run())
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+        for agent in agents:
+            agent.stop()
+
+    origin = agents[0].public_key
+    assert [] == agents[0].received_msg
+    for i, agent in enumerate(agents[1:]):
+        assert [(0, i, origin, 0, query), (1, i, origin, b"hello")] == agent.received_msg
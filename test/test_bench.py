@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import json
+
+import pytest
+
+from oef.bench import run_benchmark, main, WORKLOADS, PROXIES
+
+
+class TestRunBenchmark:
+
+    @pytest.mark.parametrize("proxy", PROXIES)
+    @pytest.mark.parametrize("workload", WORKLOADS)
+    def test_workloads(self, workload, proxy):
+        """Test that every workload runs on every proxy, and that the results are consistent."""
+        nb_buyers = 2
+        report = run_benchmark(workload, nb_sellers=2, nb_buyers=nb_buyers, proxy=proxy, duration=0.2, warmup=0.05)
+        results = report["results"]
+
+        assert workload == report["config"]["workload"]
+        assert results["requests"] > 0
+        messages_per_request = {"fipa": 3, "message": 2, "search": 1}[workload]
+        # the request in flight of every buyer may be partially counted, at the start and at the end of the measure.
+        assert abs(results["messages"] - messages_per_request * results["requests"]) \
+            <= 2 * messages_per_request * nb_buyers
+        assert 0 < results["latency_p50_ms"] <= results["latency_p99_ms"]
+
+    def test_invalid_workload(self):
+        with pytest.raises(ValueError, match="Workload not valid"):
+            run_benchmark("unknown")
+
+    def test_main_writes_json(self, tmpdir):
+        """Test that the command line saves the report as JSON."""
+        output = str(tmpdir.join("report.json"))
+        main(["--workload", "message", "--sellers", "1", "--buyers", "1", "--duration", "0.1", "--warmup", "0",
+              "--output", output])
+        with open(output) as f:
+            report = json.load(f)
+        assert {"config", "results", "environment"} == set(report.keys())
+        assert report["results"]["messages_per_second"] > 0
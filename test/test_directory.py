@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+from typing import List, Tuple, Union, Type
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import composite, lists, integers, sampled_from, floats
+
+from oef.directory import Directory, LocationIndex, SearchCache, Subscriptions
+from oef.query import Query, ConstraintExpr, Constraint, Eq, In, Gt, Range, And, Or, Not, Distance, Lt, GtEq, LtEq
+from oef.schema import Description, Location
+from test.strategies import data_models, schema_instances, constraint_expressions, locations
+
+
+@composite
+def directory_contents(draw):
+    """Draw a list of (key, description) entries over a data model, and a query over the same data model."""
+    data_model = draw(data_models(min_size=1))
+    attributes = data_model.attribute_schemas
+    keys = ["agent_{}".format(i) for i in range(draw(integers(min_value=1, max_value=5)))]
+    entries = [(draw(sampled_from(keys)), Description(values, data_model))
+               for values in draw(lists(schema_instances(attributes), max_size=10))]
+    query = Query(draw(lists(constraint_expressions(attributes), min_size=1, max_size=3)), data_model)
+    return entries, query
+
+
+@composite
+def located_entries(draw):
+    """Draw a list of (key, description) entries with a location, and a Distance query of a few hundreds of km."""
+    entries = [("agent_{}".format(i), Description({"position": location}))
+               for i, location in enumerate(draw(lists(locations(), max_size=30)))]
+    query = Query([Constraint("position", Distance(draw(locations()), draw(floats(min_value=0.0, max_value=500.0))))])
+    return entries, query
+
+
+def search_outcome(directory: Directory, query: Query) -> Union[List[str], Type[Exception]]:
+    """The result of a search, or the type of the exception it raises."""
+    try:
+        return directory.search(query)
+    except TypeError:
+        return TypeError
+
+
+def brute_force_search(entries: List[Tuple[str, Description]], query: Query) -> List[str]:
+    """The search without indexes: check the query against every description."""
+    return sorted(set(key for key, description in entries if query.check(description)))
+
+
+class TestDirectory:
+
+    @given(directory_contents())
+    def test_search_equivalent_to_brute_force(self, contents):
+        """Test that the indexed search returns the same result of checking every description."""
+        entries, query = contents
+        try:
+            expected = brute_force_search(entries, query)
+        except TypeError:
+            # e.g. a Range over Location values, that cannot be compared.
+            return
+
+        directory = Directory()
+        for key, description in entries:
+            directory.add(key, description)
+
+        assert expected == directory.search(query)
+
+    @given(directory_contents())
+    def test_search_equivalent_to_brute_force_after_removal(self, contents):
+        """Test that the indexes are correctly updated when the descriptions are removed."""
+        entries, query = contents
+        removed, kept = entries[::2], entries[1::2]
+        try:
+            expected = brute_force_search(kept, query)
+        except TypeError:
+            return
+
+        directory = Directory()
+        for key, description in entries:
+            directory.add(key, description)
+        for key, description in removed:
+            directory.remove(key, description)
+
+        assert expected == directory.search(query)
+        assert len(kept) == len(directory)
+
+    @given(directory_contents())
+    def test_add_all_equivalent_to_add(self, contents):
+        """Test that adding the descriptions in bulk gives the same result of adding them one at a time."""
+        entries, query = contents
+        directory, bulk_directory = Directory(), Directory()
+        for key, description in entries:
+            directory.add(key, description)
+        bulk_directory.add_all(entries[:3])
+        bulk_directory.add_all(entries[3:])
+
+        assert search_outcome(directory, query) == search_outcome(bulk_directory, query)
+        for key, description in entries[::2]:
+            directory.remove(key, description)
+            bulk_directory.remove(key, description)
+        assert search_outcome(directory, query) == search_outcome(bulk_directory, query)
+
+    def test_remove_key(self):
+        """Test that all the descriptions of a key are removed."""
+        directory = Directory()
+        directory.add("agent_1", Description({"year": 1990}))
+        directory.add("agent_1", Description({"year": 2000}))
+        directory.add("agent_2", Description({"year": 2000}))
+        directory.remove_key("agent_1")
+
+        assert ["agent_2"] == directory.search(Query([Constraint("year", Gt(0))]))
+
+    def test_remove_missing_description(self):
+        """Test that removing a description not in the directory raises ValueError."""
+        directory = Directory()
+        with pytest.raises(ValueError, match="Description not found"):
+            directory.remove("agent_1", Description({"year": 1990}))
+
+    def test_plan_chooses_most_selective_constraint(self):
+        """Test that only the candidates of the most selective constraint are checked."""
+        directory = Directory()
+        for i in range(100):
+            directory.add("agent_{}".format(i), Description({"year": i, "author": "author_{}".format(i % 2)}))
+
+        checked = []
+
+        class CountingQuery(Query):
+            def check(self, description):
+                checked.append(description)
+                return super().check(description)
+
+        query = CountingQuery([Constraint("author", Eq("author_0")), Constraint("year", Range((10, 12)))])
+        assert ["agent_10", "agent_12"] == directory.search(query)
+        assert 3 == len(checked)
+
+    def test_plan_optimized_query(self):
+        """Test that the bounds on the same attribute are planned as one range,
+        and that an unsatisfiable query does not check any description."""
+        directory = Directory()
+        for i in range(100):
+            directory.add("agent_{}".format(i), Description({"year": i}))
+
+        checked = []
+
+        class CountingQuery(Query):
+            def check(self, description):
+                checked.append(description)
+                return super().check(description)
+
+        query = CountingQuery([Constraint("year", GtEq(11)), Constraint("year", LtEq(12)), Constraint("year", Gt(5))])
+        assert ["agent_11", "agent_12"] == directory.search(query)
+        assert 2 == len(checked)
+
+        query = CountingQuery([Constraint("year", Gt(10)), Constraint("year", Lt(5))])
+        assert [] == directory.search(query)
+        assert 2 == len(checked)
+
+    def test_or_and_not(self):
+        """Test the plans of the composite constraint expressions."""
+        directory = Directory()
+        for i in range(10):
+            directory.add("agent_{}".format(i), Description({"year": i}))
+
+        query = Query([Or([Constraint("year", Eq(1)), Constraint("year", In([2, 3]))]),
+                       Not(Constraint("year", Eq(2))),
+                       And([Constraint("year", Gt(0)), Constraint("year", Gt(1))])])
+        assert ["agent_3"] == directory.search(query)
+
+    def test_search_by_data_model_name(self):
+        """Test that a search can be restricted to the descriptions of one data model."""
+        directory = Directory()
+        directory.add("agent_1", Description({"year": 1990}, data_model_name="book"))
+        directory.add("agent_2", Description({"year": 1990}, data_model_name="movie"))
+        directory.add("agent_3", Description({"year": 2000}, data_model_name="book"))
+
+        assert ["agent_1", "agent_2"] == directory.search(Query([Constraint("year", Eq(1990))]))
+        assert ["agent_1"] == directory.search(Query([Constraint("year", Eq(1990))]), data_model_name="book")
+        assert ["agent_3"] == directory.search(Query([Constraint("year", Gt(1990))]), data_model_name="book")
+        assert [] == directory.search(Query([Constraint("year", Gt(0))]), data_model_name="song")
+
+        directory.remove_key("agent_2")
+        assert [] == directory.search(Query([Constraint("year", Gt(0))]), data_model_name="movie")
+
+    @given(located_entries())
+    def test_distance_search_equivalent_to_brute_force(self, contents):
+        """Test that the spatial index returns the same result of checking every description."""
+        entries, query = contents
+        directory = Directory()
+        for key, description in entries:
+            directory.add(key, description)
+
+        assert brute_force_search(entries, query) == directory.search(query)
+
+    @pytest.mark.parametrize("center", [Location(0.0, 179.9), Location(0.0, -179.9), Location(89.9, 0.0),
+                                        Location(-89.9, 90.0), Location(45.0, 0.0)])
+    def test_distance_search_at_the_edges_of_the_grid(self, center):
+        """Test the spatial index around the antimeridian and the poles."""
+        directory = Directory()
+        entries = [("agent_{}_{}".format(lat, lon), Description({"position": Location(float(lat), float(lon))}))
+                   for lat in range(-90, 91, 5) for lon in range(-180, 181, 5)]
+        for key, description in entries:
+            directory.add(key, description)
+
+        for distance in [0.0, 100.0, 1000.0, 5000.0, 30000.0]:
+            query = Query([Constraint("position", Distance(center, distance))])
+            assert brute_force_search(entries, query) == directory.search(query)
+
+    def test_distance_plan_prunes_candidates(self):
+        """Test that only the locations in the cells around the center are candidates."""
+        index = LocationIndex()
+        for i in range(100):
+            index.add(i, Description({"position": Location(float(i - 50), float(i - 50))}))
+        index.add(100, Description({"position": Location(float("nan"), 0.0)}))
+
+        nb_candidates, get_candidates = index.plan(Constraint("position", Distance(Location(0.0, 0.0), 100.0)))
+        assert {49, 50, 100} == get_candidates()
+        assert 3 == nb_candidates
+
+    def test_distance_plan_across_antimeridian(self):
+        """Test that the cells of a box that wraps around the antimeridian are looked up."""
+        index = LocationIndex()
+        for i in range(100):
+            index.add(i, Description({"position": Location(float(i - 50), 0.5)}))
+        index.add(100, Description({"position": Location(0.5, 179.5)}))
+        index.add(101, Description({"position": Location(-0.5, -179.5)}))
+
+        nb_candidates, get_candidates = index.plan(Constraint("position", Distance(Location(0.0, 180.0), 100.0)))
+        assert 2 == nb_candidates
+        assert {100, 101} == get_candidates()
+
+
+class TestSearchCache:
+
+    @given(directory_contents())
+    def test_cached_search_equivalent_to_search(self, contents):
+        """Test that the cached results are invalidated when the descriptions that satisfy the query change."""
+        entries, query = contents
+        directory = Directory()
+        cached_directory = Directory(cache=SearchCache())
+        for key, description in entries:
+            directory.add(key, description)
+            cached_directory.add(key, description)
+            assert search_outcome(directory, query) == search_outcome(cached_directory, query)
+        for key, description in entries[::2]:
+            directory.remove(key, description)
+            cached_directory.remove(key, description)
+            assert search_outcome(directory, query) == search_outcome(cached_directory, query)
+
+    @given(directory_contents())
+    def test_cached_search_equivalent_to_search_after_add_all(self, contents):
+        """Test that the cached results are invalidated when many descriptions are added at once."""
+        entries, query = contents
+        directory = Directory()
+        cached_directory = Directory(cache=SearchCache())
+        for i in range(0, len(entries), 3):
+            directory.add_all(entries[i:i + 3])
+            cached_directory.add_all(entries[i:i + 3])
+            assert search_outcome(directory, query) == search_outcome(cached_directory, query)
+
+    def test_hits_and_misses(self):
+        """Test that the equivalent queries share the cached result."""
+        directory = Directory(cache=SearchCache())
+        directory.add("agent_1", Description({"year": 1990, "genre": "horror"}))
+
+        result = directory.search(Query([Constraint("year", Gt(1980)), Constraint("genre", Eq("horror"))]))
+        result.append("agent_2")
+        assert ["agent_1"] == directory.search(Query([Constraint("genre", Eq("horror")), Constraint("year", Gt(1980))]))
+        assert ["agent_1"] == directory.search(Query([Constraint("year", Gt(1980)), Constraint("year", Gt(1970)),
+                                                      Constraint("genre", In(["horror"]))]))
+        assert (1, 2) == (directory.cache.hits, directory.cache.misses)
+        assert ["agent_1"] == directory.search(Query([Constraint("year", Gt(1980)), Constraint("genre", Eq("horror"))]),
+                                               data_model_name="")
+        assert (1, 3) == (directory.cache.hits, directory.cache.misses)
+
+    def test_fingerprint_distinguishes_value_types(self):
+        """Test that the queries whose values are equal but have different types have different fingerprints."""
+        fingerprints = set(SearchCache.fingerprint(Query([Constraint("year", Eq(value))])) for value in [1, 1.0, True])
+        assert 3 == len(fingerprints)
+
+    def test_fingerprint_of_mixed_set(self):
+        """Test that the queries whose values cannot be serialized (e.g. a set of mixed types) are cached."""
+        directory = Directory(cache=SearchCache())
+        directory.add("agent_1", Description({"x": 1}))
+        assert ["agent_1"] == directory.search(Query([Constraint("x", In([1, "a"]))]))
+        assert ["agent_1"] == directory.search(Query([Constraint("x", In([1, "a"]))]))
+        assert (1, 1) == (directory.cache.hits, directory.cache.misses)
+        assert SearchCache.fingerprint(Query([Constraint("x", Eq(float("nan")))])) == \
+            SearchCache.fingerprint(Query([Constraint("x", Eq(float("nan")))]))
+
+    def test_unknown_expression_not_cached(self):
+        """Test that a query with a constraint expression defined outside the SDK is searched without the cache."""
+        class AnyDescription(ConstraintExpr):
+            def check(self, description: Description) -> bool:
+                return True
+
+            def is_valid(self, data_model) -> bool:
+                return True
+
+            def _check_validity(self) -> None:
+                pass
+
+            def to_pb(self):
+                raise NotImplementedError
+
+            @classmethod
+            def from_pb(cls, obj):
+                raise NotImplementedError
+
+        directory = Directory(cache=SearchCache())
+        directory.add("agent_1", Description({"x": 1}))
+        assert ["agent_1"] == directory.search(Query([AnyDescription()]))
+        assert 0 == len(directory.cache)
+
+    def test_invalidate_checks_only_indexed_queries(self):
+        """Test that a changed description is matched only against the cached queries that it may satisfy."""
+        directory = Directory(cache=SearchCache())
+        horror, year = Query([Constraint("genre", Eq("horror"))]), Query([Constraint("year", Gt(1990))])
+        directory.search(horror)
+        directory.search(year)
+
+        candidates = directory.cache._index.candidates(Description({"genre": "novel", "year": 2000}))
+        assert [(SearchCache.fingerprint(year), None)] == list(candidates)
+        directory.add("agent_1", Description({"genre": "novel", "year": 2000}))
+        assert 1 == len(directory.cache)
+        assert [] == directory.search(horror)
+
+    def test_invalidate_only_matching_queries(self):
+        """Test that only the results of the queries that the changed description satisfies are invalidated."""
+        directory = Directory(cache=SearchCache())
+        directory.add("agent_1", Description({"year": 1990}, data_model_name="book"))
+        old_books = Query([Constraint("year", Lt(1995))])
+        new_books = Query([Constraint("year", Gt(1995))])
+        directory.search(old_books)
+        directory.search(new_books)
+        directory.search(new_books, data_model_name="movie")
+        assert 3 == len(directory.cache)
+
+        directory.add("agent_2", Description({"year": 2000}, data_model_name="book"))
+        assert 2 == len(directory.cache)
+        assert ["agent_2"] == directory.search(new_books)
+
+        directory.remove_key("agent_1")
+        assert 2 == len(directory.cache)
+        assert [] == directory.search(old_books)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used result is evicted when the cache is full."""
+        directory = Directory(cache=SearchCache(max_size=2))
+        queries = [Query([Constraint("year", Eq(year))]) for year in range(3)]
+        directory.search(queries[0])
+        directory.search(queries[1])
+        directory.search(queries[0])
+        directory.search(queries[2])
+        assert 2 == len(directory.cache)
+
+        misses = directory.cache.misses
+        directory.search(queries[0])
+        directory.search(queries[2])
+        assert misses == directory.cache.misses
+        directory.search(queries[1])
+        assert misses + 1 == directory.cache.misses
+
+    def test_raise_exception_when_max_size_is_not_positive(self):
+        """Test that the maximum size of the cache must be at least 1."""
+        with pytest.raises(ValueError, match="the maximum size must be at least 1"):
+            SearchCache(max_size=0)
+
+
+def safe_matching_keys(entries: List[Tuple[str, Description]], query: Query) -> List[str]:
+    """The keys with a description that satisfies the query, skipping the ones whose check raises."""
+    def matches(description):
+        try:
+            return query.check(description)
+        except TypeError:
+            return False
+    return sorted(set(key for key, description in entries if matches(description)))
+
+
+class TestSubscriptions:
+
+    @given(directory_contents())
+    def test_updates_equivalent_to_search(self, contents):
+        """Test that the result of a subscription, updated with the changes, is always the result of the search."""
+        entries, query = contents
+        directory, subscriptions = Directory(), Subscriptions()
+        for key, description in entries[:2]:
+            directory.add(key, description)
+        subscription_key = ("subscriber", 0)
+        result = set(subscriptions.subscribe(subscription_key, query, directory))
+        assert safe_matching_keys(entries[:2], query) == sorted(result)
+
+        for i, (key, description) in enumerate(entries[2:], 2):
+            directory.add(key, description)
+            added = subscriptions.add(key, description)
+            assert key not in result or subscription_key not in added
+            result |= {key} if subscription_key in added else set()
+            assert safe_matching_keys(entries[:i + 1], query) == sorted(result)
+        for i, (key, description) in enumerate(entries):
+            directory.remove(key, description)
+            removed = subscriptions.remove(key, description)
+            result -= {key} if subscription_key in removed else set()
+            assert safe_matching_keys(entries[i + 1:], query) == sorted(result)
+
+    def test_only_indexed_subscriptions_are_matched(self):
+        """Test that a subscription with an equality is matched only with the descriptions that have the value."""
+        directory, subscriptions = Directory(), Subscriptions()
+        subscriptions.subscribe(("agent_0", 0), Query([Constraint("genre", Eq("horror"))]), directory)
+        subscriptions.subscribe(("agent_0", 1), Query([Constraint("genre", In(["horror", "novel"])),
+                                                       Constraint("year", Gt(1980))]), directory)
+        subscriptions.subscribe(("agent_0", 2), Query([Constraint("year", Gt(1980))]), directory)
+
+        assert [("agent_0", 2)] == subscriptions._candidates(Description({"genre": "comics", "year": 1990}))
+        assert [("agent_0", 1), ("agent_0", 2)] == subscriptions._candidates(Description({"genre": "novel"}))
+        assert [("agent_0", 1), ("agent_0", 2)] == subscriptions.add("agent_1", Description({"genre": "novel",
+                                                                                               "year": 1990}))
+
+    def test_candidates_in_subscription_order(self):
+        """Test that the candidates are in the order of subscription, also after a subscription is replaced."""
+        directory, subscriptions = Directory(), Subscriptions()
+        subscriptions.subscribe(("agent_0", 0), Query([Constraint("year", Gt(1980))]), directory)
+        subscriptions.subscribe(("agent_0", 1), Query([Constraint("genre", Eq("novel"))]), directory)
+        subscriptions.subscribe(("agent_0", 2), Query([Constraint("year", Lt(2000))]), directory)
+        subscriptions.subscribe(("agent_0", 0), Query([Constraint("year", GtEq(1980))]), directory)
+
+        assert [("agent_0", 1), ("agent_0", 2), ("agent_0", 0)] == \
+            subscriptions._candidates(Description({"genre": "novel", "year": 1990}))
+
+    def test_key_removed_when_no_description_matches(self):
+        """Test that a key is removed from the result only when none of its descriptions satisfies the query."""
+        directory, subscriptions = Directory(), Subscriptions()
+        old_book, new_book = Description({"year": 1990}), Description({"year": 2000})
+        directory.add("agent_1", old_book)
+        directory.add("agent_1", new_book)
+        assert ["agent_1"] == subscriptions.subscribe(("agent_0", 0), Query([Constraint("year", Gt(1980))]), directory)
+
+        assert [] == subscriptions.remove("agent_1", old_book)
+        assert [("agent_0", 0)] == subscriptions.remove("agent_1", new_book)
+
+    def test_unsubscribe(self):
+        """Test that the removed subscriptions are not matched, and that removing a missing one raises ValueError."""
+        directory, subscriptions = Directory(), Subscriptions()
+        subscriptions.subscribe(("agent_0", 0), Query([Constraint("genre", Eq("horror"))]), directory)
+        subscriptions.unsubscribe(("agent_0", 0))
+
+        assert 0 == len(subscriptions)
+        assert [] == subscriptions.add("agent_1", Description({"genre": "horror"}))
+        with pytest.raises(ValueError, match="Subscription .* not found"):
+            subscriptions.unsubscribe(("agent_0", 0))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+from typing import List
+from unittest.mock import MagicMock
+
+from hypothesis import given
+from hypothesis.strategies import lists, binary, integers
+
+from oef.framing import FrameReader, FrameWriter, HEADER
+
+
+class TestFrameReader:
+
+    @given(lists(binary(max_size=100)), integers(min_value=1, max_value=64))
+    def test_frames_split_in_chunks(self, payloads: List[bytes], chunk_size: int):
+        """Test that the frames are correctly parsed, however the stream of bytes is split."""
+        stream = b"".join(HEADER.pack(len(p)) + p for p in payloads)
+        reader = FrameReader(buffer_size=8)
+
+        actual_payloads = []
+        for i in range(0, len(stream), chunk_size):
+            reader.feed(stream[i:i + chunk_size])
+            actual_payloads.extend(bytes(frame) for frame in reader.frames())
+
+        assert payloads == actual_payloads
+        assert 0 == len(reader)
+
+    def test_all_complete_frames_are_parsed_in_one_pass(self):
+        """Test that all the complete frames in the buffer are returned at once, without copies."""
+        reader = FrameReader()
+        reader.feed(HEADER.pack(3) + b"foo" + HEADER.pack(3) + b"bar" + HEADER.pack(3) + b"b")
+
+        frames = reader.frames()
+
+        assert [b"foo", b"bar"] == [bytes(f) for f in frames]
+        assert all(isinstance(f, memoryview) for f in frames)
+        assert HEADER.size + 1 == len(reader)
+
+    def test_buffered_protocol_interface(self):
+        """Test that the bytes can be written directly in the buffer returned by get_buffer."""
+        reader = FrameReader(buffer_size=4)
+        data = HEADER.pack(16) + b"a" * 16
+
+        buffer = reader.get_buffer(len(data))
+        buffer[:len(data)] = data
+        reader.buffer_updated(len(data))
+
+        assert [b"a" * 16] == [bytes(f) for f in reader.frames()]
+
+
+class TestFrameWriter:
+
+    def test_frames_written_in_the_same_loop_iteration_are_coalesced(self):
+        """Test that the frames queued in the same iteration of the event loop are written with a single call."""
+        transport = MagicMock()
+        writer = FrameWriter(transport, asyncio.get_event_loop())
+
+        for payload in [b"foo", b"bar", b""]:
+            writer.write(payload)
+        assert 0 == transport.write.call_count
+
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+
+        transport.write.assert_called_once_with(HEADER.pack(3) + b"foo" + HEADER.pack(3) + b"bar" + HEADER.pack(0))
+        assert 0 == len(writer)
+
+    def test_flush_writes_immediately(self):
+        """Test that flush() writes the queued frames without waiting for the event loop."""
+        transport = MagicMock()
+        writer = FrameWriter(transport, asyncio.get_event_loop())
+
+        writer.write(b"foo")
+        writer.flush()
+        transport.write.assert_called_once_with(HEADER.pack(3) + b"foo")
+
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+        assert 1 == transport.write.call_count
+
+    def test_writelines_queues_all_the_frames(self):
+        """Test that writelines() queues the frames in order, and they are written together with the others."""
+        transport = MagicMock()
+        writer = FrameWriter(transport, asyncio.get_event_loop())
+
+        writer.write(b"foo")
+        writer.writelines([b"bar", b"baz"])
+        writer.writelines([])
+        assert 3 * HEADER.size + 9 == len(writer)
+
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+        transport.write.assert_called_once_with(HEADER.pack(3) + b"foo" + HEADER.pack(3) + b"bar"
+                                                + HEADER.pack(3) + b"baz")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+from hypothesis import given
+from hypothesis.strategies import lists, tuples, integers, text, binary
+
+from oef import agent_pb2
+from oef.messages import Multicast, CFP, Message, Propose
+from test.strategies import queries
+
+destinations = lists(tuples(integers(min_value=-2 ** 31, max_value=2 ** 31 - 1), text()), max_size=5)
+
+
+class TestMulticast:
+
+    @given(queries(), destinations)
+    def test_cfp_envelopes_equal_to_single_messages(self, query, destinations):
+        """Test that every envelope of a multicast CFP is parsed as the envelope of the single CFP."""
+        multicast = Multicast(CFP(1, 0, "", 0, query), destinations)
+        envelopes = multicast.serialize()
+
+        assert len(destinations) == len(envelopes)
+        for (dialogue_id, destination), data, msg in zip(destinations, envelopes, multicast.messages()):
+            envelope = agent_pb2.Envelope()
+            envelope.ParseFromString(data)
+            assert CFP(1, dialogue_id, destination, 0, query).to_envelope() == envelope
+            assert msg.to_envelope() == envelope
+
+    @given(binary(), destinations)
+    def test_message_envelopes_equal_to_single_messages(self, content, destinations):
+        """Test that every envelope of a multicast message is parsed as the envelope of the single message."""
+        multicast = Multicast(Message(2, 0, "", content), destinations)
+
+        for (dialogue_id, destination), data in zip(destinations, multicast.serialize()):
+            envelope = agent_pb2.Envelope()
+            envelope.ParseFromString(data)
+            assert Message(2, dialogue_id, destination, content).to_envelope() == envelope
+
+    def test_empty_proposals(self):
+        """Test that the payload of a multicast Propose with no proposals is preserved."""
+        multicast = Multicast(Propose(3, 0, "", 2, []), [(0, "alice")])
+        envelope = agent_pb2.Envelope()
+        envelope.ParseFromString(multicast.serialize()[0])
+
+        assert Propose(3, 0, "alice", 2, []).to_envelope() == envelope
+        assert "proposals" == envelope.send_message.fipa.propose.WhichOneof("payload")
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from oef.metrics import MAX_PENDING_SEARCHES, Histogram, MetricsRegistry, instrument, uninstrument
+from oef.node import OEFNode
+from oef.proxy import OEFLocalProxy, OEFNetworkProxy, OEFNetworkProtocolProxy
+from oef.query import Query, Constraint, Gt
+from oef.schema import Description
+from test.common import AgentTest
+from test.test_dialogue.dialogue_agents import AgentSingleDialogueTest
+
+_ASYNCIO_DELAY = 0.1
+
+
+def _run(local_node: OEFLocalProxy.LocalNode, agent, send) -> None:
+    """Run the loop of an agent, after the messages have been sent."""
+    loop = asyncio.get_event_loop()
+    send()
+    node_task = asyncio.ensure_future(local_node.run())
+    task = asyncio.ensure_future(agent._oef_proxy.loop(agent))
+    loop.run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+    task.cancel()
+    local_node.stop()
+    loop.run_until_complete(asyncio.wait([task, node_task]))
+
+
+class TestHistogram:
+
+    def test_bounds_are_inclusive(self):
+        """Test that a value equal to the upper bound of a bucket is in that bucket, as in Prometheus."""
+        h = Histogram(buckets=(1.0, 2.0))
+        for value in [1.0, 2.0, 2.5]:
+            h.observe(value)
+        assert [1, 2, 3] == h.cumulative_counts()
+
+
+class TestInstrument:
+
+    @pytest.mark.parametrize("wire_faithful", [False, True])
+    def test_local_proxy(self, wire_faithful):
+        """Test that the messages, the handlers and the searches of an instrumented agent are measured."""
+        local_node = OEFLocalProxy.LocalNode(wire_faithful=wire_faithful)
+        sender, recipient = OEFLocalProxy("sender", local_node), OEFLocalProxy("recipient", local_node)
+        agent = AgentTest(recipient)
+        registry = MetricsRegistry()
+        metrics = instrument(agent, registry)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(sender.connect())
+        loop.run_until_complete(recipient.connect())
+        local_node.register_service("sender", Description({"price": 5}))
+
+        def send():
+            sender.send_message(0, 1, "recipient", b"hello")
+            sender.broadcast_message(1, [(2, "recipient"), (3, "recipient")], b"hello")
+            agent.send_message(2, 1, "sender", b"hello")
+            agent.search_services(3, Query([Constraint("price", Gt(0))]))
+            agent.register_service(4, Description({"price": 5}))
+            agent.unregister_service(5, Description({"price": 5}))
+
+        _run(local_node, agent, send)
+
+        assert 4 == len(agent.received_msg)
+        assert {"Message": 1, "SearchServices": 1, "RegisterService": 1, "UnregisterService": 1} \
+            == metrics.messages_sent
+        assert {"Message": 3, "SearchResult": 1} == metrics.messages_received
+        assert (sum(metrics.bytes_received.values()) > 0) == wire_faithful
+        assert 3 == metrics.handler_latency["on_message"].count
+        assert 1 == metrics.search_round_trip.count
+        # the sender is not instrumented.
+        assert ["recipient"] == list(registry.agents)
+
+    @pytest.mark.parametrize("proxy_class", [OEFNetworkProxy, OEFNetworkProtocolProxy])
+    def test_network_proxy(self, proxy_class):
+        """Test that the messages sent and received over the network are counted with their size."""
+        previous_loop = asyncio.get_event_loop()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        node = OEFNode(port=0, loop=loop)
+        loop.run_until_complete(node.start())
+        try:
+            agent = AgentTest(proxy_class("network_agent", "127.0.0.1", node.port))
+            metrics = instrument(agent, MetricsRegistry())
+            agent.connect()
+            agent.register_service(0, Description({"price": 5}))
+            agent.search_services(1, Query([Constraint("price", Gt(0))]))
+            agent.broadcast_message(2, [(1, "network_agent"), (2, "network_agent")], b"hello")
+            task = asyncio.ensure_future(agent._oef_proxy.loop(agent))
+            loop.run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+            task.cancel()
+            loop.run_until_complete(asyncio.wait([task]))
+        finally:
+            loop.run_until_complete(node.stop())
+            loop.close()
+            asyncio.set_event_loop(previous_loop)
+
+        assert {"ID": 1, "Answer": 1, "RegisterService": 1, "SearchServices": 1, "Message": 2} \
+            == metrics.messages_sent
+        assert {"SearchResult": 1, "Message": 2} == metrics.messages_received
+        assert all(nbytes > 0 for nbytes in metrics.bytes_sent.values())
+        assert all(nbytes > 0 for nbytes in metrics.bytes_received.values())
+        assert 1 == metrics.search_round_trip.count
+
+    def test_dialogue_agent(self):
+        """Test that the messages routed by a DialogueAgent are counted, and its dialogues exported."""
+        local_node = OEFLocalProxy.LocalNode()
+        sender = OEFLocalProxy("sender", local_node)
+        agent = AgentSingleDialogueTest(OEFLocalProxy("dialogue_agent", local_node))
+        registry = MetricsRegistry()
+        metrics = instrument(agent, registry)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(sender.connect())
+        loop.run_until_complete(agent._oef_proxy.connect())
+
+        def send():
+            sender.send_message(0, 1, "dialogue_agent", b"hello")
+            sender.send_cfp(1, 1, "dialogue_agent", 0, None)
+
+        _run(local_node, agent, send)
+
+        # the new message is routed again by AgentSingleDialogueTest, once its dialogue is registered.
+        assert {"new": 1, "open": 2} == metrics.dialogue_messages
+        assert 'oef_open_dialogues{agent="dialogue_agent"} 1' in registry.render().splitlines()
+
+    def test_coroutine_handler(self):
+        """Test that the latency of a coroutine handler is measured until the coroutine completes."""
+        metrics = MetricsRegistry().agent_metrics("agent")
+
+        async def handler(delay):
+            await asyncio.sleep(delay)
+
+        coroutine = metrics.timed("on_message", handler, (0.05, ))(0.05)
+        assert 0 == metrics.handler_latency["on_message"].count
+        asyncio.get_event_loop().run_until_complete(coroutine)
+        assert 1 == metrics.handler_latency["on_message"].count
+        assert metrics.handler_latency["on_message"].sum >= 0.05
+
+    def test_pending_searches_bounded(self):
+        """Test that the searches without a result are eventually dropped."""
+        metrics = MetricsRegistry().agent_metrics("agent")
+        for search_id in range(MAX_PENDING_SEARCHES + 10):
+            metrics.search_sent(search_id)
+        assert MAX_PENDING_SEARCHES == len(metrics._pending_searches)
+        metrics.timed("on_search_result", lambda *args: None, (0, []))
+        metrics.timed("on_search_result", lambda *args: None, (MAX_PENDING_SEARCHES + 9, []))
+        assert 1 == metrics.search_round_trip.count
+
+    def test_uninstrument(self):
+        agent = AgentTest(OEFLocalProxy("agent", OEFLocalProxy.LocalNode()))
+        instrument(agent, MetricsRegistry())
+        uninstrument(agent)
+        assert agent._oef_proxy.metrics is None
+
+
+class TestExport:
+
+    def setup_method(self):
+        self.registry = MetricsRegistry(buckets=(0.1, 1.0))
+        metrics = self.registry.agent_metrics('agent "1"')
+        metrics.message_sent("Message", 10)
+        metrics.message_received("on_message", 20)
+        metrics.timed("on_message", lambda: None, ())()
+        metrics.gauges["oef_handler_queue_depth"] = lambda: 3
+
+    def test_render(self):
+        """Test the Prometheus text format, and the escaping of the labels."""
+        lines = self.registry.render().splitlines()
+        agent = 'agent="agent \\"1\\""'
+        assert "# TYPE oef_messages_sent_total counter" in lines
+        assert 'oef_messages_sent_total{%s,type="Message"} 1' % agent in lines
+        assert 'oef_sent_bytes_total{%s,type="Message"} 10' % agent in lines
+        assert 'oef_received_bytes_total{%s,type="Message"} 20' % agent in lines
+        assert "# TYPE oef_handler_latency_seconds histogram" in lines
+        assert 'oef_handler_latency_seconds_bucket{%s,handler="on_message",le="0.1"} 1' % agent in lines
+        assert 'oef_handler_latency_seconds_bucket{%s,handler="on_message",le="+Inf"} 1' % agent in lines
+        assert 'oef_handler_latency_seconds_count{%s,handler="on_message"} 1' % agent in lines
+        assert 'oef_search_round_trip_seconds_count{%s} 0' % agent in lines
+        assert 'oef_handler_queue_depth{%s} 3' % agent in lines
+
+    def test_write_text_file(self, tmpdir):
+        path = tmpdir.join("oef.prom")
+        self.registry.write_text_file(str(path))
+        assert self.registry.render() == path.read()
+        assert ["oef.prom"] == [p.basename for p in tmpdir.listdir()]
+
+    def test_http_server(self):
+        """Test that the metrics are served over HTTP."""
+        async def get() -> bytes:
+            server = await self.registry.start_http_server()
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return response
+
+        response = asyncio.get_event_loop().run_until_complete(get())
+        headers, body = response.split(b"\r\n\r\n", 1)
+        assert headers.startswith(b"HTTP/1.1 200 OK")
+        assert self.registry.render().encode("utf-8") == body
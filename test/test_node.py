@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+
+import pytest
+
+from oef import agent_pb2
+from oef.messages import OEFErrorOperation
+from oef.node import OEFNode
+from oef.proxy import OEFNetworkProxy, OEFNetworkProtocolProxy
+from oef.query import Query, Constraint, Lt
+from oef.schema import Description
+
+
+async def _receive(proxy: OEFNetworkProxy) -> agent_pb2.Server.AgentMessage:
+    """Receive the next message from the OEF Node."""
+    msg = agent_pb2.Server.AgentMessage()
+    msg.ParseFromString(await asyncio.wait_for(proxy._receive(), 1.0))
+    return msg
+
+
+class TestOEFNode:
+
+    def setup_method(self):
+        self.previous_loop = asyncio.get_event_loop()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.node = OEFNode(port=0, loop=self.loop)
+        self.loop.run_until_complete(self.node.start())
+
+    def teardown_method(self):
+        self.loop.run_until_complete(self.node.stop())
+        self.loop.close()
+        asyncio.set_event_loop(self.previous_loop)
+
+    def _connect(self, public_key: str, proxy_class=OEFNetworkProxy) -> OEFNetworkProxy:
+        proxy = proxy_class(public_key, "127.0.0.1", self.node.port)
+        assert self.loop.run_until_complete(proxy.connect())
+        return proxy
+
+    def test_handshake_fails_if_public_key_is_connected(self):
+        """Test that the node rejects a second connection with the same public key."""
+        connected = self._connect("handshake_agent")
+        proxy = OEFNetworkProxy("handshake_agent", "127.0.0.1", self.node.port)
+        assert not self.loop.run_until_complete(proxy.connect())
+        assert ["handshake_agent"] == self.node.connected_agents()
+        assert connected.is_connected()
+
+    @pytest.mark.parametrize("proxy_class", [OEFNetworkProxy, OEFNetworkProtocolProxy])
+    def test_send_message(self, proxy_class):
+        """Test that a message is delivered with the origin and the dialogue id, and that a message to an agent
+        that is not connected is answered with a DialogueError."""
+        sender, receiver = self._connect("sender", proxy_class), self._connect("receiver", proxy_class)
+        sender.send_message(1, 2, "receiver", b"hello")
+        sender.send_message(3, 4, "unknown", b"hello")
+
+        msg = self.loop.run_until_complete(_receive(receiver))
+        assert (1, 2, "sender", b"hello") == (msg.answer_id, msg.content.dialogue_id,
+                                              msg.content.origin, msg.content.content)
+        msg = self.loop.run_until_complete(_receive(sender))
+        assert (3, 4, "unknown") == (msg.answer_id, msg.dialogue_error.dialogue_id, msg.dialogue_error.origin)
+
+    def test_register_and_search(self):
+        """Test the registrations, the searches and the errors on the unregistrations."""
+        seller_0, seller_1, buyer = [self._connect(public_key) for public_key in ["seller_0", "seller_1", "buyer"]]
+        seller_0.register_service(0, Description({"price": 5}))
+        seller_1.register_service(0, Description({"price": 50}))
+        seller_1.register_agent(0, Description({"price": 1}))
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+        buyer.unregister_service(1, Description({"price": 5}))
+        buyer.unregister_agent(2)
+        buyer.search_services(3, Query([Constraint("price", Lt(10))]))
+        buyer.search_agents(4, Query([Constraint("price", Lt(10))]))
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+        seller_0.unregister_service(0, Description({"price": 5}))
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+        buyer.search_services(5, Query([Constraint("price", Lt(10))]))
+
+        messages = [self.loop.run_until_complete(_receive(buyer)) for _ in range(5)]
+        assert (1, OEFErrorOperation.UNREGISTER_SERVICE.value) == (messages[0].answer_id,
+                                                                   messages[0].oef_error.operation)
+        assert (2, OEFErrorOperation.UNREGISTER_DESCRIPTION.value) == (messages[1].answer_id,
+                                                                       messages[1].oef_error.operation)
+        assert [(3, ["seller_0"]), (4, ["seller_1"]), (5, [])] == [(msg.answer_id, list(msg.agents.agents))
+                                                                 for msg in messages[2:]]
+
+    def test_disconnect_removes_registrations(self):
+        """Test that the registrations of an agent are removed when it disconnects."""
+        seller, buyer = self._connect("seller"), self._connect("buyer")
+        seller.register_service(0, Description({"price": 5}))
+        seller.register_agent(0, Description({"price": 5}))
+        self.loop.run_until_complete(seller.stop())
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+
+        buyer.search_services(0, Query([Constraint("price", Lt(10))]))
+        buyer.search_agents(1, Query([Constraint("price", Lt(10))]))
+        messages = [self.loop.run_until_complete(_receive(buyer)) for _ in range(2)]
+        assert [[], []] == [list(msg.agents.agents) for msg in messages]
+        assert ["buyer"] == self.node.connected_agents()
+
+    def test_many_connections(self):
+        """Test that many agents can connect at once."""
+        proxies = [OEFNetworkProtocolProxy("agent_{}".format(i), "127.0.0.1", self.node.port) for i in range(500)]
+        results = self.loop.run_until_complete(asyncio.gather(*[proxy.connect() for proxy in proxies]))
+        assert all(results)
+        assert 500 == len(self.node.connected_agents())
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from oef.messages import OEFErrorOperation
+from oef.metrics import MetricsRegistry
+from oef.offload import offload, OffloadedHandler
+from oef.proxy import OEFLocalProxy
+from oef.query import Query, Constraint, Eq
+from oef.scheduler import HandlerScheduler
+from oef.schema import Description
+from test.common import AgentTest, setup_local_proxies
+from test.conftest import _ASYNCIO_DELAY
+
+
+def _price(msg_id, dialogue_id, origin, target, query):
+    """A pricing function that can be sent to another process."""
+    return [Description({"price": 10 * msg_id})]
+
+
+class ThreadOffloadedAgent(AgentTest):
+    """An agent whose on_cfp handler runs in a thread pool, and replies with a Propose."""
+
+    @offload(ThreadPoolExecutor(max_workers=2))
+    def on_cfp(self, msg_id, dialogue_id, origin, target, query):
+        self.threads = getattr(self, "threads", set()) | {threading.get_ident()}
+        self.send_propose(msg_id + 1, dialogue_id, origin, msg_id, [Description({"price": 10 * msg_id})])
+        super().on_cfp(msg_id, dialogue_id, origin, target, query)
+
+
+class TestOffload:
+
+    def test_thread_pool_handler(self):
+        """Test that a handler runs in a worker thread, and that the messages it sends are delivered."""
+        query = Query([Constraint("foo", Eq(True))])
+        with setup_local_proxies(2, "test_thread_pool_handler") as proxies:
+            seller = ThreadOffloadedAgent(proxies[0])
+            buyer = AgentTest(proxies[1])
+            seller.connect()
+            buyer.connect()
+
+            for i in range(3):
+                buyer.send_cfp(i, i, seller.public_key, 0, query)
+
+            asyncio.ensure_future(seller.async_run())
+            asyncio.ensure_future(buyer.async_run())
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+            seller.stop()
+            buyer.stop()
+
+        assert threading.get_ident() not in seller.threads
+        assert 3 == len(seller.received_msg)
+        assert sorted(msg_id for msg_id, _, _, _, _ in buyer.received_msg) == [1, 2, 3]
+        assert 3 == seller.handler_stats["on_cfp"].completed
+        assert 0 == seller.handler_stats["on_cfp"].pending
+
+    def test_process_pool_function(self):
+        """Test that with fn, the function runs in the executor and the handler receives its result."""
+        query = Query([Constraint("foo", Eq(True))])
+        executor = ProcessPoolExecutor(max_workers=1)
+        with setup_local_proxies(2, "test_process_pool_function") as proxies:
+            seller = AgentTest(proxies[0])
+            buyer = AgentTest(proxies[1])
+
+            def on_cfp(msg_id, dialogue_id, origin, target, query, proposals):
+                seller.send_propose(msg_id + 1, dialogue_id, origin, msg_id, proposals)
+
+            seller.on_cfp = on_cfp
+            seller.offload_handler("on_cfp", executor, _price)
+            seller.connect()
+            buyer.connect()
+
+            buyer.send_cfp(1, 0, seller.public_key, 0, query)
+
+            asyncio.ensure_future(seller.async_run())
+            asyncio.ensure_future(buyer.async_run())
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY * 10))
+            seller.stop()
+            buyer.stop()
+        executor.shutdown()
+
+        assert [(2, 0, seller.public_key, 1, [Description({"price": 10})])] == buyer.received_msg
+        assert 1 == seller.handler_stats["on_cfp"].completed
+
+    def test_offload_not_a_handler(self):
+        """Test that only the handlers can be offloaded."""
+        with setup_local_proxies(1, "test_offload_not_a_handler") as proxies:
+            agent = AgentTest(proxies[0])
+            with pytest.raises(ValueError, match="is not a handler"):
+                agent.offload_handler("send_message")
+
+    def test_stats_count_calls_waiting_in_scheduler(self):
+        """Test that the calls waiting behind the other calls of their dialogue are pending,
+        and that their latency includes the wait."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        handler = OffloadedHandler(lambda delay: threading.Event().wait(delay), executor)
+        scheduler = HandlerScheduler()
+        for _ in range(3):
+            scheduler.call("dialogue", handler.submit(), (_ASYNCIO_DELAY / 4, ))
+        assert 3 == handler.stats.pending
+
+        asyncio.get_event_loop().run_until_complete(scheduler.join())
+        executor.shutdown()
+        assert (0, 3) == (handler.stats.pending, handler.stats.completed)
+        assert handler.stats.max_latency >= 3 * _ASYNCIO_DELAY / 4
+
+    def test_stats_skip_cancelled_calls(self):
+        """Test that the calls cancelled, before or after they start, are not counted as completed."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        handler = OffloadedHandler(lambda delay: threading.Event().wait(delay), executor)
+        scheduler = HandlerScheduler()
+        for key in ["a", "a", "b"]:
+            scheduler.call(key, handler.submit(), (_ASYNCIO_DELAY / 4, ))
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(asyncio.sleep(0))
+        scheduler.cancel()
+        # the tasks of these calls are cancelled before they start.
+        scheduler.call("c", handler.submit(), (_ASYNCIO_DELAY / 4, ))
+        scheduler.cancel()
+        loop.run_until_complete(asyncio.sleep(_ASYNCIO_DELAY / 2))
+        executor.shutdown()
+        assert (0, 0, 0.0) == (handler.stats.pending, handler.stats.completed, handler.stats.total_latency)
+
+    def test_timed_calls_discarded(self):
+        """Test that the cancelled calls are discarded also when their latency is measured."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        handler = OffloadedHandler(lambda delay: threading.Event().wait(delay), executor)
+        metrics = MetricsRegistry().agent_metrics("agent")
+        scheduler = HandlerScheduler()
+        for _ in range(2):
+            args = (_ASYNCIO_DELAY / 4, )
+            scheduler.call("a", metrics.timed("on_message", handler.submit(), args), args)
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+        scheduler.cancel()
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY / 2))
+        executor.shutdown()
+        assert (0, 0) == (handler.stats.pending, handler.stats.completed)
+
+    def test_mock_handler_called(self):
+        """Test that only the OffloadedHandler objects are submitted: a mock handler, that has every attribute,
+        is called."""
+        proxy = OEFLocalProxy("agent", OEFLocalProxy.LocalNode())
+        agent = AgentTest(proxy)
+        agent.on_oef_error = MagicMock()
+        proxy._scheduler = HandlerScheduler()
+        proxy._call(agent, ("on_oef_error", (0, OEFErrorOperation.REGISTER_SERVICE)))
+        agent.on_oef_error.assert_called_once_with(0, OEFErrorOperation.REGISTER_SERVICE)
+
@@ -22,10 +22,13 @@ from unittest.mock import patch, MagicMock
 import pytest
 
 from oef.agents import Agent, OEFAgent, LocalAgent
+from oef import agent_pb2
+from oef.framing import HEADER
 from oef.messages import OEFErrorOperation
-from oef.proxy import OEFNetworkProxy, OEFLocalProxy, OEFConnectionError
-from oef.query import Query, Gt, Constraint, Eq
-from oef.schema import Description, AttributeSchema, DataModel
+from oef.proxy import OEFNetworkProxy, OEFLocalProxy, OEFConnectionError, OEFNetworkProtocolProxy, _OEFClientProtocol, \
+    OEFNotSupportedError
+from oef.query import FrozenQuery, Query, Gt, Constraint, Eq, Lt
+from oef.schema import Description, AttributeSchema, DataModel, FrozenDescription
 from test.conftest import _ASYNCIO_DELAY, NetworkOEFNode
 from test.common import AgentTest, setup_test_agents
 
@@ -345,6 +348,204 @@ class TestUnregisterService:
         assert (0, []) == agent_0.received_msg[0]
 
 
+class TestLocalNodeSearchCache:
+
+    def test_search_result_cached_until_matching_service_registered(self):
+        """Test that the identical searches of the agents share the cached result, until a matching service
+        is registered or unregistered."""
+        local_node = OEFLocalProxy.LocalNode(wire_faithful=True)
+        queues = [local_node.connect("agent_{}".format(i))[1] for i in range(2)]
+        query = Query([Constraint("foo", Eq(0))])
+
+        local_node.register_service("agent_0", Description({"foo": 0}))
+        local_node.search_services("agent_0", 0, query)
+        local_node.search_services("agent_1", 1, query)
+        assert (1, 1) == (local_node.service_search_cache.hits, local_node.service_search_cache.misses)
+
+        local_node.register_service("agent_1", Description({"foo": 1}))
+        local_node.search_services("agent_0", 2, query)
+        assert (2, 1) == (local_node.service_search_cache.hits, local_node.service_search_cache.misses)
+
+        local_node.register_service("agent_1", Description({"foo": 0}))
+        local_node.search_services("agent_0", 3, query)
+        assert (2, 2) == (local_node.service_search_cache.hits, local_node.service_search_cache.misses)
+
+        # the search results are delivered at the next iteration of the event loop.
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+        results = []
+        for queue in queues:
+            while not queue.empty():
+                msg = agent_pb2.Server.AgentMessage()
+                msg.ParseFromString(queue.get_nowait())
+                results.append((msg.answer_id, list(msg.agents.agents)))
+        assert [(0, ["agent_0"]), (2, ["agent_0"]), (3, ["agent_0", "agent_1"]), (1, ["agent_0"])] == results
+
+    def test_search_cache_disabled(self):
+        """Test that the search caches can be disabled."""
+        local_node = OEFLocalProxy.LocalNode(search_cache_size=0)
+        assert local_node.agent_search_cache is None
+        assert local_node.service_search_cache is None
+
+
+class TestLocalNodeDelivery:
+
+    def test_handler_calls_same_as_wire_faithful(self):
+        """Test that the messages delivered without serialization are the same as the ones delivered serialized."""
+        data_model = DataModel("book", [AttributeSchema("price", int, False)])
+        query = Query([Constraint("price", Lt(10))], data_model)
+        proposals = [Description({"price": 5}, data_model), Description({"price": 7}, data_model)]
+
+        def send_all(proxy: OEFLocalProxy, destination: str):
+            proxy.send_message(0, 1, destination, b"hello")
+            proxy.send_cfp(1, 1, destination, 0, query)
+            proxy.send_cfp(2, 1, destination, 0, b"query")
+            proxy.send_cfp(3, 1, destination, 0, None)
+            proxy.send_propose(4, 1, destination, 3, proposals)
+            proxy.send_propose(5, 1, destination, 3, b"proposals")
+            proxy.send_accept(6, 1, destination, 5)
+            proxy.send_decline(7, 1, destination, 5)
+            proxy.broadcast_cfp(8, [(2, destination), (3, destination)], 0, query)
+
+        received = []
+        for wire_faithful in [False, True]:
+            local_node = OEFLocalProxy.LocalNode(wire_faithful=wire_faithful)
+            sender, recipient = OEFLocalProxy("sender", local_node), OEFLocalProxy("recipient", local_node)
+            agent = AgentTest(recipient)
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(sender.connect())
+            loop.run_until_complete(recipient.connect())
+            local_node.register_service("sender", proposals[0])
+
+            send_all(sender, recipient.public_key)
+            recipient.search_services(9, Query([Constraint("price", Gt(0))]))
+            asyncio.ensure_future(local_node.run())
+            task = asyncio.ensure_future(recipient.loop(agent))
+            loop.run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+            task.cancel()
+            local_node.stop()
+            received.append(agent.received_msg)
+
+        assert 11 == len(received[0])
+        assert received[1] == received[0]
+
+    def test_mutable_objects_copied(self):
+        """Test that every recipient gets its own copy of a query or a proposal, unless it is immutable."""
+        query, frozen_query = Query([Constraint("price", Lt(10))]), FrozenQuery([Constraint("price", Lt(10))])
+        proposal, frozen_proposal = Description({"price": 5}), FrozenDescription({"price": 5})
+        local_node = OEFLocalProxy.LocalNode()
+        sender, recipient = OEFLocalProxy("sender", local_node), OEFLocalProxy("recipient", local_node)
+        agent = AgentTest(recipient)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(sender.connect())
+        loop.run_until_complete(recipient.connect())
+
+        sender.broadcast_cfp(0, [(1, "recipient"), (2, "recipient")], 0, query)
+        sender.broadcast_cfp(1, [(1, "recipient"), (2, "recipient")], 0, frozen_query)
+        sender.send_propose(2, 1, "recipient", 0, [proposal, frozen_proposal])
+        asyncio.ensure_future(local_node.run())
+        task = asyncio.ensure_future(recipient.loop(agent))
+        loop.run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+        task.cancel()
+        local_node.stop()
+
+        queries = [msg[4] for msg in agent.received_msg[:2]]
+        assert [query, query] == queries
+        assert query is not queries[0] and query is not queries[1] and queries[0] is not queries[1]
+        assert all(msg[4] is frozen_query for msg in agent.received_msg[2:4])
+        proposals = agent.received_msg[4][4]
+        assert [proposal, frozen_proposal] == proposals
+        assert proposal is not proposals[0] and frozen_proposal is proposals[1]
+
+
+class TestLocalNodeRegistration:
+
+    def test_register_from_coroutine(self):
+        """Test that the agents can register and unregister from the coroutines running in the event loop."""
+        with OEFLocalProxy.LocalNode() as local_node:
+            agent_0, agent_1 = agents = [AgentTest(OEFLocalProxy("register_from_coroutine_{}".format(i), local_node))
+                                         for i in range(2)]
+            for a in agents:
+                a.connect()
+
+            async def register():
+                agent_1.register_agent(0, Description({"foo": 1}))
+                agent_1.register_service(0, Description({"foo": 1}))
+                agent_1.register_services(0, [Description({"foo": 2}), Description({"foo": 3})])
+                agent_1.unregister_service(0, Description({"foo": 1}))
+                agent_0.search_agents(0, Query([Constraint("foo", Eq(1))]))
+                agent_0.search_services(1, Query([Constraint("foo", Gt(0))]))
+                agent_1.unregister_agent(0)
+
+            asyncio.get_event_loop().run_until_complete(register())
+            asyncio.ensure_future(agent_0.async_run())
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+            agent_0.stop()
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+
+        assert [(0, [agent_1.public_key]), (1, [agent_1.public_key])] == agent_0.received_msg
+        assert [Description({"foo": 2}), Description({"foo": 3})] == local_node.services[agent_1.public_key]
+
+
+class TestSubscribeServices:
+
+    def test_on_search_update(self):
+        """Test that a subscriber receives the current result, then only the changes of the result,
+        until it unsubscribes."""
+        with OEFLocalProxy.LocalNode() as local_node:
+            agent_0, agent_1, agent_2 = agents = [AgentTest(OEFLocalProxy("subscribe_services_{}".format(i),
+                                                                          local_node)) for i in range(3)]
+            for a in agents:
+                a.connect()
+
+            cheap_service, expensive_service = Description({"price": 5}), Description({"price": 50})
+            agent_1.register_service(0, cheap_service)
+            agent_0.subscribe_services(1, Query([Constraint("price", Lt(10))]))
+            agent_2.register_service(0, expensive_service)
+            agent_2.register_service(0, cheap_service)
+            agent_1.register_service(0, Description({"price": 1}))
+            agent_1.unregister_service(0, cheap_service)
+            agent_2.unregister_service(0, cheap_service)
+            agent_0.unsubscribe(1)
+            agent_2.register_service(0, cheap_service)
+
+            asyncio.ensure_future(agent_0.async_run())
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+            agent_0.stop()
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+
+        assert [(1, [agent_1.public_key], []),
+                (1, [agent_2.public_key], []),
+                (1, [], [agent_2.public_key])] == agent_0.received_msg
+
+    def test_register_services_sends_one_update(self):
+        """Test that the services registered in bulk are indexed, and sent to a subscriber in one update."""
+        local_node = OEFLocalProxy.LocalNode()
+        queue = local_node.connect("agent_0")[1]
+        local_node.connect("agent_1")
+        local_node.subscribe_services("agent_0", 0, Query([Constraint("price", Lt(10))]))
+        local_node.subscribe_services("agent_0", 1, Query([Constraint("price", Gt(100))]))
+
+        local_node.register_services("agent_1", [Description({"price": i}) for i in range(20)])
+        local_node.search_services("agent_0", 2, Query([Constraint("price", Gt(15))]))
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+
+        assert ("on_search_update", (0, [], [])) == queue.get_nowait()
+        assert ("on_search_update", (1, [], [])) == queue.get_nowait()
+        assert ("on_search_update", (0, ["agent_1"], [])) == queue.get_nowait()
+        assert ("on_search_result", (2, ["agent_1"])) == queue.get_nowait()
+        assert queue.empty()
+
+    @pytest.mark.parametrize("proxy_class", [OEFNetworkProxy, OEFNetworkProtocolProxy])
+    def test_subscriptions_not_supported_by_network_proxy(self, proxy_class):
+        """Test that an agent gets an error at once if it subscribes through the OEF Node protocol."""
+        agent = AgentTest(proxy_class("subscribe_services_network", "127.0.0.1", 3333))
+        with pytest.raises(OEFNotSupportedError, match="^{} does not support the subscriptions".format(
+                proxy_class.__name__)):
+            agent.subscribe_services(0, Query([Constraint("price", Lt(10))]))
+        with pytest.raises(OEFNotSupportedError):
+            agent.unsubscribe(0)
+
+
 class TestOEFError:
 
     def test_oef_error_when_failing_in_unregistering_service(self):
@@ -518,3 +719,47 @@ class TestMisc:
         assert expected_dialogue_id == actual_dialogue_id
         assert expected_origin == actual_origin
         assert expected_content == actual_content
+
+
+class TestProtocolProxy:
+
+    def test_dispatch_from_data_received(self):
+        """Test that the protocol queues the frames received before the dispatcher is set,
+        and then dispatches every message in the callback that received it."""
+        protocol = _OEFClientProtocol(asyncio.get_event_loop())
+        protocol.connection_made(MagicMock())
+
+        messages = []
+        for i in range(3):
+            msg = agent_pb2.Server.AgentMessage()
+            msg.answer_id = i
+            msg.content.dialogue_id = i
+            msg.content.origin = "origin"
+            msg.content.content = b"a" * i
+            messages.append(msg)
+        data = b"".join(HEADER.pack(m.ByteSize()) + m.SerializeToString() for m in messages)
+
+        protocol.data_received(data[:7])
+        protocol.data_received(data[7:20])
+        received = []
+        protocol.set_dispatcher(received.append)
+        protocol.data_received(data[20:])
+
+        assert received == messages
+
+    def test_send_more_than_64_kilobytes(self):
+        """Test that we can send more than 64KB messages with the protocol-based proxy."""
+        with NetworkOEFNode():
+            proxy = OEFNetworkProtocolProxy("test_send_more_than_64_kilobytes_protocol", "127.0.0.1", 3333)
+            agent = AgentTest(proxy)
+
+            expected_content = b"a"*2**16
+
+            agent.connect()
+            agent.send_message(0, 0, agent.public_key, expected_content)
+            asyncio.ensure_future(agent.async_run())
+            asyncio.get_event_loop().run_until_complete(asyncio.sleep(_ASYNCIO_DELAY))
+
+            agent.stop()
+
+        assert [(0, 0, agent.public_key, expected_content)] == agent.received_msg
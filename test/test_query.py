@@ -17,14 +17,20 @@
 #   limitations under the License.
 #
 # ------------------------------------------------------------------------------
+import copy
+import pickle
+
 import pytest
 from hypothesis import given
 
 from oef import query_pb2
-from oef.query import Relation, Range, Set, And, Or, Constraint, Query, Eq, In, Not, Distance
-from oef.schema import Location, DataModel, AttributeSchema
+from oef.messages import CFP
+from oef.query import Relation, Range, Set, And, Or, Constraint, Query, Eq, In, Not, Distance, LazyQuery, Gt, \
+    NotIn, FrozenQuery, ConstraintExpr, Lt, LtEq, GtEq, NotEq
+from oef.schema import Location, DataModel, AttributeSchema, Description
 from test.strategies import relations, ranges, query_sets, and_constraints, or_constraints, constraints, \
-    queries, not_constraints, distances
+    queries, not_constraints, distances, queries_and_descriptions, constraint_expressions, \
+    overlapping_queries_and_descriptions
 
 
 class TestRelation:
@@ -195,6 +201,48 @@ class TestNot:
         assert a_not != not_a_not
 
 
+class TestConstraintExprHash:
+
+    @given(constraint_expressions())
+    def test_equal_expressions_have_equal_hashes(self, expression):
+        """Test that a constraint expression and its copies, decoded, unpickled or copied, are equal and have the same hash."""
+        for copied in [ConstraintExpr._from_pb(ConstraintExpr._to_pb(expression)),
+                       pickle.loads(pickle.dumps(expression)), copy.deepcopy(expression)]:
+            assert expression == copied
+            assert hash(expression) == hash(copied)
+
+    @given(constraint_expressions())
+    def test_nodes_have_no_dict(self, expression):
+        """Test that the nodes of a constraint expression store their attributes in __slots__."""
+        nodes = [expression]
+        while nodes:
+            node = nodes.pop()
+            assert not hasattr(node, "__dict__")
+            if isinstance(node, (And, Or)):
+                nodes.extend(node.constraints)
+            elif isinstance(node, Not):
+                nodes.append(node.constraint)
+            elif isinstance(node, Constraint):
+                nodes.append(node.constraint)
+
+    def test_set_values_are_stored_in_tuples(self):
+        """Test that the sets are hashable and equal regardless of the sequence type they are built with."""
+        assert In(["horror", "thriller"]) == In(("horror", "thriller"))
+        assert NotIn([1990]) != In([1990])
+        assert {Constraint("year", In([1990, 2000])), Constraint("year", In((1990, 2000)))} == \
+            {Constraint("year", In([1990, 2000]))}
+
+    def test_nodes_are_immutable(self):
+        """Test that the attributes of the nodes cannot be assigned or deleted after their creation."""
+        constraint = Constraint("year", In([1990, 2000]))
+        with pytest.raises(AttributeError, match="'Constraint' object is immutable."):
+            constraint.attribute_name = "title"
+        with pytest.raises(AttributeError, match="'In' object is immutable."):
+            constraint.constraint.values = (1990,)
+        with pytest.raises(AttributeError, match="'And' object is immutable."):
+            del And([constraint, constraint]).constraints
+
+
 class TestQuery:
 
     @given(queries())
@@ -234,3 +282,216 @@ class TestQuery:
             a_query = Query([Constraint("an_attribute_name", Eq(0))],
                             DataModel("a_data_model", [AttributeSchema("an_attribute_name", str, True)]))
 
+    @given(queries_and_descriptions())
+    def test_compiled_query_equivalent_to_check(self, query_and_descriptions):
+        """Test that the compiled query gives the same result of checking every constraint, including errors."""
+        query, descriptions = query_and_descriptions
+        predicate = query.compile()
+        for description in descriptions:
+            try:
+                expected = all(c.check(description) for c in query.constraints)
+            except TypeError:
+                # e.g. a Range over Location values, that cannot be compared.
+                with pytest.raises(TypeError):
+                    predicate(description)
+            else:
+                assert expected == predicate(description)
+
+    def test_compiled_query_is_cached(self):
+        """Test that the query is compiled only once, and that the compiled form is not pickled."""
+        query = Query([Constraint("year", Gt(1990)), Constraint("genre", NotIn([]))])
+        assert query.compile() is query.compile()
+        assert not query.check(Description({"year": 2000, "genre": "horror"}))
+
+        unpickled_query = pickle.loads(pickle.dumps(query))
+        assert query == unpickled_query
+        assert not unpickled_query.check(Description({"year": 2000, "genre": "horror"}))
+
+    def test_compiled_query_follows_changes(self):
+        """Test that the compiled form is recomputed when the constraints or the data model of the query change."""
+        description = Description({"year": 2000})
+        query = Query([Constraint("year", Gt(1990))])
+        assert query.check(description)
+        query.constraints = [Constraint("year", Eq(1995))]
+        assert not query.check(description)
+
+        query = Query([Constraint("year", Gt(1990))])
+        assert query.check(description)
+        query.constraints.append(Constraint("year", Lt(2000)))
+        assert not query.check(description)
+        query.constraints[1] = Constraint("year", LtEq(2000))
+        assert query.check(description)
+
+        data_model = DataModel("book", [AttributeSchema("year", int, True)])
+        query.model = data_model
+        assert data_model == query.optimize().model
+
+    def test_copy(self):
+        """Test that a copy of a query has its own list of constraints, and keeps the compiled predicate."""
+        description = Description({"year": 2000})
+        query = Query([Constraint("year", Gt(1990))])
+        assert query.check(description)
+        copied = copy.copy(query)
+        assert query == copied
+        assert query.compile() is copied.compile()
+        copied.constraints.append(Constraint("year", Lt(2000)))
+        assert query.check(description) and not copied.check(description)
+
+        lazy_query = LazyQuery(query.to_pb())
+        copied = copy.copy(lazy_query)
+        assert query == copied
+        copied.constraints.append(Constraint("year", Lt(2000)))
+        assert 1 == len(lazy_query.constraints)
+
+    def test_compiled_query_short_circuits_cheapest_constraint_first(self):
+        """Test that the constraints are evaluated from the cheapest one."""
+
+        class FailingDistance(Distance):
+            def _compile(self):
+                def fail(value):
+                    raise AssertionError("The distance should not be evaluated.")
+                return fail
+
+        query = Query([Constraint("position", FailingDistance(Location(0.0, 0.0), 1.0)), Constraint("year", Gt(1990))])
+        assert not query.check(Description({"position": Location(0.0, 0.0), "year": 1980}))
+
+
+class TestOptimize:
+
+    @given(overlapping_queries_and_descriptions())
+    def test_optimized_query_equivalent_to_query(self, query_and_descriptions):
+        """Test that the optimized query gives the same result of the query, including errors."""
+        query, descriptions = query_and_descriptions
+        optimized_query = query.optimize()
+        for description in descriptions:
+            try:
+                expected = all(c.check(description) for c in query.constraints)
+            except TypeError:
+                # e.g. a Range over Location values, that cannot be compared.
+                with pytest.raises(TypeError):
+                    all(c.check(description) for c in optimized_query.constraints)
+            else:
+                assert expected == all(c.check(description) for c in optimized_query.constraints)
+                assert expected == query.check(description)
+
+    @given(queries_and_descriptions())
+    def test_optimized_query_valid_for_data_model(self, query_and_descriptions):
+        """Test that the optimized query is still valid for the data model of the query."""
+        query, _ = query_and_descriptions
+        assert query.optimize().is_valid(query.model)
+
+    def test_flatten(self):
+        """Test that the nested And and Or are flattened, and that the double Not are removed."""
+        a, b, c = Constraint("a", Eq(1)), Constraint("b", Eq("b")), Constraint("c", Eq(True))
+        query = Query([And([a, And([b, Not(Not(c))])]), Or([Or([a, b]), c])])
+        assert Query([a, b, c, Or([a, b, c])]) == query.optimize()
+
+    def test_merge_bounds(self):
+        """Test that the bounds on the same attribute are merged into one interval."""
+        query = Query([Constraint("year", Gt(1990)), Constraint("year", Range((1980, 2000))),
+                       Constraint("year", Lt(2010))])
+        assert Query([Constraint("year", Gt(1990)), Constraint("year", LtEq(2000))]) == query.optimize()
+
+        query = Query([Constraint("year", GtEq(1990)), Constraint("year", LtEq(1990))])
+        assert Query([Constraint("year", Eq(1990))]) == query.optimize()
+
+    def test_merge_equality_and_bounds(self):
+        """Test that an equality makes the bounds on the same attribute redundant."""
+        query = Query([Constraint("year", Lt(2000)), Constraint("year", Eq(1990)), Constraint("year", Eq(1990))])
+        assert Query([Constraint("year", Eq(1990))]) == query.optimize()
+
+    def test_fold_equalities(self):
+        """Test that the equalities on the same attribute and type, in disjunction, are folded into a set."""
+        query = Query([Or([Constraint("genre", Eq("horror")), Constraint("year", Eq(1990)),
+                           Constraint("genre", In(["fantasy", "horror"]))])])
+        assert Query([Or([Constraint("genre", In(["horror", "fantasy"])), Constraint("year", Eq(1990))])]) \
+            == query.optimize()
+
+        query = Query([Or([Constraint("year", Eq(1990)), Constraint("year", Eq(1990.0))])])
+        assert query == query.optimize()
+
+    @pytest.mark.parametrize("constraints", [
+        [Constraint("year", Lt(1990)), Constraint("year", Gt(2000))],
+        [Constraint("year", Lt(1990)), Constraint("year", GtEq(1990))],
+        [Constraint("year", Eq(1990)), Constraint("year", Eq(2000))],
+        [Constraint("year", Eq(1990)), Constraint("year", Gt(1990))],
+        [Constraint("year", Eq(1990)), Constraint("year", Eq("1990"))],
+        [Constraint("year", Gt(float("nan"))), Constraint("year", Lt(1.0))],
+        [Constraint("title", Eq("It")), Or([Constraint("year", In([])), Constraint("year", NotIn([]))])],
+    ])
+    def test_unsatisfiable(self, constraints):
+        """Test that the conjunctions that no description satisfies are detected."""
+        optimized_query = Query(constraints).optimize()
+        assert len(optimized_query.constraints) == 1
+        assert optimized_query.constraints[0].constraint == In([])
+
+    def test_cheapest_constraint_first(self):
+        """Test that the constraints are sorted by their estimated cost."""
+        near = Constraint("position", Distance(Location(0.0, 0.0), 1.0))
+        horror = Constraint("genre", Eq("horror"))
+        assert Query([horror, near]) == Query([near, horror]).optimize()
+
+    def test_order_preserved_when_constraint_may_raise(self):
+        """Test that the constraints are not merged nor reordered when one of them may raise an exception."""
+        query = Query([Constraint("position", Distance(Location(0.0, 0.0), 1.0)),
+                       Constraint("position", Range((Location(0.0, 0.0), Location(1.0, 1.0)))),
+                       Constraint("year", Gt(1990)), Constraint("year", NotEq(2000)), Constraint("year", Gt(1995))])
+        assert query == query.optimize()
+
+    def test_optimized_query_is_cached(self):
+        """Test that the query is optimized only once, and that the optimized query is not pickled."""
+        query = Query([Constraint("year", Gt(1990)), Constraint("year", Gt(1995))])
+        assert query.optimize() is query.optimize()
+        assert pickle.loads(pickle.dumps(query)).optimize() == query.optimize()
+
+
+
+class TestFrozenQuery:
+
+    @given(queries())
+    def test_equal_to_query(self, query: Query):
+        """Test that a FrozenQuery is equal to the query with the same content, and that they are
+        serialized to the same Protobuf object, also inside an envelope."""
+        frozen_query = FrozenQuery(query.constraints, query.model)
+
+        assert frozen_query == query
+        assert query == frozen_query
+        assert frozen_query.to_pb() == query.to_pb()
+        assert CFP(0, 0, "destination", 0, frozen_query).to_envelope() == \
+            CFP(0, 0, "destination", 0, query).to_envelope()
+
+    def test_serialization_is_cached(self):
+        """Test that the serialization is computed once, and invalidated when the constraints are reassigned."""
+        query = FrozenQuery([Constraint("year", Gt(1990))])
+        assert query.serialize() is query.serialize()
+        assert query.check(Description({"year": 2000}))
+
+        query.constraints = [Constraint("year", Gt(2010))]
+        assert query.to_pb() == Query([Constraint("year", Gt(2010))]).to_pb()
+        assert not query.check(Description({"year": 2000}))
+
+    def test_hash(self):
+        """Test that equal frozen queries have the same hash, so they can be used as keys."""
+        queries = {FrozenQuery([Constraint("year", Gt(1990))]): 1}
+        assert 1 == queries[FrozenQuery([Constraint("year", Gt(1990))])]
+
+
+class TestLazyQuery:
+
+    @given(queries())
+    def test_lazy_query_equal_to_query(self, query: Query):
+        """Test that a LazyQuery is equal to the query it wraps, and that it is serialized
+        back to the same object without decoding it."""
+        lazy_query = LazyQuery(query.to_pb())
+
+        assert lazy_query.to_pb() == query.to_pb()
+        assert lazy_query == query
+        assert query == lazy_query
+
+    def test_invalid_query_raises_when_accessed(self):
+        """Test that an invalid query is not decoded until it is accessed."""
+        query_pb = query_pb2.Query.Model()
+        lazy_query = LazyQuery(query_pb)
+
+        with pytest.raises(ValueError, match="empty list of constraints"):
+            _ = lazy_query.constraints
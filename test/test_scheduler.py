@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+from typing import List, Tuple
+from unittest.mock import patch
+
+from hypothesis import given
+from hypothesis.strategies import lists, integers, tuples
+
+from oef.scheduler import HandlerScheduler
+
+
+def _run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class TestHandlerScheduler:
+
+    @given(lists(tuples(integers(min_value=0, max_value=3), integers(min_value=0, max_value=3))))
+    def test_calls_with_the_same_key_are_serialized(self, calls: List[Tuple[int, int]]):
+        """Test that the calls with the same key are handled in order, whatever the delays of the coroutines."""
+        scheduler = HandlerScheduler(max_concurrency=len(calls) + 1)
+        handled = []
+
+        async def handler(key, index, delay):
+            for _ in range(delay):
+                await asyncio.sleep(0)
+            handled.append((key, index))
+
+        for index, (key, delay) in enumerate(calls):
+            scheduler.call(key, handler, (key, index, delay))
+        _run(scheduler.join())
+
+        assert sorted(handled) == sorted((key, index) for index, (key, _) in enumerate(calls))
+        for key in set(key for key, _ in calls):
+            indexes = [index for k, index in handled if k == key]
+            assert indexes == sorted(indexes)
+        assert 0 == len(scheduler)
+
+    def test_calls_with_different_keys_run_concurrently(self):
+        """Test that a pending coroutine does not stop the calls with other keys."""
+        scheduler = HandlerScheduler()
+        event = asyncio.Event()
+        handled = []
+
+        async def slow_handler():
+            await event.wait()
+            handled.append("slow")
+
+        scheduler.call("a", slow_handler, ())
+        scheduler.call("a", handled.append, ("a",))
+        scheduler.call("b", handled.append, ("b",))
+
+        assert ["b"] == handled
+        event.set()
+        _run(scheduler.join())
+        assert ["b", "slow", "a"] == handled
+
+    def test_full(self):
+        """Test that the scheduler is full when the pending calls reach the limit, and available after."""
+        scheduler = HandlerScheduler(max_concurrency=2)
+        event = asyncio.Event()
+
+        async def handler():
+            await event.wait()
+
+        scheduler.call("a", handler, ())
+        assert not scheduler.full()
+        scheduler.call("b", handler, ())
+        assert scheduler.full()
+
+        event.set()
+        _run(asyncio.wait_for(scheduler.wait_available(), timeout=1.0))
+        _run(scheduler.join())
+        assert not scheduler.full()
+
+    def test_exceptions_are_logged(self):
+        """Test that the exceptions raised by a coroutine are logged, and the next calls with the same key are done."""
+        scheduler = HandlerScheduler()
+        handled = []
+
+        async def failing_handler():
+            raise ValueError("failure")
+
+        with patch("oef.scheduler.logger") as mock:
+            scheduler.call("a", failing_handler, ())
+            scheduler.call("a", handled.append, ("a",))
+            _run(scheduler.join())
+
+        assert mock.exception.called
+        assert ["a"] == handled
+
+    def test_cancel(self):
+        """Test that cancel discards the pending calls."""
+        scheduler = HandlerScheduler()
+        handled = []
+
+        async def handler():
+            await asyncio.sleep(10)
+
+        scheduler.call("a", handler, ())
+        scheduler.call("a", handled.append, ("a",))
+        scheduler.cancel()
+        _run(asyncio.sleep(0))
+
+        assert [] == handled
+        assert 0 == len(scheduler)
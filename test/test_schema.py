@@ -18,15 +18,19 @@
 #
 # ------------------------------------------------------------------------------
 
+import gc
+import pickle
+import weakref
 from typing import List, Dict
 
 import pytest
-from hypothesis import given
+from hypothesis import given, assume
 from hypothesis.strategies import text, from_type, one_of, none
 from oef import query_pb2
 
+from oef.query import Query, Constraint, Eq
 from oef.schema import AttributeSchema, ATTRIBUTE_TYPES, DataModel, AttributeInconsistencyException, Description, \
-    generate_schema, Location
+    generate_schema, Location, intern_data_model, FrozenDataModel, FrozenDescription
 
 from test.strategies import attribute_schema_values, descriptions, data_models, attributes_schema, locations
 
@@ -98,6 +102,40 @@ class TestDataModel:
         """Test that equality test with different types works correctly."""
         assert data_model != any
 
+    @given(data_models())
+    def test_from_pb_interned(self, data_model):
+        """Test that the data models decoded from equal Protobuf objects are the same instance."""
+        data_model_pb = data_model.to_pb()
+        actual_data_model = DataModel.from_pb(data_model_pb)
+
+        assert actual_data_model is DataModel.from_pb(data_model_pb)
+        assert actual_data_model.fingerprint == data_model.fingerprint
+        assert actual_data_model is intern_data_model(data_model)
+
+    def test_fingerprint_includes_descriptions(self):
+        """Test that the data models that are equal but have different descriptions are interned separately."""
+        data_model = intern_data_model(DataModel("book", [AttributeSchema("title", str, True, "The title.")]))
+        other_data_model = DataModel("book", [AttributeSchema("title", str, True, "The name.")])
+
+        assert data_model == other_data_model
+        assert data_model is not intern_data_model(other_data_model)
+
+    def test_interned_data_models_are_weakly_referenced(self):
+        """Test that an interned data model is removed from the table when it is no longer referenced."""
+        data_model_pb = DataModel("weakly_referenced", [AttributeSchema("foo", int, True)]).to_pb()
+        data_model_ref = weakref.ref(DataModel.from_pb(data_model_pb))
+        gc.collect()
+
+        assert data_model_ref() is None
+
+    def test_query_and_description_share_data_model(self):
+        """Test that the queries and the descriptions decoded with the same data model share it."""
+        data_model = DataModel("book", [AttributeSchema("title", str, True)])
+        query = Query.from_pb(Query([Constraint("title", Eq("It"))], data_model).to_pb())
+        description = Description.from_pb(Description({"title": "It"}, data_model).to_pb())
+
+        assert query.model is description.data_model
+
     def test_raise_exception_when_duplicated_attribute_name(self):
         """Test that if we try to instantiate a DataModel with a list of attributes with not unique names
         we raise an exception."""
@@ -123,6 +161,70 @@ class TestDescription:
         """Test that equality test with different types works correctly."""
         assert desc != any
 
+    def test_attribute_values_are_copied(self):
+        """Test that the dictionary of values is copied, so that the description is not affected by changes to it."""
+        values = {"title": "It"}
+        description = Description(values)
+        values["title"] = "1984"
+        assert {"title": "It"} == description.values
+
+    def test_from_trusted_checks_consistency(self):
+        """Test that a description built with from_trusted is still checked against the data model."""
+        data_model = DataModel("book", [AttributeSchema("title", str, True)])
+        with pytest.raises(AttributeInconsistencyException, match="Missing required attribute."):
+            Description.from_trusted({}, data_model)
+
+    @given(descriptions())
+    def test_list_from_pb_shares_data_models(self, description):
+        """Test that the descriptions with the same data model share the decoded data model."""
+        other_description = Description({"foo": 0}, data_model_name="other")
+        assume(other_description.data_model != description.data_model)
+        instances_pb = [description.to_pb(), description.to_pb(), other_description.to_pb()]
+        actual_descriptions = Description.list_from_pb(instances_pb)
+
+        assert [description, description, other_description] == actual_descriptions
+        assert actual_descriptions[0].data_model is actual_descriptions[1].data_model
+        assert actual_descriptions[1].data_model is not actual_descriptions[2].data_model
+
+
+class TestFrozenDescription:
+
+    @given(descriptions())
+    def test_equal_to_description(self, description):
+        """Test that a FrozenDescription is equal to the description with the same content, and that
+        they are serialized to the same Protobuf object."""
+        data_model = description.data_model
+        frozen_data_model = FrozenDataModel(data_model.name, data_model.attribute_schemas, data_model.description)
+        frozen_description = FrozenDescription(description.values, frozen_data_model)
+
+        assert frozen_description == description
+        assert description == frozen_description
+        assert frozen_description.to_pb() == description.to_pb()
+        assert frozen_description.to_agent_description_pb() == description.to_agent_description_pb()
+
+    def test_serialization_is_cached(self):
+        """Test that the serialization is computed once, and invalidated when an attribute is reassigned."""
+        description = FrozenDescription({"title": "It"}, data_model_name="book")
+        assert description.serialize() is description.serialize()
+
+        description.values = {"title": "1984"}
+        assert description.to_pb() == Description({"title": "1984"}, data_model_name="book").to_pb()
+
+    def test_values_are_read_only(self):
+        """Test that the values of a FrozenDescription cannot be modified."""
+        description = FrozenDescription({"title": "It"})
+        with pytest.raises(TypeError):
+            description.values["title"] = "1984"
+
+    def test_pickle(self):
+        """Test that a FrozenDescription can be pickled."""
+        description = FrozenDescription({"title": "It", "position": Location(48.85, 2.29)}, data_model_name="book")
+        description.serialize()
+        unpickled_description = pickle.loads(pickle.dumps(description))
+
+        assert type(unpickled_description) == FrozenDescription
+        assert description == unpickled_description
+
 
 class TestGenerateSchema:
 
@@ -192,3 +294,17 @@ class TestGenerateSchema:
 
         generate_schema_checker("foo", values, DataModel("foo", schema_attributes))
 
+    def test_generate_schema_shared(self):
+        """Test that the descriptions with the same attribute names and types share the generated schema."""
+        assert Description({"foo": 1}, data_model_name="bar").data_model is \
+            Description({"foo": 2}, data_model_name="bar").data_model
+        assert Description({"foo": 1}, data_model_name="bar").data_model is not \
+            Description({"foo": "1"}, data_model_name="bar").data_model
+
+    def test_generate_schema_immutable(self):
+        """Test that the shared generated schema cannot be modified through one of the descriptions."""
+        data_model = Description({"foo": 1}, data_model_name="bar").data_model
+        assert isinstance(data_model, FrozenDataModel)
+        with pytest.raises(AttributeError):
+            data_model.attribute_schemas.append(AttributeSchema("baz", int, False))
+
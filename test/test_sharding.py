@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import asyncio
+import os
+import queue
+import time
+from typing import List
+
+import pytest
+
+from oef.messages import Message, Multicast
+from oef.proxy import OEFLocalProxy
+from oef.query import Query, Constraint, Lt
+from oef.schema import Description
+from oef.sharding import ShardNode, ShardedNode, shard_of
+from test.common import AgentTest
+
+
+def _keys_of_shard(shard_id: int, nb_shards: int, n: int) -> List[str]:
+    """Get n public keys that belong to a shard."""
+    keys = (key for key in ("agent_{}".format(i) for i in range(1000)) if shard_of(key, nb_shards) == shard_id)
+    return [next(keys) for _ in range(n)]
+
+
+class TestShardNode:
+    """Test the shards in the same process, where the inboxes are processed explicitly."""
+
+    def setup_method(self):
+        inboxes = [queue.Queue(), queue.Queue()]
+        self.nodes = [ShardNode(i, inboxes) for i in range(2)]
+        self.keys = [_keys_of_shard(i, 2, 2) for i in range(2)]
+        self.queues = {}
+        for node, keys in zip(self.nodes, self.keys):
+            for key in keys:
+                self.queues[key] = node.connect(key)[1]
+
+    def _process_inboxes(self):
+        """Process the requests between the shards, until there are none."""
+        while any(not node._inboxes[node.shard_id].empty() for node in self.nodes):
+            for node in self.nodes:
+                inbox = node._inboxes[node.shard_id]
+                while not inbox.empty():
+                    node._process_request(inbox.get_nowait())
+
+    def _received(self, public_key: str) -> list:
+        q = self.queues[public_key]
+        return [q.get_nowait() for _ in range(q.qsize())]
+
+    def test_send_message(self):
+        """Test that the messages are delivered to the agents of the same shard and of the other shards."""
+        (a, b), (c, d) = self.keys
+        self.nodes[0]._send_agent_message(a, Message(0, 1, b, b"local"))
+        self.nodes[0]._send_agent_message(a, Message(0, 2, c, b"remote"))
+        self.nodes[0]._send_multicast(a, Multicast(Message(0, 0, "", b"multicast"), [(3, b), (4, d)]))
+        self._process_inboxes()
+
+        assert [("on_message", (0, 1, a, b"local")), ("on_message", (0, 3, a, b"multicast"))] == self._received(b)
+        assert [("on_message", (0, 2, a, b"remote"))] == self._received(c)
+        assert [("on_message", (0, 4, a, b"multicast"))] == self._received(d)
+
+    def test_send_message_to_unknown_agent(self):
+        """Test that a message to an agent that is not connected is dropped by its shard."""
+        (a, _), _ = self.keys
+        unknown = _keys_of_shard(1, 2, 3)[-1]
+        self.nodes[0]._send_agent_message(a, Message(0, 1, unknown, b"hello"))
+        self._process_inboxes()
+
+    def test_search_services(self):
+        """Test that a search returns the merged and sorted results of all the shards."""
+        (a, b), (c, d) = self.keys
+        self.nodes[0].register_service(b, Description({"price": 5}))
+        self.nodes[1].register_service(c, Description({"price": 1}))
+        self.nodes[1].register_service(d, Description({"price": 50}))
+        self.nodes[1].register_agent(c, Description({"price": 1}))
+
+        self.nodes[0].search_services(a, 1, Query([Constraint("price", Lt(10))]))
+        self.nodes[0].search_agents(a, 2, Query([Constraint("price", Lt(10))]))
+        assert [] == self._received(a)
+        self._process_inboxes()
+        # the search results are delivered at the next iteration of the event loop.
+        asyncio.get_event_loop().run_until_complete(asyncio.sleep(0))
+
+        assert [("on_search_result", (1, sorted([b, c]))), ("on_search_result", (2, [c]))] == self._received(a)
+        # every shard answered from its search caches.
+        assert all(len(node.service_search_cache) == 1 and len(node.agent_search_cache) == 1 for node in self.nodes)
+
+    def test_subscribe_services(self):
+        """Test that a subscriber receives the changes of the services of all the shards."""
+        (a, b), (c, d) = self.keys
+        service = Description({"price": 5})
+        self.nodes[1].register_service(c, service)
+        self.nodes[0].subscribe_services(a, 1, Query([Constraint("price", Lt(10))]))
+        self._process_inboxes()
+        for node, register, key in [(1, True, d), (1, False, c), (0, True, b)]:
+            if register:
+                self.nodes[node].register_service(key, service)
+            else:
+                self.nodes[node].unregister_service(key, service)
+            self._process_inboxes()
+        self.nodes[0].unsubscribe(a, 1)
+        self._process_inboxes()
+        self.nodes[1].unregister_service(d, service)
+        self._process_inboxes()
+
+        assert [("on_search_update", (1, [], [])),
+                ("on_search_update", (1, [c], [])),
+                ("on_search_update", (1, [d], [])),
+                ("on_search_update", (1, [], [c])),
+                ("on_search_update", (1, [b], []))] == self._received(a)
+
+
+class _PingAgent(AgentTest):
+    """An agent created by the worker processes of a :class:`~oef.sharding.ShardedNode`."""
+
+    def __init__(self, public_key: str, proxy: OEFLocalProxy):
+        super().__init__(proxy)
+
+
+def _setup(public_keys: List[str]):
+    def setup(agent: AgentTest):
+        for i, public_key in enumerate(public_keys):
+            if public_key != agent.public_key:
+                agent.send_message(0, i, public_key, agent.public_key.encode("utf-8"))
+    return setup
+
+
+def _failing_factory(public_key: str, proxy: OEFLocalProxy) -> AgentTest:
+    """Create an agent, except in shard 1."""
+    if shard_of(public_key, 2) == 1:
+        raise ValueError("cannot create {}".format(public_key))
+    return _PingAgent(public_key, proxy)
+
+
+def _exiting_factory(public_key: str, proxy: OEFLocalProxy) -> AgentTest:
+    """Create an agent, except in shard 1, whose process exits without reporting an error."""
+    if shard_of(public_key, 2) == 1:
+        os._exit(3)
+    return _PingAgent(public_key, proxy)
+
+
+def _teardown(agent: AgentTest):
+    return sorted(content.decode("utf-8") for _, _, _, content in agent.received_msg)
+
+
+class TestShardedNode:
+
+    def test_invalid_number_of_shards(self):
+        with pytest.raises(ValueError):
+            ShardedNode(0, [], _PingAgent)
+
+    def test_send_message(self):
+        """Test that the agents of the worker processes receive the messages of all the other agents."""
+        public_keys = ["sharded_agent_{}".format(i) for i in range(6)]
+        with ShardedNode(3, public_keys, _PingAgent, setup=_setup(public_keys), teardown=_teardown) as node:
+            time.sleep(2.0)
+            results = node.stop()
+
+        assert set(public_keys) == set(results.keys())
+        for public_key, received in results.items():
+            assert sorted(set(public_keys) - {public_key}) == received
+
+    def test_failed_shard(self):
+        """Test that the node stops, and names the failed shard, if an agent cannot be created."""
+        public_keys = _keys_of_shard(0, 2, 1) + _keys_of_shard(1, 2, 1)
+        node = ShardedNode(2, public_keys, _failing_factory, connect_timeout=10.0)
+        node.start()
+        start = time.time()
+        with pytest.raises(RuntimeError, match="^Shard 1 failed: ValueError: cannot create agent_"):
+            node.stop()
+        assert time.time() - start < 5.0
+        assert [] == node._processes
+
+    def test_dead_shard(self):
+        """Test that the node stops, once the barrier times out, if a worker process dies without reporting."""
+        public_keys = _keys_of_shard(0, 2, 1) + _keys_of_shard(1, 2, 1)
+        node = ShardedNode(2, public_keys, _exiting_factory, connect_timeout=0.5)
+        node.start()
+        with pytest.raises(RuntimeError, match="^Shard 1 failed: exit code 3$"):
+            node.stop()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2018 Fetch.AI Limited
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+import pytest
+from hypothesis import given
+
+from oef.query import Query, Constraint, Eq, NotEq, Lt, Gt, In, NotIn, Range, Distance, Or, Not, ConstraintType
+from oef.schema import Description, Location
+from test.strategies import queries_and_descriptions
+
+np = pytest.importorskip("numpy")
+from oef.table import DescriptionTable  # noqa: E402
+
+
+class TestDescriptionTable:
+
+    @given(queries_and_descriptions())
+    def test_check_batch_equivalent_to_check(self, query_and_descriptions):
+        """Test that checking a table gives the same result of checking every description."""
+        query, descriptions = query_and_descriptions
+        table = DescriptionTable(descriptions)
+        try:
+            expected = [query.check(d) for d in descriptions]
+        except TypeError:
+            # e.g. a Range over Location values, that cannot be compared.
+            with pytest.raises(TypeError):
+                query.check_batch(table)
+            return
+
+        try:
+            actual = query.check_batch(table)
+        except TypeError:
+            # every constraint is evaluated, while the check of a description stops at the first false one.
+            return
+        assert expected == actual.tolist()
+
+    def test_missing_and_mistyped_attributes(self):
+        """Test that the descriptions without the attribute, or with a value of another type, do not satisfy it."""
+        table = DescriptionTable([Description({"year": 1990}),
+                                  Description({"year": "1990"}),
+                                  Description({"title": "It"}),
+                                  Description({"year": 2 ** 70})])
+
+        assert [True, False, False, False] == Query([Constraint("year", Eq(1990))]).check_batch(table).tolist()
+        assert [False, True, True, True] == Query([Not(Constraint("year", Eq(1990)))]).check_batch(table).tolist()
+        assert [True, False, False, True] == Query([Constraint("year", Gt(1000))]).check_batch(table).tolist()
+        assert [False, True, False, False] == Query([Constraint("year", In(["1990"]))]).check_batch(table).tolist()
+
+    def test_locations(self):
+        """Test the constraints over Location values."""
+        tour_eiffel = Location(48.8581064, 2.29447)
+        table = DescriptionTable([Description({"position": Location(48.8579675, 2.2951849)}),
+                                  Description({"position": Location(41.8902102, 12.4922309)}),
+                                  Description({"position": tour_eiffel})])
+
+        query = Query([Or([Constraint("position", Distance(tour_eiffel, 1.0)),
+                           Constraint("position", NotEq(tour_eiffel))])])
+        assert [True, True, True] == query.check_batch(table).tolist()
+        query = Query([Constraint("position", NotIn([tour_eiffel])), Constraint("position", Distance(tour_eiffel, 1.0))])
+        assert [True, False, False] == query.check_batch(table).tolist()
+
+        with pytest.raises(TypeError):
+            Query([Constraint("position", Range((tour_eiffel, tour_eiffel)))]).check_batch(table)
+        with pytest.raises(TypeError):
+            Query([Constraint("position", Lt(tour_eiffel))]).check_batch(table)
+
+    def test_unknown_constraint_type_checked_by_description(self):
+        """Test that the constraint types not supported by the table are checked description by description."""
+
+        class IsEven(ConstraintType):
+            def check(self, value):
+                return value % 2 == 0
+
+            def _get_type(self):
+                return int
+
+            def to_pb(self):
+                raise NotImplementedError
+
+            @classmethod
+            def from_pb(cls, obj):
+                raise NotImplementedError
+
+        table = DescriptionTable([Description({"year": 1990}), Description({"year": 1991})])
+        assert [True, False] == Query([Constraint("year", IsEven())]).check_batch(table).tolist()